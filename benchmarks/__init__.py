@@ -0,0 +1,10 @@
+"""
+Benchmarks for the computationally expensive steps of the reduction.
+
+The benchmarks are written for `airspeed velocity`_ (``asv``); see
+``asv.conf.json`` in the top-level directory.  All the data are
+synthetic and generated deterministically by :mod:`benchmarks.data`.
+
+.. include common links, assuming primary doc root is up one directory
+.. include:: ../doc/include/links.rst
+"""
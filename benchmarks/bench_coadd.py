@@ -0,0 +1,48 @@
+"""
+Benchmarks for the 1D and 2D coadding routines.
+"""
+import numpy as np
+
+from pypeit.core import coadd
+
+from benchmarks import data
+
+
+class ComputeStack:
+    """
+    Rebin and stack a set of 1D spectra using
+    :func:`pypeit.core.coadd.compute_stack`.
+    """
+    params = [5, 20]
+    param_names = ['nexp']
+
+    def setup(self, nexp):
+        self.waves, self.fluxes, self.ivars, self.masks = data.spectra(nexp=nexp)
+        self.wave_grid = np.arange(3990., 4000. + self.waves.shape[0] + 10., 1.)
+        self.weights = np.ones(self.waves.shape, dtype=float)
+
+    def time_compute_stack(self, nexp):
+        coadd.compute_stack(self.wave_grid, self.waves, self.fluxes, self.ivars, self.masks,
+                            self.weights)
+
+    def peakmem_compute_stack(self, nexp):
+        coadd.compute_stack(self.wave_grid, self.waves, self.fluxes, self.ivars, self.masks,
+                            self.weights)
+
+
+class Rebin2D:
+    """
+    Rebin a stack of 2D spectra onto a common grid using
+    :func:`pypeit.core.coadd.rebin2d`.
+    """
+    params = [3, 10]
+    param_names = ['nimgs']
+
+    def setup(self, nimgs):
+        self.d = data.rectified_stack(nimgs=nimgs)
+
+    def time_rebin2d(self, nimgs):
+        coadd.rebin2d(**self.d)
+
+    def peakmem_rebin2d(self, nimgs):
+        coadd.rebin2d(**self.d)
@@ -0,0 +1,59 @@
+"""
+Benchmarks for the bspline fitting routines.
+"""
+import numpy as np
+
+from pypeit import bspline
+from pypeit.core import fitting
+
+
+def _sky_samples(nsamp, seed=10):
+    """
+    Sorted, noisy samples of a sky spectrum with emission lines.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.sort(rng.uniform(0, 1, size=nsamp))
+    y = 100. + np.sum([a*np.exp(-0.5*((x-c)/0.002)**2)
+                       for a, c in zip(rng.uniform(50, 500, size=20), np.linspace(0.05, 0.95, 20))],
+                      axis=0)
+    y += rng.normal(scale=5., size=nsamp)
+    return x, y, np.full(nsamp, 1/25.)
+
+
+class BSplineFit:
+    """
+    Single least-squares fit with :func:`pypeit.bspline.bspline.bspline.fit`.
+    """
+    params = [10000, 100000]
+    param_names = ['nsamp']
+
+    def setup(self, nsamp):
+        self.x, self.y, self.ivar = _sky_samples(nsamp)
+        self.sset = bspline.bspline(self.x, nord=4, bkspace=0.001)
+
+    def time_fit(self, nsamp):
+        self.sset.fit(self.x, self.y, self.ivar)
+
+    def peakmem_fit(self, nsamp):
+        self.sset.fit(self.x, self.y, self.ivar)
+
+
+class BSplineProfile:
+    """
+    Iterative fit with rejection using
+    :func:`pypeit.core.fitting.bspline_profile`.
+    """
+    params = [10000, 100000]
+    param_names = ['nsamp']
+
+    def setup(self, nsamp):
+        self.x, self.y, self.ivar = _sky_samples(nsamp)
+        self.basis = np.ones((nsamp,1), dtype=float)
+
+    def time_bspline_profile(self, nsamp):
+        fitting.bspline_profile(self.x, self.y, self.ivar, self.basis,
+                                kwargs_bspline={'bkspace': 0.001}, quiet=True)
+
+    def peakmem_bspline_profile(self, nsamp):
+        fitting.bspline_profile(self.x, self.y, self.ivar, self.basis,
+                                kwargs_bspline={'bkspace': 0.001}, quiet=True)
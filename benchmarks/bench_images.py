@@ -0,0 +1,49 @@
+"""
+Benchmarks for the image processing routines.
+"""
+import numpy as np
+
+from pypeit.core import procimg, combine
+
+from benchmarks import data
+
+
+class LACosmic:
+    """
+    Cosmic-ray detection using :func:`pypeit.core.procimg.lacosmic`.
+    """
+    params = [512, 2048]
+    param_names = ['npix']
+    timeout = 300
+
+    def setup(self, npix):
+        self.image, self.var = data.cosmic_ray_image(nspec=npix, nspat=npix, ncr=npix//2)
+
+    def time_lacosmic(self, npix):
+        procimg.lacosmic(self.image, 65535., 60000., varframe=self.var)
+
+    def peakmem_lacosmic(self, npix):
+        procimg.lacosmic(self.image, 65535., 60000., varframe=self.var)
+
+
+class WeightedCombine:
+    """
+    Weighted, sigma-clipped combination of an image stack using
+    :func:`pypeit.core.combine.weighted_combine`.
+    """
+    params = [3, 10]
+    param_names = ['nimgs']
+
+    def setup(self, nimgs):
+        self.sci, self.var, self.gpm = data.image_stack(nimgs=nimgs)
+        self.weights = np.ones(nimgs, dtype=float)
+
+    def time_weighted_combine(self, nimgs):
+        combine.weighted_combine(self.weights, [self.sci], [self.var], self.gpm,
+                                 sigma_clip=True, sigma_clip_stack=self.sci,
+                                 sigrej=3.)
+
+    def peakmem_weighted_combine(self, nimgs):
+        combine.weighted_combine(self.weights, [self.sci], [self.var], self.gpm,
+                                 sigma_clip=True, sigma_clip_stack=self.sci,
+                                 sigrej=3.)
@@ -0,0 +1,90 @@
+"""
+Benchmarks for sky subtraction and object extraction.
+"""
+import numpy as np
+
+from pypeit.core import skysub, extract
+
+from benchmarks import data
+
+
+class GlobalSkySub:
+    """
+    Global sky model of a single slit using
+    :func:`pypeit.core.skysub.global_skysub`.
+    """
+    timeout = 300
+
+    def setup(self):
+        self.d = data.sky_slits()
+        self.left, self.right, _ = self.d['slits'].select_edges()
+        self.thismask = self.d['slitmask'] == self.d['slits'].spat_id[0]
+
+    def time_global_skysub(self):
+        skysub.global_skysub(self.d['image'], self.d['ivar'], self.d['tilts'], self.thismask,
+                             self.left[:,0], self.right[:,0], pos_mask=False)
+
+    def peakmem_global_skysub(self):
+        skysub.global_skysub(self.d['image'], self.d['ivar'], self.d['tilts'], self.thismask,
+                             self.left[:,0], self.right[:,0], pos_mask=False)
+
+
+class LocalSkySubExtract:
+    """
+    Local sky subtraction and optimal extraction of a single slit using
+    :func:`pypeit.core.skysub.local_skysub_extract`.
+    """
+    timeout = 300
+
+    def setup(self):
+        self.d = data.sky_slits()
+        self.left, self.right, _ = self.d['slits'].select_edges()
+        slit = self.d['slits'].spat_id[0]
+        self.thismask = self.d['slitmask'] == slit
+        self.sobjs = self.d['sobjs'][self.d['sobjs'].SLITID == slit]
+
+    def time_local_skysub_extract(self):
+        skysub.local_skysub_extract(self.d['image'], self.d['ivar'], self.d['tilts'],
+                                    self.d['waveimg'], self.d['sky'], self.d['rn2img'],
+                                    self.thismask, self.left[:,0], self.right[:,0],
+                                    self.sobjs.copy(), box_rad=7.)
+
+    def peakmem_local_skysub_extract(self):
+        skysub.local_skysub_extract(self.d['image'], self.d['ivar'], self.d['tilts'],
+                                    self.d['waveimg'], self.d['sky'], self.d['rn2img'],
+                                    self.thismask, self.left[:,0], self.right[:,0],
+                                    self.sobjs.copy(), box_rad=7.)
+
+
+class FitProfile:
+    """
+    Non-parametric object profile fit using
+    :func:`pypeit.core.extract.fit_profile`.
+    """
+    def setup(self):
+        d = data.sky_slits(nobj=1)
+        slit = d['slits'].spat_id[0]
+        self.thismask = d['slitmask'] == slit
+        self.image = d['image'] - d['sky']
+        self.ivar = d['ivar']
+        self.waveimg = d['waveimg']
+        nspec, nspat = self.image.shape
+        self.spat_img = np.tile(np.arange(nspat, dtype=float), (nspec,1))
+        sobj = d['sobjs'][d['sobjs'].SLITID == slit][0]
+        self.trace = sobj.TRACE_SPAT
+        # Boxcar extraction of the object as the input spectrum
+        spat = np.round(self.trace).astype(int)
+        self.wave = self.waveimg[np.arange(nspec),spat]
+        self.flux = np.sum(self.image[:,spat[0]-5:spat[0]+6], axis=1)
+        self.fluxivar = 1/np.sum(1/self.ivar[:,spat[0]-5:spat[0]+6], axis=1)
+        self.maskwidth = sobj.maskwidth
+
+    def time_fit_profile(self):
+        extract.fit_profile(self.image, self.ivar, self.waveimg, self.thismask, self.spat_img,
+                            self.trace, self.wave, self.flux, self.fluxivar,
+                            maskwidth=self.maskwidth)
+
+    def peakmem_fit_profile(self):
+        extract.fit_profile(self.image, self.ivar, self.waveimg, self.thismask, self.spat_img,
+                            self.trace, self.wave, self.flux, self.fluxivar,
+                            maskwidth=self.maskwidth)
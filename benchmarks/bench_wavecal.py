@@ -0,0 +1,35 @@
+"""
+Benchmarks for the automated wavelength calibration.
+"""
+import numpy as np
+
+from pypeit.par import pypeitpar
+from pypeit.core.wavecal import autoid
+
+from benchmarks import data
+
+
+class HolyGrail:
+    """
+    Pattern-matching wavelength calibration using
+    :class:`pypeit.core.wavecal.autoid.HolyGrail`.
+    """
+    params = [1, 3]
+    param_names = ['nslit']
+    # Each call takes many seconds; time single calls
+    number = 1
+    repeat = 3
+    warmup_time = 0
+    timeout = 600
+
+    def setup(self, nslit):
+        self.par = pypeitpar.WavelengthSolutionPar(lamps=data.ARC_LAMPS)
+        # Each slit covers a slightly different wavelength range
+        self.spec = np.stack([data.arc_spectrum(wv0=5500.+50*i, seed=i)[0]
+                              for i in range(nslit)], axis=1)
+
+    def time_holygrail(self, nslit):
+        autoid.HolyGrail(self.spec, par=self.par, nonlinear_counts=1e10)
+
+    def peakmem_holygrail(self, nslit):
+        autoid.HolyGrail(self.spec, par=self.par, nonlinear_counts=1e10)
@@ -0,0 +1,239 @@
+"""
+Synthetic, deterministic data used by the benchmarks.
+
+All random numbers are drawn from generators with fixed seeds so that
+every call returns identical data.
+"""
+import numpy as np
+
+from pypeit import specobj, specobjs
+from pypeit.slittrace import SlitTraceSet
+from pypeit.core.wavecal import waveio
+
+ARC_LAMPS = ['ArI', 'HgI', 'KrI', 'NeI', 'XeI']
+"""
+Lamps used to construct the synthetic arc spectra.
+"""
+
+
+def arc_spectrum(lamps=ARC_LAMPS, npix=2048, wv0=5500.,
+                 disp=1.6, fwhm=3.5, nonlinear=-1e-6, seed=1):
+    """
+    Construct an arc spectrum from a set of line lists.
+
+    Args:
+        lamps (:obj:`list`, optional):
+            The lamps used to construct the spectrum.
+        npix (:obj:`int`, optional):
+            Number of spectral pixels.
+        wv0 (:obj:`float`, optional):
+            Wavelength of the first pixel.
+        disp (:obj:`float`, optional):
+            Dispersion in angstroms per pixel.
+        fwhm (:obj:`float`, optional):
+            FWHM of the lines in pixels.
+        nonlinear (:obj:`float`, optional):
+            Quadratic term of the wavelength solution.
+        seed (:obj:`int`, optional):
+            Seed for the random number generator.
+
+    Returns:
+        :obj:`tuple`: The spectrum and the wavelength of each pixel.
+    """
+    rng = np.random.default_rng(seed)
+    pix = np.arange(npix, dtype=float)
+    wave = wv0 + disp*pix + nonlinear*pix**2
+    lines = waveio.load_line_lists(lamps)
+    lines = lines[(lines['wave'] > wave[0]) & (lines['wave'] < wave[-1])]
+    # Pixel position of each line
+    xlines = np.interp(np.asarray(lines['wave']), wave, pix)
+    amp = 10**rng.uniform(2, 4, size=xlines.size)
+    sig = fwhm/2.355
+    spec = np.sum(amp[:,None]*np.exp(-0.5*((pix[None,:]-xlines[:,None])/sig)**2), axis=0)
+    spec += rng.normal(scale=5., size=npix)
+    return spec, wave
+
+
+def sky_slits(nspec=1024, nspat=256, nslits=4, nobj=1, seed=2):
+    """
+    Construct a multi-slit image with a tilted sky spectrum and point
+    sources.
+
+    Args:
+        nspec (:obj:`int`, optional):
+            Number of spectral pixels.
+        nspat (:obj:`int`, optional):
+            Number of spatial pixels.
+        nslits (:obj:`int`, optional):
+            Number of slits, uniformly spaced across the detector.
+        nobj (:obj:`int`, optional):
+            Number of objects in each slit.
+        seed (:obj:`int`, optional):
+            Seed for the random number generator.
+
+    Returns:
+        :obj:`dict`: The image data, the slits, and the objects.  The
+        keys are ``image``, ``ivar``, ``rn2img``, ``sky``, ``tilts``,
+        ``waveimg``, ``slits``, ``slitmask``, and ``sobjs``.
+    """
+    rng = np.random.default_rng(seed)
+    piximg = np.arange(nspec, dtype=float)[:,None] \
+                + 0.02*np.arange(nspat, dtype=float)[None,:]
+    # Continuum plus a forest of sky lines
+    xlines = np.linspace(0.05, 0.95, 20)*nspec
+    sky = 100. + np.sum([a*np.exp(-0.5*((piximg-x)/2.)**2)
+                         for a, x in zip(rng.uniform(50, 500, size=xlines.size), xlines)],
+                        axis=0)
+
+    # Slits with a small gap between them
+    width = nspat/nslits
+    left = np.arange(nslits)*width + 2.
+    right = left + width - 4.
+    slits = SlitTraceSet(left_init=np.tile(left, (nspec,1)),
+                         right_init=np.tile(right, (nspec,1)), binspec=1, binspat=1,
+                         pypeline='MultiSlit', nspat=nspat, PYP_SPEC='dummy')
+    slitmask = slits.slit_img()
+
+    # Objects
+    spat = np.arange(nspat, dtype=float)[None,:]
+    sobjs = specobjs.SpecObjs()
+    obj = np.zeros_like(sky)
+    for i, (slit_spat, l, r) in enumerate(zip(slits.spat_id, left, right)):
+        for j, x in enumerate(l + (r-l)*(np.arange(nobj)+1)/(nobj+1)):
+            obj += 200.*np.exp(-0.5*((spat-x)/2.)**2)
+            sobj = specobj.SpecObj('MultiSlit', 1, SLITID=slit_spat)
+            sobj.TRACE_SPAT = np.full(nspec, x)
+            sobj.SPAT_PIXPOS = x
+            sobj.maskwidth = 10.
+            sobj.FWHM = 4.7
+            sobj.OBJID = j+1
+            sobjs.add_sobj(sobj)
+
+    var = sky + obj + 9.
+    image = sky + obj + rng.normal(size=sky.shape)*np.sqrt(var)
+    return dict(image=image, ivar=1/var, rn2img=np.full(image.shape, 9.), sky=sky,
+                tilts=piximg/(nspec-1), waveimg=4000. + piximg, slits=slits,
+                slitmask=slitmask, sobjs=sobjs)
+
+
+def cosmic_ray_image(nspec=1024, nspat=1024, ncr=500, seed=3):
+    """
+    Construct a sky-dominated image with cosmic rays.
+
+    Args:
+        nspec (:obj:`int`, optional):
+            Number of spectral pixels.
+        nspat (:obj:`int`, optional):
+            Number of spatial pixels.
+        ncr (:obj:`int`, optional):
+            Number of cosmic rays.
+        seed (:obj:`int`, optional):
+            Seed for the random number generator.
+
+    Returns:
+        :obj:`tuple`: The image and its variance.
+    """
+    rng = np.random.default_rng(seed)
+    sky = 500. + 300.*np.exp(-0.5*((np.arange(nspec)[:,None] % 100 - 50)/2.)**2)
+    sky = np.broadcast_to(sky, (nspec, nspat))
+    var = sky + 25.
+    image = sky + rng.normal(size=sky.shape)*np.sqrt(var)
+    # Cosmic rays are short streaks of a few pixels
+    for i, j, n in zip(rng.integers(nspec-4, size=ncr), rng.integers(nspat-4, size=ncr),
+                       rng.integers(1, 5, size=ncr)):
+        image[i:i+n,j:j+n//2+1] += rng.uniform(1e3, 2e4)
+    return image, var
+
+
+def image_stack(nimgs=5, nspec=1024, nspat=512, seed=4):
+    """
+    Construct a stack of flat images and their variances.
+
+    Args:
+        nimgs (:obj:`int`, optional):
+            Number of images in the stack.
+        nspec (:obj:`int`, optional):
+            Number of spectral pixels.
+        nspat (:obj:`int`, optional):
+            Number of spatial pixels.
+        seed (:obj:`int`, optional):
+            Seed for the random number generator.
+
+    Returns:
+        :obj:`tuple`: The image stack, the variance stack, and the
+        good-pixel mask stack, each with shape ``(nimgs, nspec, nspat)``.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (nimgs, nspec, nspat)
+    var = np.full(shape, 100.)
+    sci = 1000. + rng.normal(scale=10., size=shape)
+    gpm = rng.uniform(size=shape) > 0.001
+    return sci, var, gpm
+
+
+def spectra(nspec=4096, nexp=10, wv0=4000., dwv=1., seed=5):
+    """
+    Construct a set of 1D spectra with shifted wavelength grids.
+
+    Args:
+        nspec (:obj:`int`, optional):
+            Number of spectral pixels.
+        nexp (:obj:`int`, optional):
+            Number of exposures.
+        wv0 (:obj:`float`, optional):
+            Starting wavelength.
+        dwv (:obj:`float`, optional):
+            Wavelength step.
+        seed (:obj:`int`, optional):
+            Seed for the random number generator.
+
+    Returns:
+        :obj:`tuple`: The wavelengths, fluxes, inverse variances, and
+        good-pixel masks, each with shape ``(nspec, nexp)``.
+    """
+    rng = np.random.default_rng(seed)
+    waves = wv0 + dwv*(np.arange(nspec, dtype=float)[:,None]
+                       + rng.uniform(-5, 5, size=nexp)[None,:])
+    fluxes = 10. + np.sin(waves/50.) + rng.normal(scale=0.1, size=waves.shape)
+    ivars = np.full(waves.shape, 100.)
+    masks = np.ones(waves.shape, dtype=bool)
+    return waves, fluxes, ivars, masks
+
+
+def rectified_stack(nimgs=3, nspec=1024, nspat=128, seed=6):
+    """
+    Construct a stack of 2D spectra with wavelength and spatial position
+    images, as used for 2D coadding.
+
+    Args:
+        nimgs (:obj:`int`, optional):
+            Number of images in the stack.
+        nspec (:obj:`int`, optional):
+            Number of spectral pixels.
+        nspat (:obj:`int`, optional):
+            Number of spatial pixels.
+        seed (:obj:`int`, optional):
+            Seed for the random number generator.
+
+    Returns:
+        :obj:`dict`: The images and the spectral and spatial bins.  The
+        keys are ``spec_bins``, ``spat_bins``, ``waveimg_stack``,
+        ``spatimg_stack``, ``thismask_stack``, ``inmask_stack``,
+        ``sci_list``, and ``var_list``.
+    """
+    rng = np.random.default_rng(seed)
+    shape = (nimgs, nspec, nspat)
+    shift = rng.uniform(-2, 2, size=nimgs)
+    waveimg = 4000. + np.arange(nspec, dtype=float)[None,:,None] + shift[:,None,None] \
+                + 0.01*np.arange(nspat, dtype=float)[None,None,:]
+    waveimg = np.broadcast_to(waveimg, shape).copy()
+    spatimg = np.broadcast_to(np.arange(nspat, dtype=float)[None,None,:]
+                              + shift[:,None,None]/2, shape).copy()
+    thismask = np.ones(shape, dtype=bool)
+    inmask = rng.uniform(size=shape) > 0.001
+    sci = 100. + rng.normal(scale=10., size=shape)
+    var = np.full(shape, 100.)
+    return dict(spec_bins=np.arange(nspec+1, dtype=float) + 3999.5,
+                spat_bins=np.arange(nspat+1, dtype=float) - 0.5,
+                waveimg_stack=waveimg, spatimg_stack=spatimg, thismask_stack=thismask,
+                inmask_stack=inmask, sci_list=[sci], var_list=[var])
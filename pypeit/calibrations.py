@@ -5,6 +5,8 @@ Class for guiding calibration object generation in PypeIt
 .. include:: ../include/links.rst
 """
 import os
+import hashlib
+import json
 
 from abc import ABCMeta
 from collections import Counter
@@ -13,7 +15,9 @@ from IPython import embed
 
 import numpy as np
 
+import pypeit
 from pypeit import msgs
+from pypeit import profiling
 from pypeit import alignframe
 from pypeit import flatfield
 from pypeit import edgetrace
@@ -25,6 +29,7 @@ from pypeit.images import buildimage
 from pypeit.metadata import PypeItMetaData
 from pypeit.core import parse
 from pypeit.par import pypeitpar
+from pypeit.par.parset import ParSet
 from pypeit.spectrographs.spectrograph import Spectrograph
 from pypeit import io
 from pypeit import utils
@@ -54,10 +59,17 @@ class Calibrations(object):
             Path for quality assessment output.  If not provided, no QA
             plots are saved.
         reuse_masters (:obj:`bool`, optional):
-            Load calibration files from disk if they exist
+            Load calibration files from disk if they exist and their
+            inputs have not changed; see :func:`step_checksum`.
         show (:obj:`bool`, optional):
             Show plots of PypeIt's results as the code progesses.
             Requires interaction from the users.
+        reuse_files (:obj:`list`, optional):
+            Master frame files that have already been built during this
+            execution of PypeIt (e.g., by
+            :class:`pypeit.calibscheduler.CalibrationScheduler`). These
+            are always loaded from disk, regardless of
+            ``reuse_masters``.
 
     .. todo: Fix these
 
@@ -92,13 +104,20 @@ class Calibrations(object):
         slitspat_num (:obj:`str` or :obj:`list, optional):
             Identifies a slit or slits to restrict the analysis on
             Used in :func:`get_slits` and propagated beyond
+        reuse_files (:obj:`set`):
+            Master frame files to load from disk regardless of
+            :attr:`reuse_masters`.
+        manifest (:class:`pypeit.masterframe.MasterManifest`):
+            Manifest with the checksums of the inputs used to build the
+            master frames in :attr:`master_dir`.  None if
+            :attr:`master_dir` is None.
 
     """
     __metaclass__ = ABCMeta
 
     @classmethod
     def get_instance(cls, fitstbl, par, spectrograph, caldir, qadir=None,
-                     reuse_masters=False, show=False, slitspat_num=None):
+                     reuse_masters=False, show=False, slitspat_num=None, reuse_files=None):
         """
         """
         pypeline = spectrograph.pypeline
@@ -107,10 +126,11 @@ class Calibrations(object):
         return next(c for c in cls.__subclasses__()
                     if c.__name__ == (pypeline + 'Calibrations'))(
             fitstbl, par, spectrograph, caldir, qadir=qadir,
-                     reuse_masters=reuse_masters, show=show, slitspat_num=slitspat_num)
+                     reuse_masters=reuse_masters, show=show, slitspat_num=slitspat_num,
+                     reuse_files=reuse_files)
 
     def __init__(self, fitstbl, par, spectrograph, caldir, qadir=None,
-                 reuse_masters=False, show=False, slitspat_num=None):
+                 reuse_masters=False, show=False, slitspat_num=None, reuse_files=None):
 
         # Check the types
         # TODO -- Remove this None option once we have data models for all the Calibrations
@@ -129,7 +149,9 @@ class Calibrations(object):
 
         # Masters
         self.reuse_masters = reuse_masters
+        self.reuse_files = set() if reuse_files is None else set(reuse_files)
         self.master_dir = caldir
+        self.manifest = None if caldir is None else masterframe.MasterManifest(caldir)
 
         # Restrict on slits?
         self.slitspat_num = slitspat_num
@@ -168,6 +190,8 @@ class Calibrations(object):
         self.flatimages = None
         self.calib_ID = None
         self.master_key_dict = {}
+        # Input checksums of each step; see step_checksum
+        self._checksums = {}
 
         # Steps
         self.steps = []
@@ -193,6 +217,45 @@ class Calibrations(object):
         # Return
         return image_files, self.fitstbl.master_key(rows[0] if len(rows) > 0 else self.frame, det=self.det)
 
+    def _reuse_master(self, masterframe_name):
+        """
+        Check if a master frame should be loaded from disk instead of
+        being built.
+
+        Master frames built during this execution of PypeIt (see
+        :attr:`reuse_files`) are always reused.  Otherwise, if
+        :attr:`reuse_masters` is True, the master frame is reused
+        unless the checksum of the inputs recorded in :attr:`manifest`
+        differs from the checksum of the current inputs (see
+        :func:`step_checksum`).  Master frames that are not in the
+        manifest are assumed to be current.
+
+        Args:
+            masterframe_name (:obj:`str`):
+                Name of the master frame file.
+
+        Returns:
+            :obj:`bool`: True if the master frame should be loaded.
+        """
+        if not os.path.isfile(masterframe_name):
+            return False
+        if masterframe_name in self.reuse_files:
+            return True
+        if not self.reuse_masters:
+            return False
+        step = self.master_steps().get(masterframe_name)
+        checksum = None if step is None or self.manifest is None \
+                        else self.manifest.checksum(masterframe_name)
+        if checksum is None:
+            msgs.warn('{0} is not in the master frame manifest; assuming it is '
+                      'current.'.format(os.path.basename(masterframe_name)))
+            return True
+        if checksum != self.step_checksum(step):
+            msgs.info('Inputs used to build {0} have changed; rebuilding it.'.format(
+                      os.path.basename(masterframe_name)))
+            return False
+        return True
+
     def set_config(self, frame, det, par=None):
         """
         Specify the parameters of the Calibrations class and reset all
@@ -220,6 +283,7 @@ class Calibrations(object):
         # Initialize the master key dict for this science/standard frame
         self.master_key_dict['frame'] = self.fitstbl.master_key(frame, det=det)
         # Initialize the master dict for input, output
+        self._checksums = {}
 
     def get_arc(self):
         """
@@ -243,7 +307,7 @@ class Calibrations(object):
             buildimage.ArcImage, self.master_key_dict['arc'], master_dir=self.master_dir)
 
         # Reuse master frame?
-        if os.path.isfile(masterframe_name) and self.reuse_masters:
+        if self._reuse_master(masterframe_name):
             self.msarc = buildimage.ArcImage.from_file(masterframe_name)
         elif len(arc_files) == 0:
             msgs.warn("No frametype=arc files to build arc")
@@ -281,7 +345,7 @@ class Calibrations(object):
             buildimage.TiltImage, self.master_key_dict['tilt'], master_dir=self.master_dir)
 
         # Reuse master frame?
-        if os.path.isfile(masterframe_name) and self.reuse_masters:
+        if self._reuse_master(masterframe_name):
             self.mstilt = buildimage.TiltImage.from_file(masterframe_name)
         elif len(tilt_files) == 0:
             msgs.warn("No frametype=tilt files to build tiltimg")
@@ -327,7 +391,7 @@ class Calibrations(object):
                                                                master_dir=self.master_dir)
 
         # Reuse master frame?
-        if os.path.isfile(masterframe_filename) and self.reuse_masters:
+        if self._reuse_master(masterframe_filename):
             self.alignments = alignframe.Alignments.from_file(masterframe_filename)
             self.alignments.is_synced(self.slits)
             return self.alignments
@@ -374,7 +438,7 @@ class Calibrations(object):
             msgs.error("Not ready to load from disk")
 
         # Try to load?
-        if os.path.isfile(masterframe_name) and self.reuse_masters:
+        if self._reuse_master(masterframe_name):
             self.msbias = buildimage.BiasImage.from_file(masterframe_name)
         elif len(bias_files) == 0:
             self.msbias = None
@@ -411,7 +475,7 @@ class Calibrations(object):
                                                            master_dir=self.master_dir)
 
         # Try to load?
-        if os.path.isfile(masterframe_name) and self.reuse_masters:
+        if self._reuse_master(masterframe_name):
             self.msdark = buildimage.DarkImage.from_file(masterframe_name)
         elif len(dark_files) == 0:
             self.msdark = None
@@ -504,7 +568,7 @@ class Calibrations(object):
         #   3.  Load any user-supplied images to over-ride any built
 
         # Load MasterFrame?
-        if os.path.isfile(masterframe_filename) and self.reuse_masters:
+        if self._reuse_master(masterframe_filename):
             flatimages = flatfield.FlatImages.from_file(masterframe_filename)
             flatimages.is_synced(self.slits)
             # Load user defined files
@@ -604,7 +668,7 @@ class Calibrations(object):
         slit_masterframe_name = masterframe.construct_file_name(slittrace.SlitTraceSet,
                                                            self.master_key_dict['trace'],
                                                            master_dir=self.master_dir)
-        if os.path.isfile(slit_masterframe_name) and self.reuse_masters:
+        if self._reuse_master(slit_masterframe_name):
             self.slits = slittrace.SlitTraceSet.from_file(slit_masterframe_name)
             # Reset the bitmask
             self.slits.mask = self.slits.mask_init.copy()
@@ -614,7 +678,7 @@ class Calibrations(object):
                                                                self.master_key_dict['trace'],
                                                                master_dir=self.master_dir)
             # Reuse master frame?
-            if os.path.isfile(edge_masterframe_name) and self.reuse_masters:
+            if self._reuse_master(edge_masterframe_name):
                 self.edges = edgetrace.EdgeTraceSet.from_file(edge_masterframe_name)
             elif len(trace_image_files) == 0:
                 msgs.warn("No frametype=trace files to build slits")
@@ -679,7 +743,7 @@ class Calibrations(object):
         masterframe_name = masterframe.construct_file_name(wavecalib.WaveCalib,
                                                            self.master_key_dict['arc'],
                                                            master_dir=self.master_dir)
-        if os.path.isfile(masterframe_name) and self.reuse_masters:
+        if self._reuse_master(masterframe_name):
             self.wv_calib = wavecalib.WaveCalib.from_file(masterframe_name)
             self.wv_calib.chk_synced(self.slits)
             self.slits.mask_wvcalib(self.wv_calib)
@@ -723,7 +787,7 @@ class Calibrations(object):
         # Load up?
         masterframe_name = masterframe.construct_file_name(wavetilts.WaveTilts, self.master_key_dict['tilt'],
                                                            master_dir=self.master_dir)
-        if os.path.isfile(masterframe_name) and self.reuse_masters:
+        if self._reuse_master(masterframe_name):
             self.wavetilts = wavetilts.WaveTilts.from_file(masterframe_name)
             self.wavetilts.is_synced(self.slits)
             self.slits.mask_wavetilts(self.wavetilts)
@@ -744,13 +808,221 @@ class Calibrations(object):
 
         return self.wavetilts
 
+    def master_files(self, step):
+        """
+        Return the master frame files written by a calibration step.
+
+        The first file is the primary product of the step.
+        :func:`set_config` must have been called first.
+
+        Args:
+            step (:obj:`str`):
+                Calibration step; see :func:`default_steps`.
+
+        Returns:
+            :obj:`list`: The master frame file names.  Empty if the step
+            does not write a master frame.
+        """
+        # Master frame class and the frame type used to set the key of
+        # the files written by each step
+        step_masters = {'bias': [(buildimage.BiasImage, 'bias')],
+                        'dark': [(buildimage.DarkImage, 'dark')],
+                        'slits': [(slittrace.SlitTraceSet, 'trace'),
+                                  (edgetrace.EdgeTraceSet, 'trace')],
+                        'arc': [(buildimage.ArcImage, 'arc')],
+                        'tiltimg': [(buildimage.TiltImage, 'tilt')],
+                        'wv_calib': [(wavecalib.WaveCalib, 'arc')],
+                        'tilts': [(wavetilts.WaveTilts, 'tilt')],
+                        'align': [(alignframe.Alignments, 'align')],
+                        # The flats also re-write the slits
+                        'flats': [(flatfield.FlatImages, 'pixelflat'),
+                                  (slittrace.SlitTraceSet, 'trace')]}
+        if self.master_dir is None or step not in step_masters.keys():
+            return []
+        return [masterframe.construct_file_name(master_obj, self._prep_calibrations(ctype)[1],
+                                                master_dir=self.master_dir)
+                    for master_obj, ctype in step_masters[step]]
+
+    @staticmethod
+    def step_requirements():
+        """
+        Define the calibration steps whose products are used by each
+        step.
+
+        A requirement only applies if it precedes the step in
+        :attr:`steps`.
+
+        Returns:
+            :obj:`dict`: The list of required steps keyed by the name of
+            each step.
+        """
+        return {'bias': [],
+                'dark': [],
+                'bpm': ['bias'],
+                'slits': ['bias', 'dark', 'bpm'],
+                'arc': ['bias', 'bpm'],
+                'tiltimg': ['bias', 'bpm', 'slits'],
+                'wv_calib': ['bpm', 'slits', 'arc'],
+                'tilts': ['bpm', 'slits', 'tiltimg', 'wv_calib'],
+                'align': ['bias', 'bpm', 'slits'],
+                # The flats re-write the slits, such that they must follow
+                # all the other steps that use the slits
+                'flats': ['bias', 'dark', 'bpm', 'slits', 'arc', 'tiltimg', 'wv_calib', 'tilts',
+                          'align']}
+
+    def required_steps(self, step):
+        """
+        Find all the steps, direct or indirect, that must be executed
+        before a given calibration step.
+
+        Args:
+            step (:obj:`str`):
+                Calibration step; must be in :attr:`steps`.
+
+        Returns:
+            :obj:`list`: The required steps in the order they are
+            executed by :func:`run_the_steps`.
+        """
+        requirements = self.step_requirements()
+        indx = self.steps.index(step)
+        required = set()
+        new = [step]
+        while len(new) > 0:
+            _step = new.pop()
+            for req in requirements[_step]:
+                if req in self.steps[:indx] and req not in required:
+                    required.add(req)
+                    new.append(req)
+        return [s for s in self.steps if s in required]
+
+    @staticmethod
+    def step_inputs():
+        """
+        Define the raw frame types and the calibration parameters used
+        by each calibration step.
+
+        Returns:
+            :obj:`dict`: For each step, a tuple with the list of frame
+            types and the list of keywords in
+            :class:`pypeit.par.pypeitpar.CalibrationsPar` that define
+            its inputs.
+        """
+        return {'bias': (['bias'], ['biasframe']),
+                'dark': (['dark'], ['darkframe']),
+                'bpm': ([], ['bpm_usebias']),
+                'slits': (['trace'], ['traceframe', 'slitedges']),
+                'arc': (['arc'], ['arcframe']),
+                'tiltimg': (['tilt'], ['tiltframe']),
+                'wv_calib': ([], ['wavelengths']),
+                'tilts': ([], ['tilts', 'wavelengths']),
+                'align': (['align'], ['alignframe', 'alignment']),
+                'flats': (['pixelflat', 'illumflat'],
+                          ['pixelflatframe', 'illumflatframe', 'flatfield'])}
+
+    def step_checksum(self, step):
+        """
+        Compute the checksum of all the inputs of a calibration step.
+
+        The checksum is the MD5 hash of the spectrograph, the detector,
+        the binning, the PypeIt version, the path, modification time,
+        and size of each raw file used by the step, the relevant
+        calibration parameters (see :func:`step_inputs`), and the
+        checksums of the steps it requires (see
+        :func:`step_requirements`).  Any change to the inputs of a step
+        therefore changes its checksum and the checksums of all the
+        steps that depend on it.  :func:`set_config` must have been
+        called first.
+
+        Args:
+            step (:obj:`str`):
+                Calibration step; must be in :attr:`steps`.
+
+        Returns:
+            :obj:`str`: The hexadecimal checksum.
+        """
+        if step in self._checksums.keys():
+            return self._checksums[step]
+
+        frametypes, parkeys = self.step_inputs()[step]
+        files = []
+        for ctype in frametypes:
+            for f in self._prep_calibrations(ctype)[0]:
+                _f = os.path.abspath(f)
+                files += [[_f, os.path.getmtime(_f), os.path.getsize(_f)]
+                            if os.path.isfile(_f) else [_f, None, None]]
+        pars = []
+        for key in parkeys:
+            pars += self.par[key].to_config(section_name=key, include_descr=False) \
+                        if isinstance(self.par[key], ParSet) \
+                        else ['{0} = {1}'.format(key, self.par[key])]
+        indx = self.steps.index(step)
+        upstream = [self.step_checksum(s) for s in self.step_requirements()[step]
+                        if s in self.steps[:indx]]
+
+        inputs = dict(step=step, spectrograph=self.spectrograph.name, det=int(self.det),
+                      binning=str(self.binning), version=pypeit.__version__, files=files,
+                      par=pars, upstream=upstream)
+        self._checksums[step] = hashlib.md5(json.dumps(inputs).encode()).hexdigest()
+        return self._checksums[step]
+
+    def master_steps(self):
+        """
+        Find the step that builds each master frame.
+
+        Master frames re-written by later steps (e.g., the slits are
+        re-written by the flats) are assigned to the first step that
+        writes them.  :func:`set_config` must have been called first.
+
+        Returns:
+            :obj:`dict`: The calibration step keyed by the name of each
+            master frame file.
+        """
+        master_steps = {}
+        for step in self.steps:
+            for f in self.master_files(step):
+                if f not in master_steps.keys():
+                    master_steps[f] = step
+        return master_steps
+
+    def run_step(self, step):
+        """
+        Run a single calibration step.
+
+        The master frames written by the step are locked while the step
+        is executed, such that the same master frame is never built by
+        two processes at the same time.  The checksum of the inputs of
+        the step (see :func:`step_checksum`) is then recorded for each
+        master frame in :attr:`manifest`.
+
+        Args:
+            step (:obj:`str`):
+                Calibration step; see :func:`default_steps`.
+
+        Returns:
+            The result of the ``get_`` method for this step.
+        """
+        with masterframe.MasterFrameLock(self.master_files(step)), \
+                profiling.profiler.step('calibrations.{0}'.format(step),
+                                        frame=self.fitstbl['filename'][self.frame],
+                                        det=self.det):
+            result = getattr(self, 'get_{:s}'.format(step))()
+            # Record the checksum of the inputs of the master frames
+            # written by this step
+            if self.manifest is not None:
+                master_files = [f for f, s in self.master_steps().items()
+                                    if s == step and os.path.isfile(f)]
+                if len(master_files) > 0:
+                    checksum = self.step_checksum(step)
+                    self.manifest.update({f: checksum for f in master_files})
+        return result
+
     def run_the_steps(self):
         """
         Run full the full recipe of calibration steps
 
         """
         for step in self.steps:
-            getattr(self, 'get_{:s}'.format(step))()
+            self.run_step(step)
         msgs.info("Calibration complete!")
         msgs.info("#######################################################################")
 
@@ -0,0 +1,274 @@
+"""
+Schedule the calibration steps of many calibration groups and detectors
+on a pool of worker processes.
+
+.. include common links, assuming primary doc root is up one directory
+.. include:: ../include/links.rst
+"""
+from concurrent import futures
+
+from IPython import embed
+
+from pypeit import msgs
+from pypeit import calibrations
+from pypeit import profiling
+
+
+class CalibrationTask(object):
+    """
+    A single calibration step for a given frame and detector.
+
+    Args:
+        frame (:obj:`int`):
+            0-indexed row in the metadata table of the frame used to
+            configure the :class:`pypeit.calibrations.Calibrations`
+            object.
+        det (:obj:`int`):
+            1-indexed detector number.
+        step (:obj:`str`):
+            Calibration step; see
+            :func:`pypeit.calibrations.MultiSlitCalibrations.default_steps`.
+        master_files (:obj:`list`):
+            The master frame files written by the step.
+
+    Attributes:
+        requires (:obj:`list`):
+            The :class:`CalibrationTask` objects that must be completed
+            before this task can be executed.
+    """
+    def __init__(self, frame, det, step, master_files):
+        self.frame = frame
+        self.det = det
+        self.step = step
+        self.master_files = master_files
+        self.requires = []
+
+    def __repr__(self):
+        return '<{0}: frame={1}, det={2}, step={3}>'.format(self.__class__.__name__, self.frame,
+                                                            self.det, self.step)
+
+
+class CalibrationScheduler(object):
+    """
+    Build the calibrations of a set of frames and detectors
+    concurrently.
+
+    Each calibration step (see
+    :func:`pypeit.calibrations.Calibrations.step_requirements`) for each
+    frame and detector is a :class:`CalibrationTask`.  A task depends on
+    the tasks for the steps whose products it uses.  If the master frame
+    written by a task is also written by a previous task (e.g., a bias
+    shared by more than one calibration group), the task is not repeated
+    and all its dependents instead depend on the last task that wrote
+    the master frame.  Some steps re-write the master frame of an
+    earlier step (e.g., the flats re-write the slits), such that a task
+    also depends on the last task that wrote any of its master frames
+    and on all the tasks that used the previous version of them.  The
+    order in which each master frame is written and read is therefore
+    the same as when the calibrations are executed serially.  Tasks are
+    executed as soon as all their dependencies are completed.
+
+    Each worker builds a new
+    :class:`pypeit.calibrations.Calibrations` object, loads the master
+    frames of all the required steps from disk, and executes its step.
+    The master frames of each step are locked while they are loaded or
+    written (see :func:`pypeit.calibrations.Calibrations.run_step`).
+    Steps that do not write a master frame (e.g., the bad-pixel mask) are
+    executed by every task that requires them.
+
+    Args:
+        fitstbl (:class:`pypeit.metadata.PypeItMetaData`):
+            The class holding the metadata for all the frames in this
+            PypeIt run.
+        par (:class:`pypeit.par.pypeitpar.CalibrationsPar`):
+            Parameters for the calibrations.
+        spectrograph (:class:`pypeit.spectrographs.spectrograph.Spectrograph`):
+            Spectrograph object
+        caldir (:obj:`str`):
+            Path for the master frames.
+        qadir (:obj:`str`, optional):
+            Path for quality assessment output.
+        reuse_masters (:obj:`bool`, optional):
+            Load calibration files from disk if they exist.
+        slitspat_num (:obj:`str`, :obj:`list`, optional):
+            Identifies a slit or slits to restrict the analysis.
+        n_workers (:obj:`int`, optional):
+            Number of worker processes.
+        profile (:obj:`bool`, optional):
+            Profile the calibration steps executed by the workers; see
+            :mod:`pypeit.profiling`.  The records are added to those of
+            :attr:`pypeit.profiling.profiler` in the calling process.
+
+    Attributes:
+        tasks (:obj:`list`):
+            The list of :class:`CalibrationTask` objects in the order
+            they would be executed serially.
+        master_files (:obj:`set`):
+            The master frame files produced by the completed tasks.
+    """
+    def __init__(self, fitstbl, par, spectrograph, caldir, qadir=None, reuse_masters=False,
+                 slitspat_num=None, n_workers=1, profile=False):
+        self.fitstbl = fitstbl
+        self.par = par
+        self.spectrograph = spectrograph
+        self.caldir = caldir
+        self.qadir = qadir
+        self.reuse_masters = reuse_masters
+        self.slitspat_num = slitspat_num
+        self.n_workers = n_workers
+        self.profile = profile
+
+        self.tasks = []
+        self.master_files = set()
+
+    def calibrations(self, frame, det, reuse_files=None):
+        """
+        Instantiate and configure the calibrations for a frame and
+        detector.
+
+        Args:
+            frame (:obj:`int`):
+                0-indexed row in :attr:`fitstbl`.
+            det (:obj:`int`):
+                1-indexed detector number.
+            reuse_files (:obj:`list`, optional):
+                Master frames to load from disk.
+
+        Returns:
+            :class:`pypeit.calibrations.Calibrations`: The configured
+            calibrations object.
+        """
+        caliBrate = calibrations.Calibrations.get_instance(
+            self.fitstbl, self.par, self.spectrograph, self.caldir, qadir=self.qadir,
+            reuse_masters=self.reuse_masters, slitspat_num=self.slitspat_num,
+            reuse_files=reuse_files)
+        caliBrate.set_config(frame, det, self.par)
+        return caliBrate
+
+    def build_tasks(self, frames, detectors):
+        """
+        Construct the calibration tasks and their dependencies.
+
+        Args:
+            frames (:obj:`list`):
+                The 0-indexed rows in :attr:`fitstbl` with the frames to
+                calibrate; typically one frame per calibration group.
+            detectors (:obj:`list`):
+                The 1-indexed detectors to calibrate.
+
+        Returns:
+            :obj:`list`: The list of :class:`CalibrationTask` objects;
+            also kept internally as :attr:`tasks`.
+        """
+        self.tasks = []
+        # Last task that wrote each master frame
+        producers = {}
+        # Tasks that read each master frame since it was last written
+        readers = {}
+        for frame in frames:
+            for det in detectors:
+                caliBrate = self.calibrations(frame, det)
+                # Task executing each step for this frame and detector
+                chain = {}
+                for step in caliBrate.steps:
+                    master_files = caliBrate.master_files(step)
+                    if len(master_files) == 0:
+                        # Step is executed as a requirement of the others
+                        continue
+                    if master_files[0] in producers.keys():
+                        # Already built by another task
+                        chain[step] = producers[master_files[0]]
+                        continue
+                    task = CalibrationTask(frame, det, step, master_files)
+                    required = [s for s in caliBrate.required_steps(step) if s in chain.keys()]
+                    task.requires = [chain[s] for s in required]
+                    # Do not write a master frame before the previous
+                    # version has been written and read
+                    for f in master_files:
+                        for t in [producers.get(f)] + readers.pop(f, []):
+                            if t is not None and t not in task.requires:
+                                task.requires += [t]
+                    for s in required:
+                        for f in caliBrate.master_files(s):
+                            readers.setdefault(f, []).append(task)
+                    for f in master_files:
+                        producers[f] = task
+                    chain[step] = task
+                    self.tasks += [task]
+        return self.tasks
+
+    def run(self, frames, detectors):
+        """
+        Build all the calibrations.
+
+        Args:
+            frames (:obj:`list`):
+                The 0-indexed rows in :attr:`fitstbl` with the frames to
+                calibrate.
+            detectors (:obj:`list`):
+                The 1-indexed detectors to calibrate.
+
+        Returns:
+            :obj:`set`: The master frame files built or loaded;
+            also kept internally as :attr:`master_files`.
+        """
+        self.build_tasks(frames, detectors)
+        msgs.info('Executing {0} calibration tasks using {1} worker processes'.format(
+                  len(self.tasks), self.n_workers))
+
+        self.master_files = set()
+        done = set()
+        pending = list(self.tasks)
+        running = {}
+        with futures.ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            while len(pending) > 0 or len(running) > 0:
+                # Submit all the tasks with completed requirements, in
+                # order
+                for task in [t for t in pending if all([r in done for r in t.requires])]:
+                    running[executor.submit(_run_calibration_task, self, task,
+                                            self.master_files)] = task
+                    pending.remove(task)
+                if len(running) == 0:
+                    msgs.error('Calibration tasks have unresolvable dependencies.')
+                # Wait for any task to finish
+                finished, _ = futures.wait(list(running.keys()),
+                                           return_when=futures.FIRST_COMPLETED)
+                for job in finished:
+                    task = running.pop(job)
+                    # Raises any exception caught in the worker
+                    master_files, records = job.result()
+                    self.master_files |= set(master_files)
+                    profiling.profiler.add_records(records)
+                    done.add(task)
+        return self.master_files
+
+
+def _run_calibration_task(scheduler, task, reuse_files):
+    """
+    Worker function used by :class:`CalibrationScheduler` to execute a
+    single calibration task.
+
+    Args:
+        scheduler (:class:`CalibrationScheduler`):
+            The scheduler with the configuration of the calibrations.
+        task (:class:`CalibrationTask`):
+            The task to execute.
+        reuse_files (:obj:`set`):
+            Master frames built by the completed tasks.
+
+    Returns:
+        :obj:`tuple`: The list of master frame files written (or loaded)
+        by the task, which is empty if the step did not produce a result,
+        and the list of profiling records (see :mod:`pypeit.profiling`).
+    """
+    # Discard any records inherited from the parent process
+    profiling.profiler.pop_records()
+    profiling.profiler.enable(scheduler.profile)
+    msgs.info('Running calibration step {0} for frame {1}, detector {2}'.format(
+              task.step, task.frame, task.det))
+    caliBrate = scheduler.calibrations(task.frame, task.det, reuse_files=reuse_files)
+    # Load or rebuild the products of the required steps
+    for step in caliBrate.required_steps(task.step):
+        caliBrate.run_step(step)
+    master_files = [] if caliBrate.run_step(task.step) is None else task.master_files
+    return master_files, profiling.profiler.pop_records()
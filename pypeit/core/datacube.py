@@ -264,6 +264,86 @@ def dar_correction(wave_arr, coord, obstime, location, pressure, temperature, re
     return ra_diff, dec_diff
 
 
+def voxel_index(pix_coord, bins):
+    """
+    Compute the linear index of the voxel containing each pixel.
+
+    The voxels are defined by the bin edges along each axis, with the same
+    convention as `numpy.histogramdd`_: each bin includes its lower edge,
+    and the last bin along each axis also includes its upper edge.
+
+    Args:
+        pix_coord (`numpy.ndarray`_, list):
+            The coordinates of each pixel, either as an array of shape
+            (npix, ndim), or as a list of ndim 1D arrays of length npix.
+        bins (tuple):
+            The bin edges along each of the ndim axes.
+
+    Returns:
+        tuple: A 1D array with the linear (C-ordered) voxel index of the
+        pixels inside the cube, a boolean array of length npix selecting
+        the pixels inside the cube, and the shape of the cube.
+    """
+    # Same input formats as numpy.histogramdd
+    try:
+        npix, ndim = pix_coord.shape
+    except (AttributeError, ValueError):
+        pix_coord = np.atleast_2d(pix_coord).T
+        npix, ndim = pix_coord.shape
+    if len(bins) != ndim:
+        msgs.error("The number of bin edges must match the number of dimensions of the pixel coordinates")
+    shape = tuple(len(b) - 1 for b in bins)
+    gpm = np.ones(npix, dtype=bool)
+    index = []
+    for dd in range(ndim):
+        edges = np.asarray(bins[dd])
+        idx = np.searchsorted(edges, pix_coord[:, dd], side='right') - 1
+        # Pixels on the upper edge are included in the last bin
+        idx[pix_coord[:, dd] == edges[-1]] -= 1
+        gpm &= (idx >= 0) & (idx < shape[dd])
+        index.append(idx)
+    vox_index = np.ravel_multi_index(tuple(idx[gpm] for idx in index), shape)
+    return vox_index, gpm, shape
+
+
+def histogram_cube(pix_coord, bins, weights, dtype=np.float64):
+    """
+    Accumulate several weighted histograms of the same pixels onto a cube.
+
+    This is equivalent to calling `numpy.histogramdd`_ for each set of
+    weights, but the voxel of each pixel is only determined once (see
+    :func:`voxel_index`) and the weights are summed with
+    `numpy.bincount`_.
+
+    Args:
+        pix_coord (`numpy.ndarray`_, list):
+            The coordinates of each pixel, either as an array of shape
+            (npix, ndim), or as a list of ndim 1D arrays of length npix.
+        bins (tuple):
+            The bin edges along each of the ndim axes.
+        weights (list):
+            The weights of each pixel for each cube to construct. Each
+            element is a 1D array of length npix, or None to count the
+            number of pixels in each voxel.
+        dtype (`numpy.dtype`_, optional):
+            Data type of the returned cubes. The weights are always summed
+            in double precision, but single precision (``np.float32``)
+            halves the memory footprint of the cubes.
+
+    Returns:
+        list: The cubes with the summed weights, one for each element of
+        weights. Each cube has shape (len(bins[0])-1, len(bins[1])-1,
+        ...).
+    """
+    vox_index, gpm, shape = voxel_index(pix_coord, bins)
+    nvox = int(np.prod(shape))
+    cubes = []
+    for wght in weights:
+        _wght = None if wght is None else np.asarray(wght)[gpm]
+        cubes.append(np.bincount(vox_index, weights=_wght, minlength=nvox).reshape(shape).astype(dtype, copy=False))
+    return cubes
+
+
 def make_whitelight_fromref(all_ra, all_dec, all_wave, all_sci, all_wghts, all_idx, dspat, ref_filename):
     """ Generate a whitelight image of every input frame,
     based on a reference image. Note the, the reference
@@ -388,8 +468,10 @@ def make_whitelight(all_ra, all_dec, all_wave, all_sci, all_wghts, all_idx, dspa
         ww = (all_idx == ff)
         # Make the cube
         pix_coord = whitelightWCS.wcs_world2pix(np.vstack((all_ra[ww], all_dec[ww], all_wave[ww] * 1.0E-10)).T, 0)
-        wlcube, edges = np.histogramdd(pix_coord, bins=bins, weights=all_sci[ww] * all_wghts[ww])
-        norm, edges = np.histogramdd(pix_coord, bins=bins, weights=all_wghts[ww])
+        weights = [all_sci[ww] * all_wghts[ww], all_wghts[ww]]
+        if all_ivar is not None:
+            weights.append(all_ivar[ww])
+        wlcube, norm, *ivar_img = histogram_cube(pix_coord, bins, weights)
         nrmCube = (norm > 0) / (norm + (norm == 0))
         whtlght = (wlcube * nrmCube)[:, :, 0]
         # Create a mask of good pixels (trim the edges)
@@ -402,8 +484,7 @@ def make_whitelight(all_ra, all_dec, all_wave, all_sci, all_wghts, all_idx, dspa
         whitelight_Imgs[:, :, ff] = whtlght.copy()
         # Now operate on the inverse variance image
         if all_ivar is not None:
-            ivar_img, _ = np.histogramdd(pix_coord, bins=bins, weights=all_ivar[ww])
-            ivar_img = ivar_img[:, :, 0]
+            ivar_img = ivar_img[0][:, :, 0]
             ivar_img *= gpm
             minval = np.min(ivar_img[gpm == 1])
             ivar_img[gpm == 0] = minval
@@ -511,9 +592,7 @@ def compute_weights(all_ra, all_dec, all_wave, all_sci, all_ivar, all_idx, white
         ww = (all_idx == ff)
         # Extract the spectrum
         pix_coord = whitelightWCS.wcs_world2pix(np.vstack((all_ra[ww], all_dec[ww], all_wave[ww] * 1.0E-10)).T, 0)
-        spec, edges = np.histogramdd(pix_coord, bins=bins, weights=all_sci[ww])
-        var, edges = np.histogramdd(pix_coord, bins=bins, weights=1/all_ivar[ww])
-        norm, edges = np.histogramdd(pix_coord, bins=bins)
+        spec, var, norm = histogram_cube(pix_coord, bins, [all_sci[ww], 1/all_ivar[ww], None])
         normspec = (norm > 0) / (norm + (norm == 0))
         var_spec = var[0, 0, :]
         ivar_spec = (var_spec > 0) / (var_spec + (var_spec == 0))
@@ -256,6 +256,86 @@ def evaluate_fit(fitc, func, x, x2=None, minx=None, maxx=None, minx2=None, maxx2
                    "Please choose from 'polynomial', 'legendre', 'chebyshev', 'polynomial2d', 'legendre2d', 'chebyshev2d'")
 
 
+def evaluate_fits(fitc, func, x, fit_index, minx=None, maxx=None):
+    r"""
+    Evaluate many 1D fits of the same function in a single pass.
+
+    This is the vectorized equivalent of calling :func:`evaluate_fit`
+    for each fit and the subset of ``x`` that it applies to.  The
+    coefficients of fits with different orders are padded with zeros to
+    a common length, and each element of ``x`` is evaluated using the
+    coefficients selected by ``fit_index``.  The series are evaluated
+    using the same recurrences as `numpy.polynomial`_, such that the
+    result is identical to evaluating each fit separately.
+
+    Args:
+        fitc (`numpy.ndarray`_):
+            Fit coefficients; shape is :math:`(N_{\rm fit}, N_{\rm
+            coeff})`.
+        func (:obj:`str`):
+            Fitting function; must be ``polynomial``, ``legendre``, or
+            ``chebyshev``.
+        x (`numpy.ndarray`_):
+            Values at which to evaluate the fits.
+        fit_index (`numpy.ndarray`_):
+            Integer array with the same shape as ``x`` selecting the fit
+            to use for each value.
+        minx, maxx (`numpy.ndarray`_, optional):
+            The minimum and maximum used to scale ``x`` for each fit;
+            shape is :math:`(N_{\rm fit},)`.  Required for the
+            ``legendre`` and ``chebyshev`` functions.
+
+    Returns:
+        `numpy.ndarray`_: The evaluated fits.
+    """
+    if func not in ['polynomial', 'legendre', 'chebyshev']:
+        msgs.error('Batch evaluation is not implemented for the {0} function.'.format(func))
+    _fitc = np.atleast_2d(fitc)
+    if func == 'polynomial':
+        xv = x
+    else:
+        if minx is None or maxx is None:
+            msgs.error('Must provide the scaling limits to evaluate {0} fits.'.format(func))
+        xmin = np.asarray(minx)[fit_index]
+        xmax = np.asarray(maxx)[fit_index]
+        xv = 2.0 * (x-xmin)/(xmax-xmin) - 1.0
+
+    def c(i):
+        # Coefficient i (from the end for negative i) of each element
+        return _fitc[fit_index,i]
+
+    ncoeff = _fitc.shape[1]
+    if func == 'polynomial':
+        # See numpy.polynomial.polynomial.polyval
+        c0 = c(-1) + xv*0
+        for i in range(2, ncoeff+1):
+            c0 = c(-i) + c0*xv
+        return c0
+
+    if ncoeff == 1:
+        c0, c1 = c(0), 0
+    elif ncoeff == 2:
+        c0, c1 = c(0), c(1)
+    elif func == 'legendre':
+        # See numpy.polynomial.legendre.legval
+        nd = ncoeff
+        c0, c1 = c(-2), c(-1)
+        for i in range(3, ncoeff+1):
+            tmp = c0
+            nd = nd - 1
+            c0 = c(-i) - (c1*(nd - 1))/nd
+            c1 = tmp + (c1*xv*(2*nd - 1))/nd
+    else:
+        # See numpy.polynomial.chebyshev.chebval
+        x2 = 2*xv
+        c0, c1 = c(-2), c(-1)
+        for i in range(3, ncoeff+1):
+            tmp = c0
+            c0 = c(-i) - c1
+            c1 = tmp + c1*x2
+    return c0 + c1*xv
+
+
 def robust_fit(xarray, yarray, order, x2=None, function='polynomial',
                minx=None, maxx=None, minx2=None, maxx2=None,
                maxiter=10, in_gpm=None, weights=None, invvar=None,
@@ -3,6 +3,8 @@
 .. include common links, assuming primary doc root is up one directory
 .. include:: ../include/links.rst
 """
+from concurrent import futures
+
 import numpy as np
 from scipy import signal, ndimage
 from scipy.optimize import curve_fit
@@ -13,161 +15,231 @@ from pypeit import utils
 from pypeit.core import parse
 
 
+lacosmic_halo = 16
+"""
+Number of rows added to either side of each band of rows processed by
+:func:`lacosmic`.  This must be larger than the number of rows that
+affect the result of any pixel in the band, which is 8 for the current
+algorithm.
+"""
+
+
 def lacosmic(sciframe, saturation, nonlinear, varframe=None, maxiter=1, grow=1.5,
-             remove_compact_obj=True, sigclip=5.0, sigfrac=0.3, objlim=5.0):
+             remove_compact_obj=True, sigclip=5.0, sigfrac=0.3, objlim=5.0, tile_rows=512,
+             n_threads=1):
     """
     Identify cosmic rays using the L.A.Cosmic algorithm
     U{http://www.astro.yale.edu/dokkum/lacosmic/}
     (article : U{http://arxiv.org/abs/astro-ph/0108003})
     This routine is mostly courtesy of Malte Tewes
 
+    All the steps of the algorithm, except for the final growth of the
+    cosmic-ray mask, only depend on the pixels within a few rows of each
+    pixel.  The image is therefore processed in bands of ``tile_rows``
+    rows, each padded by ``lacosmic_halo`` rows on either side, which
+    limits the memory footprint (particularly of the 2x2 subsampled
+    image) and allows the bands to be processed by concurrent threads.
+    The result does not depend on the number of rows in each band or the
+    number of threads.  The calculations are done with the precision of
+    the input image; i.e., a single-precision image is processed as
+    such.
+
     Args:
         sciframe:
         saturation:
         nonlinear:
         varframe:
         maxiter:
+            Maximum number of iterations.  The image is not modified
+            between iterations, meaning that iterations after the first
+            cannot identify any new cosmic rays.  Only one iteration is
+            performed; a warning is issued if this is larger than 1.
         grow:
         remove_compact_obj:
         sigclip (float):
             Threshold for identifying a CR
         sigfrac:
         objlim:
+        tile_rows (:obj:`int`, optional):
+            Number of image rows processed at once.  If None, the full
+            image is processed at once.
+        n_threads (:obj:`int`, optional):
+            Number of threads used to process the bands of rows.
 
     Returns:
         ndarray: mask of cosmic rays (0=no CR, 1=CR)
 
     """
     msgs.info("Detecting cosmic rays with the L.A.Cosmic algorithm")
+    if maxiter > 1:
+        msgs.warn('L.A.Cosmic iterations after the first cannot identify any new cosmic rays; '
+                  'performing a single iteration instead of {0}.'.format(maxiter))
 #    msgs.work("Include these parameters in the settings files to be adjusted by the user")
     # Set the settings
-    scicopy = sciframe.copy()
-    crmask = np.cast['bool'](np.zeros(sciframe.shape))
     sigcliplow = sigclip * sigfrac
-
-    # Determine if there are saturated pixels
-    satpix = np.zeros_like(sciframe)
 #    satlev = settings_det['saturation']*settings_det['nonlinear']
     satlev = saturation*nonlinear
-    wsat = np.where(sciframe >= satlev)
-    if wsat[0].size == 0: satpix = None
-    else:
-        satpix[wsat] = 1.0
-        satpix = np.cast['bool'](satpix)
-
-    # Define the kernels
-    laplkernel = np.array([[0.0, -1.0, 0.0], [-1.0, 4.0, -1.0], [0.0, -1.0, 0.0]])  # Laplacian kernal
-    growkernel = np.ones((3,3))
-    for i in range(1, maxiter+1):
-        msgs.info("Convolving image with Laplacian kernel")
-        # Subsample, convolve, clip negative values, and rebin to original size
-        subsam = utils.subsample(scicopy)
-        conved = signal.convolve2d(subsam, laplkernel, mode="same", boundary="symm")
-        cliped = conved.clip(min=0.0)
-        lplus = utils.rebin_evlist(cliped, np.array(cliped.shape)/2.0)
-
-        msgs.info("Creating noise model")
-        # Build a custom noise map, and compare  this to the laplacian
-        m5 = ndimage.filters.median_filter(scicopy, size=5, mode='mirror')
-        if varframe is None:
-            noise = np.sqrt(np.abs(m5))
-        else:
-            noise = np.sqrt(varframe)
-        msgs.info("Calculating Laplacian signal to noise ratio")
 
-        # Laplacian S/N
-        s = lplus / (2.0 * noise)  # Note that the 2.0 is from the 2x2 subsampling
-
-        # Remove the large structures
-        sp = s - ndimage.filters.median_filter(s, size=5, mode='mirror')
+    # Bands of rows processed at once
+    nrows = sciframe.shape[0]
+    _tile_rows = nrows if tile_rows is None else max(int(tile_rows), 1)
+    start = np.arange(0, nrows, _tile_rows)
+    end = np.append(start[1:], nrows)
+    nthreads = min(n_threads, start.size)
+
+    def process_band(i):
+        return _lacosmic_band(sciframe, varframe, start[i], end[i], satlev, sigclip, sigcliplow,
+                              objlim, remove_compact_obj)
+
+    # The image is not cleaned between iterations (i.e., the pixels with
+    # cosmic rays are not replaced), such that repeating the detection
+    # would flag exactly the same pixels.  Only one iteration is
+    # performed.
+    msgs.info('Processing {0} band(s) of {1} rows using {2} thread(s)'.format(
+                start.size, _tile_rows, nthreads))
+    executor = futures.ThreadPoolExecutor(max_workers=nthreads) if nthreads > 1 else None
+    try:
+        bands = list(map(process_band, range(start.size)) if executor is None
+                     else executor.map(process_band, range(start.size)))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    crmask = np.concatenate([b[0] for b in bands], axis=0)
+    ncand, nunsat, ncosmic, ncrp = np.sum([b[1][:4] for b in bands], axis=0)
+    msgs.info("{0:5d} candidate pixels".format(ncand))
+    if any([b[1][4] for b in bands]):
+        msgs.info("{0:5d} candidate pixels not part of saturated stars".format(nunsat))
+    msgs.info("{0:5d} remaining candidate pixels".format(ncosmic))
+    msgs.info("{0:5d} pixels identified as cosmic rays".format(ncrp))
+    msgs.info("Growing cosmic ray mask by 1 pixel")
+    crmask = grow_masked(crmask.astype(np.float), grow, 1.0)
 
-        msgs.info("Selecting candidate cosmic rays")
-        # Candidate cosmic rays (this will include HII regions)
-        candidates = sp > sigclip
-        nbcandidates = np.sum(candidates)
+    return crmask.astype(bool)
 
-        msgs.info("{0:5d} candidate pixels".format(nbcandidates))
 
-        # At this stage we use the saturated stars to mask the candidates, if available :
-        if satpix is not None:
-            msgs.info("Masking saturated pixels")
-            candidates = np.logical_and(np.logical_not(satpix), candidates)
-            nbcandidates = np.sum(candidates)
+def _lacosmic_band(sciframe, varframe, start, end, satlev, sigclip, sigcliplow, objlim,
+                   remove_compact_obj):
+    """
+    Detect the cosmic rays in a band of rows of an image.
 
-            msgs.info("{0:5d} candidate pixels not part of saturated stars".format(nbcandidates))
+    This performs all the steps of the L.A.Cosmic algorithm (see
+    :func:`lacosmic`) except the final growth of the mask.  The band is
+    padded by ``lacosmic_halo`` rows on either side, such that the
+    result is identical to processing the full image.
 
-        msgs.info("Building fine structure image")
+    Args:
+        sciframe (`numpy.ndarray`_):
+            Full image.
+        varframe (`numpy.ndarray`_):
+            Variance of the full image.  Can be None.
+        start, end (:obj:`int`):
+            First and last (exclusive) row of the band.
+        satlev (:obj:`float`):
+            Saturation level.
+        sigclip, sigcliplow, objlim (:obj:`float`):
+            Detection thresholds; see :func:`lacosmic`.
+        remove_compact_obj (:obj:`bool`):
+            Remove compact objects.
 
-        # We build the fine structure image :
-        m3 = ndimage.filters.median_filter(scicopy, size=3, mode='mirror')
-        m37 = ndimage.filters.median_filter(m3, size=7, mode='mirror')
-        f = m3 - m37
-        f /= noise
-        f = f.clip(min=0.01)
+    Returns:
+        :obj:`tuple`: The cosmic-ray mask of the band and a tuple with
+        the number of candidate pixels, candidate pixels not in
+        saturated stars, remaining candidate pixels, and detected pixels
+        in the band, and whether or not the padded band has saturated
+        pixels.
+    """
+    # Padded band and the slice with the band in the padded image
+    pstart = max(start - lacosmic_halo, 0)
+    pend = min(end + lacosmic_halo, sciframe.shape[0])
+    band = slice(start - pstart, end - pstart)
+    scicopy = sciframe[pstart:pend]
 
-        msgs.info("Removing suspected compact bright objects")
+    # Determine if there are saturated pixels
+    satpix = scicopy >= satlev
+    if not np.any(satpix):
+        satpix = None
 
-        # Now we have our better selection of cosmics :
+    # Define the kernels
+    laplkernel = np.array([[0.0, -1.0, 0.0], [-1.0, 4.0, -1.0], [0.0, -1.0, 0.0]])  # Laplacian kernal
+    growkernel = np.ones((3,3))
 
-        if remove_compact_obj:
-            cosmics = np.logical_and(candidates, sp/f > objlim)
-        else:
-            cosmics = candidates
-        nbcosmics = np.sum(cosmics)
+    # Subsample, convolve, clip negative values, and rebin to original size
+    subsam = utils.subsample(scicopy)
+    conved = signal.convolve2d(subsam, laplkernel, mode="same", boundary="symm")
+    del subsam
+    cliped = conved.clip(min=0.0)
+    del conved
+    lplus = utils.rebin_evlist(cliped, np.array(cliped.shape)/2.0)
+    del cliped
+
+    # Build a custom noise map, and compare  this to the laplacian
+    if varframe is None:
+        m5 = ndimage.filters.median_filter(scicopy, size=5, mode='mirror')
+        noise = np.sqrt(np.abs(m5))
+    else:
+        noise = np.sqrt(varframe[pstart:pend])
 
-        msgs.info("{0:5d} remaining candidate pixels".format(nbcosmics))
+    # Laplacian S/N
+    s = lplus / (2.0 * noise)  # Note that the 2.0 is from the 2x2 subsampling
 
-        # What follows is a special treatment for neighbors, with more relaxed constains.
+    # Remove the large structures
+    sp = s - ndimage.filters.median_filter(s, size=5, mode='mirror')
 
-        msgs.info("Finding neighboring pixels affected by cosmic rays")
+    # Candidate cosmic rays (this will include HII regions)
+    candidates = sp > sigclip
+    nbcandidates = np.sum(candidates[band])
 
-        # We grow these cosmics a first time to determine the immediate neighborhod  :
-        growcosmics = np.cast['bool'](signal.convolve2d(np.cast['float32'](cosmics), growkernel, mode="same", boundary="symm"))
+    # At this stage we use the saturated stars to mask the candidates, if available :
+    if satpix is not None:
+        candidates = np.logical_and(np.logical_not(satpix), candidates)
+    nbunsat = np.sum(candidates[band])
 
-        # From this grown set, we keep those that have sp > sigmalim
-        # so obviously not requiring sp/f > objlim, otherwise it would be pointless
-        growcosmics = np.logical_and(sp > sigclip, growcosmics)
+    # We build the fine structure image :
+    m3 = ndimage.filters.median_filter(scicopy, size=3, mode='mirror')
+    m37 = ndimage.filters.median_filter(m3, size=7, mode='mirror')
+    f = m3 - m37
+    f /= noise
+    f = f.clip(min=0.01)
 
-        # Now we repeat this procedure, but lower the detection limit to sigmalimlow :
+    # Now we have our better selection of cosmics :
+    if remove_compact_obj:
+        cosmics = np.logical_and(candidates, sp/f > objlim)
+    else:
+        cosmics = candidates
+    nbcosmics = np.sum(cosmics[band])
 
-        finalsel = np.cast['bool'](signal.convolve2d(np.cast['float32'](growcosmics), growkernel, mode="same", boundary="symm"))
-        finalsel = np.logical_and(sp > sigcliplow, finalsel)
+    # What follows is a special treatment for neighbors, with more relaxed constains.
 
-        # Unmask saturated pixels:
-        if satpix is not None:
-            msgs.info("Masking saturated stars")
-            finalsel = np.logical_and(np.logical_not(satpix), finalsel)
+    # We grow these cosmics a first time to determine the immediate neighborhod  :
+    growcosmics = np.cast['bool'](signal.convolve2d(np.cast['float32'](cosmics), growkernel, mode="same", boundary="symm"))
 
-        ncrp = np.sum(finalsel)
+    # From this grown set, we keep those that have sp > sigmalim
+    # so obviously not requiring sp/f > objlim, otherwise it would be pointless
+    growcosmics = np.logical_and(sp > sigclip, growcosmics)
 
-        msgs.info("{0:5d} pixels detected as cosmics".format(ncrp))
+    # Now we repeat this procedure, but lower the detection limit to sigmalimlow :
+    finalsel = np.cast['bool'](signal.convolve2d(np.cast['float32'](growcosmics), growkernel, mode="same", boundary="symm"))
+    finalsel = np.logical_and(sp > sigcliplow, finalsel)
 
-        # We find how many cosmics are not yet known :
-        newmask = np.logical_and(np.logical_not(crmask), finalsel)
-        nnew = np.sum(newmask)
+    # Unmask saturated pixels:
+    if satpix is not None:
+        finalsel = np.logical_and(np.logical_not(satpix), finalsel)
 
-        # We update the mask with the cosmics we have found :
-        crmask = np.logical_or(crmask, finalsel)
+    ncrp = np.sum(finalsel[band])
 
-        msgs.info("Iteration {0:d} -- {1:d} pixels identified as cosmic rays ({2:d} new)".format(i, ncrp, nnew))
-        if ncrp == 0: break
     # Additional algorithms (not traditionally implemented by LA cosmic) to remove some false positives.
-    msgs.work("The following algorithm would be better on the rectified, tilts-corrected image")
-    filt  = ndimage.sobel(sciframe, axis=1, mode='constant')
-    filty = ndimage.sobel(filt/np.sqrt(np.abs(sciframe)), axis=0, mode='constant')
+    # TODO: The following algorithm would be better on the rectified, tilts-corrected image
+    filt  = ndimage.sobel(scicopy, axis=1, mode='constant')
+    filty = ndimage.sobel(filt/np.sqrt(np.abs(scicopy)), axis=0, mode='constant')
     filty[np.where(np.isnan(filty))]=0.0
 
     sigimg = cr_screen(filty)
 
     sigsmth = ndimage.filters.gaussian_filter(sigimg,1.5)
     sigsmth[np.where(np.isnan(sigsmth))]=0.0
-    sigmask = np.cast['bool'](np.zeros(sciframe.shape))
-    sigmask[np.where(sigsmth>sigclip)] = True
-    crmask = np.logical_and(crmask, sigmask)
-    msgs.info("Growing cosmic ray mask by 1 pixel")
-    crmask = grow_masked(crmask.astype(np.float), grow, 1.0)
-
-    return crmask.astype(bool)
+    crmask = np.logical_and(finalsel, sigsmth > sigclip)
+    return crmask[band], (nbcandidates, nbunsat, nbcosmics, ncrp, satpix is not None)
 
 
 def cr_screen(a, mask_value=0.0, spatial_axis=1):
@@ -211,30 +283,36 @@ def cr_screen(a, mask_value=0.0, spatial_axis=1):
 
 
 def grow_masked(img, grow, growval):
+    """
+    Grow the regions of an image with a given value.
 
-    if not np.any(img == growval):
+    Every pixel within a distance ``grow`` of a pixel with value
+    ``growval`` is set to ``growval``.
+
+    Args:
+        img (`numpy.ndarray`_):
+            Image to grow.
+        grow (:obj:`float`):
+            Radius of the growth in pixels.
+        growval (:obj:`float`, :obj:`bool`):
+            Value of the pixels to grow.
+
+    Returns:
+        `numpy.ndarray`_: The grown image, or the input image if no
+        pixels have the value ``growval``.
+    """
+    indx = img == growval
+    if not np.any(indx):
         return img
 
-    _img = img.copy()
-    sz_x, sz_y = img.shape
+    # Offsets within the growth radius
     d = int(1+grow)
-    rsqr = grow*grow
+    x, y = np.meshgrid(np.arange(-d, d+1), np.arange(-d, d+1), indexing='ij')
+    footprint = x*x + y*y <= grow*grow
 
     # Grow any masked values by the specified amount
-    for x in range(sz_x):
-        for y in range(sz_y):
-            if img[x,y] != growval:
-                continue
-
-            mnx = 0 if x-d < 0 else x-d
-            mxx = x+d+1 if x+d+1 < sz_x else sz_x
-            mny = 0 if y-d < 0 else y-d
-            mxy = y+d+1 if y+d+1 < sz_y else sz_y
-
-            for i in range(mnx,mxx):
-                for j in range(mny, mxy):
-                    if (i-x)*(i-x)+(j-y)*(j-y) <= rsqr:
-                        _img[i,j] = growval
+    _img = img.copy()
+    _img[ndimage.binary_dilation(indx, structure=footprint)] = growval
     return _img
 
 
@@ -3,6 +3,8 @@
 .. include common links, assuming primary doc root is up one directory
 .. include:: ../include/links.rst
 """
+from concurrent import futures
+
 import numpy as np
 
 from scipy import ndimage
@@ -911,7 +913,7 @@ def ech_local_skysub_extract(sciimg, sciivar, fullmask, tilts, waveimg, global_s
                              trim_edg=(3,3), std=False, prof_nsigma=None, niter=4, box_rad_order=7,
                              sigrej=3.5, bkpts_optimal=True, sn_gauss=4.0, model_full_slit=False,
                              model_noise=True, debug_bkpts=False, show_profile=False,
-                             show_resids=False, show_fwhm=False):
+                             show_resids=False, show_fwhm=False, n_threads=1):
     """
     Perform local sky subtraction, profile fitting, and optimal extraction slit by slit
 
@@ -955,6 +957,11 @@ def ech_local_skysub_extract(sciimg, sciivar, fullmask, tilts, waveimg, global_s
         show_profile:
         show_resids:
         show_fwhm:
+        n_threads (:obj:`int`, optional):
+            Number of threads used to reduce independent orders
+            concurrently.  The result does not depend on the number
+            of threads.  Ignored (set to 1) if any of the plots are
+            requested.
 
     Returns:
         skymodel, objmodel, ivarmodel, outmask, sobjs
@@ -1013,79 +1020,27 @@ def ech_local_skysub_extract(sciimg, sciivar, fullmask, tilts, waveimg, global_s
     msgs.info(msgs.newline() + 'Reducing orders in order of S/N of brightest object:' + msgs.newline() + dash +
               msgs.newline() + '{:<8s}{:<8s}{:>10s}'.format('slit','order','S/N') + msgs.newline() + dash +
               msgs.newline() + str_out)
-    # Loop over orders in order of S/N ratio (from highest to lowest) for the brightest object
+    # Objects in orders with S/N below min_snr adopt the FWHM measured in
+    # the orders reduced before them.  All other orders are independent
+    # of the previous ones, such that they can be reduced concurrently.
+    # Group the orders in batches, each starting with an order that may
+    # depend on the previous ones and followed by independent orders.
+    if show_profile or show_resids or show_fwhm or debug_bkpts:
+        n_threads = 1
+    batches = []
     for iord in srt_order_snr:
-        order = order_vec[iord]
-        msgs.info("Local sky subtraction and extraction for slit/order: {:d}/{:d}".format(iord,order))
-        other_orders = (fwhm_here > 0) & np.invert(fwhm_was_fit)
-        other_fit    = (fwhm_here > 0) & fwhm_was_fit
-        # Loop over objects in order of S/N ratio (from highest to lowest)
-        for iobj in srt_obj:
-            if (order_snr[iord, iobj] <= min_snr) & (np.sum(other_orders) >= 3):
-                if iobj == ibright:
-                    # If this is the brightest object then we extrapolate the FWHM from a fit
-                    #fwhm_coeffs = np.polyfit(order_vec[other_orders], fwhm_here[other_orders], 1)
-                    #fwhm_fit_eval = np.poly1d(fwhm_coeffs)
-                    #fwhm_fit = fwhm_fit_eval(order_vec[iord])
-                    fwhm_was_fit[iord] = True
-                    # Either perform a linear fit to the FWHM or simply take the median
-                    if fit_fwhm:
-                        minx = 0.0
-                        maxx = fwhm_here[other_orders].max()
-                        # ToDO robust_poly_fit needs to return minv and maxv as outputs for the fits to be usable downstream
-                        #fit_mask, fwhm_coeffs = fitting.robust_fit(order_vec[other_orders], fwhm_here[other_orders],1,
-                        pypeitFit = fitting.robust_fit(order_vec[other_orders], fwhm_here[other_orders],1,
-                                                                        function='polynomial',maxiter=25,lower=2.0, upper=2.0,
-                                                                        maxrej=1,sticky=False, minx=minx, maxx=maxx)
-                        fwhm_this_ord = pypeitFit.eval(order_vec[iord])#, 'polynomial', minx=minx, maxx=maxx)
-                        fwhm_all = pypeitFit.eval(order_vec)#, 'polynomial', minx=minx, maxx=maxx)
-                        fwhm_str = 'linear fit'
-                    else:
-                        fit_mask = np.ones_like(order_vec[other_orders],dtype=bool)
-                        fwhm_this_ord = np.median(fwhm_here[other_orders])
-                        fwhm_all = np.full(norders,fwhm_this_ord)
-                        fwhm_str = 'median '
-                    indx = (sobjs.ECH_OBJID == uni_objid[iobj]) & (sobjs.ECH_ORDERINDX == iord)
-                    for spec in sobjs[indx]:
-                        spec.FWHM = fwhm_this_ord
-
-                    str_out = ''
-                    for slit_now, order_now, snr_now, fwhm_now in zip(slit_vec[other_orders], order_vec[other_orders],order_snr[other_orders,ibright], fwhm_here[other_orders]):
-                        str_out += '{:<8d}{:<8d}{:>10.2f}{:>10.2f}'.format(slit_now, order_now, snr_now, fwhm_now) + msgs.newline()
-                    msgs.info(msgs.newline() + 'Using' +  fwhm_str + ' for FWHM of object={:d}'.format(uni_objid[iobj]) +
-                              ' on slit/order: {:d}/{:d}'.format(iord,order) + msgs.newline() + dash_big +
-                              msgs.newline() + '{:<8s}{:<8s}{:>10s}{:>10s}'.format('slit', 'order','SNR','FWHM') +
-                              msgs.newline() + dash_big +
-                              msgs.newline() + str_out[:-8] +
-                              fwhm_str.upper() +  ':{:<8d}{:<8d}{:>10.2f}{:>10.2f}'.format(iord, order, order_snr[iord,ibright], fwhm_this_ord) +
-                              msgs.newline() + dash_big)
-                    if show_fwhm:
-                        plt.plot(order_vec[other_orders][fit_mask], fwhm_here[other_orders][fit_mask], marker='o', linestyle=' ',
-                        color='k', mfc='k', markersize=4.0, label='orders informing fit')
-                        if np.any(np.invert(fit_mask)):
-                            plt.plot(order_vec[other_orders][np.invert(fit_mask)],
-                                     fwhm_here[other_orders][np.invert(fit_mask)], marker='o', linestyle=' ',
-                                     color='magenta', mfc='magenta', markersize=4.0, label='orders rejected by fit')
-                        if np.any(other_fit):
-                            plt.plot(order_vec[other_fit], fwhm_here[other_fit], marker='o', linestyle=' ',
-                            color='lawngreen', mfc='lawngreen',markersize=4.0, label='fits to other low SNR orders')
-                        plt.plot([order_vec[iord]], [fwhm_this_ord], marker='o', linestyle=' ',color='red', mfc='red', markersize=6.0,label='this order')
-                        plt.plot(order_vec, fwhm_all, color='cornflowerblue', zorder=10, linewidth=2.0, label=fwhm_str)
-                        plt.legend()
-                        plt.show()
-                else:
-                    # If this is not the brightest object then assign it the FWHM of the brightest object
-                    indx     = np.where((sobjs.ECH_OBJID == uni_objid[iobj]) & (sobjs.ECH_ORDERINDX == iord))[0][0]
-                    indx_bri = np.where((sobjs.ECH_OBJID == uni_objid[ibright]) & (sobjs.ECH_ORDERINDX == iord))[0][0]
-                    spec = sobjs[indx]
-                    spec.FWHM = sobjs[indx_bri].FWHM
+        if len(batches) == 0 or n_threads == 1 or np.any(order_snr[iord] <= min_snr):
+            batches += [[iord]]
+        else:
+            batches[-1] += [iord]
 
+    def extract_order(iord):
         thisobj = (sobjs.ECH_ORDERINDX == iord) # indices of objects for this slit
         thismask = slitmask == gdslit_spat[iord] # pixels for this slit
         # True  = Good, False = Bad for inmask
         inmask = (fullmask == 0) & thismask
         # Local sky subtraction and extraction
-        skymodel[thismask], objmodel[thismask], ivarmodel[thismask], extractmask[thismask] = local_skysub_extract(
+        return thismask, local_skysub_extract(
             sciimg, sciivar, tilts, waveimg, global_sky,rn2img, thismask,
             left[:,iord], right[:,iord], sobjs[thisobj], spat_pix=spat_pix,
             ingpm=inmask,std = std, bsp=bsp, extract_maskwidth=extract_maskwidth, trim_edg=trim_edg,
@@ -1093,13 +1048,93 @@ def ech_local_skysub_extract(sciimg, sciivar, fullmask, tilts, waveimg, global_s
             sn_gauss=sn_gauss, model_full_slit=model_full_slit, model_noise=model_noise, debug_bkpts=debug_bkpts,
             show_resids=show_resids, show_profile=show_profile)
 
-        # update the FWHM fitting vector for the brighest object
-        indx = (sobjs.ECH_OBJID == uni_objid[ibright]) & (sobjs.ECH_ORDERINDX == iord)
-        fwhm_here[iord] = np.median(sobjs[indx].FWHMFIT)
-        # Did the FWHM get updated by the profile fitting routine in local_skysub_extract? If so, include this value
-        # for future fits
-        if np.abs(fwhm_here[iord] - sobjs[indx].FWHM) >= 0.01:
-            fwhm_was_fit[iord] = False
+    # Loop over orders in order of S/N ratio (from highest to lowest) for the brightest object
+    for batch in batches:
+        for iord in batch:
+            order = order_vec[iord]
+            msgs.info("Local sky subtraction and extraction for slit/order: {:d}/{:d}".format(iord,order))
+            other_orders = (fwhm_here > 0) & np.invert(fwhm_was_fit)
+            other_fit    = (fwhm_here > 0) & fwhm_was_fit
+            # Loop over objects in order of S/N ratio (from highest to lowest)
+            for iobj in srt_obj:
+                if (order_snr[iord, iobj] <= min_snr) & (np.sum(other_orders) >= 3):
+                    if iobj == ibright:
+                        # If this is the brightest object then we extrapolate the FWHM from a fit
+                        #fwhm_coeffs = np.polyfit(order_vec[other_orders], fwhm_here[other_orders], 1)
+                        #fwhm_fit_eval = np.poly1d(fwhm_coeffs)
+                        #fwhm_fit = fwhm_fit_eval(order_vec[iord])
+                        fwhm_was_fit[iord] = True
+                        # Either perform a linear fit to the FWHM or simply take the median
+                        if fit_fwhm:
+                            minx = 0.0
+                            maxx = fwhm_here[other_orders].max()
+                            # ToDO robust_poly_fit needs to return minv and maxv as outputs for the fits to be usable downstream
+                            #fit_mask, fwhm_coeffs = fitting.robust_fit(order_vec[other_orders], fwhm_here[other_orders],1,
+                            pypeitFit = fitting.robust_fit(order_vec[other_orders], fwhm_here[other_orders],1,
+                                                                            function='polynomial',maxiter=25,lower=2.0, upper=2.0,
+                                                                            maxrej=1,sticky=False, minx=minx, maxx=maxx)
+                            fwhm_this_ord = pypeitFit.eval(order_vec[iord])#, 'polynomial', minx=minx, maxx=maxx)
+                            fwhm_all = pypeitFit.eval(order_vec)#, 'polynomial', minx=minx, maxx=maxx)
+                            fwhm_str = 'linear fit'
+                        else:
+                            fit_mask = np.ones_like(order_vec[other_orders],dtype=bool)
+                            fwhm_this_ord = np.median(fwhm_here[other_orders])
+                            fwhm_all = np.full(norders,fwhm_this_ord)
+                            fwhm_str = 'median '
+                        indx = (sobjs.ECH_OBJID == uni_objid[iobj]) & (sobjs.ECH_ORDERINDX == iord)
+                        for spec in sobjs[indx]:
+                            spec.FWHM = fwhm_this_ord
+
+                        str_out = ''
+                        for slit_now, order_now, snr_now, fwhm_now in zip(slit_vec[other_orders], order_vec[other_orders],order_snr[other_orders,ibright], fwhm_here[other_orders]):
+                            str_out += '{:<8d}{:<8d}{:>10.2f}{:>10.2f}'.format(slit_now, order_now, snr_now, fwhm_now) + msgs.newline()
+                        msgs.info(msgs.newline() + 'Using' +  fwhm_str + ' for FWHM of object={:d}'.format(uni_objid[iobj]) +
+                                  ' on slit/order: {:d}/{:d}'.format(iord,order) + msgs.newline() + dash_big +
+                                  msgs.newline() + '{:<8s}{:<8s}{:>10s}{:>10s}'.format('slit', 'order','SNR','FWHM') +
+                                  msgs.newline() + dash_big +
+                                  msgs.newline() + str_out[:-8] +
+                                  fwhm_str.upper() +  ':{:<8d}{:<8d}{:>10.2f}{:>10.2f}'.format(iord, order, order_snr[iord,ibright], fwhm_this_ord) +
+                                  msgs.newline() + dash_big)
+                        if show_fwhm:
+                            plt.plot(order_vec[other_orders][fit_mask], fwhm_here[other_orders][fit_mask], marker='o', linestyle=' ',
+                            color='k', mfc='k', markersize=4.0, label='orders informing fit')
+                            if np.any(np.invert(fit_mask)):
+                                plt.plot(order_vec[other_orders][np.invert(fit_mask)],
+                                         fwhm_here[other_orders][np.invert(fit_mask)], marker='o', linestyle=' ',
+                                         color='magenta', mfc='magenta', markersize=4.0, label='orders rejected by fit')
+                            if np.any(other_fit):
+                                plt.plot(order_vec[other_fit], fwhm_here[other_fit], marker='o', linestyle=' ',
+                                color='lawngreen', mfc='lawngreen',markersize=4.0, label='fits to other low SNR orders')
+                            plt.plot([order_vec[iord]], [fwhm_this_ord], marker='o', linestyle=' ',color='red', mfc='red', markersize=6.0,label='this order')
+                            plt.plot(order_vec, fwhm_all, color='cornflowerblue', zorder=10, linewidth=2.0, label=fwhm_str)
+                            plt.legend()
+                            plt.show()
+                    else:
+                        # If this is not the brightest object then assign it the FWHM of the brightest object
+                        indx     = np.where((sobjs.ECH_OBJID == uni_objid[iobj]) & (sobjs.ECH_ORDERINDX == iord))[0][0]
+                        indx_bri = np.where((sobjs.ECH_OBJID == uni_objid[ibright]) & (sobjs.ECH_ORDERINDX == iord))[0][0]
+                        spec = sobjs[indx]
+                        spec.FWHM = sobjs[indx_bri].FWHM
+
+        if len(batch) > 1:
+            msgs.info('Reducing {0} orders using {1} threads'.format(len(batch),
+                      min(n_threads, len(batch))))
+            with futures.ThreadPoolExecutor(max_workers=min(n_threads, len(batch))) as executor:
+                results = list(executor.map(extract_order, batch))
+        else:
+            results = map(extract_order, batch)
+
+        for iord, (thismask, models) in zip(batch, results):
+            skymodel[thismask], objmodel[thismask], ivarmodel[thismask], extractmask[thismask] \
+                    = models
+
+            # update the FWHM fitting vector for the brighest object
+            indx = (sobjs.ECH_OBJID == uni_objid[ibright]) & (sobjs.ECH_ORDERINDX == iord)
+            fwhm_here[iord] = np.median(sobjs[indx].FWHMFIT)
+            # Did the FWHM get updated by the profile fitting routine in local_skysub_extract? If so, include this value
+            # for future fits
+            if np.abs(fwhm_here[iord] - sobjs[indx].FWHM) >= 0.01:
+                fwhm_was_fit[iord] = False
 
     # Set the bit for pixels which were masked by the extraction.
     # For extractmask, True = Good, False = Bad
@@ -8,7 +8,10 @@ import numpy as np
 import scipy
 import matplotlib.pyplot as plt
 import os
+import inspect
 import pickle
+from collections import OrderedDict
+from concurrent import futures
 from pypeit.core import load, flux_calib
 from pypeit.core.wavecal import wvutils
 from astropy import table
@@ -123,11 +126,30 @@ def pca_lnprior(theta,pca_dict):
     return gaussian_mixture_model.score_samples(A.reshape(1,-1))
 
 
-def read_telluric_grid(filename, wave_min=None, wave_max=None, pad = 0):
+telluric_grid_cache_size = 4
+"""
+Maximum number of (trimmed) telluric grids cached by
+:func:`read_telluric_grid`.  The least recently used grid is dropped when
+the cache is full.
+"""
+
+_telluric_grid_cache = OrderedDict()
+"""
+Cache with the telluric grids read by :func:`read_telluric_grid` in this
+process.
+"""
+
+
+def read_telluric_grid(filename, wave_min=None, wave_max=None, pad=0):
     """
     Reads in the telluric grid from a file, and optionally trims the grid to be in within
     wave_min and wave_max adding a padding if requested.
 
+    Only the wavelength range of the trimmed grid is read from disk, such that the full grid (which can be
+    several GB) is never loaded into memory. The grids are cached, such that reading the same file with the same
+    wavelength limits again in the same process returns the cached grid; see :data:`telluric_grid_cache_size`.
+    The arrays in the returned dictionary are read-only.
+
     Args:
         filename (str):
            Telluric grid filename
@@ -135,8 +157,10 @@ def read_telluric_grid(filename, wave_min=None, wave_max=None, pad = 0):
            Minimum wavelength at which the grid is desired
         wave_max (float):
            Maximum wavelength at which the grid is desired.
-        pad:
-           Padding to be added to the grid boundaries if wave_min or wave_max are input
+        pad (int):
+           Padding in pixels to be added to the grid boundaries if wave_min or wave_max are input. If None, the
+           grid is padded by the number of pixels needed to convolve the telluric model at the boundaries (see
+           :func:`eval_telluric`).
 
     Returns:
         tell_dict (dict):
@@ -144,29 +168,39 @@ def read_telluric_grid(filename, wave_min=None, wave_max=None, pad = 0):
 
     """
 
-    hdul = io.fits_open(filename)
-    wave_grid_full = 10.0*hdul[1].data
-    model_grid_full = hdul[0].data
-    nspec_full = wave_grid_full.size
+    with io.fits_open(filename) as hdul:
+        wave_grid_full = 10.0*hdul[1].data
+        nspec_full = wave_grid_full.size
+        if pad is None:
+            pad = int(np.ceil(10.0 * wvutils.get_sampling(wave_grid_full)[3])) + 1
 
-    if wave_min is not None:
-        ind_lower = np.argmin(np.abs(wave_grid_full - wave_min)) - pad
-    else:
-        ind_lower = 0
-    if wave_max is not None:
-        ind_upper = np.argmin(np.abs(wave_grid_full - wave_max)) + pad
-    else:
-        ind_upper=nspec_full
-    wave_grid = wave_grid_full[ind_lower:ind_upper]
-    model_grid = model_grid_full[:,:,:,:, ind_lower:ind_upper]
-
-    pg = hdul[0].header['PRES0']+hdul[0].header['DPRES']*np.arange(0,hdul[0].header['NPRES'])
-    tg = hdul[0].header['TEMP0']+hdul[0].header['DTEMP']*np.arange(0,hdul[0].header['NTEMP'])
-    hg = hdul[0].header['HUM0']+hdul[0].header['DHUM']*np.arange(0,hdul[0].header['NHUM'])
-    if hdul[0].header['NAM'] > 1:
-        ag = hdul[0].header['AM0']+hdul[0].header['DAM']*np.arange(0,hdul[0].header['NAM'])
+        if wave_min is not None:
+            ind_lower = max(np.argmin(np.abs(wave_grid_full - wave_min)) - pad, 0)
+        else:
+            ind_lower = 0
+        if wave_max is not None:
+            ind_upper = min(np.argmin(np.abs(wave_grid_full - wave_max)) + pad, nspec_full)
+        else:
+            ind_upper=nspec_full
+
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_mtime, stat.st_size, ind_lower, ind_upper)
+        if key in _telluric_grid_cache.keys():
+            _telluric_grid_cache.move_to_end(key)
+            return _telluric_grid_cache[key].copy()
+
+        wave_grid = wave_grid_full[ind_lower:ind_upper]
+        # Only read the wavelength range of the grid that is needed
+        model_grid = hdul[0].section[:,:,:,:, ind_lower:ind_upper]
+        header = hdul[0].header
+
+    pg = header['PRES0']+header['DPRES']*np.arange(0,header['NPRES'])
+    tg = header['TEMP0']+header['DTEMP']*np.arange(0,header['NTEMP'])
+    hg = header['HUM0']+header['DHUM']*np.arange(0,header['NHUM'])
+    if header['NAM'] > 1:
+        ag = header['AM0']+header['DAM']*np.arange(0,header['NAM'])
     else:
-        ag = hdul[0].header['AM0']+1*np.arange(0,1)
+        ag = header['AM0']+1*np.arange(0,1)
 
     dwave, dloglam, resln_guess, pix_per_sigma = wvutils.get_sampling(wave_grid)
     tell_pad_pix = int(np.ceil(10.0 * pix_per_sigma))
@@ -174,7 +208,14 @@ def read_telluric_grid(filename, wave_min=None, wave_max=None, pad = 0):
     tell_dict = dict(wave_grid=wave_grid, dloglam=dloglam,
                      resln_guess=resln_guess, pix_per_sigma=pix_per_sigma, tell_pad_pix=tell_pad_pix,
                      pressure_grid=pg, temp_grid=tg, h2o_grid=hg, airmass_grid=ag, tell_grid=model_grid)
-    return tell_dict
+    for value in tell_dict.values():
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False
+
+    _telluric_grid_cache[key] = tell_dict
+    if len(_telluric_grid_cache) > telluric_grid_cache_size:
+        _telluric_grid_cache.popitem(last=False)
+    return tell_dict.copy()
 
 
 def interp_telluric_grid(theta,tell_dict):
@@ -222,6 +263,29 @@ def interp_telluric_grid(theta,tell_dict):
 
     return model_grid[p_ind,t_ind,h_ind,a_ind]
 
+def telluric_grid_indices(theta, tell_dict):
+    """
+    Routine to find the nearest telluric model grid points to a set of locations in the four dimensional
+    parameter space of (pressure, temperature, humidity, airmass). This is the vectorized version of the grid
+    lookup performed by :func:`interp_telluric_grid`.
+
+    Args:
+        theta (`numpy.ndarray`_):
+           Telluric model parameter vectors with shape (4, npop), where:
+               pressure, temperature, humidity, airmass = theta
+        tell_dict (dict):
+            Dictionary containing the telluric grid
+
+    Returns:
+        tuple: Integer arrays with shape (npop,) with the indices of the nearest grid point along the pressure,
+        temperature, humidity, and airmass axes of the telluric grid.
+
+    """
+    grids = [tell_dict['pressure_grid'], tell_dict['temp_grid'], tell_dict['h2o_grid'], tell_dict['airmass_grid']]
+    return tuple(np.round((param-grid[0])/(grid[1]-grid[0])).astype(int) if len(grid) > 1
+                 else np.zeros(param.shape, dtype=int) for grid, param in zip(grids, theta))
+
+
 def conv_telluric(tell_model, dloglam, res):
     """
     Routine to convolve the telluric model to desired resolution.
@@ -254,6 +318,55 @@ def conv_telluric(tell_model, dloglam, res):
     conv_model = scipy.signal.convolve(tell_model,g,mode='same')
     return conv_model
 
+def conv_telluric_batch(tell_models, dloglam, res, kernel_pad=0):
+    """
+    Routine to convolve a set of telluric models, each to its own resolution.
+
+    This is the vectorized version of :func:`conv_telluric`. The Gaussian kernels of all the models are zero-padded
+    to the size of the widest kernel, and the convolutions are performed with a single FFT along the spectral axis.
+    The result is identical to calling :func:`conv_telluric` for each model to within numerical precision.
+
+    Args:
+        tell_models (`numpy.ndarray`_):
+            Input telluric models at the native resolution of the telluric model grid. Shape = (npop, nspec).
+        dloglam (float):
+            Wavelength spacing of the telluric grid expressed as a a dlog10(lambda), i.e. stored in the
+            tell_dict as tell_dict['dloglam']
+        res (`numpy.ndarray`_):
+            Desired resolution of each model expressed as lambda/dlambda. Shape = (npop,).
+        kernel_pad (int, optional):
+            Minimum number of pixels by which the kernels are padded on either side of their center, which sets the
+            length of the FFT. By default, the kernels are padded to the size of the widest kernel, such that the
+            round-off errors of each convolved model depend on the other models in the set. If kernel_pad is at least
+            the half-width of the widest kernel, the result for each model does not depend on the other models.
+
+    Returns:
+        convolved_models (`numpy.ndarray`_):
+            Resolution convolved telluric models. Shape = same as input tell_models.
+
+    """
+
+    npop, nspec = tell_models.shape
+    pix_per_sigma = 1.0/np.asarray(res)/(dloglam*np.log(10.0))/(2.0 * np.sqrt(2.0 * np.log(2)))
+    sig2pix = 1.0/pix_per_sigma
+    # Number of kernel pixels below and above x=0, and the offset of the
+    # center of the convolution with mode='same'; see conv_telluric
+    nleft = np.array([np.arange(s, 4, s).size for s in sig2pix])
+    nright = np.array([np.arange(0, 4, s).size - 1 for s in sig2pix])
+    offset = (nleft + nright)//2 - nleft
+    nmax = max(np.amax(nleft + offset), np.amax(nright - offset), kernel_pad)
+    # Kernels, all centered on pixel nmax
+    x = np.arange(-nmax, nmax+1)[None,:] + offset[:,None]
+    gpm = (x >= -nleft[:,None]) & (x <= nright[:,None])
+    x = x*sig2pix[:,None]
+    g = (1.0/(np.sqrt(2*np.pi)))*np.exp(-0.5*x**2)*sig2pix[:,None]
+    g[np.logical_not(gpm)] = 0.0
+    # Convolve
+    nfft = scipy.fft.next_fast_len(nspec + 2*nmax, real=True)
+    conv_model = scipy.fft.irfft(scipy.fft.rfft(tell_models, n=nfft, axis=1)
+                                 * scipy.fft.rfft(g, n=nfft, axis=1), n=nfft, axis=1)
+    return conv_model[:,nmax:nmax+nspec]
+
 def shift_telluric(tell_model, loglam, dloglam, shift, stretch):
     """
     Routine to apply a shift to the telluric model. Note that the shift can be sub-pixel, i.e this routine interpolates.
@@ -284,7 +397,70 @@ def shift_telluric(tell_model, loglam, dloglam, shift, stretch):
     return tell_model_shift
 
 
-def eval_telluric(theta_tell, tell_dict, ind_lower=None, ind_upper=None):
+def shift_telluric_batch(tell_models, loglam, dloglam, shift, stretch):
+    """
+    Routine to apply a shift and a stretch to a set of telluric models.
+
+    This is the vectorized version of :func:`shift_telluric`. The shifted wavelength grids of all the models are
+    computed at once, but the interpolation is performed by `numpy.interp`_ for each model in turn; this is faster
+    than any vectorized interpolation scheme because the input wavelength grid is shared by all the models.
+
+    Args:
+        tell_models (`numpy.ndarray`_):
+            Input telluric models. Shape = (npop, nspec).
+        loglam (`numpy.ndarray`_):
+            The log10 of the wavelength grid on which the tell_models are evaluated. Shape = (nspec,).
+        dloglam (float):
+            Wavelength spacing of the telluric grid expressed as a a dlog10(lambda), i.e. stored in the
+            tell_dict as tell_dict['dloglam']
+        shift (`numpy.ndarray`_):
+            Desired shift of each model. Shape = (npop,).
+        stretch (`numpy.ndarray`_):
+            Desired stretch of each model. Shape = (npop,).
+    Returns:
+        shifted_models (`numpy.ndarray`_):
+            Shifted telluric models. Shape = same as input tell_models.
+
+    """
+    loglam_shift = loglam[0] + np.arange(tell_models.shape[1])[None,:] * dloglam * np.asarray(stretch)[:,None] \
+                        + np.asarray(shift)[:,None] * dloglam
+    return np.array([np.interp(_loglam_shift, loglam, tell_model)
+                     for _loglam_shift, tell_model in zip(loglam_shift, tell_models)])
+
+
+def telluric_pad_indices(tell_dict, ind_lower=None, ind_upper=None):
+    """
+    Routine to determine the portion of the telluric grid that needs to be convolved to evaluate the telluric
+    model between ind_lower and ind_upper. See :func:`eval_telluric`.
+
+    Args:
+        tell_dict (dict):
+            Dictionary containing the telluric grid.
+        ind_lower (int):
+            Lower index into the telluric model wave_grid to trim down
+            the telluric model.
+        ind_upper:
+            Upper index into the telluric model wave_grid to trim down
+            the telluric model.
+
+    Returns:
+        tuple: The lower and upper index of the padded portion of the telluric grid, and the slice that trims the
+        padding from the convolved model.
+
+    """
+    ind_lower = 0 if ind_lower is None else ind_lower
+    ind_upper = tell_dict['wave_grid'].size - 1 if ind_upper is None else ind_upper
+    # Deal with padding for the convolutions
+    ind_lower_pad = np.fmax(ind_lower - tell_dict['tell_pad_pix'], 0)
+    ind_upper_pad = np.fmin(ind_upper + tell_dict['tell_pad_pix'], tell_dict['wave_grid'].size - 1)
+    ## FW: There is an extreme case with ind_upper == ind_upper_pad, the previous -0 won't work
+    if ind_upper_pad == ind_upper:
+        ind_upper_final = ind_upper_pad
+    else:
+        ind_upper_final = ind_upper - ind_upper_pad
+    return ind_lower_pad, ind_upper_pad, slice(ind_lower - ind_lower_pad, ind_upper_final)
+
+def eval_telluric(theta_tell, tell_dict, ind_lower=None, ind_upper=None, cache=None):
     """
     Routine to evaluate the telluric model at an arbitrary location in
     the theta_tell parameter space.  The full atmosphere model lives in
@@ -326,6 +502,11 @@ def eval_telluric(theta_tell, tell_dict, ind_lower=None, ind_upper=None):
         ind_upper:
             Upper index into the telluric model wave_grid to trim down
             the telluric model.
+        cache (:class:`TelluricModelCache`, optional):
+            Cache of the convolved telluric models.  If provided, the
+            model is convolved to the quantized resolution of the
+            cache, and the convolved model is reused by later calls
+            with the same grid point and quantized resolution.
 
     Returns:
         `numpy.ndarray`_: Telluric model evaluated at the desired
@@ -333,28 +514,222 @@ def eval_telluric(theta_tell, tell_dict, ind_lower=None, ind_upper=None):
 
     """
 
+    if cache is not None:
+        return eval_telluric_batch(np.asarray(theta_tell, dtype=float)[:,None], tell_dict,
+                                   ind_lower=ind_lower, ind_upper=ind_upper, cache=cache)[0]
+
     ntheta = len(theta_tell)
     tellmodel_hires = interp_telluric_grid(theta_tell[:4], tell_dict)
 
-    ind_lower = 0 if ind_lower is None else ind_lower
-    ind_upper = tell_dict['wave_grid'].size - 1 if ind_upper is None else ind_upper
-    # Deal with padding for the convolutions
-    ind_lower_pad = np.fmax(ind_lower - tell_dict['tell_pad_pix'], 0)
-    ind_upper_pad = np.fmin(ind_upper + tell_dict['tell_pad_pix'], tell_dict['wave_grid'].size - 1)
-    ## FW: There is an extreme case with ind_upper == ind_upper_pad, the previous -0 won't work
-    if ind_upper_pad == ind_upper:
-        ind_upper_final = ind_upper_pad
-    else:
-        ind_upper_final = ind_upper - ind_upper_pad
-    tell_pad_tuple = (ind_lower - ind_lower_pad, ind_upper_final)
+    ind_lower_pad, ind_upper_pad, trim = telluric_pad_indices(tell_dict, ind_lower=ind_lower, ind_upper=ind_upper)
     tellmodel_conv = conv_telluric(tellmodel_hires[ind_lower_pad:ind_upper_pad + 1], tell_dict['dloglam'], theta_tell[4])
 
     if ntheta == 7:
         tellmodel_out = shift_telluric(tellmodel_conv, np.log10(tell_dict['wave_grid'][ind_lower_pad: ind_upper_pad+1]), tell_dict['dloglam'],
                                        theta_tell[5],theta_tell[6])
-        return tellmodel_out[tell_pad_tuple[0]:ind_upper_final]
+        return tellmodel_out[trim]
+    else:
+        return tellmodel_conv[trim]
+
+
+def eval_telluric_batch(theta_tell, tell_dict, ind_lower=None, ind_upper=None, cache=None):
+    """
+    Routine to evaluate the telluric model at a set of locations in the theta_tell parameter space.
+
+    This is the vectorized version of :func:`eval_telluric`. The nearest grid point models of all the locations
+    are extracted from the telluric grid at once, convolved using :func:`conv_telluric_batch`, and shifted using
+    :func:`shift_telluric_batch`.
+
+    Args:
+        theta_tell (`numpy.ndarray`_):
+            Parameter vectors describing the atmosphere with shape (ntheta, npop), where ntheta is 5 or 7. See
+            :func:`eval_telluric` for a description of parameters.
+        tell_dict (dict):
+            Dictionary containing the telluric grid.
+        ind_lower (int):
+            Lower index into the telluric model wave_grid to trim down
+            the telluric model.
+        ind_upper:
+            Upper index into the telluric model wave_grid to trim down
+            the telluric model.
+        cache (:class:`TelluricModelCache`, optional):
+            Cache of the convolved telluric models; see
+            :func:`eval_telluric`.
+
+    Returns:
+        `numpy.ndarray`_: Telluric models evaluated at the desired locations theta_tell in atomphere parameter space.
+        Shape = (npop, nspec), where nspec is the number of wavelengths between ind_lower and ind_upper.
+
+    """
+
+    ntheta = theta_tell.shape[0]
+    ind_lower_pad, ind_upper_pad, trim = telluric_pad_indices(tell_dict, ind_lower=ind_lower, ind_upper=ind_upper)
+    grid_indices = telluric_grid_indices(theta_tell[:4], tell_dict)
+    if cache is None:
+        p_ind, t_ind, h_ind, a_ind = grid_indices
+        tellmodel_hires = tell_dict['tell_grid'][p_ind,t_ind,h_ind,a_ind,ind_lower_pad:ind_upper_pad + 1]
+        tellmodel_conv = conv_telluric_batch(tellmodel_hires, tell_dict['dloglam'], theta_tell[4])
+    else:
+        tellmodel_conv = cache.conv_models(tell_dict, grid_indices, theta_tell[4], ind_lower_pad, ind_upper_pad)
+
+    if ntheta == 7:
+        tellmodel_out = shift_telluric_batch(tellmodel_conv,
+                                             np.log10(tell_dict['wave_grid'][ind_lower_pad: ind_upper_pad+1]),
+                                             tell_dict['dloglam'], theta_tell[5], theta_tell[6])
+        return tellmodel_out[:,trim]
     else:
-        return tellmodel_conv[tell_pad_tuple[0]:ind_upper_final]
+        return tellmodel_conv[:,trim]
+
+
+class TelluricModelCache:
+    """
+    Least-recently-used cache of telluric grid models convolved to a given resolution.
+
+    During a differential evolution fit, the same grid point is convolved many times at nearly the same resolution.
+    This cache stores the convolved models keyed by the grid point, the wavelength range, and the resolution
+    quantized in steps of ``resln_quantum`` in the natural log of the resolution. Each model is convolved to its
+    quantized resolution (see :func:`quantize`), such that the models returned by the cache do not depend on which
+    models happen to be cached.
+
+    The cache is meant to be used with a single telluric grid; see :func:`eval_telluric`.
+
+    Args:
+        maxmem (float, optional):
+            Maximum size in MB of the cached models. The least recently used models are dropped when the cache is
+            full.
+        resln_quantum (float, optional):
+            Step in the natural log of the resolution used to quantize the resolution, i.e. the fractional change
+            in the resolution between quantization levels. If 0, the resolution is not quantized, and only models at
+            identical resolutions are reused.
+
+    Attributes:
+        hits (int):
+            Number of models found in the cache, including repeated models within a single batch.
+        misses (int):
+            Number of models that had to be convolved.
+    """
+
+    def __init__(self, maxmem=256., resln_quantum=1e-3):
+        self.maxmem = maxmem
+        self.resln_quantum = resln_quantum
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._models = OrderedDict()
+
+    def __len__(self):
+        return len(self._models)
+
+    def quantize(self, resln):
+        """
+        Quantize the resolution.
+
+        Args:
+            resln (float, `numpy.ndarray`_):
+                Resolution(s) expressed as lambda/dlambda.
+
+        Returns:
+            tuple: The quantization level and the quantized resolution, with the same shape as ``resln``.
+        """
+        resln = np.asarray(resln, dtype=float)
+        if self.resln_quantum == 0:
+            return resln, resln
+        level = np.round(np.log(resln)/self.resln_quantum)
+        return level, np.exp(level*self.resln_quantum)
+
+    @property
+    def hit_rate(self):
+        """
+        Fraction of the requested models found in the cache.
+        """
+        nmodels = self.hits + self.misses
+        return 0. if nmodels == 0 else self.hits/nmodels
+
+    def reset_stats(self):
+        """
+        Reset the number of hits and misses.
+        """
+        self.hits = 0
+        self.misses = 0
+
+    def report(self):
+        """
+        Report the cache statistics.
+        """
+        msgs.info('Convolved telluric model cache: {0} hits, {1} misses ({2:.1f}% hit rate), '
+                  '{3} models ({4:.1f} MB) cached'.format(self.hits, self.misses, 100*self.hit_rate,
+                                                          len(self), self.nbytes/1024**2))
+
+    def conv_models(self, tell_dict, grid_indices, resln, ind_lower_pad, ind_upper_pad):
+        """
+        Return the convolved telluric models for a set of grid points and resolutions, convolving (with
+        :func:`conv_telluric_batch`) and caching the models not yet in the cache.
+
+        Args:
+            tell_dict (dict):
+                Dictionary containing the telluric grid.
+            grid_indices (tuple):
+                Indices of the grid points, as returned by :func:`telluric_grid_indices`; each is an integer
+                array with shape (npop,).
+            resln (`numpy.ndarray`_):
+                Resolution of each model. Shape = (npop,).
+            ind_lower_pad (int):
+                Lower index of the wavelength range of the grid to convolve.
+            ind_upper_pad (int):
+                Upper index (inclusive) of the wavelength range of the grid to convolve.
+
+        Returns:
+            `numpy.ndarray`_: The convolved models. Shape = (npop, ind_upper_pad - ind_lower_pad + 1).
+        """
+        level, resln_quant = self.quantize(resln)
+        grid_id = id(tell_dict['tell_grid'])
+        keys = [(grid_id, int(ind_lower_pad), int(ind_upper_pad)) + tuple(int(i) for i in indx) + (float(lev),)
+                for indx, lev in zip(zip(*grid_indices), level)]
+        models = [None]*len(keys)
+        # Models to convolve, and the population members that need them
+        missing = OrderedDict()
+        for j, key in enumerate(keys):
+            if key in self._models:
+                self._models.move_to_end(key)
+                models[j] = self._models[key]
+                self.hits += 1
+            elif key in missing:
+                missing[key] += [j]
+                self.hits += 1
+            else:
+                missing[key] = [j]
+                self.misses += 1
+
+        if len(missing) > 0:
+            first = np.array([indx[0] for indx in missing.values()])
+            # The kernels are padded to the power of two above their
+            # half-width, such that the round-off errors of a convolved
+            # model do not depend on the other models convolved with it;
+            # see conv_telluric_batch
+            pix_per_sigma = 1.0/resln_quant[first]/(tell_dict['dloglam']*np.log(10.0)) \
+                            / (2.0 * np.sqrt(2.0 * np.log(2)))
+            kernel_pad = np.power(2, np.ceil(np.log2(np.ceil(4*pix_per_sigma) + 1))).astype(int)
+            missing = list(missing.items())
+            for pad in np.unique(kernel_pad):
+                indx = np.where(kernel_pad == pad)[0]
+                p_ind, t_ind, h_ind, a_ind = [np.asarray(i)[first[indx]] for i in grid_indices]
+                tellmodel_conv = conv_telluric_batch(
+                        tell_dict['tell_grid'][p_ind,t_ind,h_ind,a_ind,ind_lower_pad:ind_upper_pad + 1],
+                        tell_dict['dloglam'], resln_quant[first[indx]], kernel_pad=pad)
+                for i, model in zip(indx, tellmodel_conv):
+                    # Copy so that the batch can be freed when its models
+                    # are dropped from the cache
+                    model = model.copy()
+                    model.flags.writeable = False
+                    key, members = missing[i]
+                    for j in members:
+                        models[j] = model
+                    self._models[key] = model
+                    self.nbytes += model.nbytes
+            while self.nbytes > self.maxmem*1024**2 and len(self._models) > 0:
+                self.nbytes -= self._models.popitem(last=False)[1].nbytes
+
+        return np.array(models)
 
 
 ############################
@@ -367,9 +742,15 @@ def tellfit_chi2(theta, flux, thismask, arg_dict):
     telluric corrections. This is a general abstracted routine that provides the loss function for any object model
     that the user provides.
 
+    The loss function can also be evaluated for a full population of parameter vectors at once, as done by
+    differential evolution with ``vectorized=True``. In this case, the telluric models of all the parameter vectors
+    are evaluated together using :func:`eval_telluric_batch`, whereas the object model is evaluated for each
+    parameter vector in turn.
+
     Args:
         theta (`numpy.ndarray`_):
-           Parameter vector for the object + telluric model. See documentation of tellfit for a detailed description.
+           Parameter vector for the object + telluric model, with shape (ntheta,) or (ntheta, npop) to evaluate a
+           population of npop parameter vectors. See documentation of tellfit for a detailed description.
         flux (`numpy.ndarray`_):
            The flux of the object being fit
         thismask (`numpy.ndarray`_, boolean):
@@ -378,19 +759,47 @@ def tellfit_chi2(theta, flux, thismask, arg_dict):
            A dictionary containing the parameters needed to evaluate the telluric model and the object model. See
            documentation of tellfit for a detailed description.
     Returns:
-        loss_function (float):
+        loss_function (float, `numpy.ndarray`_):
            The value of the loss function at the location in parameter space theta. This is loss function is the thing
-           that is minimized to perform the fit.
+           that is minimized to perform the fit. If theta is two dimensional, this is an array with shape (npop,).
 
     """
 
     obj_model_func = arg_dict['obj_model_func']
     flux_ivar = arg_dict['ivar']
 
+    if np.ndim(theta) == 2:
+        npop = theta.shape[1]
+        loss_function = np.full(npop, np.inf)
+        chi_weight = thismask * np.sqrt(flux_ivar)
+        # Evaluate the population in batches to limit the memory footprint
+        # of the telluric models
+        nbatch = max(1, 2**22 // flux.size)
+        for start in range(0, npop, nbatch):
+            end = min(start + nbatch, npop)
+            chi_vec = eval_telluric_batch(theta[-7:,start:end], arg_dict['tell_dict'],
+                                          ind_lower=arg_dict['ind_lower'], ind_upper=arg_dict['ind_upper'],
+                                          cache=arg_dict.get('tell_cache'))
+            obj_model, modelmask = map(np.array, zip(*[obj_model_func(theta[:-7,i], arg_dict['obj_dict'])
+                                                       for i in range(start, end)]))
+            # Same as the single parameter vector case below, but computed
+            # in place. The masked pixels have chi_vec = 0 and therefore do
+            # not contribute to the loss function.
+            chi_vec *= obj_model
+            np.subtract(flux, chi_vec, out=chi_vec)
+            chi_vec *= chi_weight
+            chi_vec *= modelmask
+            robust_scale = 2.0
+            scipy.special.huber(robust_scale, chi_vec, out=chi_vec)
+            loss_function[start:end] = np.where(np.any(modelmask, axis=1),
+                                                np.einsum('ij,ij->i', chi_vec, chi_vec), np.inf)
+        return loss_function
+
     theta_obj = theta[:-7]
     theta_tell = theta[-7:]
     tell_model = eval_telluric(theta_tell, arg_dict['tell_dict'],
-                               ind_lower=arg_dict['ind_lower'], ind_upper=arg_dict['ind_upper'])
+                               ind_lower=arg_dict['ind_lower'], ind_upper=arg_dict['ind_upper'],
+                               cache=arg_dict.get('tell_cache'))
     obj_model, modelmask = obj_model_func(theta_obj, arg_dict['obj_dict'])
 
     if not np.any(modelmask):
@@ -403,7 +812,7 @@ def tellfit_chi2(theta, flux, thismask, arg_dict):
         loss_function = np.sum(np.square(huber_vec * totalmask))
         return loss_function
 
-def tellfit(flux, thismask, arg_dict, **kwargs_opt):
+def tellfit(flux, thismask, arg_dict, vectorized=False, **kwargs_opt):
     """
     Routine to perform the object + telluric model fitting for telluric
     corrections. This is a general abstracted routine that performs the
@@ -455,6 +864,23 @@ def tellfit(flux, thismask, arg_dict, **kwargs_opt):
                   object model arguments which is passed to the
                   obj_model_func
 
+            Optionally, ``arg_dict['tell_cache']`` can provide a
+            :class:`TelluricModelCache` used to reuse the convolved
+            telluric models in the loss function (see
+            :func:`tellfit_chi2` and :func:`eval_telluric`).  The
+            returned model of the best fit is always convolved to the
+            fitted resolution.
+
+        vectorized (bool, optional):
+            Evaluate the loss function for the full population of each
+            generation of the differential evolution optimization at
+            once; see :func:`tellfit_chi2`.  This requires the
+            population to be updated once per generation (i.e.,
+            ``updating='deferred'``), which is much faster than the
+            serial evaluation of each population member but leads to a
+            different, albeit still deterministic, path through
+            parameter space.  Requires scipy version 1.9 or later;
+            otherwise, the population is evaluated serially.
         **kwargs_opt (dict):
             Optional arguments for the differential evolution
             optimization
@@ -479,6 +905,12 @@ def tellfit(flux, thismask, arg_dict, **kwargs_opt):
     flux_ivar = arg_dict['ivar'] # Inverse variance of flux or counts
     bounds = arg_dict['bounds']  # bounds for differential evolution optimizaton
     seed = arg_dict['seed']      # Seed for differential evolution optimizaton
+    if vectorized:
+        if 'vectorized' in inspect.signature(scipy.optimize.differential_evolution).parameters:
+            kwargs_opt['vectorized'] = True
+            kwargs_opt['updating'] = 'deferred'
+        else:
+            msgs.warn('Vectorized telluric fits require scipy>=1.9; evaluating the population serially.')
     result = scipy.optimize.differential_evolution(tellfit_chi2, bounds, args=(flux, thismask, arg_dict,), seed=seed,
                                                    **kwargs_opt)
 
@@ -1115,8 +1547,8 @@ def sensfunc_telluric(wave, counts, counts_ivar, counts_mask, exptime, airmass,
                       ech_orders=None,
                       polyorder=8, mask_abs_lines=True,
                       delta_coeff_bounds=(-20.0, 20.0), minmax_coeff_bounds=(-5.0, 5.0),
-                      sn_clip=30.0, only_orders=None, tol=1e-3, popsize=30, recombination=0.7, polish=True, disp=False,
-                      debug_init=False, debug=False):
+                      sn_clip=30.0, only_orders=None, tol=1e-3, popsize=30, recombination=0.7, polish=True,
+                      vectorized=True, n_workers=1, resln_quantum=1e-3, tell_cache_mem=256., disp=False, debug_init=False, debug=False):
     """
     Function to compute a sensitivity function and a telluric model from the PypeIt spec1d file of a standard star spectrum
 
@@ -1189,6 +1621,16 @@ def sensfunc_telluric(wave, counts, counts_ivar, counts_mask, exptime, airmass,
     polish : bool, optional, default=True
         If True then differential evolution will perform an additional optimizatino at the end to polish the best fit
         at the end, which can improve the optimization slightly. See scipy.optimize.differential_evolution for details.
+    vectorized : bool, optional, default=True
+        Evaluate the loss function for the full population of each generation of the differential evolution
+        optimization at once. See :func:`tellfit` for details.
+    n_workers : int, optional, default=1
+        Number of worker processes used to fit the orders concurrently. See :class:`Telluric` for details.
+    resln_quantum : float, optional, default=1e-3
+        Quantization step in the natural log of the resolution used to cache the convolved telluric models. See
+        :class:`Telluric` for details.
+    tell_cache_mem : float, optional, default=256.
+        Maximum memory in MB used to cache the convolved telluric models. See :class:`Telluric` for details.
     disp : bool, optional, default=True
         Argument for scipy.optimize.differential_evolution which will  display status messages to the screen
         indicating the status of the optimization. See above for a description of the output and how to know
@@ -1249,7 +1691,8 @@ def sensfunc_telluric(wave, counts, counts_ivar, counts_mask, exptime, airmass,
     TelObj = Telluric(wave, counts, counts_ivar, mask_tot, telgridfile, obj_params,
                       init_sensfunc_model, eval_sensfunc_model,  ech_orders=ech_orders, sn_clip=sn_clip, tol=tol,
                       popsize=popsize, recombination=recombination,
-                      polish=polish, disp=disp, debug=debug)
+                      polish=polish, vectorized=vectorized, n_workers=n_workers,
+                      resln_quantum=resln_quantum, tell_cache_mem=tell_cache_mem, disp=disp, debug=debug)
 
     TelObj.run(only_orders=only_orders)
     # Append the sensfunc to the output table for convenience
@@ -1305,7 +1748,7 @@ def create_bal_mask(wave, bal_wv_min_max):
 def qso_telluric(spec1dfile, telgridfile, pca_file, z_qso, telloutfile, outfile, npca=8, bal_wv_min_max=None,
                  delta_zqso=0.1, bounds_norm=(0.1, 3.0), tell_norm_thresh=0.9, sn_clip=30.0, only_orders=None,
                  tol=1e-3, popsize=30, recombination=0.7, pca_lower=1220.0,
-                 pca_upper=3100.0, polish=True, disp=False, debug_init=False, debug=False,
+                 pca_upper=3100.0, polish=True, vectorized=True, n_workers=1, resln_quantum=1e-3, tell_cache_mem=256., disp=False, debug_init=False, debug=False,
                  show=False):
     """
     Telluric correction for a QSO list object.
@@ -1375,6 +1818,16 @@ def qso_telluric(spec1dfile, telgridfile, pca_file, z_qso, telloutfile, outfile,
     polish : bool, optional, default=True
         If True then differential evolution will perform an additional optimizatino at the end to polish the best fit
         at the end, which can improve the optimization slightly. See scipy.optimize.differential_evolution for details.
+    vectorized : bool, optional, default=True
+        Evaluate the loss function for the full population of each generation of the differential evolution
+        optimization at once. See :func:`tellfit` for details.
+    n_workers : int, optional, default=1
+        Number of worker processes used to fit the orders concurrently. See :class:`Telluric` for details.
+    resln_quantum : float, optional, default=1e-3
+        Quantization step in the natural log of the resolution used to cache the convolved telluric models. See
+        :class:`Telluric` for details.
+    tell_cache_mem : float, optional, default=256.
+        Maximum memory in MB used to cache the convolved telluric models. See :class:`Telluric` for details.
     disp : bool, optional, default=True
         Argument for scipy.optimize.differential_evolution which will  display status messages to the screen
         indicating the status of the optimization. See above for a description of the output and how to know
@@ -1415,7 +1868,8 @@ def qso_telluric(spec1dfile, telgridfile, pca_file, z_qso, telloutfile, outfile,
     # parameters lowered for testing
     TelObj = Telluric(wave, flux, ivar, mask_tot, telgridfile, obj_params, init_qso_model, eval_qso_model,
                       sn_clip=sn_clip, tol=tol, popsize=popsize, recombination=recombination,
-                      polish=polish, disp=disp, debug=debug)
+                      polish=polish, vectorized=vectorized, n_workers=n_workers,
+                      resln_quantum=resln_quantum, tell_cache_mem=tell_cache_mem, disp=disp, debug=debug)
     TelObj.run(only_orders=only_orders)
     TelObj.save(telloutfile)
 
@@ -1458,7 +1912,7 @@ def qso_telluric(spec1dfile, telgridfile, pca_file, z_qso, telloutfile, outfile,
 def star_telluric(spec1dfile, telgridfile, telloutfile, outfile, star_type=None, star_mag=None, star_ra=None, star_dec=None,
                   func='legendre', model='exp', polyorder=5, mask_abs_lines=True, delta_coeff_bounds=(-20.0, 20.0),
                   minmax_coeff_bounds=(-5.0, 5.0), only_orders=None, sn_clip=30.0, tol=1e-3, popsize=30, recombination=0.7, polish=True,
-                  disp=False, debug_init=False, debug=False, show=False):
+                  vectorized=True, n_workers=1, resln_quantum=1e-3, tell_cache_mem=256., disp=False, debug_init=False, debug=False, show=False):
 
     # Turn on disp for the differential_evolution if debug mode is turned on.
     if debug:
@@ -1505,7 +1959,9 @@ def star_telluric(spec1dfile, telgridfile, telloutfile, outfile, star_type=None,
     # parameters lowered for testing
     TelObj = Telluric(wave, flux, ivar, mask_tot, telgridfile, obj_params,
                       init_star_model, eval_star_model,  sn_clip=sn_clip,
-                      tol=tol, popsize=popsize, recombination=recombination, polish=polish, disp=disp, debug=debug)
+                      tol=tol, popsize=popsize, recombination=recombination, polish=polish,
+                      vectorized=vectorized, n_workers=n_workers,
+                      resln_quantum=resln_quantum, tell_cache_mem=tell_cache_mem, disp=disp, debug=debug)
 
     TelObj.run(only_orders=only_orders)
     TelObj.save(telloutfile)
@@ -1547,7 +2003,8 @@ def star_telluric(spec1dfile, telgridfile, telloutfile, outfile, star_type=None,
 def poly_telluric(spec1dfile, telgridfile, telloutfile, outfile, z_obj=0.0, func='legendre', model='exp', polyorder=3,
                   fit_wv_min_max=None, mask_lyman_a=True, delta_coeff_bounds=(-20.0, 20.0),
                   minmax_coeff_bounds=(-5.0, 5.0), only_orders=None, sn_clip=30.0, tol=1e-3, popsize=30, maxiter=3,
-                  recombination=0.7, polish=True, disp=False, debug_init=False, debug=False, show=False):
+                  recombination=0.7, polish=True, vectorized=True, n_workers=1, resln_quantum=1e-3, tell_cache_mem=256., disp=False, debug_init=False,
+                  debug=False, show=False):
 
     # Turn on disp for the differential_evolution if debug mode is turned on.
     if debug:
@@ -1590,7 +2047,9 @@ def poly_telluric(spec1dfile, telgridfile, telloutfile, outfile, z_obj=0.0, func
     # parameters lowered for testing
     TelObj = Telluric(wave, flux, ivar, mask_tot, telgridfile, obj_params,
                       init_poly_model, eval_poly_model,  sn_clip=sn_clip, maxiter=maxiter,
-                      tol=tol, popsize=popsize, recombination=recombination, polish=polish, disp=disp, debug=debug)
+                      tol=tol, popsize=popsize, recombination=recombination, polish=polish,
+                      vectorized=vectorized, n_workers=n_workers,
+                      resln_quantum=resln_quantum, tell_cache_mem=tell_cache_mem, disp=disp, debug=debug)
 
     TelObj.run(only_orders=only_orders)
     TelObj.save(telloutfile)
@@ -1775,6 +2234,24 @@ class Telluric(object):
         polish (bool): default=True
             If True then differential evolution will perform an additional optimizatino at the end to polish the best fit
             at the end, which can improve the optimization slightly. See scipy.optimize.differential_evolution for details.
+        vectorized (bool): default=True
+            Evaluate the loss function for the full population of each generation of the differential evolution
+            optimization at once. This is much faster than evaluating each population member in turn, but results in
+            a different sequence of trial parameters. See :func:`tellfit` for details.
+        n_workers (int): default = 1
+            Number of worker processes used to fit the orders/slits concurrently. The worker processes share the
+            telluric grid read by this object (or, if the processes are not forked, read the same wavelength range of
+            the grid once). Because the fit of each order uses its own seed, the results are identical to the serial
+            fits. Ignored (i.e. set to 1) if debug is True.
+        resln_quantum (float): default = 1e-3
+            The telluric models convolved to the trial resolutions of the fit are cached and reused (see
+            :class:`TelluricModelCache`). To this end, the resolution is quantized in steps of resln_quantum in its
+            natural log, i.e. the models are convolved to a resolution within a fraction resln_quantum/2 of the trial
+            resolution. The cache is only used by the loss function of the optimization; the telluric model of the best
+            fit is convolved to the fitted resolution. If 0, the resolution is not quantized.
+        tell_cache_mem (float): default = 256.
+            Maximum memory in MB used by the cache of the convolved telluric models. The least recently used models
+            are dropped when the cache is full. If 0, the models are not cached.
         disp (bool): default=True
             Argument for scipy.optimize.differential_evolution which will  display status messages to the screen
             indicating the status of the optimization. See above for a description of the output and how to know
@@ -1791,7 +2268,8 @@ class Telluric(object):
                  sn_clip=30.0, airmass_guess=1.5, resln_guess=None,
                  resln_frac_bounds=(0.5, 1.5), pix_shift_bounds=(-5.0, 5.0), pix_stretch_bounds=(0.9,1.1),
                  maxiter=3, sticky=True, lower=3.0, upper=3.0,
-                 seed=777, tol=1e-3, popsize=30, recombination=0.7, polish=True, disp=False, debug=False):
+                 seed=777, tol=1e-3, popsize=30, recombination=0.7, polish=True, vectorized=True, n_workers=1, resln_quantum=1e-3, tell_cache_mem=256.,
+                 disp=False, debug=False):
 
         # Turn on disp for the differential_evolution if debug mode is turned on.
         if debug:
@@ -1824,6 +2302,10 @@ class Telluric(object):
         self.popsize = popsize
         self.recombination = recombination
         self.polish = polish
+        self.vectorized = vectorized
+        self.n_workers = n_workers
+        self.resln_quantum = resln_quantum
+        self.tell_cache_mem = tell_cache_mem
         self.disp = disp
         self.debug = debug
 
@@ -1836,8 +2318,13 @@ class Telluric(object):
         rand = np.random.RandomState(seed=self.seed)
         seed_vec = rand.randint(2 ** 32 - 1, size=self.norders)
 
-        # 3) Read the telluric grid and initalize associated parameters
-        self.tell_dict = self.read_telluric_grid()
+        # 3) Read the telluric grid and initalize associated parameters.
+        #    Only the wavelength range covered by the data (padded for the
+        #    convolutions) is needed.
+        wave_gpm = self.wave_in_arr > 1.0
+        self.tell_grid_kwargs = dict(wave_min=self.wave_in_arr[wave_gpm].min(),
+                                     wave_max=self.wave_in_arr[wave_gpm].max(), pad=None)
+        self.tell_dict = self.read_telluric_grid(**self.tell_grid_kwargs)
         self.wave_grid = self.tell_dict['wave_grid']
         self.ngrid = self.wave_grid.size
         self.resln_guess = wvutils.get_sampling(self.wave_in_arr)[2] if resln_guess is None else resln_guess
@@ -1845,6 +2332,8 @@ class Telluric(object):
         self.tell_guess = self.get_tell_guess()
         # Set the bounds for the telluric optimization
         self.bounds_tell = self.get_bounds_tell()
+        # Cache of the convolved telluric models used by the fits
+        self.tell_cache = self.init_tell_cache()
 
         # 4) Interpolate the input values onto the fixed telluric wavelength grid, clip S/N and process inmask
         self.flux_arr, self.ivar_arr, self.mask_arr = coadd.interp_spec(self.wave_grid, self.wave_in_arr, self.flux_in_arr,
@@ -1886,7 +2375,7 @@ class Telluric(object):
             self.bounds_list[iord] = bounds_iord
             arg_dict_iord = dict(ivar=self.ivar_arr[self.ind_lower[iord]:self.ind_upper[iord]+1, iord],
                                  tell_dict=self.tell_dict, ind_lower=self.ind_lower[iord], ind_upper=self.ind_upper[iord],
-                                 obj_model_func=self.eval_obj_model, obj_dict=obj_dict,
+                                 tell_cache=self.tell_cache, obj_model_func=self.eval_obj_model, obj_dict=obj_dict,
                                  bounds=bounds_iord, seed=seed_vec[iord], debug=debug)
             self.arg_dict_list[iord] = arg_dict_iord
 
@@ -1916,24 +2405,102 @@ class Telluric(object):
         self.tellmodel_list = [None]*self.norders
         self.theta_obj_list = [None]*self.norders
         self.theta_tell_list = [None]*self.norders
-        for counter, iord in enumerate(self.srt_order_tell):
-            if iord not in good_orders:
-                continue
-            msgs.info('Fitting object + telluric model for order: {:d}, {:d}/{:d}'.format(iord, counter, self.norders) +
-                      ' with user supplied function: {:s}'.format(self.init_obj_model.__name__))
-            self.result_list[iord], ymodel, ivartot, self.outmask_list[iord] = utils.robust_optimize(
-                self.flux_arr[self.ind_lower[iord]:self.ind_upper[iord]+1, iord], tellfit, self.arg_dict_list[iord],
-                inmask=self.mask_arr[self.ind_lower[iord]:self.ind_upper[iord]+1, iord],
-                maxiter=self.maxiter, lower=self.lower, upper=self.upper, sticky=self.sticky,
-                tol=self.tol, popsize=self.popsize, recombination=self.recombination, polish=self.polish, disp=self.disp)
-            self.theta_obj_list[iord] = self.result_list[iord].x[:-7]
-            self.theta_tell_list[iord] = self.result_list[iord].x[-7:]
-            self.obj_model_list[iord], modelmask = self.eval_obj_model(self.theta_obj_list[iord], self.obj_dict_list[iord])
-            self.tellmodel_list[iord] = eval_telluric(self.theta_tell_list[iord], self.tell_dict,
-                                                      ind_lower=self.ind_lower[iord],ind_upper=self.ind_upper[iord])
-            self.assign_output(iord)
-            if self.debug:
-                self.show_fit_qa(iord)
+        orders = [iord for iord in self.srt_order_tell if iord in good_orders]
+        n_workers = min(self.n_workers, len(orders))
+        if n_workers > 1 and self.debug:
+            msgs.warn('Cannot show the fit QA when fitting orders in parallel; using 1 worker process.')
+            n_workers = 1
+        if n_workers == 1:
+            fits = map(self.fit_order, orders)
+        else:
+            msgs.info('Fitting {0} orders using {1} worker processes'.format(len(orders), n_workers))
+            executor = futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_init_telluric_worker,
+                                                   initargs=(self,))
+            fits = executor.map(_fit_telluric_order, orders)
+
+        try:
+            # The results are collected in the same order as the serial fits
+            for iord, (result, outmask) in zip(orders, fits):
+                self.result_list[iord], self.outmask_list[iord] = result, outmask
+                self.theta_obj_list[iord] = self.result_list[iord].x[:-7]
+                self.theta_tell_list[iord] = self.result_list[iord].x[-7:]
+                self.obj_model_list[iord], modelmask = self.eval_obj_model(self.theta_obj_list[iord],
+                                                                           self.obj_dict_list[iord])
+                self.tellmodel_list[iord] = eval_telluric(self.theta_tell_list[iord], self.tell_dict,
+                                                          ind_lower=self.ind_lower[iord],ind_upper=self.ind_upper[iord])
+                self.assign_output(iord)
+                if self.debug:
+                    self.show_fit_qa(iord)
+        finally:
+            if n_workers > 1:
+                executor.shutdown()
+
+    def fit_order(self, iord):
+        """
+        Perform the object + telluric model fit of a single order/slit.
+
+        The fit of each order uses its own seed for the differential evolution optimization, such that the result
+        does not depend on whether the orders are fit serially or in parallel; see :func:`run`.
+
+        Args:
+            iord (int):
+                Index of the order/slit to fit.
+
+        Returns:
+            tuple: The result object returned by the differential evolution optimizer for the last rejection
+            iteration, and the output good pixel mask of the fit.
+
+        """
+        counter = np.where(self.srt_order_tell == iord)[0][0]
+        msgs.info('Fitting object + telluric model for order: {:d}, {:d}/{:d}'.format(iord, counter, self.norders) +
+                  ' with user supplied function: {:s}'.format(self.init_obj_model.__name__))
+        if self.tell_cache is not None:
+            self.tell_cache.reset_stats()
+        result, ymodel, ivartot, outmask = utils.robust_optimize(
+            self.flux_arr[self.ind_lower[iord]:self.ind_upper[iord]+1, iord], tellfit, self.arg_dict_list[iord],
+            inmask=self.mask_arr[self.ind_lower[iord]:self.ind_upper[iord]+1, iord],
+            maxiter=self.maxiter, lower=self.lower, upper=self.upper, sticky=self.sticky,
+            tol=self.tol, popsize=self.popsize, recombination=self.recombination, polish=self.polish,
+            vectorized=self.vectorized, disp=self.disp)
+        if self.tell_cache is not None:
+            self.tell_cache.report()
+        return result, outmask
+
+    def init_tell_cache(self):
+        """
+        Instantiate the cache of the convolved telluric models.
+
+        Returns:
+            :class:`TelluricModelCache`: The empty cache, or None if the models are not to be cached.
+
+        """
+        return None if self.tell_cache_mem == 0 \
+                else TelluricModelCache(maxmem=self.tell_cache_mem, resln_quantum=self.resln_quantum)
+
+    def __getstate__(self):
+        """
+        Remove the telluric grid and the cache of the convolved models when pickling the object, e.g. to send it to a
+        worker process; see :func:`__setstate__`.
+        """
+        state = self.__dict__.copy()
+        state['tell_dict'] = None
+        state['tell_cache'] = None
+        state['arg_dict_list'] = [None if arg_dict is None else dict(arg_dict, tell_dict=None, tell_cache=None)
+                                  for arg_dict in self.arg_dict_list]
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the object, read the telluric grid, which is cached by each process (see
+        :func:`read_telluric_grid`), and start a new cache of the convolved models.
+        """
+        self.__dict__.update(state)
+        self.tell_dict = self.read_telluric_grid(**self.tell_grid_kwargs)
+        self.tell_cache = self.init_tell_cache()
+        for arg_dict in self.arg_dict_list:
+            if arg_dict is not None:
+                arg_dict['tell_dict'] = self.tell_dict
+                arg_dict['tell_cache'] = self.tell_cache
 
     def save(self, outfile):
         """
@@ -2150,12 +2717,18 @@ class Telluric(object):
     def read_telluric_grid(self, wave_min=None, wave_max=None, pad=0):
         """
         Wrapper for utility function read_telluric_grid
+
         Args:
-            wave_min:
-            wave_max:
-            pad:
+            wave_min (float):
+               Minimum wavelength at which the grid is desired
+            wave_max (float):
+               Maximum wavelength at which the grid is desired.
+            pad (int):
+               Padding in pixels to be added to the grid boundaries. If None, the grid is padded by the number of
+               pixels needed to convolve the telluric model at the boundaries.
 
         Returns:
+            dict: Dictionary containing the telluric grid
 
         """
 
@@ -2216,3 +2789,27 @@ class Telluric(object):
 
         return srt_order_tell
 
+
+# Telluric object used by the worker processes of Telluric.run
+_telluric_worker = None
+
+
+def _init_telluric_worker(telluric):
+    """
+    Initialize a worker process used by :func:`Telluric.run`.
+
+    Args:
+        telluric (:class:`Telluric`):
+            The object performing the fits.
+    """
+    global _telluric_worker
+    _telluric_worker = telluric
+
+
+def _fit_telluric_order(iord):
+    """
+    Fit an order/slit in a worker process initialized by :func:`_init_telluric_worker`.
+
+    See :func:`Telluric.fit_order`.
+    """
+    return _telluric_worker.fit_order(iord)
@@ -789,7 +789,7 @@ def fit_tilts(trc_tilt_dict, thismask, slit_cen, spat_order=3, spec_order=4, max
     # msgs.info("RMS/FWHM: {}".format(rms_real/fwhm))
 
 
-def fit2tilts(shape, coeff2, func2d, spat_shift=None):
+def fit2tilts(shape, coeff2, func2d, spat_shift=None, pixels=None):
     """
     Evaluate the wavelength tilt model over the full image.
 
@@ -805,12 +805,18 @@ def fit2tilts(shape, coeff2, func2d, spat_shift=None):
         Spatial shift to be added to image pixels before evaluation
         If you are accounting for flexure, then you probably wish to
         input -1*flexure_shift into this parameter.
+    pixels : ndarray, int, optional
+        Flattened (row-major) indices of the image pixels at which to
+        evaluate the model; e.g., the pixels in a single slit provided
+        by :func:`pypeit.slittrace.SlitTraceSet.slit_pixels`.  If None,
+        the model is evaluated over the full image.
 
     Returns
     -------
     tilts: ndarray, float
         Image indicating how spectral pixel locations move across the
-        image. This output is used in the pipeline.
+        image. This output is used in the pipeline.  If ``pixels`` is
+        provided, this is a vector with the tilts at those pixels.
 
     """
     # Init
@@ -819,9 +825,13 @@ def fit2tilts(shape, coeff2, func2d, spat_shift=None):
     nspec, nspat = shape
     xnspecmin1 = float(nspec - 1)
     xnspatmin1 = float(nspat - 1)
-    spec_vec = np.arange(nspec)
-    spat_vec = np.arange(nspat) - _spat_shift
-    spat_img, spec_img = np.meshgrid(spat_vec, spec_vec)
+    if pixels is None:
+        spec_vec = np.arange(nspec)
+        spat_vec = np.arange(nspat) - _spat_shift
+        spat_img, spec_img = np.meshgrid(spat_vec, spec_vec)
+    else:
+        spec_img, spat_img = np.divmod(pixels, nspat)
+        spat_img = spat_img - _spat_shift
     #
     pypeitFit = fitting.PypeItFit(fitc=coeff2, minx=0.0, maxx=1.0,
                                   minx2=0.0, maxx2=1.0, func=func2d)
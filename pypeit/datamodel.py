@@ -475,6 +475,7 @@ from astropy.table import Table
 from pypeit import io
 from pypeit import masterframe
 from pypeit import msgs
+from pypeit import profiling
 
 class DataContainer:
     """
@@ -1367,8 +1368,9 @@ class DataContainer:
         hdr = masterframe.build_master_header(self, self.master_key, self.master_dir,
                                               steps=steps, raw_files=raw_files)
         # Finish
-        self.to_file(master_filename, primary_hdr=hdr,
-                     limit_hdus=self.output_to_disk, overwrite=True, **kwargs)
+        with profiling.profiler.step('io.write_master'):
+            self.to_file(master_filename, primary_hdr=hdr,
+                         limit_hdus=self.output_to_disk, overwrite=True, **kwargs)
 
     # TODO: Add options to compare the checksum and/or check the package versions
     @classmethod
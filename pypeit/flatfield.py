@@ -7,6 +7,10 @@ Implements the flat-field class.
 """
 import copy
 import inspect
+import threading
+from concurrent import futures
+from collections import OrderedDict
+
 import numpy as np
 
 from scipy import interpolate
@@ -79,11 +83,19 @@ class FlatImages(datamodel.DataContainer):
         # Setup the DataContainer
         datamodel.DataContainer.__init__(self, d=d)
 
+    # Maximum number of illumination images cached by fit2illumflat
+    illumflat_cache_size = 4
+    # Number of decimals kept in the flexure shift when caching the
+    # illumination images
+    flexure_decimals = 2
+
     def _init_internals(self):
         self.filename = None
         # Master stuff
         self.master_key = None
         self.master_dir = None
+        # Cache with the illumination images; see fit2illumflat
+        self._illumflat_cache = OrderedDict()
 
     def _validate(self):
         #
@@ -243,6 +255,16 @@ class FlatImages(datamodel.DataContainer):
 
     def fit2illumflat(self, slits, frametype='illum', initial=False, flexure_shift=None):
         """
+        Construct the illumination image from the spatial bspline fits.
+
+        The images are cached (keeping the :attr:`illumflat_cache_size`
+        most recently used ones), keyed by the checksum of the slit
+        traces (see :func:`pypeit.slittrace.SlitTraceSet.checksum`), the
+        frame type, ``initial``, and the flexure shift.  To allow the
+        cached images to be reused by frames with nearly identical
+        flexure, the shift is rounded to :attr:`flexure_decimals`
+        decimals before constructing the image.  The returned image is
+        read-only.
 
         Args:
             slits (:class:`pypeit.slittrace.SlitTraceSet`):
@@ -253,12 +275,28 @@ class FlatImages(datamodel.DataContainer):
             flexure_shift (float, optional):
 
         Returns:
-
+            `numpy.ndarray`_: The illumination image.
         """
+        if flexure_shift is not None:
+            flexure_shift = float(np.round(flexure_shift, self.flexure_decimals))
+            # Avoid separate entries for 0 and -0
+            flexure_shift += 0.
+        key = (slits.checksum(initial=initial, flexure=flexure_shift), frametype, initial,
+               flexure_shift)
+        if key in self._illumflat_cache:
+            self._illumflat_cache.move_to_end(key)
+            return self._illumflat_cache[key]
+
         illumflat = np.ones(self.shape())
+        _illumflat = illumflat.reshape(-1)
         # Load spatial bsplines
         spat_bsplines = self.get_spat_bsplines(frametype=frametype)
 
+        # Pixels in each unmasked slit and their spatial coordinate
+        pixels = slits.slit_pixels(initial=initial, flexure=flexure_shift)
+        left, right, _ = slits.select_edges(initial=initial, flexure=flexure_shift)
+        slitwidth = right - left
+
         # Loop
         for slit_idx in range(slits.nslits):
             # Skip masked
@@ -266,13 +304,14 @@ class FlatImages(datamodel.DataContainer):
                 continue
             # Skip those without a bspline
             # DO it
-            _slitid_img = slits.slit_img(slitidx=slit_idx, initial=initial, flexure=flexure_shift)
-            onslit = _slitid_img == slits.spat_id[slit_idx]
-            spat_coo = slits.spatial_coordinate_image(slitidx=slit_idx,
-                                                      initial=initial,
-                                                      slitid_img=_slitid_img,
-                                                      flexure_shift=flexure_shift)
-            illumflat[onslit] = spat_bsplines[slit_idx].value(spat_coo[onslit])[0]
+            indx = pixels[slits.spat_id[slit_idx]]
+            spec, spat = np.divmod(indx, slits.nspat)
+            spat_coo = (spat - left[spec,slit_idx])/slitwidth[spec,slit_idx]
+            _illumflat[indx] = spat_bsplines[slit_idx].value(spat_coo)[0]
+        illumflat.flags.writeable = False
+        self._illumflat_cache[key] = illumflat
+        if len(self._illumflat_cache) > self.illumflat_cache_size:
+            self._illumflat_cache.popitem(last=False)
         # TODO -- Update the internal one?  Or remove it altogether??
         return illumflat
 
@@ -668,25 +707,17 @@ class FlatField(object):
         self.mspixelflat = np.ones_like(rawflat)
         self.msillumflat = np.ones_like(rawflat)
         self.flat_model = np.zeros_like(rawflat)
-
-        # Allocate work arrays only once
-        spec_model = np.ones_like(rawflat)
-        norm_spec = np.ones_like(rawflat)
-        norm_spec_spat = np.ones_like(rawflat)
-        twod_model = np.ones_like(rawflat)
-        twod_gpm_out = np.ones_like(rawflat, dtype=np.bool)
+        twod_gpm_out = np.ones_like(rawflat, dtype=bool)
 
         # #################################################
-        # Model each slit independently
+        # Select the slits to model
+        gdslits = []
         for slit_idx, slit_spat in enumerate(self.slits.spat_id):
             # Is this a good slit??
             if self.slits.mask[slit_idx] != 0:
                 msgs.info('Skipping bad slit: {}'.format(slit_spat))
                 continue
 
-            msgs.info('Modeling the flat-field response for slit spat_id={}: {}/{}'.format(
-                        slit_spat, slit_idx+1, self.slits.nslits))
-
             # Find the pixels on the initial slit
             onslit_init = slitid_img_init == slit_spat
 
@@ -740,332 +771,48 @@ class FlatField(object):
             # TODO: Always calculate the optimized `npoly` and warn the
             #  user if npoly is provided but higher than the nominal
             #  calculation?
+            gdslits += [slit_idx]
+
+        # Model each slit independently.  The slits can be modeled by
+        # concurrent threads, unless the pixels rejected by the fit to
+        # one slit are propagated to the next (rej_sticky) or the fits
+        # are shown.  The models are assembled in the slit order, such
+        # that the result does not depend on the number of threads.
+        n_threads = 1 if debug or sticky \
+                        else min(self.flatpar['n_threads'], max(len(gdslits), 1))
+        # Work images are allocated only once per thread
+        work = threading.local()
+
+        def fit_slit(slit_idx):
+            if not hasattr(work, 'images'):
+                work.images = [np.ones_like(rawflat) for i in range(4)]
+            return self._fit_slit(slit_idx, rawflat, gpm, flat_log, gpm_log, ivar_log,
+                                  slitid_img_init, padded_slitid_img, trimmed_slitid_img,
+                                  median_slit_widths[slit_idx], npoly, work.images,
+                                  spat_illum_only=spat_illum_only, debug=debug)
+
+        if n_threads > 1:
+            msgs.info('Modeling the flat-field response of {0} slits using {1} threads'.format(
+                      len(gdslits), n_threads))
+            with futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+                models = list(executor.map(fit_slit, gdslits))
+        else:
+            models = map(fit_slit, gdslits)
 
-            # Create an image with the spatial coordinates relative to the left edge of this slit
-            spat_coo_init = self.slits.spatial_coordinate_image(slitidx=slit_idx, full=True, initial=True)
-
-            # Find pixels on the padded and trimmed slit coordinates
-            onslit_padded = padded_slitid_img == slit_spat
-            onslit_trimmed = trimmed_slitid_img == slit_spat
-
-            # ----------------------------------------------------------
-            # Collapse the slit spatially and fit the spectral function
-            # TODO: Put this stuff in a self.spectral_fit method?
-
-            # Create the tilts image for this slit
-            # TODO -- JFH Confirm the sign of this shift is correct!
-            _flexure = 0. if self.wavetilts.spat_flexure is None else self.wavetilts.spat_flexure
-            tilts = tracewave.fit2tilts(rawflat.shape, self.wavetilts['coeffs'][:,:,slit_idx],
-                                        self.wavetilts['func2d'], spat_shift=-1*_flexure)
-            # Convert the tilt image to an image with the spectral pixel index
-            spec_coo = tilts * (nspec-1)
-
-            # Only include the trimmed set of pixels in the flat-field
-            # fit along the spectral direction.
-            spec_gpm = onslit_trimmed & gpm_log  # & (rawflat < nonlinear_counts)
-            spec_nfit = np.sum(spec_gpm)
-            spec_ntot = np.sum(onslit_init)
-            msgs.info('Spectral fit of flatfield for {0}/{1} '.format(spec_nfit, spec_ntot)
-                      + ' pixels in the slit.')
-            # Set this to a parameter?
-            if spec_nfit/spec_ntot < 0.5:
-                # TODO: Shouldn't this raise an exception or continue to the next slit instead?
-                msgs.warn('Spectral fit includes only {:.1f}'.format(100*spec_nfit/spec_ntot)
-                          + '% of the pixels on this slit.' + msgs.newline()
-                          + '          Either the slit has many bad pixels or the number of '
-                            'trimmed pixels is too large.')
-
-            # Sort the pixels by their spectral coordinate.
-            # TODO: Include ivar and sorted gpm in outputs?
-            spec_gpm, spec_srt, spec_coo_data, spec_flat_data \
-                    = flat.sorted_flat_data(flat_log, spec_coo, gpm=spec_gpm)
-            # NOTE: By default np.argsort sorts the data over the last
-            # axis. Just to avoid the possibility (however unlikely) of
-            # spec_coo[spec_gpm] returning an array, all the arrays are
-            # explicitly flattened.
-            spec_ivar_data = ivar_log[spec_gpm].ravel()[spec_srt]
-            spec_gpm_data = gpm_log[spec_gpm].ravel()[spec_srt]
-
-            # Rejection threshold for spectral fit in log(image)
-            # TODO: Make this a parameter?
-            logrej = 0.5
-
-            # Fit the spectral direction of the blaze.
-            # TODO: Figure out how to deal with the fits going crazy at
-            #  the edges of the chip in spec direction
-            # TODO: Can we add defaults to bspline_profile so that we
-            #  don't have to instantiate invvar and profile_basis
-            try:
-                spec_bspl, spec_gpm_fit, spec_flat_fit, _, exit_status \
-                    = fitting.bspline_profile(spec_coo_data, spec_flat_data, spec_ivar_data,
-                                            np.ones_like(spec_coo_data), ingpm=spec_gpm_data,
-                                            nord=4, upper=logrej, lower=logrej,
-                                            kwargs_bspline={'bkspace': spec_samp_fine},
-                                            kwargs_reject={'groupbadpix': True, 'maxrej': 5})
-            except:
-                embed(header='808 of flatfield')
-
-            if exit_status > 1:
-                # TODO -- MAKE A FUNCTION
-                msgs.warn('Flat-field spectral response bspline fit failed!  Not flat-fielding '
-                          'slit {0} and continuing!'.format(slit_spat))
-                self.slits.mask[slit_idx] = self.slits.bitmask.turn_on(self.slits.mask[slit_idx], 'BADFLATCALIB')
+        for slit_idx, model in zip(gdslits, models):
+            if model is None:
+                # Fit failed and the slit has been masked
                 continue
-
-            # Debugging/checking spectral fit
-            if debug:
-                fitting.bspline_qa(spec_coo_data, spec_flat_data, spec_bspl, spec_gpm_fit,
-                                 spec_flat_fit, xlabel='Spectral Pixel', ylabel='log(flat counts)',
-                                 title='Spectral Fit for slit={:d}'.format(slit_spat))
-
-            if sticky:
-                # Add rejected pixels to gpm
-                gpm[spec_gpm] = (spec_gpm_fit & spec_gpm_data)[np.argsort(spec_srt)]
-
-            # Construct the model of the flat-field spectral shape
-            # including padding on either side of the slit.
-            spec_model[...] = 1.
-            spec_model[onslit_padded] = np.exp(spec_bspl.value(spec_coo[onslit_padded])[0])
-            # ----------------------------------------------------------
-
-            # ----------------------------------------------------------
-            # To fit the spatial response, first normalize out the
-            # spectral response, and then collapse the slit spectrally.
-
-            # Normalize out the spectral shape of the flat
-            norm_spec[...] = 1.
-            norm_spec[onslit_padded] = rawflat[onslit_padded] \
-                                            / np.fmax(spec_model[onslit_padded],1.0)
-
-            # Find pixels fot fit in the spatial direction:
-            #   - Fit pixels in the padded slit that haven't been masked
-            #     by the BPM
-            spat_gpm = onslit_padded & gpm #& (rawflat < nonlinear_counts)
-            #   - Fit pixels with non-zero flux and less than 70% above
-            #     the average spectral profile.
-            spat_gpm &= (norm_spec > 0.0) & (norm_spec < 1.7)
-            #   - Determine maximum counts in median filtered flat
-            #     spectrum model.
-            spec_interp = interpolate.interp1d(spec_coo_data, spec_flat_fit, kind='linear',
-                                               assume_sorted=True, bounds_error=False,
-                                               fill_value=-np.inf)
-            spec_sm = utils.fast_running_median(np.exp(spec_interp(np.arange(nspec))),
-                                                np.fmax(np.ceil(0.10*nspec).astype(int),10))
-            #   - Only fit pixels with at least values > 10% of this maximum and no less than 1.
-            spat_gpm &= (spec_model > 0.1*np.amax(spec_sm)) & (spec_model > 1.0)
-
-            # Report
-            spat_nfit = np.sum(spat_gpm)
-            spat_ntot = np.sum(onslit_padded)
-            msgs.info('Spatial fit of flatfield for {0}/{1} '.format(spat_nfit, spat_ntot)
-                      + ' pixels in the slit.')
-            if spat_nfit/spat_ntot < 0.5:
-                # TODO: Shouldn't this raise an exception or continue to the next slit instead?
-                msgs.warn('Spatial fit includes only {:.1f}'.format(100*spat_nfit/spat_ntot)
-                          + '% of the pixels on this slit.' + msgs.newline()
-                          + '          Either the slit has many bad pixels, the model of the '
-                          'spectral shape is poor, or the illumination profile is very irregular.')
-
-            # First fit -- With initial slits
-            exit_status, spat_coo_data,  spat_flat_data, spat_bspl, spat_gpm_fit, \
-                spat_flat_fit, spat_flat_data_raw \
-                        = self.spatial_fit(norm_spec, spat_coo_init, median_slit_widths[slit_idx],
-                                           spat_gpm, gpm, debug=debug)
-
-            if tweak_slits:
-                # TODO: Should the tweak be based on the bspline fit?
-                # TODO: Will this break if
-                left_thresh, left_shift, self.slits.left_tweak[:,slit_idx], right_thresh, \
-                    right_shift, self.slits.right_tweak[:,slit_idx] \
-                        = flat.tweak_slit_edges(self.slits.left_init[:,slit_idx],
-                                                self.slits.right_init[:,slit_idx],
-                                                spat_coo_data, spat_flat_data,
-                                                thresh=tweak_slits_thresh,
-                                                maxfrac=tweak_slits_maxfrac, debug=debug)
-                # TODO: Because the padding doesn't consider adjacent
-                #  slits, calling slit_img for individual slits can be
-                #  different from the result when you construct the
-                #  image for all slits. Fix this...
-
-                # Update the onslit mask
-                _slitid_img = self.slits.slit_img(slitidx=slit_idx, initial=False)
-                onslit_tweak = _slitid_img == slit_spat
-                spat_coo_tweak = self.slits.spatial_coordinate_image(slitidx=slit_idx,
-                                                               slitid_img=_slitid_img)
-
-                # Construct the empirical illumination profile
-                # TODO This is extremely inefficient, because we only need to re-fit the illumflat, but
-                #  spatial_fit does both the reconstruction of the illumination function and the bspline fitting.
-                #  Only the b-spline fitting needs be reddone with the new tweaked spatial coordinates, so that would
-                #  save a ton of runtime. It is not a trivial change becauase the coords are sorted, etc.
-                exit_status, spat_coo_data, spat_flat_data, spat_bspl, spat_gpm_fit, \
-                    spat_flat_fit, spat_flat_data_raw = self.spatial_fit(
-                    norm_spec, spat_coo_tweak, median_slit_widths[slit_idx], spat_gpm, gpm, debug=False)
-
-                spat_coo_final = spat_coo_tweak
-            else:
-                _slitid_img = slitid_img_init
-                spat_coo_final = spat_coo_init
-                onslit_tweak = onslit_init
-
-            # Add an approximate pixel axis at the top
-            if debug:
-                # TODO: Move this into a qa plot that gets saved
-                ax = fitting.bspline_qa(spat_coo_data, spat_flat_data, spat_bspl, spat_gpm_fit,
-                                      spat_flat_fit, show=False)
-                ax.scatter(spat_coo_data, spat_flat_data_raw, marker='.', s=1, zorder=0, color='k',
-                           label='raw data')
-                # Force the center of the slit to be at the center of the plot for the hline
-                ax.set_xlim(-0.1,1.1)
-                ax.axvline(0.0, color='lightgreen', linestyle=':', linewidth=2.0,
-                           label='original left edge', zorder=8)
-                ax.axvline(1.0, color='red', linestyle=':', linewidth=2.0,
-                           label='original right edge', zorder=8)
-                if tweak_slits and left_shift > 0:
-                    label = 'threshold = {:5.2f}'.format(tweak_slits_thresh) \
-                                + ' % of max of left illumprofile'
-                    ax.axhline(left_thresh, xmax=0.5, color='lightgreen', linewidth=3.0,
-                               label=label, zorder=10)
-                    ax.axvline(left_shift, color='lightgreen', linestyle='--', linewidth=3.0,
-                               label='tweaked left edge', zorder=11)
-                if tweak_slits and right_shift > 0:
-                    label = 'threshold = {:5.2f}'.format(tweak_slits_thresh) \
-                                + ' % of max of right illumprofile'
-                    ax.axhline(right_thresh, xmin=0.5, color='red', linewidth=3.0, label=label,
-                               zorder=10)
-                    ax.axvline(1-right_shift, color='red', linestyle='--', linewidth=3.0,
-                               label='tweaked right edge', zorder=20)
-                ax.legend()
-                ax.set_xlabel('Normalized Slit Position')
-                ax.set_ylabel('Normflat Spatial Profile')
-                ax.set_title('Illumination Function Fit for slit={:d}'.format(slit_spat))
-                plt.show()
-
-            # ----------------------------------------------------------
-            # Construct the illumination profile with the tweaked edges
-            # of the slit
-            if exit_status <= 1:
-                # TODO -- JFH -- Check this is ok for flexure!!
-                self.msillumflat[onslit_tweak] = spat_bspl.value(spat_coo_final[onslit_tweak])[0]
-                self.list_of_spat_bsplines[slit_idx] = spat_bspl
-                # No need to proceed further if we just need the illumination profile
-                if spat_illum_only:
-                    continue
-            else:
-                # Save the nada
-                msgs.warn('Slit illumination profile bspline fit failed!  Spatial profile not '
-                          'included in flat-field model for slit {0}!'.format(slit_spat))
-                self.slits.mask[slit_idx] = self.slits.bitmask.turn_on(self.slits.mask[slit_idx], 'BADFLATCALIB')
+            pixels, illumflat, spat_bspl, flat_model, pixelflat, twod_pixels, twod_gpm \
+                    = model
+            self.msillumflat.flat[pixels] = illumflat
+            self.list_of_spat_bsplines[slit_idx] = spat_bspl
+            if spat_illum_only:
                 continue
-
-            # ----------------------------------------------------------
-            # Fit the 2D residuals of the 1D spectral and spatial fits.
-            msgs.info('Performing 2D illumination + scattered light flat field fit')
-
-            # Construct the spectrally and spatially normalized flat
-            norm_spec_spat[...] = 1.
-            norm_spec_spat[onslit_tweak] = rawflat[onslit_tweak] / np.fmax(spec_model[onslit_tweak], 1.0) \
-                                                    / np.fmax(self.msillumflat[onslit_tweak], 0.01)
-
-            # Sort the pixels by their spectral coordinate. The mask
-            # uses the nominal padding defined by the slits object.
-            twod_gpm, twod_srt, twod_spec_coo_data, twod_flat_data \
-                    = flat.sorted_flat_data(norm_spec_spat, spec_coo, gpm=onslit_tweak)
-            # Also apply the sorting to the spatial coordinates
-            twod_spat_coo_data = spat_coo_final[twod_gpm].ravel()[twod_srt]
-            # TODO: Reset back to origin gpm if sticky is true?
-            twod_gpm_data = gpm[twod_gpm].ravel()[twod_srt]
-            # Only fit data with less than 30% variations
-            # TODO: Make 30% a parameter?
-            twod_gpm_data &= np.absolute(twod_flat_data - 1) < 0.3
-            # Here we ignore the formal photon counting errors and
-            # simply assume that a typical error per pixel. This guess
-            # is somewhat aribtrary. We then set the rejection
-            # threshold with sigrej_twod
-            # TODO: Make twod_sig and twod_sigrej parameters?
-            twod_sig = 0.01
-            twod_ivar_data = twod_gpm_data.astype(float)/(twod_sig**2)
-            twod_sigrej = 4.0
-
-            poly_basis = basis.fpoly(2.0*twod_spat_coo_data - 1.0, npoly)
-
-            # Perform the full 2d fit
-            twod_bspl, twod_gpm_fit, twod_flat_fit, _, exit_status \
-                    = fitting.bspline_profile(twod_spec_coo_data, twod_flat_data, twod_ivar_data,
-                                            poly_basis, ingpm=twod_gpm_data, nord=4,
-                                            upper=twod_sigrej, lower=twod_sigrej,
-                                            kwargs_bspline={'bkspace': spec_samp_coarse},
-                                            kwargs_reject={'groupbadpix': True, 'maxrej': 10})
-            if debug:
-                # TODO: Make a plot that shows the residuals in the 2D
-                # image
-                resid = twod_flat_data - twod_flat_fit
-                goodpix = twod_gpm_fit & twod_gpm_data
-                badpix = np.invert(twod_gpm_fit) & twod_gpm_data
-
-                plt.clf()
-                ax = plt.gca()
-                ax.plot(twod_spec_coo_data[goodpix], resid[goodpix], color='k', marker='o',
-                        markersize=0.2, mfc='k', fillstyle='full', linestyle='None',
-                        label='good points')
-                ax.plot(twod_spec_coo_data[badpix], resid[badpix], color='red', marker='+',
-                        markersize=0.5, mfc='red', fillstyle='full', linestyle='None',
-                        label='masked')
-                ax.axhline(twod_sigrej*twod_sig, color='lawngreen', linestyle='--',
-                           label='rejection thresholds', zorder=10, linewidth=2.0)
-                ax.axhline(-twod_sigrej*twod_sig, color='lawngreen', linestyle='--', zorder=10,
-                           linewidth=2.0)
-#                ax.set_ylim(-0.05, 0.05)
-                ax.legend()
-                ax.set_xlabel('Spectral Pixel')
-                ax.set_ylabel('Residuals from pixelflat 2-d fit')
-                ax.set_title('Spectral Residuals for slit={:d}'.format(slit_spat))
-                plt.show()
-
-                plt.clf()
-                ax = plt.gca()
-                ax.plot(twod_spat_coo_data[goodpix], resid[goodpix], color='k', marker='o',
-                        markersize=0.2, mfc='k', fillstyle='full', linestyle='None',
-                        label='good points')
-                ax.plot(twod_spat_coo_data[badpix], resid[badpix], color='red', marker='+',
-                        markersize=0.5, mfc='red', fillstyle='full', linestyle='None',
-                        label='masked')
-                ax.axhline(twod_sigrej*twod_sig, color='lawngreen', linestyle='--',
-                           label='rejection thresholds', zorder=10, linewidth=2.0)
-                ax.axhline(-twod_sigrej*twod_sig, color='lawngreen', linestyle='--', zorder=10,
-                           linewidth=2.0)
-#                ax.set_ylim((-0.05, 0.05))
-#                ax.set_xlim(-0.02, 1.02)
-                ax.legend()
-                ax.set_xlabel('Normalized Slit Position')
-                ax.set_ylabel('Residuals from pixelflat 2-d fit')
-                ax.set_title('Spatial Residuals for slit={:d}'.format(slit_spat))
-                plt.show()
-
-            # Save the 2D residual model
-            twod_model[...] = 1.
-            if exit_status > 1:
-                msgs.warn('Two-dimensional fit to flat-field data failed!  No higher order '
-                          'flat-field corrections included in model of slit {0}!'.format(slit_spat))
-            else:
-                twod_model[twod_gpm] = twod_flat_fit[np.argsort(twod_srt)]
-                twod_gpm_out[twod_gpm] = twod_gpm_fit[np.argsort(twod_srt)]
-
-
-            # Construct the full flat-field model
-            # TODO: Why is the 0.05 here for the illumflat compared to the 0.01 above?
-            self.flat_model[onslit_tweak] = twod_model[onslit_tweak] \
-                                        * np.fmax(self.msillumflat[onslit_tweak], 0.05) \
-                                        * np.fmax(spec_model[onslit_tweak], 1.0)
-
-            # Construct the pixel flat
-            #self.mspixelflat[onslit] = rawflat[onslit]/self.flat_model[onslit]
-            #self.mspixelflat[onslit_tweak] = 1.
-            #trimmed_slitid_img_anew = self.slits.slit_img(pad=-trim, slitidx=slit_idx)
-            #onslit_trimmed_anew = trimmed_slitid_img_anew == slit_spat
-            self.mspixelflat[onslit_tweak] = rawflat[onslit_tweak]/self.flat_model[onslit_tweak]
-            # TODO: Add some code here to treat the edges and places where fits
-            #  go bad?
+            if twod_pixels is not None:
+                twod_gpm_out.flat[twod_pixels] = twod_gpm
+            self.flat_model.flat[pixels] = flat_model
+            self.mspixelflat.flat[pixels] = pixelflat
 
         # No need to continue if we're just doing the spatial illumination
         if spat_illum_only:
@@ -1086,6 +833,410 @@ class FlatField(object):
         if self.flatpar['slit_illum_relative']:
             self.spec_illum = self.spectral_illumination(twod_gpm_out, debug=debug)
 
+    def _fit_slit(self, slit_idx, rawflat, gpm, flat_log, gpm_log, ivar_log, slitid_img_init,
+                  padded_slitid_img, trimmed_slitid_img, median_slit_width, npoly, work,
+                  spat_illum_only=False, debug=False):
+        """
+        Model the flat-field response of a single slit.
+
+        See :func:`fit` for a description of the algorithm.  The edges
+        of the slit (if tweaked) and its mask are updated in
+        :attr:`slits`, but the flat-field images are not.  Instead, the
+        model of the slit is returned, such that independent slits can
+        be modeled by concurrent threads.
+
+        Args:
+            slit_idx (:obj:`int`):
+                Index of the slit.
+            rawflat (`numpy.ndarray`_):
+                Raw flat-field image.
+            gpm (`numpy.ndarray`_):
+                Good-pixel mask for ``rawflat``.  If ``rej_sticky`` is
+                True in :attr:`flatpar`, the pixels rejected by the fits
+                are removed from the mask.
+            flat_log (`numpy.ndarray`_):
+                Log of the flat-field image.
+            gpm_log (`numpy.ndarray`_):
+                Good-pixel mask for ``flat_log``.
+            ivar_log (`numpy.ndarray`_):
+                Inverse variance of ``flat_log``.
+            slitid_img_init (`numpy.ndarray`_):
+                Slit ID image for the initial slit edges.
+            padded_slitid_img (`numpy.ndarray`_):
+                Slit ID image with the edges padded by
+                ``slit_illum_pad``.
+            trimmed_slitid_img (`numpy.ndarray`_):
+                Slit ID image with the edges trimmed by ``slit_trim``.
+            median_slit_width (:obj:`float`):
+                Median width of the slit in pixels.
+            npoly (:obj:`int`):
+                Order of the polynomial used in the 2D fit.
+            work (:obj:`list`):
+                Four work images with the same shape as ``rawflat``,
+                used for the spectral model, the spectrally normalized
+                flat, the spectrally and spatially normalized flat, and
+                the 2D model.  Their contents are overwritten.
+            spat_illum_only (:obj:`bool`, optional):
+                Only fit the spatial illumination profile.
+            debug (:obj:`bool`, optional):
+                Show plots of the fits.
+
+        Returns:
+            :obj:`tuple`: None if a fit failed and the slit has been
+            masked.  Otherwise, the flattened (row-major) indices of the
+            pixels on the (tweaked) slit, the illumination flat at those
+            pixels, the bspline fit to the spatial profile, the
+            flat-field model and pixel flat at those pixels, and the
+            flattened indices of the pixels included in the 2D fit with
+            the good-pixel mask resulting from the fit.  The last four
+            are None if ``spat_illum_only`` is True, and the last two
+            are None if the 2D fit failed.
+        """
+        # Set parameters (for convenience)
+        spec_samp_fine = self.flatpar['spec_samp_fine']
+        spec_samp_coarse = self.flatpar['spec_samp_coarse']
+        tweak_slits = self.flatpar['tweak_slits']
+        tweak_slits_thresh = self.flatpar['tweak_slits_thresh']
+        tweak_slits_maxfrac = self.flatpar['tweak_slits_maxfrac']
+        sticky = self.flatpar['rej_sticky']
+        nspec = rawflat.shape[0]
+        spec_model, norm_spec, norm_spec_spat, twod_model = work
+
+        slit_spat = self.slits.spat_id[slit_idx]
+        msgs.info('Modeling the flat-field response for slit spat_id={}: {}/{}'.format(
+                    slit_spat, slit_idx+1, self.slits.nslits))
+
+        # Find the pixels on the initial slit
+        onslit_init = slitid_img_init == slit_spat
+
+        # Create an image with the spatial coordinates relative to the left edge of this slit
+        spat_coo_init = self.slits.spatial_coordinate_image(slitidx=slit_idx, full=True, initial=True)
+
+        # Find pixels on the padded and trimmed slit coordinates
+        onslit_padded = padded_slitid_img == slit_spat
+        onslit_trimmed = trimmed_slitid_img == slit_spat
+
+        # ----------------------------------------------------------
+        # Collapse the slit spatially and fit the spectral function
+        # TODO: Put this stuff in a self.spectral_fit method?
+
+        # Create the tilts image for this slit
+        # TODO -- JFH Confirm the sign of this shift is correct!
+        _flexure = 0. if self.wavetilts.spat_flexure is None else self.wavetilts.spat_flexure
+        tilts = tracewave.fit2tilts(rawflat.shape, self.wavetilts['coeffs'][:,:,slit_idx],
+                                    self.wavetilts['func2d'], spat_shift=-1*_flexure)
+        # Convert the tilt image to an image with the spectral pixel index
+        spec_coo = tilts * (nspec-1)
+
+        # Only include the trimmed set of pixels in the flat-field
+        # fit along the spectral direction.
+        spec_gpm = onslit_trimmed & gpm_log  # & (rawflat < nonlinear_counts)
+        spec_nfit = np.sum(spec_gpm)
+        spec_ntot = np.sum(onslit_init)
+        msgs.info('Spectral fit of flatfield for {0}/{1} '.format(spec_nfit, spec_ntot)
+                  + ' pixels in the slit.')
+        # Set this to a parameter?
+        if spec_nfit/spec_ntot < 0.5:
+            # TODO: Shouldn't this raise an exception or continue to the next slit instead?
+            msgs.warn('Spectral fit includes only {:.1f}'.format(100*spec_nfit/spec_ntot)
+                      + '% of the pixels on this slit.' + msgs.newline()
+                      + '          Either the slit has many bad pixels or the number of '
+                        'trimmed pixels is too large.')
+
+        # Sort the pixels by their spectral coordinate.
+        # TODO: Include ivar and sorted gpm in outputs?
+        spec_gpm, spec_srt, spec_coo_data, spec_flat_data \
+                = flat.sorted_flat_data(flat_log, spec_coo, gpm=spec_gpm)
+        # NOTE: By default np.argsort sorts the data over the last
+        # axis. Just to avoid the possibility (however unlikely) of
+        # spec_coo[spec_gpm] returning an array, all the arrays are
+        # explicitly flattened.
+        spec_ivar_data = ivar_log[spec_gpm].ravel()[spec_srt]
+        spec_gpm_data = gpm_log[spec_gpm].ravel()[spec_srt]
+
+        # Rejection threshold for spectral fit in log(image)
+        # TODO: Make this a parameter?
+        logrej = 0.5
+
+        # Fit the spectral direction of the blaze.
+        # TODO: Figure out how to deal with the fits going crazy at
+        #  the edges of the chip in spec direction
+        # TODO: Can we add defaults to bspline_profile so that we
+        #  don't have to instantiate invvar and profile_basis
+        try:
+            spec_bspl, spec_gpm_fit, spec_flat_fit, _, exit_status \
+                = fitting.bspline_profile(spec_coo_data, spec_flat_data, spec_ivar_data,
+                                        np.ones_like(spec_coo_data), ingpm=spec_gpm_data,
+                                        nord=4, upper=logrej, lower=logrej,
+                                        kwargs_bspline={'bkspace': spec_samp_fine},
+                                        kwargs_reject={'groupbadpix': True, 'maxrej': 5})
+        except:
+            embed(header='808 of flatfield')
+
+        if exit_status > 1:
+            # TODO -- MAKE A FUNCTION
+            msgs.warn('Flat-field spectral response bspline fit failed!  Not flat-fielding '
+                      'slit {0} and continuing!'.format(slit_spat))
+            self.slits.mask[slit_idx] = self.slits.bitmask.turn_on(self.slits.mask[slit_idx], 'BADFLATCALIB')
+            return None
+
+        # Debugging/checking spectral fit
+        if debug:
+            fitting.bspline_qa(spec_coo_data, spec_flat_data, spec_bspl, spec_gpm_fit,
+                             spec_flat_fit, xlabel='Spectral Pixel', ylabel='log(flat counts)',
+                             title='Spectral Fit for slit={:d}'.format(slit_spat))
+
+        if sticky:
+            # Add rejected pixels to gpm
+            gpm[spec_gpm] = (spec_gpm_fit & spec_gpm_data)[np.argsort(spec_srt)]
+
+        # Construct the model of the flat-field spectral shape
+        # including padding on either side of the slit.
+        spec_model[...] = 1.
+        spec_model[onslit_padded] = np.exp(spec_bspl.value(spec_coo[onslit_padded])[0])
+        # ----------------------------------------------------------
+
+        # ----------------------------------------------------------
+        # To fit the spatial response, first normalize out the
+        # spectral response, and then collapse the slit spectrally.
+
+        # Normalize out the spectral shape of the flat
+        norm_spec[...] = 1.
+        norm_spec[onslit_padded] = rawflat[onslit_padded] \
+                                        / np.fmax(spec_model[onslit_padded],1.0)
+
+        # Find pixels fot fit in the spatial direction:
+        #   - Fit pixels in the padded slit that haven't been masked
+        #     by the BPM
+        spat_gpm = onslit_padded & gpm #& (rawflat < nonlinear_counts)
+        #   - Fit pixels with non-zero flux and less than 70% above
+        #     the average spectral profile.
+        spat_gpm &= (norm_spec > 0.0) & (norm_spec < 1.7)
+        #   - Determine maximum counts in median filtered flat
+        #     spectrum model.
+        spec_interp = interpolate.interp1d(spec_coo_data, spec_flat_fit, kind='linear',
+                                           assume_sorted=True, bounds_error=False,
+                                           fill_value=-np.inf)
+        spec_sm = utils.fast_running_median(np.exp(spec_interp(np.arange(nspec))),
+                                            np.fmax(np.ceil(0.10*nspec).astype(int),10))
+        #   - Only fit pixels with at least values > 10% of this maximum and no less than 1.
+        spat_gpm &= (spec_model > 0.1*np.amax(spec_sm)) & (spec_model > 1.0)
+
+        # Report
+        spat_nfit = np.sum(spat_gpm)
+        spat_ntot = np.sum(onslit_padded)
+        msgs.info('Spatial fit of flatfield for {0}/{1} '.format(spat_nfit, spat_ntot)
+                  + ' pixels in the slit.')
+        if spat_nfit/spat_ntot < 0.5:
+            # TODO: Shouldn't this raise an exception or continue to the next slit instead?
+            msgs.warn('Spatial fit includes only {:.1f}'.format(100*spat_nfit/spat_ntot)
+                      + '% of the pixels on this slit.' + msgs.newline()
+                      + '          Either the slit has many bad pixels, the model of the '
+                      'spectral shape is poor, or the illumination profile is very irregular.')
+
+        # First fit -- With initial slits
+        exit_status, spat_coo_data,  spat_flat_data, spat_bspl, spat_gpm_fit, \
+            spat_flat_fit, spat_flat_data_raw \
+                    = self.spatial_fit(norm_spec, spat_coo_init, median_slit_width,
+                                       spat_gpm, gpm, debug=debug)
+
+        if tweak_slits:
+            # TODO: Should the tweak be based on the bspline fit?
+            # TODO: Will this break if
+            left_thresh, left_shift, self.slits.left_tweak[:,slit_idx], right_thresh, \
+                right_shift, self.slits.right_tweak[:,slit_idx] \
+                    = flat.tweak_slit_edges(self.slits.left_init[:,slit_idx],
+                                            self.slits.right_init[:,slit_idx],
+                                            spat_coo_data, spat_flat_data,
+                                            thresh=tweak_slits_thresh,
+                                            maxfrac=tweak_slits_maxfrac, debug=debug)
+            # TODO: Because the padding doesn't consider adjacent
+            #  slits, calling slit_img for individual slits can be
+            #  different from the result when you construct the
+            #  image for all slits. Fix this...
+
+            # Update the onslit mask
+            _slitid_img = self.slits.slit_img(slitidx=slit_idx, initial=False)
+            onslit_tweak = _slitid_img == slit_spat
+            spat_coo_tweak = self.slits.spatial_coordinate_image(slitidx=slit_idx,
+                                                           slitid_img=_slitid_img)
+
+            # Construct the empirical illumination profile
+            # TODO This is extremely inefficient, because we only need to re-fit the illumflat, but
+            #  spatial_fit does both the reconstruction of the illumination function and the bspline fitting.
+            #  Only the b-spline fitting needs be reddone with the new tweaked spatial coordinates, so that would
+            #  save a ton of runtime. It is not a trivial change becauase the coords are sorted, etc.
+            exit_status, spat_coo_data, spat_flat_data, spat_bspl, spat_gpm_fit, \
+                spat_flat_fit, spat_flat_data_raw = self.spatial_fit(
+                norm_spec, spat_coo_tweak, median_slit_width, spat_gpm, gpm, debug=False)
+
+            spat_coo_final = spat_coo_tweak
+        else:
+            _slitid_img = slitid_img_init
+            spat_coo_final = spat_coo_init
+            onslit_tweak = onslit_init
+
+        # Add an approximate pixel axis at the top
+        if debug:
+            # TODO: Move this into a qa plot that gets saved
+            ax = fitting.bspline_qa(spat_coo_data, spat_flat_data, spat_bspl, spat_gpm_fit,
+                                  spat_flat_fit, show=False)
+            ax.scatter(spat_coo_data, spat_flat_data_raw, marker='.', s=1, zorder=0, color='k',
+                       label='raw data')
+            # Force the center of the slit to be at the center of the plot for the hline
+            ax.set_xlim(-0.1,1.1)
+            ax.axvline(0.0, color='lightgreen', linestyle=':', linewidth=2.0,
+                       label='original left edge', zorder=8)
+            ax.axvline(1.0, color='red', linestyle=':', linewidth=2.0,
+                       label='original right edge', zorder=8)
+            if tweak_slits and left_shift > 0:
+                label = 'threshold = {:5.2f}'.format(tweak_slits_thresh) \
+                            + ' % of max of left illumprofile'
+                ax.axhline(left_thresh, xmax=0.5, color='lightgreen', linewidth=3.0,
+                           label=label, zorder=10)
+                ax.axvline(left_shift, color='lightgreen', linestyle='--', linewidth=3.0,
+                           label='tweaked left edge', zorder=11)
+            if tweak_slits and right_shift > 0:
+                label = 'threshold = {:5.2f}'.format(tweak_slits_thresh) \
+                            + ' % of max of right illumprofile'
+                ax.axhline(right_thresh, xmin=0.5, color='red', linewidth=3.0, label=label,
+                           zorder=10)
+                ax.axvline(1-right_shift, color='red', linestyle='--', linewidth=3.0,
+                           label='tweaked right edge', zorder=20)
+            ax.legend()
+            ax.set_xlabel('Normalized Slit Position')
+            ax.set_ylabel('Normflat Spatial Profile')
+            ax.set_title('Illumination Function Fit for slit={:d}'.format(slit_spat))
+            plt.show()
+
+        # ----------------------------------------------------------
+        # Construct the illumination profile with the tweaked edges
+        # of the slit
+        if exit_status <= 1:
+            # TODO -- JFH -- Check this is ok for flexure!!
+            pixels = np.flatnonzero(onslit_tweak)
+            illumflat = spat_bspl.value(spat_coo_final.flat[pixels])[0]
+            # No need to proceed further if we just need the illumination profile
+            if spat_illum_only:
+                return pixels, illumflat, spat_bspl, None, None, None, None
+        else:
+            # Save the nada
+            msgs.warn('Slit illumination profile bspline fit failed!  Spatial profile not '
+                      'included in flat-field model for slit {0}!'.format(slit_spat))
+            self.slits.mask[slit_idx] = self.slits.bitmask.turn_on(self.slits.mask[slit_idx], 'BADFLATCALIB')
+            return None
+
+        # ----------------------------------------------------------
+        # Fit the 2D residuals of the 1D spectral and spatial fits.
+        msgs.info('Performing 2D illumination + scattered light flat field fit')
+
+        # Construct the spectrally and spatially normalized flat
+        norm_spec_spat[...] = 1.
+        norm_spec_spat.flat[pixels] = rawflat.flat[pixels] / np.fmax(spec_model.flat[pixels], 1.0) \
+                                                / np.fmax(illumflat, 0.01)
+
+        # Sort the pixels by their spectral coordinate. The mask
+        # uses the nominal padding defined by the slits object.
+        twod_gpm, twod_srt, twod_spec_coo_data, twod_flat_data \
+                = flat.sorted_flat_data(norm_spec_spat, spec_coo, gpm=onslit_tweak)
+        # Also apply the sorting to the spatial coordinates
+        twod_spat_coo_data = spat_coo_final[twod_gpm].ravel()[twod_srt]
+        # TODO: Reset back to origin gpm if sticky is true?
+        twod_gpm_data = gpm[twod_gpm].ravel()[twod_srt]
+        # Only fit data with less than 30% variations
+        # TODO: Make 30% a parameter?
+        twod_gpm_data &= np.absolute(twod_flat_data - 1) < 0.3
+        # Here we ignore the formal photon counting errors and
+        # simply assume that a typical error per pixel. This guess
+        # is somewhat aribtrary. We then set the rejection
+        # threshold with sigrej_twod
+        # TODO: Make twod_sig and twod_sigrej parameters?
+        twod_sig = 0.01
+        twod_ivar_data = twod_gpm_data.astype(float)/(twod_sig**2)
+        twod_sigrej = 4.0
+
+        poly_basis = basis.fpoly(2.0*twod_spat_coo_data - 1.0, npoly)
+
+        # Perform the full 2d fit
+        twod_bspl, twod_gpm_fit, twod_flat_fit, _, exit_status \
+                = fitting.bspline_profile(twod_spec_coo_data, twod_flat_data, twod_ivar_data,
+                                        poly_basis, ingpm=twod_gpm_data, nord=4,
+                                        upper=twod_sigrej, lower=twod_sigrej,
+                                        kwargs_bspline={'bkspace': spec_samp_coarse},
+                                        kwargs_reject={'groupbadpix': True, 'maxrej': 10})
+        if debug:
+            # TODO: Make a plot that shows the residuals in the 2D
+            # image
+            resid = twod_flat_data - twod_flat_fit
+            goodpix = twod_gpm_fit & twod_gpm_data
+            badpix = np.invert(twod_gpm_fit) & twod_gpm_data
+
+            plt.clf()
+            ax = plt.gca()
+            ax.plot(twod_spec_coo_data[goodpix], resid[goodpix], color='k', marker='o',
+                    markersize=0.2, mfc='k', fillstyle='full', linestyle='None',
+                    label='good points')
+            ax.plot(twod_spec_coo_data[badpix], resid[badpix], color='red', marker='+',
+                    markersize=0.5, mfc='red', fillstyle='full', linestyle='None',
+                    label='masked')
+            ax.axhline(twod_sigrej*twod_sig, color='lawngreen', linestyle='--',
+                       label='rejection thresholds', zorder=10, linewidth=2.0)
+            ax.axhline(-twod_sigrej*twod_sig, color='lawngreen', linestyle='--', zorder=10,
+                       linewidth=2.0)
+#                ax.set_ylim(-0.05, 0.05)
+            ax.legend()
+            ax.set_xlabel('Spectral Pixel')
+            ax.set_ylabel('Residuals from pixelflat 2-d fit')
+            ax.set_title('Spectral Residuals for slit={:d}'.format(slit_spat))
+            plt.show()
+
+            plt.clf()
+            ax = plt.gca()
+            ax.plot(twod_spat_coo_data[goodpix], resid[goodpix], color='k', marker='o',
+                    markersize=0.2, mfc='k', fillstyle='full', linestyle='None',
+                    label='good points')
+            ax.plot(twod_spat_coo_data[badpix], resid[badpix], color='red', marker='+',
+                    markersize=0.5, mfc='red', fillstyle='full', linestyle='None',
+                    label='masked')
+            ax.axhline(twod_sigrej*twod_sig, color='lawngreen', linestyle='--',
+                       label='rejection thresholds', zorder=10, linewidth=2.0)
+            ax.axhline(-twod_sigrej*twod_sig, color='lawngreen', linestyle='--', zorder=10,
+                       linewidth=2.0)
+#                ax.set_ylim((-0.05, 0.05))
+#                ax.set_xlim(-0.02, 1.02)
+            ax.legend()
+            ax.set_xlabel('Normalized Slit Position')
+            ax.set_ylabel('Residuals from pixelflat 2-d fit')
+            ax.set_title('Spatial Residuals for slit={:d}'.format(slit_spat))
+            plt.show()
+
+        # Save the 2D residual model
+        twod_model[...] = 1.
+        twod_pixels = twod_gpm_out = None
+        if exit_status > 1:
+            msgs.warn('Two-dimensional fit to flat-field data failed!  No higher order '
+                      'flat-field corrections included in model of slit {0}!'.format(slit_spat))
+        else:
+            twod_model[twod_gpm] = twod_flat_fit[np.argsort(twod_srt)]
+            twod_pixels = np.flatnonzero(twod_gpm)
+            twod_gpm_out = twod_gpm_fit[np.argsort(twod_srt)]
+
+
+        # Construct the full flat-field model
+        # TODO: Why is the 0.05 here for the illumflat compared to the 0.01 above?
+        flat_model = twod_model.flat[pixels] * np.fmax(illumflat, 0.05) \
+                        * np.fmax(spec_model.flat[pixels], 1.0)
+
+        # Construct the pixel flat
+        #self.mspixelflat[onslit] = rawflat[onslit]/self.flat_model[onslit]
+        #self.mspixelflat[onslit_tweak] = 1.
+        #trimmed_slitid_img_anew = self.slits.slit_img(pad=-trim, slitidx=slit_idx)
+        #onslit_trimmed_anew = trimmed_slitid_img_anew == slit_spat
+        pixelflat = rawflat.flat[pixels]/flat_model
+        # TODO: Add some code here to treat the edges and places where fits
+        #  go bad?
+        return pixels, illumflat, spat_bspl, flat_model, pixelflat, twod_pixels, twod_gpm_out
+
     def spatial_fit(self, norm_spec, spat_coo, median_slit_width, spat_gpm, gpm, debug=False):
         """
         Perform the spatial fit
@@ -7,10 +7,15 @@
 import inspect
 
 import os
+import collections
+import itertools
+import tempfile
+from concurrent import futures
 import numpy as np
 
 
 from pypeit import msgs
+from pypeit import profiling
 
 from pypeit.core import combine
 from pypeit.par import pypeitpar
@@ -41,6 +46,12 @@ class CombineImage:
             defaults.
 
     """
+    combine_bytes_per_pixel = 100
+    """
+    Approximate number of bytes used for each pixel in the image stack
+    when combining a block of rows.
+    """
+
     def __init__(self, spectrograph, det, par, files):
 
         # Required parameters
@@ -88,87 +99,108 @@ class CombineImage:
         # Loop on the files
         nimages = len(self.files)
         lampstat = []
-        for kk, ifile in enumerate(self.files):
-            # Load raw image
-            rawImage = rawimage.RawImage(ifile, self.spectrograph, self.det)
-            # Process
-            pypeitImage = rawImage.process(self.par, bias=bias, bpm=bpm, dark=dark,
-                                           flatimages=flatimages, slits=slits)
-            #embed(header='96 of combineimage')
-            # Are we all done?
-            if nimages == 1:
-                return pypeitImage
-            elif kk == 0:
-                # Get ready
-                shape = (nimages, pypeitImage.image.shape[0], pypeitImage.image.shape[1])
-                img_stack = np.zeros(shape)
-                ivar_stack= np.zeros(shape)
-                rn2img_stack = np.zeros(shape)
-                crmask_stack = np.zeros(shape, dtype=bool)
-                # Mask
-                bitmask = imagebitmask.ImageBitMask()
-                mask_stack = np.zeros(shape, bitmask.minimum_dtype(asuint=True))
-            # Grab the lamp status
-            lampstat += [self.spectrograph.get_lamps_status(pypeitImage.rawheadlist)]
-            # Process
-            img_stack[kk,:,:] = pypeitImage.image
-            # Construct raw variance image and turn into inverse variance
-            if pypeitImage.ivar is not None:
-                ivar_stack[kk, :, :] = pypeitImage.ivar
-            else:
-                ivar_stack[kk, :, :] = 1.
-            # Mask cosmic rays
-            if pypeitImage.crmask is not None:
-                crmask_stack[kk, :, :] = pypeitImage.crmask
-            # Read noise squared image
-            if pypeitImage.rn2img is not None:
-                rn2img_stack[kk, :, :] = pypeitImage.rn2img
-            # Final mask for this image
-            # TODO This seems kludgy to me. Why not just pass ignore_saturation to process_one and ignore the saturation
-            # when the mask is actually built, rather than untoggling the bit here
-            if ignore_saturation:  # Important for calibrations as we don't want replacement by 0
-                indx = pypeitImage.bitmask.flagged(pypeitImage.fullmask, flag=['SATURATION'])
-                pypeitImage.fullmask[indx] = pypeitImage.bitmask.turn_off(
-                    pypeitImage.fullmask[indx], 'SATURATION')
-            mask_stack[kk, :, :] = pypeitImage.fullmask
-
-        # Check that the lamps being combined are all the same:
-        if not lampstat[1:] == lampstat[:-1]:
-            msgs.warn("The following files contain different lamp status")
-            # Get the longest strings
-            maxlen = max([len("Filename")]+[len(os.path.split(x)[1]) for x in self.files])
-            maxlmp = max([len("Lamp status")]+[len(x) for x in lampstat])
-            strout = "{0:" + str(maxlen) + "}  {1:s}"
-            # Print the messages
-            print(msgs.indent() + '-'*maxlen + "  " + '-'*maxlmp)
-            print(msgs.indent() + strout.format("Filename", "Lamp status"))
-            print(msgs.indent() + '-'*maxlen + "  " + '-'*maxlmp)
-            for ff, file in enumerate(self.files):
-                print(msgs.indent() + strout.format(os.path.split(file)[1], " ".join(lampstat[ff].split("_"))))
-            print(msgs.indent() + '-'*maxlen + "  " + '-'*maxlmp)
-
-        # Coadd them
-        weights = np.ones(nimages)/float(nimages)
-        img_list = [img_stack]
-        var_stack = utils.inverse(ivar_stack)
-        var_list = [var_stack, rn2img_stack]
-        if combine_method == 'weightmean':
-            img_list_out, var_list_out, gpm, nused = combine.weighted_combine(
-                weights, img_list, var_list, (mask_stack == 0),
-                sigma_clip=sigma_clip, sigma_clip_stack=img_stack, sigrej=sigrej, maxiters=maxiters)
-        elif combine_method == 'median':
-            img_list_out = [np.median(img_stack, axis=0)]
-            var_list_out = [np.median(var_stack, axis=0)]
-            var_list_out += [np.median(rn2img_stack, axis=0)]
-            gpm = np.ones_like(img_list_out[0], dtype='bool')
-        else:
-            msgs.error("Bad choice for combine.  Allowed options are 'median', 'weightmean'.")
+        # Temporary directory used to hold the image stacks on disk
+        tmpdir = None
+        try:
+            for kk, pypeitImage in enumerate(self.process_files(bias=bias, bpm=bpm, dark=dark,
+                                                                flatimages=flatimages,
+                                                                slits=slits)):
+                #embed(header='96 of combineimage')
+                # Are we all done?
+                if nimages == 1:
+                    return pypeitImage
+                elif kk == 0:
+                    # Get ready
+                    shape = (nimages, pypeitImage.image.shape[0], pypeitImage.image.shape[1])
+                    bitmask = imagebitmask.ImageBitMask()
+                    mask_dtype = bitmask.minimum_dtype(asuint=True)
+                    # Keep the stacks on disk if they would exceed the
+                    # memory budget
+                    nrows = self.combine_nrows(shape, np.dtype(mask_dtype).itemsize)
+                    if nrows < shape[1]:
+                        tmpdir = tempfile.TemporaryDirectory(prefix='pypeit_combine_')
+                        msgs.info('Combining images in blocks of {0} rows using '.format(nrows)
+                                  + 'image stacks stored in {0}'.format(tmpdir.name))
+                    img_stack = self.empty_stack(shape, float, tmpdir, 'img')
+                    ivar_stack = self.empty_stack(shape, float, tmpdir, 'ivar')
+                    rn2img_stack = self.empty_stack(shape, float, tmpdir, 'rn2img')
+                    # Mask
+                    mask_stack = self.empty_stack(shape, mask_dtype, tmpdir, 'mask')
+                # Grab the lamp status
+                lampstat += [self.spectrograph.get_lamps_status(pypeitImage.rawheadlist)]
+                # Process
+                img_stack[kk,:,:] = pypeitImage.image
+                # Construct raw variance image and turn into inverse variance
+                if pypeitImage.ivar is not None:
+                    ivar_stack[kk, :, :] = pypeitImage.ivar
+                else:
+                    ivar_stack[kk, :, :] = 1.
+                # Read noise squared image
+                if pypeitImage.rn2img is not None:
+                    rn2img_stack[kk, :, :] = pypeitImage.rn2img
+                # Final mask for this image.  NOTE: Any cosmic rays are
+                # included in the full mask.
+                # TODO This seems kludgy to me. Why not just pass ignore_saturation to process_one and ignore the saturation
+                # when the mask is actually built, rather than untoggling the bit here
+                if ignore_saturation:  # Important for calibrations as we don't want replacement by 0
+                    indx = pypeitImage.bitmask.flagged(pypeitImage.fullmask, flag=['SATURATION'])
+                    pypeitImage.fullmask[indx] = pypeitImage.bitmask.turn_off(
+                        pypeitImage.fullmask[indx], 'SATURATION')
+                mask_stack[kk, :, :] = pypeitImage.fullmask
+
+            # Check that the lamps being combined are all the same:
+            if not lampstat[1:] == lampstat[:-1]:
+                msgs.warn("The following files contain different lamp status")
+                # Get the longest strings
+                maxlen = max([len("Filename")]+[len(os.path.split(x)[1]) for x in self.files])
+                maxlmp = max([len("Lamp status")]+[len(x) for x in lampstat])
+                strout = "{0:" + str(maxlen) + "}  {1:s}"
+                # Print the messages
+                print(msgs.indent() + '-'*maxlen + "  " + '-'*maxlmp)
+                print(msgs.indent() + strout.format("Filename", "Lamp status"))
+                print(msgs.indent() + '-'*maxlen + "  " + '-'*maxlmp)
+                for ff, file in enumerate(self.files):
+                    print(msgs.indent() + strout.format(os.path.split(file)[1], " ".join(lampstat[ff].split("_"))))
+                print(msgs.indent() + '-'*maxlen + "  " + '-'*maxlmp)
+
+            # Coadd them, one block of rows at a time.  All the
+            # operations are independent for each pixel, so the result
+            # does not depend on the size of the blocks.
+            weights = np.ones(nimages)/float(nimages)
+            img_out = np.zeros(shape[1:], dtype=float)
+            var_out = np.zeros(shape[1:], dtype=float)
+            rn2img_out = np.zeros(shape[1:], dtype=float)
+            gpm = np.ones(shape[1:], dtype=bool)
+            for r0 in range(0, shape[1], nrows):
+                rows = slice(r0, r0+nrows)
+                _img_stack = np.asarray(img_stack[:,rows,:])
+                var_stack = utils.inverse(np.asarray(ivar_stack[:,rows,:]))
+                _rn2img_stack = np.asarray(rn2img_stack[:,rows,:])
+                if combine_method == 'weightmean':
+                    img_list_out, var_list_out, gpm[rows,:], nused = combine.weighted_combine(
+                        weights, [_img_stack], [var_stack, _rn2img_stack],
+                        (np.asarray(mask_stack[:,rows,:]) == 0), sigma_clip=sigma_clip,
+                        sigma_clip_stack=_img_stack, sigrej=sigrej, maxiters=maxiters)
+                elif combine_method == 'median':
+                    img_list_out = [np.median(_img_stack, axis=0)]
+                    var_list_out = [np.median(var_stack, axis=0)]
+                    var_list_out += [np.median(_rn2img_stack, axis=0)]
+                else:
+                    msgs.error("Bad choice for combine.  Allowed options are 'median', 'weightmean'.")
+                img_out[rows,:] = img_list_out[0]
+                var_out[rows,:] = var_list_out[0]
+                rn2img_out[rows,:] = var_list_out[1]
+        finally:
+            if tmpdir is not None:
+                # Release the memory maps before removing the files
+                img_stack = ivar_stack = rn2img_stack = mask_stack = None
+                tmpdir.cleanup()
 
         # Build the last one
-        final_pypeitImage = pypeitimage.PypeItImage(img_list_out[0],
-                                                    ivar=utils.inverse(var_list_out[0]),
+        final_pypeitImage = pypeitimage.PypeItImage(img_out,
+                                                    ivar=utils.inverse(var_out),
                                                     bpm=pypeitImage.bpm,
-                                                    rn2img=var_list_out[1],
+                                                    rn2img=rn2img_out,
                                                     crmask=np.logical_not(gpm),
                                                     detector=pypeitImage.detector,
                                                     PYP_SPEC=pypeitImage.PYP_SPEC)
@@ -182,6 +214,113 @@ class CombineImage:
         # Return
         return final_pypeitImage
 
+    def process_files(self, bias=None, bpm=None, dark=None, flatimages=None, slits=None):
+        """
+        Load and process each raw file.
+
+        If ``n_workers`` in :attr:`par` is larger than 1, the files are
+        processed concurrently by a pool of worker processes.  The
+        calibration images are sent to each worker only once, and at most
+        twice as many files as there are workers are processed ahead of
+        the one being consumed.  The profiling records of the workers
+        (see :mod:`pypeit.profiling`) are added to those of the calling
+        process.
+
+        Args:
+            bias (:class:`pypeit.images.buildimage.BiasImage`, optional): Bias image
+            bpm (`numpy.ndarray`_, optional): Bad pixel mask
+            dark (:class:`pypeit.images.buildimage.DarkImage`, optional): Dark image
+            flatimages (:class:`pypeit.flatfield.FlatImages`, optional):  For flat fielding
+            slits (:class:`pypeit.slittrace.SlitTraceSet`, optional): Slit object
+
+        Yields:
+            :class:`pypeit.images.pypeitimage.PypeItImage`: The
+            processed image for each file, in the order of
+            :attr:`files`.
+        """
+        calibs = dict(bias=bias, bpm=bpm, dark=dark, flatimages=flatimages, slits=slits)
+        n_workers = min(self.par['n_workers'], self.nfiles)
+        if n_workers == 1:
+            for ifile in self.files:
+                yield _process_file(ifile, self.spectrograph, self.det, self.par, calibs)
+            return
+
+        msgs.info('Processing {0} files using {1} worker processes'.format(self.nfiles,
+                                                                          n_workers))
+        # Steps executed by the workers inherit the profiling context
+        # of the step in progress
+        context = profiling.profiler.context()
+        with futures.ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                                         initargs=(self.spectrograph, self.det, self.par,
+                                                   calibs, profiling.profiler.enabled,
+                                                   context)) as executor:
+            files = iter(self.files)
+            jobs = collections.deque([executor.submit(_process_worker_file, ifile)
+                                        for ifile in itertools.islice(files, 2*n_workers)])
+            while len(jobs) > 0:
+                pypeitImage, records = jobs.popleft().result()
+                profiling.profiler.add_records(records)
+                # Keep the pool busy
+                ifile = next(files, None)
+                if ifile is not None:
+                    jobs.append(executor.submit(_process_worker_file, ifile))
+                yield pypeitImage
+
+    def combine_nrows(self, shape, mask_itemsize):
+        """
+        Determine the number of image rows to combine at once given the
+        memory budget, ``comb_maxmem``, in :attr:`par`.
+
+        Args:
+            shape (:obj:`tuple`):
+                Shape of the image stacks, (nimages, nspec, nspat).
+            mask_itemsize (:obj:`int`):
+                Number of bytes per mask pixel.
+
+        Returns:
+            :obj:`int`: The number of rows to combine at once.  If all
+            rows fit in the memory budget, this is the number of rows in
+            the image and the image stacks are kept in memory.
+        """
+        if self.par['comb_maxmem'] is None:
+            return shape[1]
+        # The image, inverse variance, and read-noise stacks, and the
+        # mask
+        stack_bytes = np.prod(shape)*(3*np.dtype(float).itemsize + mask_itemsize)
+        maxmem = self.par['comb_maxmem']*1e9
+        if stack_bytes <= maxmem:
+            return shape[1]
+        # Number of bytes used per pixel in the stack for each block of
+        # rows; accounts for the temporary arrays used by
+        # combine.weighted_combine
+        nrows = int(maxmem / (self.combine_bytes_per_pixel * shape[0] * shape[2]))
+        return min(max(nrows, 1), shape[1])
+
+    @staticmethod
+    def empty_stack(shape, dtype, tmpdir, name):
+        """
+        Allocate an empty image stack.
+
+        Args:
+            shape (:obj:`tuple`):
+                Shape of the stack.
+            dtype (:obj:`type`):
+                Data type of the stack.
+            tmpdir (`tempfile.TemporaryDirectory`_):
+                If None, the stack is kept in memory.  Otherwise, it is
+                memory-mapped to a file in this directory.
+            name (:obj:`str`):
+                Root name of the memory-mapped file.
+
+        Returns:
+            `numpy.ndarray`_, `numpy.memmap`_: The zero-filled image
+            stack.
+        """
+        if tmpdir is None:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(os.path.join(tmpdir.name, '{0}.dat'.format(name)), dtype=dtype,
+                         mode='w+', shape=shape)
+
     @property
     def nfiles(self):
         """
@@ -193,3 +332,77 @@ class CombineImage:
         """
         return len(self.files) if isinstance(self.files, (np.ndarray, list)) else 0
 
+
+def _process_file(ifile, spectrograph, det, par, calibs):
+    """
+    Load and process a single raw file.
+
+    Args:
+        ifile (:obj:`str`):
+            Raw file to process.
+        spectrograph (:class:`pypeit.spectrographs.spectrograph.Spectrograph`):
+            Spectrograph used to take the data.
+        det (:obj:`int`):
+            The 1-indexed detector number to process.
+        par (:class:`pypeit.par.pypeitpar.ProcessImagesPar`):
+            Parameters that dictate the processing of the images.
+        calibs (:obj:`dict`):
+            Calibrations passed as keyword arguments to
+            :func:`pypeit.images.rawimage.RawImage.process`.
+
+    Returns:
+        :class:`pypeit.images.pypeitimage.PypeItImage`: The processed
+        image.
+    """
+    # Load raw image
+    rawImage = rawimage.RawImage(ifile, spectrograph, det)
+    # Process
+    return rawImage.process(par, **calibs)
+
+
+# Processing setup for the worker processes used by
+# CombineImage.process_files
+_worker_setup = None
+
+
+def _init_worker(spectrograph, det, par, calibs, profile, context):
+    """
+    Initialize a worker process used by
+    :func:`CombineImage.process_files`.
+
+    See :func:`_process_file` for the first four arguments.
+
+    Args:
+        profile (:obj:`bool`):
+            Profile the processing steps; see :mod:`pypeit.profiling`.
+        context (:obj:`dict`):
+            Profiling context of the step in progress in the calling
+            process; see :func:`pypeit.profiling.Profiler.context`.
+    """
+    global _worker_setup
+    # Discard any records inherited from the parent process
+    profiling.profiler.pop_records()
+    profiling.profiler.enable(profile)
+    _worker_setup = (spectrograph, det, par, calibs, context)
+
+
+def _process_worker_file(ifile):
+    """
+    Process a raw file in a worker process initialized by
+    :func:`_init_worker`.
+
+    Args:
+        ifile (:obj:`str`):
+            Raw file to process.
+
+    Returns:
+        :obj:`tuple`: The processed
+        :class:`pypeit.images.pypeitimage.PypeItImage` and the list of
+        profiling records (see :mod:`pypeit.profiling`).
+    """
+    spectrograph, det, par, calibs, context = _worker_setup
+    pypeitImage = _process_file(ifile, spectrograph, det, par, calibs)
+    records = profiling.profiler.pop_records()
+    for record in records:
+        record.update({k: v for k, v in context.items() if record[k] is None})
+    return pypeitImage, records
@@ -202,7 +202,8 @@ class PypeItImage(datamodel.DataContainer):
                                        remove_compact_obj=par['rmcompact'],
                                        sigclip=par['sigclip'],
                                        sigfrac=par['sigfrac'],
-                                       objlim=par['objlim'])
+                                       objlim=par['objlim'],
+                                       n_threads=par['lathreads'])
         # Return
         return self.crmask.copy()
 
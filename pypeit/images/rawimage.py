@@ -4,12 +4,14 @@
 .. include:: ../include/links.rst
 """
 
+import os
 import inspect
 from copy import deepcopy
 import numpy as np
 from astropy import stats
 
 from pypeit import msgs
+from pypeit import profiling
 from pypeit.core import procimg
 from pypeit.core import flat
 from pypeit.core import flexure
@@ -30,6 +32,8 @@ class RawImage(object):
 
     Attributes:
         rawimage (`numpy.ndarray`_):
+            The raw image as read from the file, in its original data
+            type.  It should not be modified in place.
         steps (dict):
             Dict describing the steps performed on the image
         datasec_img (`numpy.ndarray`_):
@@ -38,7 +42,6 @@ class RawImage(object):
             orientation and trimming.
         spat_flexure_shift (float):
             Holds the spatial flexure shift, if calculated
-        image (`numpy.ndarray`_):
     """
     def __init__(self, ifile, spectrograph, det):
 
@@ -49,17 +52,23 @@ class RawImage(object):
 
         # Load
         # Load the raw image and the other items of interest
-        self.detector, self.rawimage, self.hdu, self.exptime, self.rawdatasec_img, \
-            self.oscansec_img = self.spectrograph.get_rawimage(self.filename, self.det)
+        with profiling.profiler.step('io.read_raw', frame=os.path.basename(self.filename)):
+            self.detector, self.rawimage, self.hdu, self.exptime, self.rawdatasec_img, \
+                self.oscansec_img = self.spectrograph.get_rawimage(self.filename, self.det)
 
         # Grab items from rawImage (for convenience and for processing)
         #   Could just keep rawImage in the object, if preferred
         self.headarr = deepcopy(self.spectrograph.get_headarr(self.hdu))
 
-        # Key attributes
-        self.rawimage = self.rawimage.copy()
-        self.image = self.rawimage.copy()
-        self.datasec_img = self.rawdatasec_img.copy()
+        # Key attributes.  The raw image is kept as read (possibly
+        # memory-mapped and in the data type of the file); the floating
+        # point image is only constructed when first used (see
+        # :attr:`image`).
+        self._image = None
+        self.datasec_img = self.rawdatasec_img
+        # Trimmed and oriented data section image; only set while the
+        # image is trimmed but not yet oriented
+        self._oriented_datasec_img = None
         self.ronoise = self.detector['ronoise']
 
         # Attributes
@@ -80,6 +89,26 @@ class RawImage(object):
                           flatten=False,
                           )
 
+    @property
+    def image(self):
+        """
+        The image being processed.
+
+        On first access, this is a double-precision copy of the raw
+        image; this defers reading memory-mapped data and promoting the
+        raw data type until a processing step needs it.
+
+        Returns:
+            `numpy.ndarray`_: The current image.
+        """
+        if self._image is None:
+            self._image = self.rawimage.astype(float)
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        self._image = image
+
     @property
     def bpm(self):
         """
@@ -206,29 +235,39 @@ class RawImage(object):
         """
         self.par = par
         self._bpm = bpm
+        # Each processing stage is profiled separately
+        profile = profiling.profiler.step
 
         # Get started
         # Standard order
         #   -- May need to allow for other order some day..
         if par['use_pattern']:  # Note, this step *must* be done before use_overscan
-            self.subtract_pattern()
+            with profile('process.subtract_pattern'):
+                self.subtract_pattern()
         if par['use_overscan']:
-            self.subtract_overscan()
+            with profile('process.subtract_overscan'):
+                self.subtract_overscan()
         if par['trim']:
-            self.trim()
+            with profile('process.trim'):
+                self.trim()
         if par['orient']:
-            self.orient()
+            with profile('process.orient'):
+                self.orient()
         if par['use_biasimage']:  # Bias frame, if it exists, is *not* trimmed nor oriented
-            self.subtract_bias(bias)
+            with profile('process.subtract_bias'):
+                self.subtract_bias(bias)
         if par['use_darkimage']:  # Dark frame, if it exists, is TODO:: check: trimmed, oriented (and oscan/bias subtracted?)
-            self.subtract_dark(dark)
+            with profile('process.subtract_dark'):
+                self.subtract_dark(dark)
         if par['apply_gain']:
-            self.apply_gain()
+            with profile('process.apply_gain'):
+                self.apply_gain()
 
         # This needs to come after trim, orient
         # Calculate flexure -- May not be used, but always calculated when slits are provided
         if slits is not None and self.par['spat_flexure_correct']:
-            self.spat_flexure_shift = flexure.spat_flexure_shift(self.image, slits)
+            with profile('process.spat_flexure'):
+                self.spat_flexure_shift = flexure.spat_flexure_shift(self.image, slits)
 
         # Generate the illumination flat, as needed
         illum_flat = None
@@ -237,7 +276,8 @@ class RawImage(object):
                 msgs.error("Cannot illumflatten, no such image generated. Add one or more illumflat images to your PypeIt file!!")
             if slits is None:
                 msgs.error("Need to provide slits to create illumination flat")
-            illum_flat = flatimages.fit2illumflat(slits, flexure_shift=self.spat_flexure_shift)
+            with profile('process.illumflat'):
+                illum_flat = flatimages.fit2illumflat(slits, flexure_shift=self.spat_flexure_shift)
             if debug:
                 left, right = slits.select_edges(flexure=self.spat_flexure_shift)
                 viewer, ch = display.show_image(illum_flat, chname='illum_flat')
@@ -260,14 +300,17 @@ class RawImage(object):
             if flatimages is None or flatimages.get_pixelflat() is None:
                 msgs.error("Flat fielding desired but not generated/provided.")
             else:
-                self.flatten(flatimages.get_pixelflat()/spec_illum, illum_flat=illum_flat, bpm=self.bpm)
+                with profile('process.flatten'):
+                    self.flatten(flatimages.get_pixelflat()/spec_illum, illum_flat=illum_flat,
+                                 bpm=self.bpm)
 
         # Fresh BPM
         bpm = self.spectrograph.bpm(self.filename, self.det, shape=self.image.shape)
 
         # Extras
-        self.build_rn2img()
-        self.build_ivar()
+        with profile('process.build_ivar'):
+            self.build_rn2img()
+            self.build_ivar()
 
         # Generate a PypeItImage
         pypeitImage = pypeitimage.PypeItImage(self.image, ivar=self.ivar, rn2img=self.rn2img,
@@ -279,12 +322,14 @@ class RawImage(object):
 
         # Mask(s)
         if par['mask_cr']:
-            pypeitImage.build_crmask(self.par)
+            with profile('process.crmask'):
+                pypeitImage.build_crmask(self.par)
         #
         nonlinear_counts = self.spectrograph.nonlinear_counts(self.detector,
                                                               apply_gain=self.par['apply_gain'])
         # Build
-        pypeitImage.build_mask(saturation=nonlinear_counts)
+        with profile('process.build_mask'):
+            pypeitImage.build_mask(saturation=nonlinear_counts)
 
         # Return
         return pypeitImage
@@ -339,7 +384,10 @@ class RawImage(object):
             return self.image.copy()
         # Orient me
         self.image = self.spectrograph.orient_image(self.detector, self.image)#, self.det)
-        self.datasec_img = self.spectrograph.orient_image(self.detector, self.datasec_img)#, self.det)
+        self.datasec_img = self.spectrograph.orient_image(self.detector, self.datasec_img) \
+                                if self._oriented_datasec_img is None \
+                                else self._oriented_datasec_img
+        self._oriented_datasec_img = None
         #
         self.steps[step] = True
 
@@ -450,8 +498,16 @@ class RawImage(object):
             msgs.warn("Image was already trimmed.  Returning current image")
             return self.image
         # Do it
-        self.image = procimg.trim_frame(self.image, self.datasec_img < 1)
-        self.datasec_img = procimg.trim_frame(self.datasec_img, self.datasec_img < 1)
+        if self.datasec_img is self.rawdatasec_img:
+            # The image has not been oriented, so use the (cached) maps
+            # for the raw data section
+            rows, cols, self._oriented_datasec_img \
+                    = self.spectrograph.get_trim_orient_maps(self.detector, self.rawdatasec_img)
+            self.image = self.image[np.ix_(rows, cols)]
+            self.datasec_img = self.rawdatasec_img[np.ix_(rows, cols)]
+        else:
+            self.image = procimg.trim_frame(self.image, self.datasec_img < 1)
+            self.datasec_img = procimg.trim_frame(self.datasec_img, self.datasec_img < 1)
         #
         self.steps[step] = True
 
@@ -0,0 +1,301 @@
+"""
+Share a processed image and its companion calibration images with worker
+processes without copying them.
+
+The images are placed in `multiprocessing.shared_memory`_ blocks by a
+:class:`SharedImageStore` in the parent process.  Its
+:attr:`SharedImageStore.handle` is a small, picklable object that is
+passed to the workers, which use it to attach to the blocks and obtain
+numpy arrays (and a :class:`~pypeit.images.pypeitimage.PypeItImage`)
+backed by the shared memory; nothing but the names and shapes of the
+blocks are pickled.  For example::
+
+    with SharedImageStore(sciImg, tilts=tilts, waveimg=waveimg,
+                          slitmask=slitmask) as store:
+        with futures.ProcessPoolExecutor(max_workers=4) as executor:
+            jobs = [executor.submit(worker, store.handle, slit) for slit in slits]
+            ...
+
+    def worker(handle, slit):
+        with handle.attach() as shared:
+            sciImg = shared.sciImg
+            tilts = shared['tilts']
+            ...
+
+The store owns the blocks and releases them when closed; the workers
+only detach from them.  The shared arrays are read-only in the workers.
+
+.. include common links, assuming primary doc root is up one directory
+.. include:: ../include/links.rst
+"""
+import inspect
+
+import numpy as np
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8
+    shared_memory = None
+
+from IPython import embed
+
+from pypeit import msgs
+from pypeit.images import pypeitimage
+
+
+def _shared_memory(**kwargs):
+    """
+    Create or attach to a `multiprocessing.shared_memory`_ block.
+
+    Blocks attached to by a worker should not be tracked by the
+    multiprocessing resource tracker, which would otherwise release them
+    when the worker exits.  This is only possible for python >= 3.13;
+    for earlier versions the blocks are tracked.
+    """
+    if shared_memory is None:
+        msgs.error('Sharing images between processes requires python 3.8 or later.')
+    if 'create' not in kwargs \
+            and 'track' in inspect.signature(shared_memory.SharedMemory).parameters:
+        kwargs['track'] = False
+    return shared_memory.SharedMemory(**kwargs)
+
+
+class SharedArray:
+    """
+    Picklable handle to a numpy array held by a shared-memory block.
+
+    Args:
+        name (:obj:`str`):
+            Name of the shared-memory block.
+        shape (:obj:`tuple`):
+            Shape of the array.
+        dtype (`numpy.dtype`_):
+            Data type of the array.
+    """
+    def __init__(self, name, shape, dtype):
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    def __repr__(self):
+        return '<{0}: name={1}, shape={2}, dtype={3}>'.format(self.__class__.__name__,
+                                                              self.name, self.shape, self.dtype)
+
+    @classmethod
+    def create(cls, arr):
+        """
+        Copy an array into a new shared-memory block.
+
+        Args:
+            arr (`numpy.ndarray`_):
+                Array to share.
+
+        Returns:
+            :obj:`tuple`: The :class:`SharedArray` handle and the
+            `multiprocessing.shared_memory`_ block, which must be kept
+            by the caller and released when no longer needed.
+        """
+        _arr = np.asarray(arr)
+        # Blocks cannot be empty
+        shm = _shared_memory(create=True, size=max(_arr.nbytes, 1))
+        shared = np.ndarray(_arr.shape, dtype=_arr.dtype, buffer=shm.buf)
+        shared[...] = _arr
+        return cls(shm.name, _arr.shape, _arr.dtype), shm
+
+    def attach(self, readonly=True):
+        """
+        Attach to the shared-memory block.
+
+        Args:
+            readonly (:obj:`bool`, optional):
+                Return a read-only array.
+
+        Returns:
+            :obj:`tuple`: The `multiprocessing.shared_memory`_ block,
+            which must be kept open as long as the array is used, and
+            the array backed by the block.
+        """
+        shm = _shared_memory(name=self.name)
+        arr = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+        if readonly:
+            arr.flags.writeable = False
+        return shm, arr
+
+
+class SharedImages:
+    """
+    The images attached to by a worker process.
+
+    Instantiated by :func:`SharedImageHandle.attach`.  The companion
+    images are accessed by name (e.g., ``shared['tilts']``).
+
+    Args:
+        handle (:class:`SharedImageHandle`):
+            Handle to the shared images.
+        readonly (:obj:`bool`, optional):
+            Attach to read-only arrays.
+
+    Attributes:
+        sciImg (:class:`~pypeit.images.pypeitimage.PypeItImage`):
+            The image with its arrays backed by the shared memory.  None
+            if the store was created without an image.
+        images (:obj:`dict`):
+            The companion images, backed by the shared memory.
+    """
+    def __init__(self, handle, readonly=True):
+        self._blocks = []
+        arrays = {}
+        for key, shared in handle.arrays.items():
+            shm, arrays[key] = shared.attach(readonly=readonly)
+            self._blocks += [shm]
+
+        self.sciImg = None
+        if handle.image_type is not None:
+            _d = dict(handle.image_items)
+            _d.update({k: arrays['image:' + k] for k in handle.image_arrays})
+            self.sciImg = handle.image_type(**_d)
+        self.images = {k: arrays[k] for k in handle.images}
+
+    def __getitem__(self, item):
+        return self.images[item]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Detach from the shared-memory blocks.
+
+        The arrays must not be used after detaching.
+        """
+        self.sciImg = None
+        self.images = {}
+        for shm in self._blocks:
+            shm.close()
+        self._blocks = []
+
+
+class SharedImageHandle:
+    """
+    Picklable handle to the images in a :class:`SharedImageStore`.
+
+    Attributes:
+        arrays (:obj:`dict`):
+            The :class:`SharedArray` handles for all shared arrays.
+        image_type (:obj:`type`):
+            The class of the shared image; None if no image is shared.
+        image_arrays (:obj:`list`):
+            The array data model items of the image.  Their keys in
+            :attr:`arrays` are prefixed by ``image:``.
+        image_items (:obj:`dict`):
+            The other (non-array) data model items of the image, which
+            are pickled with the handle.
+        images (:obj:`list`):
+            The keys in :attr:`arrays` with the companion images.
+    """
+    def __init__(self):
+        self.arrays = {}
+        self.image_type = None
+        self.image_arrays = []
+        self.image_items = {}
+        self.images = []
+
+    def attach(self, readonly=True):
+        """
+        Attach to the shared images.
+
+        Args:
+            readonly (:obj:`bool`, optional):
+                Attach to read-only arrays.
+
+        Returns:
+            :class:`SharedImages`: The attached images.
+        """
+        return SharedImages(self, readonly=readonly)
+
+
+class SharedImageStore:
+    """
+    Place an image and its companion calibration images in shared memory.
+
+    The store owns the shared-memory blocks.  They are released by
+    :func:`close`, when exiting the context manager, or when the object
+    is deleted, whichever comes first.
+
+    Args:
+        sciImg (:class:`~pypeit.images.pypeitimage.PypeItImage`, optional):
+            The image to share.  All its array data model items are
+            placed in shared memory.  Internals (e.g., the headers) are
+            not shared.
+        **images:
+            Companion images to share (e.g., ``tilts``, ``waveimg``,
+            ``slitmask``), keyed by name.  None values are ignored.
+
+    Attributes:
+        handle (:class:`SharedImageHandle`):
+            The handle to pass to the worker processes.
+    """
+    def __init__(self, sciImg=None, **images):
+        self._blocks = []
+        self.handle = SharedImageHandle()
+        try:
+            if sciImg is not None:
+                if not isinstance(sciImg, pypeitimage.PypeItImage):
+                    msgs.error('Can only share PypeItImage objects.')
+                self.handle.image_type = type(sciImg)
+                for key in sciImg.datamodel.keys():
+                    if sciImg[key] is None:
+                        continue
+                    if isinstance(sciImg[key], np.ndarray):
+                        self._add('image:' + key, sciImg[key])
+                        self.handle.image_arrays += [key]
+                    else:
+                        self.handle.image_items[key] = sciImg[key]
+            for key, img in images.items():
+                if img is None:
+                    continue
+                self._add(key, img)
+                self.handle.images += [key]
+        except:
+            self.close()
+            raise
+
+    def _add(self, key, arr):
+        """
+        Place an array in a new shared-memory block.
+        """
+        self.handle.arrays[key], shm = SharedArray.create(arr)
+        self._blocks += [shm]
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes in shared memory.
+        """
+        return int(np.sum([shm.size for shm in self._blocks]))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Release all the shared-memory blocks.
+
+        Workers can no longer attach to the images after the store is
+        closed.
+        """
+        for shm in self._blocks:
+            shm.close()
+            shm.unlink()
+        self._blocks = []
+
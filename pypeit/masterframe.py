@@ -6,6 +6,9 @@ Implements the master frame base class.
 
 """
 import os
+import time
+import json
+import socket
 from IPython import embed
 from abc import ABCMeta
 
@@ -41,6 +44,224 @@ def construct_file_name(master_obj, master_key, master_dir=None):
     return filename
 
 
+class MasterFrameLock(object):
+    """
+    Context manager that provides exclusive access to a set of master
+    frame files.
+
+    A lock file (the master frame file name with an additional ``.lock``
+    extension) is created for each master frame file on entry and
+    removed on exit.  The lock file records the host name and process ID
+    of its owner.  If a lock file already exists, the lock is held by
+    another process, and we wait for it to be released.  A lock left
+    behind by a process that was killed on the same host (i.e., whose
+    process ID no longer exists) is stale and is taken over.  Stale
+    locks from other hosts cannot be detected, such that we only wait
+    for a finite time before faulting.
+
+    Args:
+        filenames (:obj:`str`, :obj:`list`):
+            One or more master frame file names.
+        poll (:obj:`float`, optional):
+            Number of seconds to wait before checking again if a lock
+            has been released.
+        timeout (:obj:`float`, optional):
+            Maximum number of seconds to wait for each lock.  If None,
+            wait indefinitely.
+    """
+    def __init__(self, filenames, poll=1., timeout=7200.):
+        self.filenames = sorted(set([filenames] if isinstance(filenames, str) else filenames))
+        self.poll = poll
+        self.timeout = timeout
+        self.locks = []
+
+    def acquire(self, filename):
+        """
+        Create the lock file for a single master frame.
+
+        Args:
+            filename (:obj:`str`):
+                Name of the master frame file.
+        """
+        lockfile = filename + '.lock'
+        tstart = time.time()
+        waiting = False
+        while True:
+            try:
+                fd = os.open(lockfile, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if self.take_stale(lockfile):
+                    continue
+                if self.timeout is not None and time.time() - tstart > self.timeout:
+                    msgs.error('Timed out waiting for {0}.  If no other process is building '
+                               'this master frame, remove the lock file.'.format(lockfile))
+                if not waiting:
+                    msgs.info('Waiting for another process to release {0}'.format(lockfile))
+                    waiting = True
+                time.sleep(self.poll)
+                continue
+            os.write(fd, self.owner().encode())
+            os.close(fd)
+            self.locks += [lockfile]
+            return
+
+    @staticmethod
+    def owner():
+        """
+        Identify the owner of the locks created by this process.
+
+        Returns:
+            :obj:`str`: The host name and process ID, separated by a
+            space.
+        """
+        return '{0} {1}'.format(socket.gethostname(), os.getpid())
+
+    @staticmethod
+    def take_stale(lockfile):
+        """
+        Remove a lock file if its owner was a process on this host that
+        no longer exists.
+
+        Args:
+            lockfile (:obj:`str`):
+                Name of the lock file.
+
+        Returns:
+            :obj:`bool`: True if the lock was stale and has been
+            removed, False if the lock may still be held.
+        """
+        try:
+            with open(lockfile) as f:
+                owner = f.read()
+        except FileNotFoundError:
+            # Released in the meantime
+            return True
+        try:
+            host, pid = owner.split()
+            pid = int(pid)
+        except ValueError:
+            # Lock file still being written by its owner
+            return False
+        if host != socket.gethostname():
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            pass
+        except OSError:
+            # Process exists, but belongs to another user
+            return False
+        else:
+            return False
+        msgs.warn('Removing stale lock {0} left by process {1}, which no longer '
+                  'exists.'.format(lockfile, pid))
+        try:
+            # Only remove the lock if it has not been taken over by another
+            # process in the meantime
+            with open(lockfile) as f:
+                if f.read() == owner:
+                    os.remove(lockfile)
+        except FileNotFoundError:
+            pass
+        return True
+
+    def release(self):
+        """
+        Remove all the lock files held by this object.
+        """
+        for lockfile in self.locks:
+            if os.path.isfile(lockfile):
+                os.remove(lockfile)
+        self.locks = []
+
+    def __enter__(self):
+        try:
+            for filename in self.filenames:
+                self.acquire(filename)
+        except:
+            self.release()
+            raise
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+class MasterManifest(object):
+    """
+    Manifest of the master frames in a master directory.
+
+    The manifest is a JSON file in the master directory that provides,
+    for each master frame file, the checksum of the inputs used to build
+    it (see :func:`pypeit.calibrations.Calibrations.step_checksum`).  A
+    master frame whose recorded checksum differs from the checksum of
+    the current inputs is stale and must be rebuilt.
+
+    The manifest is re-read each time it is queried and is locked while
+    it is updated, such that it can be shared by concurrent processes.
+
+    Args:
+        master_dir (:obj:`str`):
+            Path to the master frame folder.
+    """
+
+    file_name = 'MasterManifest.json'
+    """
+    Name of the manifest file in the master directory.
+    """
+
+    def __init__(self, master_dir):
+        self.master_dir = master_dir
+        self.filename = os.path.join(master_dir, self.file_name)
+
+    def read(self):
+        """
+        Read the manifest.
+
+        Returns:
+            :obj:`dict`: The checksums keyed by the name of each master
+            frame file (without the path).  Empty if the manifest does
+            not exist.
+        """
+        if not os.path.isfile(self.filename):
+            return {}
+        with open(self.filename, 'r') as f:
+            return json.load(f)
+
+    def checksum(self, master_file):
+        """
+        Return the recorded checksum of a master frame.
+
+        Args:
+            master_file (:obj:`str`):
+                Name of the master frame file.  Only the base name is
+                used.
+
+        Returns:
+            :obj:`str`: The checksum; None if the file is not in the
+            manifest.
+        """
+        return self.read().get(os.path.basename(master_file))
+
+    def update(self, checksums):
+        """
+        Record the checksums of one or more master frames.
+
+        Args:
+            checksums (:obj:`dict`):
+                The checksums keyed by the master frame file names.
+        """
+        with MasterFrameLock(self.filename):
+            manifest = self.read()
+            manifest.update({os.path.basename(f): c for f, c in checksums.items()})
+            # Write to a temporary file first so that the manifest is
+            # never read when it is only partially written
+            tmp = self.filename + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(manifest, f, indent=1, sort_keys=True)
+            os.replace(tmp, self.filename)
+
+
 def grab_key_mdir(inp, from_filename=False):
     """
     Grab master_key and master_dir by parsing a filename or inspecting a header
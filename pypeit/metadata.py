@@ -7,7 +7,9 @@ Provides a class that handles the fits metadata required by PypeIt.
 import os
 import io
 import string
+import json
 from copy import deepcopy
+from concurrent import futures
 
 import numpy as np
 import yaml
@@ -166,36 +168,77 @@ class PypeItMetaData:
         data['directory'] = ['None']*len(_files)
         data['filename'] = ['None']*len(_files)
 
-        # Build the table
-        for idx, ifile in enumerate(_files):
-            # User data (for frame type)
-            if usrdata is None:
-                usr_row = None
-            else:
-                # TODO: This check should be done elsewhere
-                # Check
-                if os.path.basename(ifile) != usrdata['filename'][idx]:
-                    msgs.error('File name list does not match user-provided metadata table.  See '
-                               'usrdata argument of instantiation of PypeItMetaData.')
-                usr_row = usrdata[idx]
-
-            # Add the directory and file name to the table
-            data['directory'][idx], data['filename'][idx] = os.path.split(ifile)
-
-            # Read the fits headers
-            headarr = self.spectrograph.get_headarr(ifile, strict=strict)
-
-            # Grab Meta
-            for meta_key in self.spectrograph.meta.keys():
-                value = self.spectrograph.get_meta_value(headarr, meta_key, required=strict,
-                                                         usr_row=usr_row, ignore_bad_header
-                                                            =self.par['rdx']['ignore_bad_headers'])
-                if isinstance(value, str) and '#' in value:
-                    value = value.replace('#', '')
-                    msgs.warn('Removing troublesome # character from {0}.  Returning {1}.'.format(
-                              meta_key, value))
-                data[meta_key].append(value)
-            msgs.info('Added metadata for {0}'.format(os.path.split(ifile)[1]))
+        # Get the metadata of previously read files from the cache.  The
+        # cache is not used with user-provided data because the frame
+        # types in usrdata change how missing metadata are treated.
+        cache = None if self.par['rdx']['meta_cache'] is None or usrdata is not None \
+                    else MetaDataCache(self.par['rdx']['meta_cache'], self.spectrograph,
+                                       strict=strict,
+                                       ignore_bad_headers=self.par['rdx']['ignore_bad_headers'])
+        if self.par['rdx']['meta_cache'] is not None and usrdata is not None:
+            msgs.info('Metadata cache is not used with user-provided metadata.')
+        cached = [None]*len(_files) if cache is None else [cache.get(f) for f in _files]
+        if cache is not None:
+            msgs.info('Found cached metadata for {0} of {1} files.'.format(
+                      len(_files) - cached.count(None), len(_files)))
+
+        # Read the headers of all other files, in order.  Threads are
+        # used because reading the headers is dominated by I/O.
+        to_read = [f for f, c in zip(_files, cached) if c is None]
+        nthreads = min(self.par['rdx']['header_threads'], len(to_read))
+        executor = futures.ThreadPoolExecutor(max_workers=nthreads) if nthreads > 1 else None
+        try:
+            headarrs = map(lambda f: self.spectrograph.get_headarr(f, strict=strict), to_read) \
+                            if executor is None \
+                            else executor.map(lambda f: self.spectrograph.get_headarr(
+                                                            f, strict=strict), to_read)
+
+            # Build the table
+            for idx, ifile in enumerate(_files):
+                # User data (for frame type)
+                if usrdata is None:
+                    usr_row = None
+                else:
+                    # TODO: This check should be done elsewhere
+                    # Check
+                    if os.path.basename(ifile) != usrdata['filename'][idx]:
+                        msgs.error('File name list does not match user-provided metadata '
+                                   'table.  See usrdata argument of instantiation of '
+                                   'PypeItMetaData.')
+                    usr_row = usrdata[idx]
+
+                # Add the directory and file name to the table
+                data['directory'][idx], data['filename'][idx] = os.path.split(ifile)
+
+                if cached[idx] is not None:
+                    for meta_key in self.spectrograph.meta.keys():
+                        data[meta_key].append(cached[idx][meta_key])
+                    continue
+
+                # Get the fits headers
+                headarr = next(headarrs)
+
+                # Grab Meta
+                file_meta = {}
+                for meta_key in self.spectrograph.meta.keys():
+                    value = self.spectrograph.get_meta_value(headarr, meta_key, required=strict,
+                                                             usr_row=usr_row, ignore_bad_header
+                                                                =self.par['rdx']['ignore_bad_headers'])
+                    if isinstance(value, str) and '#' in value:
+                        value = value.replace('#', '')
+                        msgs.warn('Removing troublesome # character from {0}.  Returning '
+                                  '{1}.'.format(meta_key, value))
+                    data[meta_key].append(value)
+                    file_meta[meta_key] = value
+                if cache is not None:
+                    cache.set(ifile, file_meta)
+                msgs.info('Added metadata for {0}'.format(os.path.split(ifile)[1]))
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True)
+
+        if cache is not None:
+            cache.write()
 
         # JFH Changed the below to not crash if some files have None in
         # their MJD. This is the desired behavior since if there are
@@ -1697,6 +1740,134 @@ class PypeItMetaData:
         return self.calib_bitmask.flagged_bits(self['calibbit'][row])
 
 
+class MetaDataCache:
+    """
+    Persistent cache of the metadata read from the headers of raw files.
+
+    The cache is a json file with the metadata of each file, as returned
+    by :func:`pypeit.spectrographs.spectrograph.Spectrograph.get_meta_value`,
+    organized by spectrograph.  Each file is identified by its absolute
+    path, size, and modification time; the cached metadata of a file is
+    ignored if the file has changed since it was cached, if the metadata
+    keys of the spectrograph have changed, or if it was read with
+    different ``strict`` or ``ignore_bad_headers`` settings.
+
+    Metadata with missing (None) values are never cached so that any
+    associated warnings or errors are issued every time the file is
+    read.
+
+    Args:
+        ofile (:obj:`str`):
+            Name of the cache file.  Created when first written, if it
+            does not exist.
+        spectrograph (:class:`pypeit.spectrographs.spectrograph.Spectrograph`):
+            The spectrograph used to collect the data.
+        strict (:obj:`bool`, optional):
+            The ``strict`` setting used to read the headers; see
+            :func:`PypeItMetaData._build`.
+        ignore_bad_headers (:obj:`bool`, optional):
+            The ``ignore_bad_headers`` setting used to read the
+            metadata; see
+            :func:`pypeit.spectrographs.spectrograph.Spectrograph.get_meta_value`.
+
+    Attributes:
+        entries (:obj:`dict`):
+            The cached metadata for all files of :attr:`spectrograph`,
+            keyed by absolute file path.
+    """
+    def __init__(self, ofile, spectrograph, strict=True, ignore_bad_headers=False):
+        self.ofile = ofile
+        self.spectrograph = spectrograph
+        self.meta_keys = list(self.spectrograph.meta.keys())
+        self.read_par = [bool(strict), bool(ignore_bad_headers)]
+        self.modified = False
+
+        self.db = {}
+        if os.path.isfile(self.ofile):
+            try:
+                with open(self.ofile, 'r') as f:
+                    self.db = json.load(f)
+            except (ValueError, OSError):
+                msgs.warn('Could not read metadata cache {0}; it will be rebuilt.'.format(
+                          self.ofile))
+                self.db = {}
+        self.entries = self.db.setdefault(self.spectrograph.name, {})
+
+    @staticmethod
+    def file_id(ifile):
+        """
+        Return the absolute path, size, and modification time of a file.
+        """
+        stat = os.stat(ifile)
+        return os.path.abspath(ifile), stat.st_size, stat.st_mtime
+
+    def get(self, ifile):
+        """
+        Return the cached metadata for a file.
+
+        Args:
+            ifile (:obj:`str`):
+                Name of the file.
+
+        Returns:
+            :obj:`dict`: The metadata of the file, or None if the file
+            is not in the cache or has changed since it was cached.
+        """
+        try:
+            path, size, mtime = self.file_id(ifile)
+        except OSError:
+            return None
+        entry = self.entries.get(path)
+        if entry is None or entry['size'] != size or entry['mtime'] != mtime \
+                or entry.get('read_par') != self.read_par \
+                or list(entry['meta'].keys()) != self.meta_keys:
+            return None
+        return entry['meta']
+
+    def set(self, ifile, file_meta):
+        """
+        Add the metadata of a file to the cache.
+
+        The file is not cached if any of its metadata is None or cannot
+        be written to a json file.
+
+        Args:
+            ifile (:obj:`str`):
+                Name of the file.
+            file_meta (:obj:`dict`):
+                The metadata of the file, keyed by the metadata keys of
+                :attr:`spectrograph`.
+        """
+        _meta = {}
+        for key, value in file_meta.items():
+            if isinstance(value, np.generic):
+                value = value.item()
+            if not isinstance(value, (str, bool, int, float)):
+                return
+            _meta[key] = value
+        try:
+            path, size, mtime = self.file_id(ifile)
+        except OSError:
+            return
+        self.entries[path] = dict(size=size, mtime=mtime, read_par=self.read_par, meta=_meta)
+        self.modified = True
+
+    def write(self):
+        """
+        Write the cache to disk, if it has been modified.
+        """
+        if not self.modified:
+            return
+        # Write to a temporary file first so that an interrupted write
+        # does not corrupt the cache
+        tmp = '{0}.{1}.tmp'.format(self.ofile, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self.db, f)
+        os.replace(tmp, self.ofile)
+        self.modified = False
+        msgs.info('Metadata cache written to {0}'.format(self.ofile))
+
+
 # TODO: Is there a reason why this is not an attribute of
 # PypeItMetaData?
 def row_match_config(row, config, spectrograph):
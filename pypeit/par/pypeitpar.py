@@ -183,8 +183,8 @@ class ProcessImagesPar(ParSet):
                  overscan_method=None, overscan_par=None,
                  combine=None, satpix=None,
                  mask_cr=None, clip=None,
-                 cr_sigrej=None, n_lohi=None, replace=None, lamaxiter=None, grow=None,
-                 comb_sigrej=None,
+                 cr_sigrej=None, n_lohi=None, replace=None, lamaxiter=None, lathreads=None,
+                 grow=None, comb_sigrej=None, comb_maxmem=None, n_workers=None,
                  rmcompact=None, sigclip=None, sigfrac=None, objlim=None,
                  use_biasimage=None, use_overscan=None, use_darkimage=None,
                  use_pixelflat=None, use_illumflat=None, use_specillum=None,
@@ -285,6 +285,20 @@ class ProcessImagesPar(ParSet):
         descr['comb_sigrej'] = 'Sigma-clipping level for when clip=True; ' \
                            'Use None for automatic limit (recommended).  '
 
+        defaults['comb_maxmem'] = None
+        dtypes['comb_maxmem'] = [int, float]
+        descr['comb_maxmem'] = 'Approximate memory budget in GB for combining multiple frames.  ' \
+                               'If the stack of processed frames exceeds this limit, it is kept ' \
+                               'in temporary files on disk and combined in blocks of rows that ' \
+                               'fit within the budget.  The result is identical.  Use None ' \
+                               'for no limit.'
+
+        defaults['n_workers'] = 1
+        dtypes['n_workers'] = int
+        descr['n_workers'] = 'Number of worker processes used to load and process the raw ' \
+                             'frames concurrently before they are combined.  The default of ' \
+                             '1 processes the frames serially.'
+
         defaults['satpix'] = 'reject'
         options['satpix'] = ProcessImagesPar.valid_saturation_handling()
         dtypes['satpix'] = str
@@ -313,7 +327,14 @@ class ProcessImagesPar(ParSet):
 
         defaults['lamaxiter'] = 1
         dtypes['lamaxiter'] = int
-        descr['lamaxiter'] = 'Maximum number of iterations for LA cosmics routine.'
+        descr['lamaxiter'] = 'Maximum number of iterations for LA cosmics routine.  The ' \
+                             'image is not cleaned between iterations, such that only one ' \
+                             'iteration is performed; values larger than 1 are ignored.'
+
+        defaults['lathreads'] = 1
+        dtypes['lathreads'] = int
+        descr['lathreads'] = 'Number of threads used by the LA cosmics routine to process ' \
+                             'separate bands of image rows concurrently.'
 
         defaults['grow'] = 1.5
         dtypes['grow'] = [int, float]
@@ -354,8 +375,9 @@ class ProcessImagesPar(ParSet):
                    'use_biasimage', 'use_pattern', 'use_overscan', 'overscan_method', 'overscan_par', 'use_darkimage',
                    'spat_flexure_correct', 'use_illumflat', 'use_specillum', 'use_pixelflat',
                    'combine', 'satpix', 'cr_sigrej', 'n_lohi', 'mask_cr',
-                   'replace', 'lamaxiter', 'grow', 'clip', 'comb_sigrej',
-                   'rmcompact', 'sigclip', 'sigfrac', 'objlim']
+                   'replace', 'lamaxiter', 'lathreads', 'grow', 'clip', 'comb_sigrej',
+                   'comb_maxmem',
+                   'n_workers', 'rmcompact', 'sigclip', 'sigfrac', 'objlim']
 
         badkeys = numpy.array([pk not in parkeys for pk in k])
         if numpy.any(badkeys):
@@ -402,6 +424,12 @@ class ProcessImagesPar(ParSet):
         if self.data['n_lohi'] is not None and len(self.data['n_lohi']) != 2:
             raise ValueError('n_lohi must be a list of two numbers.')
 
+        if self.data['n_workers'] < 1:
+            raise ValueError('Number of workers must be at least 1.')
+
+        if self.data['lathreads'] < 1:
+            raise ValueError('Number of LA cosmics threads must be at least 1.')
+
         if not self.data['use_overscan']:
             return
         if self.data['overscan_par'] is None:
@@ -476,7 +504,7 @@ class FlatFieldPar(ParSet):
                  spec_samp_coarse=None, spat_samp=None, tweak_slits=None, tweak_slits_thresh=None,
                  tweak_slits_maxfrac=None, rej_sticky=None, slit_trim=None, slit_illum_pad=None,
                  illum_iter=None, illum_rej=None, twod_fit_npoly=None, saturated_slits=None,
-                 slit_illum_relative=None):
+                 slit_illum_relative=None, n_threads=None):
 
         # Grab the parameter names and values from the function
         # arguments
@@ -593,6 +621,15 @@ class FlatFieldPar(ParSet):
                                    'extracted from the slit; \'continue\' - ignore the ' \
                                    'flat-field correction, but continue with the reduction.'
 
+        defaults['n_threads'] = 1
+        dtypes['n_threads'] = int
+        descr['n_threads'] = 'Number of threads used to model the flat-field response of ' \
+                             'independent slits concurrently.  The bspline fits release the ' \
+                             'GIL in their compiled code and all threads share the same ' \
+                             'flat-field image.  The slits are always modeled serially if ' \
+                             'rej_sticky is True.  The result does not depend on the number ' \
+                             'of threads.'
+
         # Instantiate the parameter set
         super(FlatFieldPar, self).__init__(list(pars.keys()),
                                            values=list(pars.values()),
@@ -610,7 +647,7 @@ class FlatFieldPar(ParSet):
         parkeys = ['method', 'pixelflat_file', 'spec_samp_fine', 'spec_samp_coarse',
                    'spat_samp', 'tweak_slits', 'tweak_slits_thresh', 'tweak_slits_maxfrac',
                    'rej_sticky', 'slit_trim', 'slit_illum_pad', 'slit_illum_relative',
-                   'illum_iter', 'illum_rej', 'twod_fit_npoly', 'saturated_slits']
+                   'illum_iter', 'illum_rej', 'twod_fit_npoly', 'saturated_slits', 'n_threads']
 
         badkeys = numpy.array([pk not in parkeys for pk in k])
         if numpy.any(badkeys):
@@ -649,6 +686,8 @@ class FlatFieldPar(ParSet):
         #                     'pixels, number of repeats')
         #if self.data['method'] == 'bspline' and len(self.data['params']) != 1:
         #    raise ValueError('For bspline method, set params = spacing (integer).')
+        if self.data['n_threads'] < 1:
+            raise ValueError('Number of threads must be at least 1.')
         if self.data['pixelflat_file'] is None:
             return
 
@@ -1111,7 +1150,7 @@ class CubePar(ParSet):
     def __init__(self, slit_spec=None, relative_weights=None, combine=None, output_filename=None,
                  standard_cube=None, flux_calibrate=None, reference_image=None, save_whitelight=None,
                  ra_min=None, ra_max=None, dec_min=None, dec_max=None, wave_min=None, wave_max=None,
-                 spatial_delta=None, wave_delta=None):
+                 spatial_delta=None, wave_delta=None, single_precision=None):
 
         # Grab the parameter names and values from the function
         # arguments
@@ -1215,6 +1254,12 @@ class CubePar(ParSet):
         descr['wave_delta'] = 'The wavelength step to use when generating the WCS (in Angstroms).' \
                                 'If None, the default is set by the wavelength solution.'
 
+        defaults['single_precision'] = False
+        dtypes['single_precision'] = bool
+        descr['single_precision'] = 'If True, the weighted flux and variance of each pixel are computed in single ' \
+                                    'precision, and the datacube is constructed and saved in single precision.  ' \
+                                    'This halves the memory footprint of the cube, at the expense of precision.'
+
         # Instantiate the parameter set
         super(CubePar, self).__init__(list(pars.keys()),
                                       values=list(pars.values()),
@@ -1231,7 +1276,7 @@ class CubePar(ParSet):
         # Basic keywords
         parkeys = ['slit_spec', 'output_filename', 'standard_cube', 'flux_calibrate', 'reference_image',
                    'save_whitelight', 'ra_min', 'ra_max', 'dec_min', 'dec_max', 'wave_min', 'wave_max',
-                   'spatial_delta', 'wave_delta', 'relative_weights', 'combine']
+                   'spatial_delta', 'wave_delta', 'relative_weights', 'combine', 'single_precision']
 
         badkeys = numpy.array([pk not in parkeys for pk in k])
         if numpy.any(badkeys):
@@ -1622,7 +1667,7 @@ class TelluricPar(ParSet):
 
     def __init__(self, telgridfile=None, sn_clip=None, resln_guess=None, resln_frac_bounds=None, pix_shift_bounds=None, maxiter=None,
                  sticky=None, lower=None, upper=None, seed=None, tol=None, popsize=None, recombination=None, polish=None,
-                 disp=None):
+                 vectorized=None, n_workers=None, resln_quantum=None, tell_cache_mem=None, disp=None):
 
         # Grab the parameter names and values from the function
         # arguments
@@ -1754,6 +1799,32 @@ class TelluricPar(ParSet):
                           'polish the best fit at the end, which can improve the optimization slightly. See ' \
                           'scipy.optimize.differential_evolution for details.'
 
+        defaults['vectorized'] = True
+        dtypes['vectorized'] = bool
+        descr['vectorized'] = 'If True, the loss function is evaluated for the full population of each generation ' \
+                              'of the differential evolution optimization at once, which is much faster than ' \
+                              'evaluating each member of the population in turn.  This requires the population to be ' \
+                              'updated once per generation, which leads to a different (but still reproducible) fit ' \
+                              'result.  Requires scipy>=1.9.'
+
+        defaults['n_workers'] = 1
+        dtypes['n_workers'] = int
+        descr['n_workers'] = 'Number of worker processes used to fit the orders (or slits) concurrently.  The ' \
+                             'results are identical to fitting them one after the other.'
+
+        defaults['resln_quantum'] = 1e-3
+        dtypes['resln_quantum'] = [int, float]
+        descr['resln_quantum'] = 'Step in the natural log of the resolution used to cache the telluric models ' \
+                                 'convolved to the trial resolutions of the fit; i.e., the resolution is ' \
+                                 'quantized to a fractional precision of resln_quantum.  Set to 0 to only reuse ' \
+                                 'models convolved to identical resolutions.'
+
+        defaults['tell_cache_mem'] = 256.
+        dtypes['tell_cache_mem'] = [int, float]
+        descr['tell_cache_mem'] = 'Maximum memory in MB used to cache the convolved telluric models during the ' \
+                                  'fit.  The least recently used models are dropped when the cache is full.  Set ' \
+                                  'to 0 to disable the cache.'
+
         defaults['disp'] = False
         dtypes['disp'] = bool
         descr['disp'] = 'Argument for scipy.optimize.differential_evolution which will  display status messages to the ' \
@@ -1773,7 +1844,8 @@ class TelluricPar(ParSet):
         k = numpy.array([*cfg.keys()])
         parkeys = ['telgridfile', 'sn_clip', 'resln_guess', 'resln_frac_bounds',
                    'pix_shift_bounds', 'maxiter', 'sticky', 'lower', 'upper', 'seed', 'tol',
-                   'popsize', 'recombination', 'polish', 'disp']
+                   'popsize', 'recombination', 'polish', 'vectorized', 'n_workers', 'resln_quantum',
+                   'tell_cache_mem', 'disp']
 
         badkeys = numpy.array([pk not in parkeys for pk in k])
         if numpy.any(badkeys):
@@ -1788,9 +1860,14 @@ class TelluricPar(ParSet):
         """
         Check the parameters are valid for the provided method.
         """
-        pass
         # JFH add something in here which checks that the recombination value provided is bewteen 0 and 1, although
         # scipy.optimize.differential_evoluiton probalby checks this.
+        if self.data['n_workers'] < 1:
+            raise ValueError('Number of workers must be at least 1.')
+        if self.data['resln_quantum'] < 0:
+            raise ValueError('Resolution quantum must be non-negative.')
+        if self.data['tell_cache_mem'] < 0:
+            raise ValueError('Telluric model cache memory must be non-negative.')
 
 
 class TellFitPar(ParSet):
@@ -1806,7 +1883,8 @@ class TellFitPar(ParSet):
                  bounds_norm=None, tell_norm_thresh=None, only_orders=None, pca_lower=None, pca_upper=None,
                  star_type=None, star_mag=None, star_ra=None, star_dec=None, mask_abs_lines=None,
                  func=None, model=None, polyorder=None, fit_wv_min_max=None, mask_lyman_a=None,
-                 delta_coeff_bounds=None, minmax_coeff_bounds=None, tell_grid=None):
+                 delta_coeff_bounds=None, minmax_coeff_bounds=None, tell_grid=None, n_workers=None,
+                 resln_quantum=None, tell_cache_mem=None):
 
         # Grab the parameter names and values from the function arguments
         args, _, _, values = inspect.getargvalues(inspect.currentframe())
@@ -1922,6 +2000,23 @@ class TellFitPar(ParSet):
         dtypes['mask_lyman_a'] = bool
         descr['mask_lyman_a'] = 'Mask the blueward of Lyman-alpha line during the fitting?'
 
+        defaults['n_workers'] = 1
+        dtypes['n_workers'] = int
+        descr['n_workers'] = 'Number of worker processes used to fit the orders (or slits) concurrently.  The ' \
+                             'results are identical to fitting them one after the other.'
+
+        defaults['resln_quantum'] = 1e-3
+        dtypes['resln_quantum'] = [int, float]
+        descr['resln_quantum'] = 'Step in the natural log of the resolution used to cache the telluric models ' \
+                                 'convolved to the trial resolutions of the fit; i.e., the resolution is ' \
+                                 'quantized to a fractional precision of resln_quantum.  Set to 0 to only reuse ' \
+                                 'models convolved to identical resolutions.'
+
+        defaults['tell_cache_mem'] = 256.
+        dtypes['tell_cache_mem'] = [int, float]
+        descr['tell_cache_mem'] = 'Maximum memory in MB used to cache the convolved telluric models during the ' \
+                                  'fit.  The least recently used models are dropped when the cache is full.  Set ' \
+                                  'to 0 to disable the cache.'
 
         # Instantiate the parameter set
         super(TellFitPar, self).__init__(list(pars.keys()),
@@ -1938,7 +2033,8 @@ class TellFitPar(ParSet):
                    'tell_norm_thresh', 'only_orders', 'pca_lower', 'pca_upper',
                    'star_type','star_mag','star_ra','star_dec','mask_abs_lines',
                    'func','model','polyorder','fit_wv_min_max','mask_lyman_a',
-                   'delta_coeff_bounds','minmax_coeff_bounds','tell_grid']
+                   'delta_coeff_bounds','minmax_coeff_bounds','tell_grid', 'n_workers', 'resln_quantum',
+                   'tell_cache_mem']
 
         badkeys = numpy.array([pk not in parkeys for pk in k])
         if numpy.any(badkeys):
@@ -1950,7 +2046,12 @@ class TellFitPar(ParSet):
         return cls(**kwargs)
 
     def validate(self):
-        pass
+        if self.data['n_workers'] < 1:
+            raise ValueError('Number of workers must be at least 1.')
+        if self.data['resln_quantum'] < 0:
+            raise ValueError('Resolution quantum must be non-negative.')
+        if self.data['tell_cache_mem'] < 0:
+            raise ValueError('Telluric model cache memory must be non-negative.')
 
 class ManualExtractionPar(ParSet):
     """
@@ -2074,7 +2175,8 @@ class ReduxPar(ParSet):
     see :ref:`pypeitpar`.
     """
     def __init__(self, spectrograph=None, detnum=None, sortroot=None, calwin=None, scidir=None,
-                 qadir=None, redux_path=None, ignore_bad_headers=None, slitspatnum=None):
+                 qadir=None, redux_path=None, ignore_bad_headers=None, slitspatnum=None,
+                 n_workers=None, header_threads=None, meta_cache=None, profile=None):
 
         # Grab the parameter names and values from the function
         # arguments
@@ -2140,6 +2242,38 @@ class ReduxPar(ParSet):
         descr['redux_path'] = 'Path to folder for performing reductions.  Default is the ' \
                               'current working directory.'
 
+        defaults['n_workers'] = 1
+        dtypes['n_workers'] = int
+        descr['n_workers'] = 'Number of worker processes used to build the calibrations of ' \
+                             'all calibration groups and to reduce the detectors of a ' \
+                             'single exposure concurrently.  The default of 1 performs ' \
+                             'all steps serially.  The results are identical to the serial ' \
+                             'reduction regardless of the number of workers.'
+
+        defaults['header_threads'] = 1
+        dtypes['header_threads'] = int
+        descr['header_threads'] = 'Number of threads used to read the headers of the raw files ' \
+                                  'when building the metadata table.  Reading the headers is ' \
+                                  'dominated by I/O, such that using many threads can ' \
+                                  'significantly speed up the setup of large datasets, ' \
+                                  'particularly on network file systems.'
+
+        dtypes['meta_cache'] = str
+        descr['meta_cache'] = 'Name of a file used to cache the metadata read from the raw ' \
+                              'file headers.  Files are identified by their path, size, and ' \
+                              'modification time, such that only new or modified files are ' \
+                              'read when the metadata table is rebuilt.  The cache is not ' \
+                              'used with metadata provided by the user, e.g. in a pypeit ' \
+                              'file.  If None, no cache is used.'
+
+        dtypes['profile'] = str
+        descr['profile'] = 'Name of a file, relative to ``redux_path``, used to write the ' \
+                           'wall-clock time, CPU time, and peak memory use of each ' \
+                           'reduction step for each frame, detector, and slit.  The report ' \
+                           'is written as JSON if the file extension is ``.json`` and as ' \
+                           'comma-separated values otherwise.  If None, the reduction is ' \
+                           'not profiled.  See :ref:`profiling`.'
+
         # Instantiate the parameter set
         super(ReduxPar, self).__init__(list(pars.keys()),
                                         values=list(pars.values()),
@@ -2155,7 +2289,8 @@ class ReduxPar(ParSet):
 
         # Basic keywords
         parkeys = [ 'spectrograph', 'detnum', 'sortroot', 'calwin', 'scidir', 'qadir',
-                    'redux_path', 'ignore_bad_headers', 'slitspatnum']
+                    'redux_path', 'ignore_bad_headers', 'slitspatnum', 'n_workers',
+                    'header_threads', 'meta_cache', 'profile']
 
         badkeys = numpy.array([pk not in parkeys for pk in k])
         if numpy.any(badkeys):
@@ -2175,7 +2310,10 @@ class ReduxPar(ParSet):
 #        return available_spectrographs
 
     def validate(self):
-        pass
+        if self.data['n_workers'] < 1:
+            raise ValueError('Number of workers must be at least 1.')
+        if self.data['header_threads'] < 1:
+            raise ValueError('Number of header threads must be at least 1.')
 
     
 class WavelengthSolutionPar(ParSet):
@@ -3380,7 +3518,7 @@ class SkySubPar(ParSet):
 
     def __init__(self, bspline_spacing=None, sky_sigrej=None, global_sky_std=None, no_poly=None,
                  user_regions=None, joint_fit=None, load_mask=None, mask_by_boxcar=None,
-                 no_local_sky=None):
+                 no_local_sky=None, n_threads=None):
         # Grab the parameter names and values from the function
         # arguments
         args, _, _, values = inspect.getargvalues(inspect.currentframe())
@@ -3442,6 +3580,15 @@ class SkySubPar(ParSet):
         dtypes['joint_fit'] = bool
         descr['joint_fit'] = 'Perform a simultaneous joint fit to sky regions using all available slits.'
 
+        defaults['n_threads'] = 1
+        dtypes['n_threads'] = int
+        descr['n_threads'] = 'Number of threads used to fit the global sky and to perform ' \
+                             'the local sky subtraction and extraction of independent ' \
+                             'slits or orders concurrently.  The bspline fits release the ' \
+                             'GIL in their compiled code and all threads share the same ' \
+                             'detector images.  The result does not depend on the number of ' \
+                             'threads.'
+
         # Instantiate the parameter set
         super(SkySubPar, self).__init__(list(pars.keys()),
                                         values=list(pars.values()),
@@ -3458,7 +3605,7 @@ class SkySubPar(ParSet):
         # Basic keywords
         parkeys = ['bspline_spacing', 'sky_sigrej', 'global_sky_std', 'no_poly',
                    'user_regions', 'load_mask', 'joint_fit', 'mask_by_boxcar',
-                   'no_local_sky']
+                   'no_local_sky', 'n_threads']
 
         badkeys = numpy.array([pk not in parkeys for pk in k])
         if numpy.any(badkeys):
@@ -3470,7 +3617,8 @@ class SkySubPar(ParSet):
         return cls(**kwargs)
 
     def validate(self):
-        pass
+        if self.data['n_threads'] < 1:
+            raise ValueError('Number of threads must be at least 1.')
 
 
 class ExtractionPar(ParSet):
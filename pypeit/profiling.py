@@ -0,0 +1,255 @@
+"""
+Record the execution time and memory use of the reduction steps.
+
+The steps are instrumented using the :func:`Profiler.step` context
+manager of the module-level :attr:`profiler` object, which does
+nothing unless profiling has been enabled.  For example::
+
+    from pypeit import profiling
+
+    profiling.profiler.enable()
+    with profiling.profiler.step('calibrations.arc', frame='b1.fits.gz', det=1):
+        ...
+    profiling.profiler.write('profile.csv')
+
+Steps inherit the frame, detector, and slit of the step they are nested
+in, such that only the outermost step needs to identify the frame and
+detector.  For each step, the wall-clock time, the CPU time, and the
+peak resident set size (RSS) of the process are recorded.
+
+.. note::
+
+    The CPU time and the peak RSS are measured for the full process.
+    For steps executed concurrently by multiple threads (e.g., the
+    slits fit by :class:`pypeit.reduce.Reduce` when
+    ``reduce.skysub.n_threads > 1``), they include the resources used
+    by all threads.  On Linux, the peak RSS is reset at the start of
+    each step; on other platforms, it is the peak RSS of the process
+    since it started.
+
+.. include common links, assuming primary doc root is up one directory
+.. include:: ../include/links.rst
+"""
+import os
+import sys
+import csv
+import json
+import time
+import threading
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # Windows
+    resource = None
+
+from IPython import embed
+
+from pypeit import msgs
+
+
+class Profiler:
+    """
+    Record the execution time and memory use of the reduction steps.
+
+    Attributes:
+        enabled (:obj:`bool`):
+            Flag that profiling is enabled.  If False, :func:`step`
+            does nothing.
+        records (:obj:`list`):
+            The :obj:`dict` with the measurements of each completed
+            step, in the order they were completed.
+    """
+
+    columns = ['step', 'frame', 'det', 'slit', 'wall_time', 'cpu_time', 'peak_rss', 'pid']
+    """
+    The items recorded for each step.  Times are in seconds and the peak
+    RSS is in MB.
+    """
+
+    _context = ['frame', 'det', 'slit']
+    """
+    The items inherited by nested steps.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.records = []
+        self._lock = threading.Lock()
+        # Steps in progress in each thread
+        self._local = threading.local()
+        # Steps in progress in all threads; see _reset_peak_rss
+        self._active = []
+
+    def enable(self, enabled=True):
+        """
+        Enable or disable profiling.
+
+        Args:
+            enabled (:obj:`bool`, optional):
+                Enable profiling.
+        """
+        self.enabled = enabled
+
+    def pop_records(self):
+        """
+        Remove and return all the records.
+
+        Returns:
+            :obj:`list`: The records removed.
+        """
+        with self._lock:
+            records, self.records = self.records, []
+        return records
+
+    def add_records(self, records):
+        """
+        Add records, typically collected by a worker process.
+
+        Args:
+            records (:obj:`list`):
+                The records to add; see :func:`pop_records`.
+        """
+        with self._lock:
+            self.records += records
+
+    def context(self):
+        """
+        Return the frame, detector, and slit of the innermost step in
+        progress in the current thread.
+
+        Use this to pass the context to steps executed by other threads.
+
+        Returns:
+            :obj:`dict`: The frame, detector, and slit; empty if no step
+            is in progress.
+        """
+        stack = getattr(self._local, 'stack', [])
+        return {} if len(stack) == 0 else {k: stack[-1][k] for k in self._context}
+
+    @staticmethod
+    def _rss():
+        """
+        Return the peak RSS of the process in MB.
+        """
+        if sys.platform.startswith('linux'):
+            try:
+                with open('/proc/self/status', 'r') as f:
+                    for line in f:
+                        if line.startswith('VmHWM:'):
+                            return float(line.split()[1])/1024
+            except OSError:
+                pass
+        if resource is None:
+            return None
+        # ru_maxrss is in kB on Linux and in bytes on macOS
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss/1024**2 if sys.platform == 'darwin' else rss/1024
+
+    def _reset_peak_rss(self):
+        """
+        Reset the peak RSS of the process to its current RSS, if
+        possible.
+
+        The peak RSS up to this point is first included in the
+        measurements of all the steps in progress.
+        """
+        rss = self._rss()
+        with self._lock:
+            for record in self._active:
+                record['peak_rss'] = rss if record['peak_rss'] is None or rss is None \
+                                            else max(record['peak_rss'], rss)
+        try:
+            with open('/proc/self/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+    @contextmanager
+    def step(self, name, frame=None, det=None, slit=None, context=None):
+        """
+        Context manager that records the execution of a step.
+
+        Args:
+            name (:obj:`str`):
+                Name of the step.
+            frame (:obj:`str`, optional):
+                Frame being reduced.  If None, inherited from the step
+                in progress.
+            det (:obj:`int`, optional):
+                1-indexed detector being reduced.  If None, inherited
+                from the step in progress.
+            slit (:obj:`int`, optional):
+                Slit being reduced (e.g., its spatial ID).  If None,
+                inherited from the step in progress.
+            context (:obj:`dict`, optional):
+                Frame, detector, and slit to inherit, as returned by
+                :func:`context`; typically used by steps executed by
+                threads other than the one that started the parent
+                step.  If None, the context of the current thread is
+                used.
+        """
+        if not self.enabled:
+            yield
+            return
+
+        record = dict.fromkeys(self.columns)
+        record.update(self.context() if context is None else context)
+        for key, value, _type in zip(self._context, [frame, det, slit], [str, int, int]):
+            if value is not None:
+                # Cast numpy types so that the records can be written
+                # to JSON
+                record[key] = _type(value)
+        record['step'] = name
+        record['pid'] = os.getpid()
+
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        self._reset_peak_rss()
+        self._local.stack.append(record)
+        with self._lock:
+            self._active.append(record)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            record['wall_time'] = time.perf_counter() - wall
+            record['cpu_time'] = time.process_time() - cpu
+            rss = self._rss()
+            with self._lock:
+                self._active.remove(record)
+                if rss is not None:
+                    record['peak_rss'] = rss if record['peak_rss'] is None \
+                                            else max(record['peak_rss'], rss)
+                self.records.append(record)
+            self._local.stack.pop()
+
+    def write(self, ofile):
+        """
+        Write the records to a file.
+
+        Args:
+            ofile (:obj:`str`):
+                Output file.  If the extension is ``.json``, the records
+                are written as a list of JSON objects; otherwise, they
+                are written as a table of comma-separated values.
+        """
+        with self._lock:
+            records = list(self.records)
+        if os.path.splitext(ofile)[1] == '.json':
+            with open(ofile, 'w') as f:
+                json.dump(records, f, indent=1)
+        else:
+            with open(ofile, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=self.columns)
+                writer.writeheader()
+                writer.writerows(records)
+        msgs.info('Profiling report with {0} steps written to {1}'.format(len(records), ofile))
+
+
+profiler = Profiler()
+"""
+The profiler used by all the instrumented steps.
+"""
@@ -7,12 +7,18 @@ Main driver class for PypeIt run
 """
 import time
 import os
+import json
+import hashlib
 import numpy as np
 import copy
+from concurrent import futures
 from astropy.io import fits
 from astropy.table import Table
 from pypeit import msgs
 from pypeit import calibrations
+from pypeit import calibscheduler
+from pypeit import profiling
+import pypeit
 from pypeit.images import buildimage
 from pypeit.display import display
 from pypeit import reduce
@@ -61,6 +67,11 @@ class PypeIt(object):
             Over-ride reduction path in PypeIt file (e.g. Notebook usage)
         calib_only: (:obj:`bool`, optional):
             Only generate the calibration files that you can
+        skip_unchanged (:obj:`bool`, optional):
+            Only reduce the exposures whose output files do not exist or
+            whose provenance (see :func:`provenance`) has changed since
+            they were last reduced.  This takes precedence over
+            ``overwrite``.
 
     Attributes:
         pypeit_file (:obj:`str`):
@@ -73,7 +84,7 @@ class PypeIt(object):
 #    __metaclass__ = ABCMeta
 
     def __init__(self, pypeit_file, verbosity=2, overwrite=True, reuse_masters=False, logname=None,
-                 show=False, redux_path=None, calib_only=False):
+                 show=False, redux_path=None, calib_only=False, skip_unchanged=False):
 
         # Set up logging
         self.logname = logname
@@ -139,12 +150,18 @@ class PypeIt(object):
 
         # Other Internals
         self.overwrite = overwrite
+        self.skip_unchanged = skip_unchanged
 
         # Currently the runtime argument determines the behavior for
         # reuse_masters.
         self.reuse_masters = reuse_masters
         self.show = show
 
+        # Profile the reduction steps?  Any previous records are
+        # discarded.
+        profiling.profiler.enable(self.par['rdx']['profile'] is not None)
+        profiling.profiler.pop_records()
+
         # Set paths
         self.calibrations_path = os.path.join(self.par['rdx']['redux_path'], self.par['calibrations']['master_dir'])
 
@@ -167,6 +184,8 @@ class PypeIt(object):
         # TODO: I don't think this ever used
 
         self.det = None
+        # Master frames built by the calibration scheduler
+        self.calib_masters = set()
 
         self.tstart = None
         self.basename = None
@@ -219,6 +238,124 @@ class PypeIt(object):
         """
         return os.path.isfile(self.spec_output_file(frame, twod=True))
 
+    def provenance_file(self, frame):
+        """
+        Return the path to the provenance file of a reduced exposure.
+
+        The file is written to the science directory, alongside the
+        spec1d and spec2d files.
+
+        Args:
+            frame (:obj:`int`):
+                Frame index from :attr:`fitstbl`.
+
+        Returns:
+            :obj:`str`: The path for the provenance file.
+        """
+        return os.path.join(self.science_path, 'provenance_{0}.json'.format(
+                                self.fitstbl.construct_basename(frame)))
+
+    def provenance(self, frames, bg_frames=None, std_outfile=None):
+        """
+        Collect the provenance of the reduction of an exposure.
+
+        The provenance includes the path, modification time, and size
+        of all the raw science and background frames and of the
+        standard-star spec1d file, the checksums of the inputs of all
+        the calibration steps of each detector (see
+        :func:`pypeit.calibrations.Calibrations.step_checksum`), and the
+        parameters used to reduce the science frames.
+
+        Args:
+            frames (:obj:`list`):
+                0-indexed rows in :attr:`fitstbl` with the frames that
+                are combined.
+            bg_frames (:obj:`list`, optional):
+                0-indexed rows in :attr:`fitstbl` with the background
+                frames.
+            std_outfile (:obj:`str`, optional):
+                Standard-star spec1d file used by the reduction.
+
+        Returns:
+            :obj:`dict`: The provenance.  The ``checksum`` item is the
+            MD5 hash of all the other items.
+        """
+        def _stat(f):
+            return [f, os.path.getmtime(f), os.path.getsize(f)] if os.path.isfile(f) \
+                        else [f, None, None]
+
+        _bg_frames = [] if bg_frames is None else bg_frames
+        detectors = PypeIt.select_detectors(detnum=self.par['rdx']['detnum'],
+                                            slitspatnum=self.par['rdx']['slitspatnum'],
+                                            ndet=self.spectrograph.ndet)
+        masters = {}
+        for det in detectors:
+            caliBrate = calibrations.Calibrations.get_instance(
+                self.fitstbl, self.par['calibrations'], self.spectrograph,
+                self.calibrations_path, reuse_masters=self.reuse_masters,
+                slitspat_num=self.par['rdx']['slitspatnum'])
+            caliBrate.set_config(frames[0], det, self.par['calibrations'])
+            masters[str(det)] = {step: caliBrate.step_checksum(step) for step in caliBrate.steps}
+
+        par = []
+        for key in ['scienceframe', 'reduce', 'flexure']:
+            par += self.par[key].to_config(section_name=key, include_descr=False)
+
+        provenance = dict(spectrograph=self.spectrograph.name, version=pypeit.__version__,
+                          raw=[_stat(os.path.abspath(f))
+                                for f in self.fitstbl.frame_paths(frames)],
+                          background=[_stat(os.path.abspath(f))
+                                for f in self.fitstbl.frame_paths(_bg_frames)],
+                          standard=None if std_outfile is None
+                                        else _stat(os.path.abspath(std_outfile)),
+                          masters=masters, par=par)
+        provenance['checksum'] = hashlib.md5(json.dumps(provenance).encode()).hexdigest()
+        return provenance
+
+    def write_provenance(self, frames, bg_frames=None, std_outfile=None):
+        """
+        Write the provenance of a reduced exposure to
+        :func:`provenance_file`.
+
+        See :func:`provenance` for the arguments.
+        """
+        with open(self.provenance_file(frames[0]), 'w') as f:
+            json.dump(self.provenance(frames, bg_frames=bg_frames, std_outfile=std_outfile),
+                      f, indent=1)
+
+    def needs_reduction(self, frames, bg_frames=None, std_outfile=None):
+        """
+        Check whether an exposure should be reduced.
+
+        An exposure is reduced if its spec2d file does not exist.
+        Otherwise, if :attr:`skip_unchanged` is True, it is only reduced
+        if its provenance (see :func:`provenance`) differs from the one
+        recorded when it was last reduced; if False, it is reduced if
+        :attr:`overwrite` is True.
+
+        See :func:`provenance` for the arguments.
+
+        Returns:
+            :obj:`bool`: True if the exposure should be reduced.
+        """
+        if not self.outfile_exists(frames[0]):
+            return True
+        if not self.skip_unchanged:
+            return self.overwrite
+        provenance_file = self.provenance_file(frames[0])
+        if not os.path.isfile(provenance_file):
+            msgs.info('No provenance for {0}; reducing it.'.format(
+                      self.fitstbl.construct_basename(frames[0])))
+            return True
+        with open(provenance_file, 'r') as f:
+            checksum = json.load(f).get('checksum')
+        if checksum != self.provenance(frames, bg_frames=bg_frames,
+                                       std_outfile=std_outfile)['checksum']:
+            msgs.info('Provenance of {0} has changed; reducing it.'.format(
+                      self.fitstbl.construct_basename(frames[0])))
+            return True
+        return False
+
     def get_std_outfile(self, standard_frames):
         """
         Grab the output filename from an input list of standard_frame indices
@@ -259,6 +396,17 @@ class PypeIt(object):
 
         # Frame indices
         frame_indx = np.arange(len(self.fitstbl))
+
+        # Build the calibrations of all groups concurrently?
+        if self.par['rdx']['n_workers'] > 1 and not self.show:
+            grp_frames = [frame_indx[self.fitstbl.find_calib_group(i)][0]
+                            for i in range(self.fitstbl.n_calib_groups)]
+            self.schedule_calibrations(grp_frames)
+            # Finish
+            self.write_profile()
+            self.print_end_time()
+            return
+
         for i in range(self.fitstbl.n_calib_groups):
             # Find all the frames in this calibration group
             in_grp = self.fitstbl.find_calib_group(i)
@@ -279,8 +427,39 @@ class PypeIt(object):
                 self.caliBrate.run_the_steps()
 
         # Finish
+        self.write_profile()
         self.print_end_time()
 
+    def schedule_calibrations(self, frames):
+        """
+        Build the calibrations for a set of frames using a pool of
+        ``rdx.n_workers`` worker processes.
+
+        Independent calibration steps of all the frames and detectors
+        are executed concurrently by
+        :class:`pypeit.calibscheduler.CalibrationScheduler`.  The master
+        frames that are built are kept in :attr:`calib_masters` so that
+        they are loaded, not rebuilt, during the reduction.
+
+        Args:
+            frames (:obj:`list`):
+                0-indexed rows in :attr:`fitstbl` with the frames to
+                calibrate.
+
+        Returns:
+            :obj:`set`: The master frame files that have been built.
+        """
+        detectors = PypeIt.select_detectors(detnum=self.par['rdx']['detnum'],
+                                            slitspatnum=self.par['rdx']['slitspatnum'],
+                                            ndet=self.spectrograph.ndet)
+        scheduler = calibscheduler.CalibrationScheduler(
+            self.fitstbl, self.par['calibrations'], self.spectrograph, self.calibrations_path,
+            qadir=self.qa_path, reuse_masters=self.reuse_masters,
+            slitspat_num=self.par['rdx']['slitspatnum'], n_workers=self.par['rdx']['n_workers'],
+            profile=profiling.profiler.enabled)
+        self.calib_masters |= scheduler.run(frames, detectors)
+        return self.calib_masters
+
     def reduce_all(self):
         """
         Main driver of the entire reduction
@@ -302,6 +481,18 @@ class PypeIt(object):
         # Frame indices
         frame_indx = np.arange(len(self.fitstbl))
 
+        # Build all the calibrations needed for the standard and science
+        # frames concurrently?
+        if self.par['rdx']['n_workers'] > 1 and not self.show:
+            is_reduced = is_standard | is_science
+            calib_frames = [np.where(self.fitstbl['comb_id'] == comb_id)[0][0]
+                                for comb_id in np.unique(self.fitstbl['comb_id'][is_reduced])]
+            calib_frames = [frame for frame in calib_frames
+                                if not self.outfile_exists(frame) or self.overwrite
+                                    or self.skip_unchanged]
+            if len(calib_frames) > 0:
+                self.schedule_calibrations(calib_frames)
+
         # Iterate over each calibration group and reduce the standards
         for i in range(self.fitstbl.n_calib_groups):
 
@@ -316,10 +507,11 @@ class PypeIt(object):
             for j, comb_id in enumerate(u_combid_std):
                 frames = np.where(self.fitstbl['comb_id'] == comb_id)[0]
                 bg_frames = np.where(self.fitstbl['bkg_id'] == comb_id)[0]
-                if not self.outfile_exists(frames[0]) or self.overwrite:
+                if self.needs_reduction(frames, bg_frames=bg_frames):
                     std_spec2d, std_sobjs = self.reduce_exposure(frames, bg_frames=bg_frames)
                     # TODO come up with sensible naming convention for save_exposure for combined files
                     self.save_exposure(frames[0], std_spec2d, std_sobjs, self.basename)
+                    self.write_provenance(frames, bg_frames=bg_frames)
                 else:
                     msgs.info('Output file: {:s} already exists'.format(self.fitstbl.construct_basename(frames[0])) +
                               '. Set overwrite=True to recreate and overwrite.')
@@ -346,13 +538,14 @@ class PypeIt(object):
                 # as a background image. The syntax below would require that we could somehow list multiple
                 # numbers for the bkg_id which is impossible without a comma separated list
 #                bg_frames = np.where(self.fitstbl['bkg_id'] == comb_id)[0]
-                if not self.outfile_exists(frames[0]) or self.overwrite:
+                if self.needs_reduction(frames, bg_frames=bg_frames, std_outfile=std_outfile):
                     # TODO -- Should we reset/regenerate self.slits.mask for a new exposure
                     sci_spec2d, sci_sobjs = self.reduce_exposure(frames, bg_frames=bg_frames,
                                                     std_outfile=std_outfile)
                     science_basename[j] = self.basename
                     # TODO come up with sensible naming convention for save_exposure for combined files
                     self.save_exposure(frames[0], sci_spec2d, sci_sobjs, self.basename)
+                    self.write_provenance(frames, bg_frames=bg_frames, std_outfile=std_outfile)
                 else:
                     msgs.warn('Output file: {:s} already exists'.format(self.fitstbl.construct_basename(frames[0])) +
                               '. Set overwrite=True to recreate and overwrite.')
@@ -360,6 +553,7 @@ class PypeIt(object):
             msgs.info('Finished calibration group {0}'.format(i))
 
         # Finish
+        self.write_profile()
         self.print_end_time()
 
     # This is a static method to allow for use in coadding script 
@@ -455,24 +649,43 @@ class PypeIt(object):
             msgs.warn('Not reducing detectors: {0}'.format(' '.join([ str(d) for d in 
                                 set(np.arange(self.spectrograph.ndet))-set(detectors)])))
 
-        # Loop on Detectors
-        # TODO: Attempt to put in a multiprocessing call here?
-        for self.det in detectors:
-            msgs.info("Working on detector {0}".format(self.det))
-            # Instantiate Calibrations class
+        # Reduce the detectors, either serially or with a pool of worker
+        # processes
+        n_workers = min(self.par['rdx']['n_workers'], len(detectors))
+        if n_workers > 1 and self.show:
+            msgs.warn('Cannot show the reduction steps when reducing detectors in parallel.  '
+                      'Reducing the detectors serially.')
+            n_workers = 1
+
+        if n_workers > 1:
+            msgs.info('Reducing {0} detectors using {1} worker processes'.format(
+                      len(detectors), n_workers))
+            with futures.ProcessPoolExecutor(max_workers=n_workers) as executor:
+                jobs = [executor.submit(_reduce_detector, self, frames, det, bg_frames,
+                                        std_outfile) for det in detectors]
+                # Collect the results in the order of the detectors so
+                # that the output is identical to the serial reduction
+                results = [job.result() for job in jobs]
+            for self.det, (spec2DObj, tmp_sobjs, self.basename, master_key_dict, records) \
+                    in zip(detectors, results):
+                profiling.profiler.add_records(records)
+                all_spec2d[self.det] = spec2DObj
+                if tmp_sobjs.nobj > 0:
+                    all_specobjs.add_sobj(tmp_sobjs)
+            # Keep the master keys of the last detector for the output
+            # headers, as done by the serial reduction
             self.caliBrate = calibrations.Calibrations.get_instance(
                 self.fitstbl, self.par['calibrations'], self.spectrograph,
                 self.calibrations_path, qadir=self.qa_path, reuse_masters=self.reuse_masters,
                 show=self.show, slitspat_num=self.par['rdx']['slitspatnum'])
-            # These need to be separate to accomodate COADD2D
             self.caliBrate.set_config(frames[0], self.det, self.par['calibrations'])
-            self.caliBrate.run_the_steps()
-            # Extract
-            # TODO: pass back the background frame, pass in background
-            # files as an argument. extract one takes a file list as an
-            # argument and instantiates science within
+            self.caliBrate.master_key_dict = master_key_dict
+            return all_spec2d, all_specobjs
+
+        # Loop on Detectors
+        for self.det in detectors:
             all_spec2d[self.det], tmp_sobjs \
-                    = self.reduce_one(frames, self.det, bg_frames, std_outfile=std_outfile)
+                    = self.reduce_detector(frames, self.det, bg_frames, std_outfile=std_outfile)
             # Hold em
             if tmp_sobjs.nobj > 0:
                 all_specobjs.add_sobj(tmp_sobjs)
@@ -483,6 +696,49 @@ class PypeIt(object):
         # Return
         return all_spec2d, all_specobjs
 
+    def reduce_detector(self, frames, det, bg_frames, std_outfile=None):
+        """
+        Calibrate and reduce a single exposure/detector pair
+
+        This builds the calibrations for the detector and then calls
+        :func:`reduce_one`.
+
+        Args:
+            frames (:obj:`list`):
+                List of frames to extract; stacked if more than one
+                is provided
+            det (:obj:`int`):
+                Detector number (1-indexed)
+            bg_frames (:obj:`list`):
+                List of frames to use as the background. Can be
+                empty.
+            std_outfile (:obj:`str`, optional):
+                Filename for the standard star spec1d file. Passed
+                directly to :func:`get_std_trace`.
+
+        Returns:
+            tuple: The :class:`pypeit.spec2dobj.Spec2DObj` and
+            :class:`pypeit.specobjs.SpecObjs` objects for this
+            exposure/detector pair.
+        """
+        msgs.info("Working on detector {0}".format(det))
+        with profiling.profiler.step('reduce_detector', frame=self.fitstbl['filename'][frames[0]],
+                                     det=det):
+            # Instantiate Calibrations class
+            self.caliBrate = calibrations.Calibrations.get_instance(
+                self.fitstbl, self.par['calibrations'], self.spectrograph,
+                self.calibrations_path, qadir=self.qa_path, reuse_masters=self.reuse_masters,
+                show=self.show, slitspat_num=self.par['rdx']['slitspatnum'],
+                reuse_files=self.calib_masters)
+            # These need to be separate to accomodate COADD2D
+            self.caliBrate.set_config(frames[0], det, self.par['calibrations'])
+            self.caliBrate.run_the_steps()
+            # Extract
+            # TODO: pass back the background frame, pass in background
+            # files as an argument. extract one takes a file list as an
+            # argument and instantiates science within
+            return self.reduce_one(frames, det, bg_frames, std_outfile=std_outfile)
+
     def get_sci_metadata(self, frame, det):
         """
         Grab the meta data for a given science frame and specific detector
@@ -599,25 +855,27 @@ class PypeIt(object):
 
         # Build Science image
         sci_files = self.fitstbl.frame_paths(frames)
-        sciImg = buildimage.buildimage_fromlist(
-            self.spectrograph, det, frame_par,
-            sci_files, bias=self.caliBrate.msbias, bpm=self.caliBrate.msbpm,
-            dark=self.caliBrate.msdark,
-            flatimages=self.caliBrate.flatimages,
-            slits=self.caliBrate.slits,  # For flexure correction
-            ignore_saturation=False)
+        with profiling.profiler.step('reduce.buildimage'):
+            sciImg = buildimage.buildimage_fromlist(
+                self.spectrograph, det, frame_par,
+                sci_files, bias=self.caliBrate.msbias, bpm=self.caliBrate.msbpm,
+                dark=self.caliBrate.msdark,
+                flatimages=self.caliBrate.flatimages,
+                slits=self.caliBrate.slits,  # For flexure correction
+                ignore_saturation=False)
 
         # Background Image?
         if len(bg_frames) > 0:
             bg_file_list = self.fitstbl.frame_paths(bg_frames)
-            sciImg = sciImg.sub(
-                buildimage.buildimage_fromlist(
-                self.spectrograph, det, frame_par,bg_file_list,
-                bpm=self.caliBrate.msbpm, bias=self.caliBrate.msbias,
-                dark=self.caliBrate.msdark,
-                flatimages=self.caliBrate.flatimages,
-                slits=self.caliBrate.slits,  # For flexure correction
-                ignore_saturation=False), frame_par['process'])
+            with profiling.profiler.step('reduce.buildimage_bkg'):
+                sciImg = sciImg.sub(
+                    buildimage.buildimage_fromlist(
+                    self.spectrograph, det, frame_par,bg_file_list,
+                    bpm=self.caliBrate.msbpm, bias=self.caliBrate.msbias,
+                    dark=self.caliBrate.msdark,
+                    flatimages=self.caliBrate.flatimages,
+                    slits=self.caliBrate.slits,  # For flexure correction
+                    ignore_saturation=False), frame_par['process'])
 
         # Instantiate Reduce object
         # Required for pypeline specific object
@@ -698,7 +956,15 @@ class PypeIt(object):
 
         """
         # TODO: Need some checks here that the exposure has been reduced?
+        with profiling.profiler.step('io.write_exposure', frame=self.fitstbl['filename'][frame]):
+            self._save_exposure(frame, all_spec2d, all_specobjs, basename)
+
+    def _save_exposure(self, frame, all_spec2d, all_specobjs, basename):
+        """
+        Save the outputs from extraction for a given exposure.
 
+        See :func:`save_exposure`.
+        """
         # Determine the headers
         row_fitstbl = self.fitstbl[frame]
         # Need raw file header information
@@ -733,6 +999,17 @@ class PypeIt(object):
         all_spec2d.write_to_fits(outfile2d, pri_hdr=pri_hdr, update_det=self.par['rdx']['detnum'])
 
 
+    def write_profile(self):
+        """
+        Write the profiling report, if requested by ``rdx.profile``.
+
+        See :mod:`pypeit.profiling`.
+        """
+        if self.par['rdx']['profile'] is None:
+            return
+        profiling.profiler.write(os.path.join(self.par['rdx']['redux_path'],
+                                              self.par['rdx']['profile']))
+
     def msgs_reset(self):
         """
         Reset the msgs object
@@ -769,8 +1046,47 @@ class PypeIt(object):
         indx = self.fitstbl.find_frames('science')
         print(self.fitstbl[['target','ra','dec','exptime','dispname']][indx])
 
+    def __getstate__(self):
+        # Do not pickle the calibrations and reduction of the previous
+        # detector when shipping the object to the worker processes
+        state = self.__dict__.copy()
+        state.pop('caliBrate', None)
+        state.pop('redux', None)
+        return state
+
     def __repr__(self):
         # Generate sets string
         return '<{:s}: pypeit_file={}>'.format(self.__class__.__name__, self.pypeit_file)
 
 
+def _reduce_detector(pypeIt, frames, det, bg_frames, std_outfile):
+    """
+    Worker function used by :func:`PypeIt.reduce_exposure` to reduce a
+    single detector in a separate process.
+
+    Args:
+        pypeIt (:class:`PypeIt`):
+            The (pickled copy of the) object performing the reduction.
+        frames (:obj:`list`):
+            List of frames to extract.
+        det (:obj:`int`):
+            Detector number (1-indexed)
+        bg_frames (:obj:`list`):
+            List of frames to use as the background.
+        std_outfile (:obj:`str`):
+            Filename for the standard star spec1d file.
+
+    Returns:
+        tuple: The :class:`pypeit.spec2dobj.Spec2DObj` and
+        :class:`pypeit.specobjs.SpecObjs` objects for the detector, the
+        basename of the reduced frame, the dictionary with the master
+        keys used by the calibrations, and the profiling records (see
+        :mod:`pypeit.profiling`) of the reduction.
+    """
+    # Discard any records inherited from the parent process
+    profiling.profiler.pop_records()
+    profiling.profiler.enable(pypeIt.par['rdx']['profile'] is not None)
+    pypeIt.det = det
+    spec2DObj, sobjs = pypeIt.reduce_detector(frames, det, bg_frames, std_outfile=std_outfile)
+    return spec2DObj, sobjs, pypeIt.basename, pypeIt.caliBrate.master_key_dict, \
+                profiling.profiler.pop_records()
@@ -9,6 +9,7 @@ Main driver class for skysubtraction and extraction
 import inspect
 import numpy as np
 import os
+from concurrent import futures
 
 from astropy import stats
 from abc import ABCMeta
@@ -18,7 +19,7 @@ from scipy import interpolate
 from scipy.optimize import least_squares
 
 from pypeit import specobjs
-from pypeit import msgs, utils
+from pypeit import msgs, utils, profiling
 from pypeit import masterframe, flatfield
 from pypeit.display import display
 from pypeit.core import skysub, extract, pixels, wave, flexure, flat
@@ -214,6 +215,9 @@ class Reduce(object):
         # Slitmask
         self.slitmask = self.slits.slit_img(initial=initial, flexure=self.spat_flexure_shift,
                                             exclude_flag=self.slits.bitmask.exclude_for_reducing)
+        # Pixels in each slit; cached by the SlitTraceSet object
+        self.slitpix = self.slits.slit_pixels(initial=initial, flexure=self.spat_flexure_shift,
+                                              exclude_flag=self.slits.bitmask.exclude_for_reducing)
         # Now add the slitmask to the mask (i.e. post CR rejection in proc)
         # NOTE: this uses the par defined by EdgeTraceSet; this will
         # use the tweaked traces if they exist
@@ -221,6 +225,27 @@ class Reduce(object):
 #        # For echelle
 #        self.spatial_coo = self.slits.spatial_coordinates(initial=initial, flexure=self.spat_flexure_shift)
 
+    def slit_thismask(self, slit_spat):
+        """
+        Construct the boolean image selecting the pixels in a slit.
+
+        The image is constructed from the slit pixel indices
+        (:attr:`slitpix`), which avoids comparing the full
+        :attr:`slitmask` image to the slit ID.
+
+        Args:
+            slit_spat (:obj:`int`):
+                The slit ``spat_id``.
+
+        Returns:
+            `numpy.ndarray`_: Boolean image that is True for the pixels
+            in the slit.
+        """
+        thismask = np.zeros(self.slitmask.shape, dtype=bool)
+        if slit_spat in self.slitpix:
+            thismask.reshape(-1)[self.slitpix[slit_spat]] = True
+        return thismask
+
     def parse_manual_dict(self, manual_dict, neg=False):
         """
         Parse the manual dict
@@ -281,7 +306,7 @@ class Reduce(object):
                 sobj = self.sobjs[iobj]
                 plate_scale = self.get_platescale(sobj)
                 # True  = Good, False = Bad for inmask
-                thismask = self.slitmask == sobj.SLITID  # pixels for this slit
+                thismask = self.slit_thismask(sobj.SLITID)  # pixels for this slit
                 inmask = (self.sciImg.fullmask == 0) & thismask
                 # Do it
                 extract.extract_boxcar(self.sciImg.image, self.sciImg.ivar,
@@ -358,33 +383,39 @@ class Reduce(object):
         else:
             tilt_flexure_shift = self.spat_flexure_shift
         msgs.info("Generating tilts image")
-        self.tilts = self.waveTilts.fit2tiltimg(self.slitmask, flexure=tilt_flexure_shift)
+        with profiling.profiler.step('reduce.tilts'):
+            self.tilts = self.waveTilts.fit2tiltimg(self.slitmask, flexure=tilt_flexure_shift)
 
         # Wavelengths (on unmasked slits)
         msgs.info("Generating wavelength image")
-        self.waveimg = self.wv_calib.build_waveimg(self.tilts, self.slits, spat_flexure=self.spat_flexure_shift)
+        with profiling.profiler.step('reduce.waveimg'):
+            self.waveimg = self.wv_calib.build_waveimg(self.tilts, self.slits,
+                                                       spat_flexure=self.spat_flexure_shift)
 
         # First pass object finding
-        self.sobjs_obj, self.nobj, skymask_init = \
-            self.find_objects(self.sciImg.image, std_trace=std_trace,
-                              show_peaks=show_peaks,
-                              show=self.reduce_show & (not self.std_redux),
-                              manual_extract_dict=self.par['reduce']['extraction']['manual'].dict_for_objfind())
+        with profiling.profiler.step('reduce.find_objects'):
+            self.sobjs_obj, self.nobj, skymask_init = \
+                self.find_objects(self.sciImg.image, std_trace=std_trace,
+                                  show_peaks=show_peaks,
+                                  show=self.reduce_show & (not self.std_redux),
+                                  manual_extract_dict=self.par['reduce']['extraction']['manual'].dict_for_objfind())
 
         # Check if the user wants to overwrite the skymask with a pre-defined sky regions file
         skymask_init, usersky = self.load_skyregions(skymask_init)
 
         # Global sky subtract
-        self.initial_sky = self.global_skysub(skymask=skymask_init).copy()
+        with profiling.profiler.step('reduce.global_skysub'):
+            self.initial_sky = self.global_skysub(skymask=skymask_init).copy()
 
         # Second pass object finding on sky-subtracted image
         if (not self.std_redux) and (not self.par['reduce']['findobj']['skip_second_find']):
-            self.sobjs_obj, self.nobj, self.skymask = \
-                self.find_objects(self.sciImg.image - self.initial_sky,
-                                  std_trace=std_trace,
-                                  show=self.reduce_show,
-                                  show_peaks=show_peaks,
-                                  manual_extract_dict=self.par['reduce']['extraction']['manual'].dict_for_objfind())
+            with profiling.profiler.step('reduce.find_objects'):
+                self.sobjs_obj, self.nobj, self.skymask = \
+                    self.find_objects(self.sciImg.image - self.initial_sky,
+                                      std_trace=std_trace,
+                                      show=self.reduce_show,
+                                      show_peaks=show_peaks,
+                                      manual_extract_dict=self.par['reduce']['extraction']['manual'].dict_for_objfind())
         else:
             msgs.info("Skipping 2nd run of finding objects")
 
@@ -400,23 +431,28 @@ class Reduce(object):
                     self.par['reduce']['findobj']['skip_second_find'] or usersky):
                 self.global_sky = self.initial_sky.copy()
             else:
-                self.global_sky = self.global_skysub(skymask=self.skymask, show=self.reduce_show)
+                with profiling.profiler.step('reduce.global_skysub'):
+                    self.global_sky = self.global_skysub(skymask=self.skymask,
+                                                         show=self.reduce_show)
 
             # Apply a global flexure correction to each slit
             # provided it's not a standard star
             if self.par['flexure']['spec_method'] != 'skip' and not self.std_redux:
-                self.spec_flexure_correct(mode='global')
+                with profiling.profiler.step('reduce.flexure'):
+                    self.spec_flexure_correct(mode='global')
 
             # Extract + Return
-            self.skymodel, self.objmodel, self.ivarmodel, self.outmask, self.sobjs \
-                = self.extract(self.global_sky, self.sobjs_obj)
+            with profiling.profiler.step('reduce.local_skysub_extract'):
+                self.skymodel, self.objmodel, self.ivarmodel, self.outmask, self.sobjs \
+                    = self.extract(self.global_sky, self.sobjs_obj)
             if self.ir_redux:
                 self.sobjs.make_neg_pos() if return_negative else self.sobjs.purge_neg()
         else:  # No objects, pass back what we have
             # Apply a global flexure correction to each slit
             # provided it's not a standard star
             if self.par['flexure']['spec_method'] != 'skip' and not self.std_redux:
-                self.spec_flexure_correct(mode='global')
+                with profiling.profiler.step('reduce.flexure'):
+                    self.spec_flexure_correct(mode='global')
             #Could have negative objects but no positive objects so purge them
             if self.ir_redux:
                 self.sobjs_obj.make_neg_pos() if return_negative else self.sobjs_obj.purge_neg()
@@ -440,10 +476,12 @@ class Reduce(object):
             msgs.warn('No objects to extract!')
         elif self.par['flexure']['spec_method'] not in ['skip', 'slitcen'] and not self.std_redux:
             # Apply a refined estimate of the flexure to objects, and then apply reference frame correction to objects
-            self.spec_flexure_correct(mode='local', sobjs=self.sobjs)
+            with profiling.profiler.step('reduce.flexure'):
+                self.spec_flexure_correct(mode='local', sobjs=self.sobjs)
 
         # Apply a reference frame correction to each object and the waveimg
-        self.refframe_correct(ra, dec, obstime, sobjs=self.sobjs)
+        with profiling.profiler.step('reduce.refframe'):
+            self.refframe_correct(ra, dec, obstime, sobjs=self.sobjs)
 
         # Update the mask
         reduce_masked = np.where(np.invert(self.reduce_bpm_init) & self.reduce_bpm)[0]
@@ -563,28 +601,31 @@ class Reduce(object):
         # Mask objects using the skymask? If skymask has been set by objfinding, and masking is requested, then do so
         skymask_now = skymask if (skymask is not None) else np.ones_like(self.sciImg.image, dtype=bool)
 
-        # Loop on slits
-        for slit_idx in gdslits:
-            slit_spat = self.slits.spat_id[slit_idx]
-            msgs.info("Global sky subtraction for slit: {:d}".format(slit_idx))
-            thismask = self.slitmask == slit_spat
-            inmask = (self.sciImg.fullmask == 0) & thismask & skymask_now
-            # All masked?
-            if not np.any(inmask):
-                msgs.warn("No pixels for fitting sky.  If you are using mask_by_boxcar=True, your radius may be too large.")
+        # Fit the sky in each slit.  The slits are independent, such that
+        # they can be fit by concurrent threads.  The fits are assembled
+        # in the slit order, such that the result does not depend on the
+        # number of threads.
+        n_threads = 1 if show_fit \
+                        else min(self.par['reduce']['skysub']['n_threads'], max(gdslits.size, 1))
+        context = profiling.profiler.context()
+        fit_slit = lambda slit_idx: self._global_skysub_slit(slit_idx, skymask_now, sigrej,
+                                                             show_fit=show_fit, context=context)
+        if n_threads > 1:
+            msgs.info('Fitting the global sky of {0} slits using {1} threads'.format(
+                      gdslits.size, n_threads))
+            with futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+                fits = list(executor.map(fit_slit, gdslits))
+        else:
+            fits = map(fit_slit, gdslits)
+
+        for slit_idx, (thismask, sky) in zip(gdslits, fits):
+            if sky is None:
+                # All masked
                 self.reduce_bpm[slit_idx] = True
                 continue
-
-            # Find sky
-            self.global_sky[thismask] = skysub.global_skysub(self.sciImg.image, self.sciImg.ivar, self.tilts,
-                                                             thismask, self.slits_left[:,slit_idx],
-                                                             self.slits_right[:,slit_idx],
-                                                             inmask=inmask, sigrej=sigrej,
-                                                             bsp=self.par['reduce']['skysub']['bspline_spacing'],
-                                                             no_poly=self.par['reduce']['skysub']['no_poly'],
-                                                             pos_mask=(not self.ir_redux), show_fit=show_fit)
+            self.global_sky[thismask] = sky
             # Mask if something went wrong
-            if np.sum(self.global_sky[thismask]) == 0.:
+            if np.sum(sky) == 0.:
                 self.reduce_bpm[slit_idx] = True
 
         if update_crmask and self.par['scienceframe']['process']['mask_cr']:
@@ -605,6 +646,50 @@ class Reduce(object):
         # Return
         return self.global_sky
 
+    def _global_skysub_slit(self, slit_idx, skymask, sigrej, show_fit=False, context=None):
+        """
+        Fit the global sky of a single slit.
+
+        Wrapper to skysub.global_skysub
+
+        Args:
+            slit_idx (:obj:`int`):
+                Index of the slit.
+            skymask (`numpy.ndarray`_):
+                A 2D boolean image indicating the sky regions (True=sky).
+            sigrej (:obj:`float`):
+                Rejection threshold for the sky fit.
+            show_fit (:obj:`bool`, optional):
+                Show the fit.
+            context (:obj:`dict`, optional):
+                The profiling context of the calling thread; see
+                :func:`pypeit.profiling.Profiler.context`.
+
+        Returns:
+            :obj:`tuple`: The boolean image selecting the slit pixels
+            and the sky model at those pixels.  The latter is None if
+            all sky pixels in the slit are masked.
+        """
+        slit_spat = self.slits.spat_id[slit_idx]
+        msgs.info("Global sky subtraction for slit: {:d}".format(slit_idx))
+        thismask = self.slit_thismask(slit_spat)
+        inmask = (self.sciImg.fullmask == 0) & thismask & skymask
+        # All masked?
+        if not np.any(inmask):
+            msgs.warn("No pixels for fitting sky.  If you are using mask_by_boxcar=True, your radius may be too large.")
+            return thismask, None
+
+        # Find sky
+        with profiling.profiler.step('reduce.global_skysub.slit', slit=int(slit_spat),
+                                     context=context):
+            return thismask, skysub.global_skysub(
+                        self.sciImg.image, self.sciImg.ivar, self.tilts, thismask,
+                        self.slits_left[:,slit_idx], self.slits_right[:,slit_idx],
+                        inmask=inmask, sigrej=sigrej,
+                        bsp=self.par['reduce']['skysub']['bspline_spacing'],
+                        no_poly=self.par['reduce']['skysub']['no_poly'],
+                        pos_mask=(not self.ir_redux), show_fit=show_fit)
+
     def local_skysub_extract(self, global_sky, sobjs,
                              model_noise=True, spat_pix=None,
                              show_profile=False, show_resids=False, show=False):
@@ -708,7 +793,7 @@ class Reduce(object):
                         slit_specs.append(None)
                         continue
                     slit_spat = self.slits.spat_id[ss]
-                    thismask = (self.slitmask == slit_spat)
+                    thismask = self.slit_thismask(slit_spat)
                     box_denom = moment1d(self.waveimg * thismask > 0.0, trace_spat[:, ss], 2, row=trace_spec)[0]
                     wghts = (box_denom + (box_denom == 0.0))
                     slit_sky = moment1d(self.global_sky * thismask, trace_spat[:, ss], 2, row=trace_spec)[0] / wghts
@@ -999,7 +1084,7 @@ class MultiSlitReduce(Reduce):
             slit_spat = self.slits.spat_id[slit_idx]
             qa_title ="Finding objects on slit # {:d}".format(slit_spat)
             msgs.info(qa_title)
-            thismask = self.slitmask == slit_spat
+            thismask = self.slit_thismask(slit_spat)
             inmask = (self.sciImg.fullmask == 0) & thismask
             # Find objects
             specobj_dict = {'SLITID': slit_spat,
@@ -1086,32 +1171,32 @@ class MultiSlitReduce(Reduce):
         # Could actually create a model anyway here, but probably
         # overkill since nothing is extracted
         self.sobjs = sobjs.copy()  # WHY DO WE CREATE A COPY HERE?
-        # Loop on slits
-        for slit_idx in gdslits:
-            slit_spat = self.slits.spat_id[slit_idx]
-            msgs.info("Local sky subtraction and extraction for slit: {:d}".format(slit_spat))
-            thisobj = self.sobjs.SLITID == slit_spat    # indices of objects for this slit
-            if np.any(thisobj):
-                thismask = self.slitmask == slit_spat   # pixels for this slit
-                # True  = Good, False = Bad for inmask
-                ingpm = (self.sciImg.fullmask == 0) & thismask
-                # Local sky subtraction and extraction
-                self.skymodel[thismask], self.objmodel[thismask], self.ivarmodel[thismask], \
-                    self.extractmask[thismask] = skysub.local_skysub_extract(
-                    self.sciImg.image, self.sciImg.ivar, self.tilts, self.waveimg,
-                    self.global_sky, self.sciImg.rn2img,
-                    thismask, self.slits_left[:,slit_idx], self.slits_right[:, slit_idx],
-                    self.sobjs[thisobj], ingpm,
-                    spat_pix=spat_pix,
-                    model_full_slit=self.par['reduce']['extraction']['model_full_slit'],
-                    box_rad=self.par['reduce']['extraction']['boxcar_radius']/self.get_platescale(None),
-                    sigrej=self.par['reduce']['skysub']['sky_sigrej'],
-                    model_noise=model_noise, std=self.std_redux,
-                    bsp=self.par['reduce']['skysub']['bspline_spacing'],
-                    sn_gauss=self.par['reduce']['extraction']['sn_gauss'],
-                    show_profile=show_profile,
-                    use_2dmodel_mask=self.par['reduce']['extraction']['use_2dmodel_mask'],
-                    no_local_sky=self.par['reduce']['skysub']['no_local_sky'])
+
+        # Reduce the slits with objects.  The slits are independent, such
+        # that they can be reduced by concurrent threads; the objects of
+        # each slit are updated in place.  The models are assembled in the
+        # slit order, such that the result does not depend on the number
+        # of threads.
+        gdslits = [slit_idx for slit_idx in gdslits
+                    if np.any(self.sobjs.SLITID == self.slits.spat_id[slit_idx])]
+        n_threads = 1 if show_profile \
+                        else min(self.par['reduce']['skysub']['n_threads'], max(len(gdslits), 1))
+        context = profiling.profiler.context()
+        reduce_slit = lambda slit_idx: self._local_skysub_extract_slit(
+                                            slit_idx, spat_pix=spat_pix, model_noise=model_noise,
+                                            show_profile=show_profile, context=context)
+        if n_threads > 1:
+            msgs.info('Reducing {0} slits using {1} threads'.format(len(gdslits), n_threads))
+            with futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+                models = list(executor.map(reduce_slit, gdslits))
+        else:
+            models = map(reduce_slit, gdslits)
+
+        for thismask, (skymodel, objmodel, ivarmodel, extractmask) in models:
+            self.skymodel[thismask] = skymodel
+            self.objmodel[thismask] = objmodel
+            self.ivarmodel[thismask] = ivarmodel
+            self.extractmask[thismask] = extractmask
 
         # Set the bit for pixels which were masked by the extraction.
         # For extractmask, True = Good, False = Bad
@@ -1128,6 +1213,55 @@ class MultiSlitReduce(Reduce):
         # Return
         return self.skymodel, self.objmodel, self.ivarmodel, self.outmask, self.sobjs
 
+    def _local_skysub_extract_slit(self, slit_idx, spat_pix=None, model_noise=True,
+                                   show_profile=False, context=None):
+        """
+        Perform local sky subtraction, profile fitting, and optimal
+        extraction of the objects in a single slit.
+
+        Wrapper to skysub.local_skysub_extract.  The objects in
+        :attr:`sobjs` are updated in place.
+
+        Args:
+            slit_idx (:obj:`int`):
+                Index of the slit.
+            spat_pix (`numpy.ndarray`_, optional):
+            model_noise (:obj:`bool`, optional):
+            show_profile (:obj:`bool`, optional):
+            context (:obj:`dict`, optional):
+                The profiling context of the calling thread; see
+                :func:`pypeit.profiling.Profiler.context`.
+
+        Returns:
+            :obj:`tuple`: The boolean image selecting the slit pixels and
+            the tuple with the sky model, object model, model inverse
+            variance, and extraction mask at those pixels.
+        """
+        slit_spat = self.slits.spat_id[slit_idx]
+        msgs.info("Local sky subtraction and extraction for slit: {:d}".format(slit_spat))
+        thisobj = self.sobjs.SLITID == slit_spat    # indices of objects for this slit
+        thismask = self.slit_thismask(slit_spat)   # pixels for this slit
+        # True  = Good, False = Bad for inmask
+        ingpm = (self.sciImg.fullmask == 0) & thismask
+        # Local sky subtraction and extraction
+        with profiling.profiler.step('reduce.local_skysub_extract.slit', slit=int(slit_spat),
+                                     context=context):
+            return thismask, skysub.local_skysub_extract(
+                        self.sciImg.image, self.sciImg.ivar, self.tilts, self.waveimg,
+                        self.global_sky, self.sciImg.rn2img,
+                        thismask, self.slits_left[:,slit_idx], self.slits_right[:, slit_idx],
+                        self.sobjs[thisobj], ingpm,
+                        spat_pix=spat_pix,
+                        model_full_slit=self.par['reduce']['extraction']['model_full_slit'],
+                        box_rad=self.par['reduce']['extraction']['boxcar_radius']/self.get_platescale(None),
+                        sigrej=self.par['reduce']['skysub']['sky_sigrej'],
+                        model_noise=model_noise, std=self.std_redux,
+                        bsp=self.par['reduce']['skysub']['bspline_spacing'],
+                        sn_gauss=self.par['reduce']['extraction']['sn_gauss'],
+                        show_profile=show_profile,
+                        use_2dmodel_mask=self.par['reduce']['extraction']['use_2dmodel_mask'],
+                        no_local_sky=self.par['reduce']['skysub']['no_local_sky'])
+
 
 class EchelleReduce(Reduce):
     """
@@ -1295,7 +1429,8 @@ class EchelleReduce(Reduce):
                                                   model_full_slit=model_full_slit,
                                                   model_noise=model_noise,
                                                   show_profile=show_profile,
-                                                  show_resids=show_resids, show_fwhm=show_fwhm)
+                                                  show_resids=show_resids, show_fwhm=show_fwhm,
+                                                  n_threads=self.par['reduce']['skysub']['n_threads'])
 
         # Step
         self.steps.append(inspect.stack()[0][3])
@@ -311,24 +311,23 @@ def coadd_cube(files, parset, overwrite=False):
         pix_coord = wcs.wcs_world2pix(np.vstack((all_ra, all_dec, all_wave*1.0E-10)).T, 0)
         hdr = wcs.to_header()
 
-    # Find the NGP coordinates for all input pixels
-    msgs.info("Generating data cube")
+    # Find the NGP coordinates for all input pixels, and accumulate the
+    # flux, weights, and variance (including weights) in a single pass
+    msgs.info("Generating data and variance cubes")
     bins = (xbins, ybins, spec_bins)
-    datacube, edges = np.histogramdd(pix_coord, bins=bins, weights=all_sci*all_wghts)
-    norm, edges = np.histogramdd(pix_coord, bins=bins, weights=all_wghts)
+    dtype = np.float32 if cubepar['single_precision'] else np.float64
+    all_var = (all_ivar > 0) / (all_ivar + (all_ivar == 0))
+    _sci, _wghts, _var = [arr.astype(dtype, copy=False) for arr in [all_sci, all_wghts, all_var]]
+    datacube, norm, var_cube = dc_utils.histogram_cube(pix_coord, bins,
+                                                       [_sci*_wghts, _wghts, _var*_wghts**2], dtype=dtype)
     norm_cube = (norm > 0) / (norm + (norm == 0))
     datacube *= norm_cube
-    # Create the variance cube, including weights
-    msgs.info("Generating variance cube")
-    all_var = (all_ivar > 0) / (all_ivar + (all_ivar == 0))
-    var_cube, edges = np.histogramdd(pix_coord, bins=bins, weights=all_var * all_wghts**2)
     var_cube *= norm_cube**2
 
     # Save the datacube
     debug = False
     if debug:
-        datacube_resid, edges = np.histogramdd(pix_coord, bins=(xbins, ybins, spec_bins), weights=all_sci*np.sqrt(all_ivar))
-        norm, edges = np.histogramdd(pix_coord, bins=(xbins, ybins, spec_bins))
+        datacube_resid, norm = dc_utils.histogram_cube(pix_coord, bins, [all_sci*np.sqrt(all_ivar), None])
         norm_cube = (norm > 0) / (norm + (norm == 0))
         outfile = "datacube_resid.fits"
         msgs.info("Saving datacube as: {0:s}".format(outfile))
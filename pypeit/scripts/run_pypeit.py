@@ -54,6 +54,10 @@ def parse_args(options=None, return_parser=False):
     # JFH Should the default now be true with the new definition.
     parser.add_argument('-o', '--overwrite', default=False, action='store_true',
                         help='Overwrite any existing files/directories')
+    parser.add_argument('-u', '--skip_unchanged', default=False, action='store_true',
+                        help='Only reduce exposures whose raw frames, calibrations, or reduction '
+                             'parameters have changed since they were last reduced; takes '
+                             'precedence over -o')
     group = parser.add_mutually_exclusive_group()
 #    group.add_argument('-p', '--prep_setup', default=False, action='store_true',
 #                       help='Run pypeit to prepare the setup only')
@@ -98,6 +102,7 @@ def main(args):
     pypeIt = pypeit.PypeIt(args.pypeit_file, verbosity=args.verbosity,
                            reuse_masters=~args.do_not_reuse_masters,
                            overwrite=args.overwrite,
+                           skip_unchanged=args.skip_unchanged,
                            redux_path=args.redux_path,
                            calib_only=args.calib_only,
                            logname=logname, show=args.show)
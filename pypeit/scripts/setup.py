@@ -42,6 +42,12 @@ def parse_args(options=None, return_parser=False):
                         help='Include the background-pair columns for the user to edit')
     parser.add_argument('-v', '--verbosity', type=int, default=2,
                         help='Level of verbosity from 0 to 2.')
+    parser.add_argument('--header_threads', type=int, default=1,
+                        help='Number of threads used to read the file headers.')
+    parser.add_argument('--meta_cache', default=None, type=str,
+                        help='File used to cache the metadata read from the file headers.  '
+                             'If provided, only new or modified files are read when the '
+                             'script is re-run.')
 
     if return_parser:
         return parser
@@ -72,6 +78,8 @@ def main(args):
     # Initialize PypeItSetup based on the arguments
     ps = PypeItSetup.from_file_root(args.root, args.spectrograph, extension=args.extension,
                                     output_path=sort_dir)
+    ps.par['rdx']['header_threads'] = args.header_threads
+    ps.par['rdx']['meta_cache'] = args.meta_cache
     # Run the setup
     ps.run(setup_only=True, sort_dir=sort_dir, write_bkg_pairs=args.background, obslog=True)
 
@@ -312,7 +312,9 @@ class IR(SensFunc):
             #delta_coeff_bounds=self.par['IR']['delta_coeff_bounds'],
             #minmax_coeff_bounds=self.par['IR']['min_max_coeff_bounds'],
             tol=self.par['IR']['tol'], popsize=self.par['IR']['popsize'], recombination=self.par['IR']['recombination'],
-            polish=self.par['IR']['polish'],
+            polish=self.par['IR']['polish'], vectorized=self.par['IR']['vectorized'],
+            n_workers=self.par['IR']['n_workers'], resln_quantum=self.par['IR']['resln_quantum'],
+            tell_cache_mem=self.par['IR']['tell_cache_mem'],
             disp=self.par['IR']['disp'], debug=self.debug)
         # Add the algorithm to the meta_table
         meta_table['ALGORITHM'] = self.par['algorithm']
@@ -6,6 +6,9 @@ Implements the objects used to hold slit edge data.
 
 """
 import inspect
+import hashlib
+import threading
+from collections import OrderedDict
 
 from IPython import embed
 
@@ -21,6 +24,10 @@ from pypeit import datamodel
 from pypeit.bitmask import BitMask
 from pypeit.spectrographs import slitmask
 
+# Guards the slit pixel caches (see SlitTraceSet.slit_pixels) against
+# concurrent use by threads fitting independent slits
+_slit_pixels_lock = threading.Lock()
+
 
 class SlitTraceBitMask(BitMask):
     """
@@ -249,9 +256,14 @@ class SlitTraceSet(datamodel.DataContainer):
         if self.mask is None:
             self.mask = self.mask_init.copy()
 
+    # Maximum number of slit pixel indices cached by slit_pixels
+    _max_cached_pixels = 4
+
     def _init_internals(self):
         self.left_flexure = None
         self.right_flexure = None
+        # Cache with the slit pixel indices; see slit_pixels
+        self._slit_pixels_cache = OrderedDict()
         # Master stuff
         self.master_key = None
         self.master_dir = None
@@ -486,6 +498,148 @@ class SlitTraceSet(datamodel.DataContainer):
         # Return
         return left.copy(), right.copy(), self.mask.copy()
 
+    def checksum(self, initial=False, flexure=None):
+        """
+        Compute a checksum of the slit traces.
+
+        The checksum includes the selected slit edges, the slit IDs,
+        the spectral limits, and the slit mask, such that it changes
+        whenever any of these are modified.  It is used to key cached
+        products that depend on the slits.
+
+        Args:
+            initial (:obj:`bool`, optional):
+                Use the initial edges regardless of the presence of the
+                tweaked edges.  See :func:`select_edges`.
+            flexure (:obj:`float`, optional):
+                Spatial flexure shift applied to the slit edges.
+
+        Returns:
+            :obj:`str`: The hexadecimal MD5 checksum.
+        """
+        left, right, mask = self.select_edges(initial=initial, flexure=flexure)
+        checksum = hashlib.md5()
+        checksum.update(np.array([self.nspec, self.nspat]).tobytes())
+        for arr in [left, right, mask, self.specmin, self.specmax, self.spat_id]:
+            checksum.update(np.ascontiguousarray(arr).tobytes())
+        return checksum.hexdigest()
+
+    def slit_pixels(self, pad=None, slitidx=None, initial=False, flexure=None,
+                    exclude_flag=None):
+        r"""
+        Find the pixels associated with each slit.
+
+        This is the sparse equivalent of :func:`slit_img`: instead of an
+        image with the slit associated with each pixel, the method
+        returns the flattened (row-major) indices of the pixels in each
+        slit.  Pixels falling in more than one slit (because of the
+        padding) are associated with the last slit, the same as in
+        :func:`slit_img`.  The indices are used to gather and scatter the
+        on-slit pixels of an image with shape :math:`(N_{\rm spec},
+        N_{\rm spat})`; e.g.::
+
+            pixels = slits.slit_pixels(flexure=flexure)
+            waveimg = np.zeros(tilts.shape, dtype=float)
+            for spat_id, indx in pixels.items():
+                waveimg.flat[indx] = wave_fit[spat_id].eval(tilts.flat[indx])
+
+        The pixel spans of each slit are computed row by row from the
+        slit edges, such that the cost scales with the number of on-slit
+        pixels instead of the number of slits times the number of
+        detector pixels.  The result is cached based on the input
+        arguments (including the flexure shift) and a checksum of the
+        slit edges, such that repeated calls with the same slits are
+        essentially free.  The returned arrays are read-only.
+
+        Args:
+            pad (:obj:`float`, :obj:`int`, :obj:`tuple`, optional):
+                The number of pixels used to pad (extend) the edge of
+                each slit.  See :func:`slit_img`.
+            slitidx (:obj:`int`, array_like, optional):
+                List of indexes (zero-based) to include.  If None, all
+                slits not flagged are included.
+            initial (:obj:`bool`, optional):
+                Use the initial edges regardless of the presence of the
+                tweaked edges.  See :func:`select_edges`.
+            flexure (:obj:`float`, optional):
+                Spatial flexure shift applied to the slit edges.
+            exclude_flag (:obj:`str`, optional):
+                Bitmask flag to ignore when masking.  Cannot be used
+                with ``slitidx``.
+
+        Returns:
+            :obj:`dict`: The flattened indices of the pixels in each
+            slit, keyed by the slit ``spat_id``, in the order of the
+            selected slits.  The indices are sorted.
+        """
+        if slitidx is not None and exclude_flag is not None:
+            msgs.error("Cannot pass in both slitidx and exclude_flag!")
+        # Check the input
+        if pad is None:
+            pad = self.pad
+        _pad = pad if isinstance(pad, tuple) else (pad,pad)
+        if len(_pad) != 2:
+            msgs.error('Padding for both left and right edges should be provided as a 2-tuple!')
+
+        left, right, _ = self.select_edges(initial=initial, flexure=flexure)
+
+        # Choose the slits to use
+        if slitidx is not None:
+            slitidx = np.atleast_1d(slitidx).ravel()
+        else:
+            bpm = self.mask.astype(bool)
+            if exclude_flag:
+                bpm &= np.invert(self.bitmask.flagged(self.mask, flag=exclude_flag))
+            slitidx = np.where(np.invert(bpm))[0]
+
+        # Check the cache.  The checksum guards against edges that have
+        # changed since the indices were cached (e.g., after tweaking).
+        key = (tuple(float(p) for p in _pad), tuple(slitidx.tolist()), initial,
+               None if flexure is None else float(flexure),
+               self.checksum(initial=initial, flexure=flexure))
+        with _slit_pixels_lock:
+            if key in self._slit_pixels_cache:
+                self._slit_pixels_cache.move_to_end(key)
+                return self._slit_pixels_cache[key]
+
+        # Pixels in each row are within the open interval (left-pad,
+        # right+pad), limited by the minimum and maximum spectral
+        # position.
+        spec = np.arange(self.nspec)
+        _left = left[:,slitidx] - _pad[0]
+        _right = right[:,slitidx] + _pad[1]
+        offslit = np.logical_not(np.isfinite(_left) & np.isfinite(_right)) \
+                    | (spec[:,None] <= self.specmin[None,slitidx]) \
+                    | (spec[:,None] >= self.specmax[None,slitidx])
+        _left[offslit] = 0.
+        _right[offslit] = 0.
+        start = np.clip(np.floor(_left).astype(int) + 1, 0, self.nspat)
+        end = np.clip(np.ceil(_right).astype(int), 0, self.nspat)
+        npix = np.where(offslit, 0, np.clip(end - start, 0, None))
+
+        # Flattened pixel indices of each slit and the slit that owns
+        # each pixel; later slits take precedence
+        owner = np.full(self.nspec*self.nspat, -1, dtype=int)
+        indices = []
+        for i in range(slitidx.size):
+            cumpix = np.cumsum(npix[:,i])
+            indx = np.arange(cumpix[-1]) + np.repeat(spec*self.nspat + start[:,i] - cumpix
+                                                     + npix[:,i], npix[:,i])
+            owner[indx] = i
+            indices += [indx]
+
+        pixels = OrderedDict()
+        for i, indx in enumerate(indices):
+            indx = indx[owner[indx] == i]
+            indx.flags.writeable = False
+            pixels[self.spat_id[slitidx[i]]] = indx
+
+        with _slit_pixels_lock:
+            self._slit_pixels_cache[key] = pixels
+            if len(self._slit_pixels_cache) > self._max_cached_pixels:
+                self._slit_pixels_cache.popitem(last=False)
+        return pixels
+
     def slit_img(self, pad=None, slitidx=None, initial=False, flexure=None,
                  exclude_flag=None, use_spatial=True):
         r"""
@@ -503,6 +657,10 @@ class SlitTraceSet(datamodel.DataContainer):
         This value can be overridden using the method keyword
         argument.
 
+        The image is constructed from the (cached) pixel indices
+        returned by :func:`slit_pixels`; use those directly to avoid
+        comparing the full image to each slit ID.
+
         .. warning::
 
             - The function does not check that pixels end up in
@@ -542,43 +700,12 @@ class SlitTraceSet(datamodel.DataContainer):
             `numpy.ndarray`_: The image with the slit index
             identified for each pixel.
         """
-        #
-        if slitidx is not None and exclude_flag is not None:
-            msgs.error("Cannot pass in both slitidx and exclude_flag!")
-        # Check the input
-        if pad is None:
-            pad = self.pad
-        _pad = pad if isinstance(pad, tuple) else (pad,pad)
-        if len(_pad) != 2:
-            msgs.error('Padding for both left and right edges should be provided as a 2-tuple!')
-
-        # Pixel coordinates
-        spat = np.arange(self.nspat)
-        spec = np.arange(self.nspec)
-
-        left, right, _ = self.select_edges(initial=initial, flexure=flexure)
-
-        # Choose the slits to use
-        if slitidx is not None:
-            slitidx = np.atleast_1d(slitidx).ravel()
-        else:
-            bpm = self.mask.astype(bool)
-            if exclude_flag:
-                bpm &= np.invert(self.bitmask.flagged(self.mask, flag=exclude_flag))
-            slitidx = np.where(np.invert(bpm))[0]
-
-        # TODO: When specific slits are chosen, need to check that the
-        # padding doesn't lead to slit overlap.
-
-        # Find the pixels in each slit, limited by the minimum and
-        # maximum spectral position.
+        pixels = self.slit_pixels(pad=pad, slitidx=slitidx, initial=initial, flexure=flexure,
+                                  exclude_flag=exclude_flag)
         slitid_img = np.full((self.nspec,self.nspat), -1, dtype=int)
-        for i in slitidx:
-            slit_id = self.spat_id[i] if use_spatial else i
-            indx = (spat[None,:] > left[:,i,None] - _pad[0]) \
-                        & (spat[None,:] < right[:,i,None] + _pad[1]) \
-                        & (spec > self.specmin[i])[:,None] & (spec < self.specmax[i])[:,None]
-            slitid_img[indx] = slit_id
+        _slitid_img = slitid_img.reshape(-1)
+        for spat_id, indx in pixels.items():
+            _slitid_img[indx] = spat_id if use_spatial else self.spatid_to_zero(spat_id)
         # Return
         return slitid_img
 
@@ -655,16 +782,21 @@ class SlitTraceSet(datamodel.DataContainer):
             # TODO: Shouldn't this fault?
             msgs.warn('Slits {0} have negative (or 0) slit width!'.format(bad_slits))
 
-        # Output image
+        if full:
+            spat = np.arange(self.nspat)
+            i = _slitidx[0]
+            return (spat[None,:] - left[:,i,None])/slitwidth[:,i,None]
+
+        # Output image; only the on-slit pixels are evaluated
         coo_img = np.zeros((self.nspec,self.nspat), dtype=float)
-        spat = np.arange(self.nspat)
+        _coo_img = coo_img.reshape(-1)
+        pixels = slitid_img_pixels(slitid_img)
         for i in _slitidx:
-            coo = (spat[None,:] - left[:,i,None])/slitwidth[:,i,None]
-            if not full:
-                indx = slitid_img == self.spat_id[i]
-                coo_img[indx] = coo[indx]
-            else:
-                coo_img = coo
+            if self.spat_id[i] not in pixels:
+                continue
+            indx = pixels[self.spat_id[i]]
+            spec, spat = np.divmod(indx, self.nspat)
+            _coo_img[indx] = (spat - left[spec,i])/slitwidth[spec,i]
         return coo_img
 
     def spatial_coordinates(self, initial=False, flexure=None):
@@ -938,3 +1070,31 @@ def parse_slitspatnum(slitspatnum):
         spat_ids.append(int(spt[1]))
     # Return
     return np.array(dets).astype(int), np.array(spat_ids).astype(int)
+
+
+def slitid_img_pixels(slitid_img):
+    """
+    Group the pixels of a slit ID image by slit.
+
+    This is the equivalent of :func:`SlitTraceSet.slit_pixels` for an
+    existing slit ID image (e.g., one constructed by
+    :func:`SlitTraceSet.slit_img`), replacing repeated comparisons of
+    the full image with each slit ID by a single sort of the on-slit
+    pixels.
+
+    Args:
+        slitid_img (`numpy.ndarray`_):
+            Image identifying the slit associated with each pixel.
+            Pixels not associated with any slit have a value of -1.
+
+    Returns:
+        :obj:`dict`: The flattened (row-major) indices of the pixels in
+        each slit, keyed by the slit ID in the image, in order of
+        increasing slit ID.  The indices are sorted.
+    """
+    _slitid_img = slitid_img.ravel()
+    indx = np.flatnonzero(_slitid_img >= 0)
+    slit_ids = _slitid_img[indx]
+    srt = np.argsort(slit_ids, kind='stable')
+    slit_ids, start = np.unique(slit_ids[srt], return_index=True)
+    return OrderedDict(zip(slit_ids.tolist(), np.split(indx[srt], start[1:])))
@@ -27,6 +27,7 @@ provide instrument-specific:
 """
 
 from abc import ABCMeta
+from collections import OrderedDict
 
 import numpy as np
 
@@ -117,6 +118,19 @@ class Spectrograph:
     Metadata model that is generic to all spectrographs.
     """
 
+    raw_section_cache_size = 16
+    """
+    Maximum number of detector setups for which the amplifier section
+    images (see :func:`get_raw_section_images`) are cached.  The least
+    recently used setup is dropped when the cache is full.
+    """
+
+    _raw_section_cache = OrderedDict()
+    """
+    Cache with the amplifier section images and the maps used to trim
+    and orient them, shared by all spectrograph objects.
+    """
+
     def __init__(self):
         self.dispname = None
         self.rawdatasec_img = None
@@ -386,9 +400,7 @@ class Spectrograph:
         else:
             detector_par, _,  _, _, rawdatasec_img, _ = self.get_rawimage(filename, det)
             # Trim + reorient
-            trim = procimg.trim_frame(rawdatasec_img, rawdatasec_img < 1)
-            orient = self.orient_image(detector_par, trim)#, det)
-            _shape = orient.shape
+            _shape = self.get_trim_orient_maps(detector_par, rawdatasec_img)[2].shape
 
         # Shape must be defined at this point.
         if _shape is None:
@@ -638,7 +650,9 @@ class Spectrograph:
         detector_par : :class:`pypeit.images.detector_container.DetectorContainer`
             Detector metadata parameters.
         raw_img : `numpy.ndarray`_
-            Raw image for this detector.
+            Raw image for this detector.  The image has the data type
+            of the file and, if possible, is memory-mapped; it should
+            not be modified in place.
         hdu : `astropy.io.fits.HDUList`_
             Opened fits file
         exptime : :obj:`float`
@@ -651,15 +665,21 @@ class Spectrograph:
             Overscan section of the detector as provided by setting the
             (1-indexed) number of the amplifier used to read each detector
             pixel. Pixels unassociated with any amplifier are set to 0.
+            This and ``rawdatasec_img`` are read-only images cached by
+            :func:`get_raw_section_images`.
         """
-        # Open
+        # Open.  By default, astropy memory-maps the data when possible
+        # (i.e., uncompressed and unscaled data), meaning that they are
+        # only read when accessed.
         hdu = io.fits_open(raw_file)
 
         # Grab the DetectorContainer
         detector = self.get_detector_par(hdu, det)
 
-        # Raw image
-        raw_img = hdu[detector['dataext']].data.astype(float)
+        # Raw image.  The data are kept in the type of the file; they
+        # are promoted to floating point by the processing steps that
+        # need it (see :class:`pypeit.images.rawimage.RawImage`).
+        raw_img = hdu[detector['dataext']].data
         # TODO: This feels very dangerous.  Can we make this a priority?
         # TODO -- Move to FLAMINGOS2 spectrograph
         # Raw data from some spectrograph (i.e. FLAMINGOS2) have an
@@ -681,25 +701,68 @@ class Spectrograph:
             binning_raw = (',').join(binning.split(',')[::-1])
         else:
             binning_raw = binning
+        rawdatasec_img, oscansec_img \
+                = self.get_raw_section_images(detector, raw_img.shape, binning_raw)
 
-        for section in ['datasec', 'oscansec']:
+        # Return
+        return detector, raw_img, hdu, exptime, rawdatasec_img, oscansec_img
+
+    def get_raw_section_images(self, detector, shape, binning_raw):
+        """
+        Construct the images identifying the amplifier used to read each
+        pixel in the data and overscan sections of a raw frame.
+
+        The images only depend on the spectrograph, the detector
+        parameters, the shape of the raw image, and the binning, meaning
+        they are identical for all frames of a given setup.  They are
+        therefore kept in a least-recently-used cache, shared by all
+        spectrograph objects, that holds up to
+        :attr:`raw_section_cache_size` setups.
 
-            # Get the data section
-            # Try using the image sections as header keywords
+        Args:
+            detector (:class:`pypeit.images.detector_container.DetectorContainer`):
+                Detector metadata parameters, including the data and
+                overscan sections of each amplifier.
+            shape (:obj:`tuple`):
+                Shape of the raw image.
+            binning_raw (:obj:`str`):
+                Comma-separated binning of the *raw* image; i.e., this
+                has not been reordered to follow the PypeIt convention.
+
+        Returns:
+            :obj:`tuple`: Two integer `numpy.ndarray`_ objects with the
+            data and overscan section images, providing the (1-indexed)
+            number of the amplifier used to read each detector pixel.
+            Pixels unassociated with any amplifier are set to 0.  The
+            arrays are cached, and they are returned as read-only.
+        """
+        sections = {}
+        for section in ['datasec', 'oscansec']:
             # TODO -- Deal with user windowing of the CCD (e.g. Kast red)
             #  Code like the following maybe useful
             #hdr = hdu[detector[det - 1]['dataext']].header
             #image_sections = [hdr[key] for key in detector[det - 1][section]]
             # Grab from Detector
             image_sections = detector[section]
-            #if not isinstance(image_sections, list):
-            #    image_sections = [image_sections]
+            sections[section] = None if image_sections is None \
+                                    else tuple(np.atleast_1d(image_sections).tolist())
+
+        key = (self.name, detector['det'], detector['numamplifiers'], tuple(shape), binning_raw,
+               sections['datasec'], sections['oscansec'])
+        if key in self._raw_section_cache.keys():
+            self._raw_section_cache.move_to_end(key)
+            entry = self._raw_section_cache[key]
+            return entry['datasec'], entry['oscansec']
+
+        entry = {}
+        for section in ['datasec', 'oscansec']:
+            image_sections = sections[section]
             # Always assume normal FITS header formatting
             one_indexed = True
             include_last = True
 
             # Initialize the image (0 means no amplifier)
-            pix_img = np.zeros(raw_img.shape, dtype=int)
+            pix_img = np.zeros(shape, dtype=int)
             for i in range(detector['numamplifiers']):
 
                 if image_sections is not None:  # and image_sections[i] is not None:
@@ -709,15 +772,58 @@ class Spectrograph:
                                               binning=binning_raw)
                     # Assign the amplifier
                     pix_img[datasec] = i+1
+            pix_img.flags.writeable = False
+            entry[section] = pix_img
 
-            # Finish
-            if section == 'datasec':
-                rawdatasec_img = pix_img.copy()
-            else:
-                oscansec_img = pix_img.copy()
+        self._raw_section_cache[key] = entry
+        if len(self._raw_section_cache) > self.raw_section_cache_size:
+            self._raw_section_cache.popitem(last=False)
+        return entry['datasec'], entry['oscansec']
 
-        # Return
-        return detector, raw_img, hdu, exptime, rawdatasec_img, oscansec_img
+    def get_trim_orient_maps(self, detector, rawdatasec_img):
+        """
+        Construct the maps used to trim the overscan regions from a raw
+        image and to orient the result into the ``PypeIt``
+        configuration.
+
+        If ``rawdatasec_img`` is one of the images cached by
+        :func:`get_raw_section_images`, the maps are computed once and
+        cached with it; otherwise, they are recomputed.
+
+        Args:
+            detector (:class:`pypeit.images.detector_container.DetectorContainer`):
+                Detector metadata parameters.
+            rawdatasec_img (`numpy.ndarray`_):
+                Image identifying the amplifier used to read each pixel
+                of the raw image; see :func:`get_rawimage`.
+
+        Returns:
+            :obj:`tuple`: The boolean vectors selecting the rows and
+            columns of the raw image kept after trimming, and the
+            trimmed and oriented data section image.  For cached
+            images, the returned arrays are read-only.
+        """
+        entry = None
+        for _entry in self._raw_section_cache.values():
+            if _entry['datasec'] is rawdatasec_img:
+                entry = _entry
+                break
+        if entry is not None and 'trim' in entry.keys():
+            return entry['trim'] + (entry['datasec_img'],)
+
+        mask = rawdatasec_img < 1
+        # Check the data section, and trim it
+        datasec_img = procimg.trim_frame(rawdatasec_img, mask)
+        trim = (np.invert(np.all(mask, axis=1)), np.invert(np.all(mask, axis=0)))
+        datasec_img = self.orient_image(detector, datasec_img)
+        if entry is None:
+            return trim + (datasec_img,)
+
+        for arr in trim + (datasec_img,):
+            arr.flags.writeable = False
+        entry['trim'] = trim
+        entry['datasec_img'] = datasec_img
+        return trim + (datasec_img,)
 
     def get_lamps_status(self, headarr):
         """
@@ -8,6 +8,7 @@ import pytest
 import glob
 import numpy as np
 
+from pypeit import profiling
 from pypeit.images import buildimage
 from pypeit.tests.tstutils import dev_suite_required
 from pypeit.par import pypeitpar
@@ -46,3 +47,54 @@ def test_combine(deimos_flat_files):
     assert deimos_flat.image.shape == (4096,2048)
 
 
+
+
+def test_combine_maxmem():
+    # Stack the same frame three times so that sigma clipping is used
+    files = [os.path.join(os.path.dirname(__file__), 'files', 'b27.fits.gz')]*3
+    par = pypeitpar.ProcessImagesPar(use_biasimage=False, use_pixelflat=False,
+                                     use_illumflat=False)
+    img = buildimage.buildimage_fromlist(kast_blue, 1, pypeitpar.FrameGroupPar(frametype='arc', process=par),
+                                         files)
+    # Force the stack onto disk and the combination in blocks of rows
+    par['comb_maxmem'] = 0.01
+    _img = buildimage.buildimage_fromlist(kast_blue, 1, pypeitpar.FrameGroupPar(frametype='arc', process=par),
+                                          files)
+    assert np.array_equal(img.image, _img.image), 'Combined image changed'
+    assert np.array_equal(img.ivar, _img.ivar), 'Combined inverse variance changed'
+    assert np.array_equal(img.fullmask, _img.fullmask), 'Combined mask changed'
+
+
+def test_combine_n_workers():
+    files = [os.path.join(os.path.dirname(__file__), 'files', 'b27.fits.gz')]*3
+    par = pypeitpar.ProcessImagesPar(use_biasimage=False, use_pixelflat=False,
+                                     use_illumflat=False)
+    frame_par = pypeitpar.FrameGroupPar(frametype='arc', process=par)
+    img = buildimage.buildimage_fromlist(kast_blue, 1, frame_par, files)
+    # Process the frames in parallel
+    frame_par['process']['n_workers'] = 2
+    _img = buildimage.buildimage_fromlist(kast_blue, 1, frame_par, files)
+    assert np.array_equal(img.image, _img.image), 'Combined image changed'
+    assert np.array_equal(img.fullmask, _img.fullmask), 'Combined mask changed'
+
+
+def test_combine_n_workers_profile():
+    files = [os.path.join(os.path.dirname(__file__), 'files', 'b27.fits.gz')]*3
+    par = pypeitpar.ProcessImagesPar(use_biasimage=False, use_pixelflat=False,
+                                     use_illumflat=False, n_workers=2)
+    frame_par = pypeitpar.FrameGroupPar(frametype='arc', process=par)
+    profiling.profiler.pop_records()
+    profiling.profiler.enable()
+    try:
+        with profiling.profiler.step('build', frame='arc', det=1):
+            buildimage.buildimage_fromlist(kast_blue, 1, frame_par, files)
+    finally:
+        profiling.profiler.enable(False)
+    records = profiling.profiler.pop_records()
+    # The records of the workers are returned to the calling process
+    read = [r for r in records if r['step'] == 'io.read_raw']
+    assert len(read) == len(files), 'Missing records from the workers'
+    assert all([r['pid'] != os.getpid() for r in read]), 'Files should be read by the workers'
+    assert all([r['frame'] == 'b27.fits.gz' and r['det'] == 1 for r in read]), 'Bad context'
+    assert any([r['step'].startswith('process.') and r['frame'] == 'arc' for r in records]), \
+            'Processing steps should inherit the context'
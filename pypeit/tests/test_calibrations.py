@@ -46,6 +46,10 @@ def fitstbl():
 
 @pytest.fixture
 def multi_caliBrate(fitstbl):
+    return multi_caliBrate_fixture(fitstbl)
+
+
+def multi_caliBrate_fixture(fitstbl):
     # Grab a science file for configuration specific parameters
     for idx, row in enumerate(fitstbl):
         if 'science' in row['frametype']:
@@ -233,3 +237,99 @@ def test_reuse(multi_caliBrate, fitstbl):
     # Clean-up
     shutil.rmtree(multi_caliBrate_reuse.master_dir)
 
+
+
+def test_required_steps(multi_caliBrate):
+    assert multi_caliBrate.required_steps('bias') == []
+    assert multi_caliBrate.required_steps('arc') == ['bias', 'bpm']
+    assert multi_caliBrate.required_steps('flats') == multi_caliBrate.steps[:-1]
+    # No master frame for the bad-pixel mask
+    assert multi_caliBrate.master_files('bpm') == []
+    assert len(multi_caliBrate.master_files('slits')) == 2
+
+
+def test_scheduler_tasks(multi_caliBrate):
+    from pypeit import calibscheduler
+    scheduler = calibscheduler.CalibrationScheduler(multi_caliBrate.fitstbl, multi_caliBrate.par,
+                                                    multi_caliBrate.spectrograph,
+                                                    multi_caliBrate.master_dir, n_workers=2)
+    # Calibrating the same frame twice should not repeat any task
+    frame = multi_caliBrate.frame
+    tasks = scheduler.build_tasks([frame, frame], [1])
+    assert [t.step for t in tasks] \
+                == [s for s in multi_caliBrate.steps if s != 'bpm'], 'Bad tasks'
+    assert [t.step for t in tasks[-1].requires] \
+                == ['bias', 'dark', 'slits', 'arc', 'tiltimg', 'wv_calib', 'tilts'], \
+                'Bad requirements'
+
+    # Cleanup
+    shutil.rmtree(multi_caliBrate.master_dir)
+
+
+def test_scheduler_shared_slits(multi_caliBrate):
+    from pypeit import calibscheduler
+    # The flats re-write the slits, so they must follow all the steps that
+    # read them
+    assert 'align' in calibrations.Calibrations.step_requirements()['flats']
+
+    # Two calibration groups that only share the slits
+    shared = multi_caliBrate.master_files('slits')
+    class CalibGroup:
+        def __init__(self, frame):
+            self.frame = frame
+            self.steps = multi_caliBrate.steps
+            self.required_steps = multi_caliBrate.required_steps
+        def master_files(self, step):
+            return [f if f in shared else '{0}.{1}'.format(f, self.frame)
+                        for f in multi_caliBrate.master_files(step)]
+
+    scheduler = calibscheduler.CalibrationScheduler(multi_caliBrate.fitstbl, multi_caliBrate.par,
+                                                    multi_caliBrate.spectrograph,
+                                                    multi_caliBrate.master_dir, n_workers=2)
+    scheduler.calibrations = lambda frame, det, reuse_files=None: CalibGroup(frame)
+    tasks = scheduler.build_tasks([0, 1], [1])
+    first = {t.step: t for t in tasks if t.frame == 0}
+    second = {t.step: t for t in tasks if t.frame == 1}
+    assert 'slits' not in second.keys(), 'Shared slits should be traced once'
+    # The second group uses the slits re-written by the flats of the first
+    for step in ['tiltimg', 'wv_calib', 'tilts', 'flats']:
+        assert first['flats'] in second[step].requires, \
+                '{0} does not wait for the slits to be re-written'.format(step)
+
+    # Cleanup
+    if os.path.isdir(multi_caliBrate.master_dir):
+        shutil.rmtree(multi_caliBrate.master_dir)
+
+
+def test_master_manifest(fitstbl):
+    multi_caliBrate = multi_caliBrate_fixture(fitstbl)
+    multi_caliBrate.reuse_masters = True
+    # The checksums depend on the upstream steps
+    checksum = multi_caliBrate.step_checksum('arc')
+    multi_caliBrate.par['biasframe']['process']['sigclip'] = 4.
+    multi_caliBrate._checksums = {}
+    assert multi_caliBrate.step_checksum('arc') != checksum, 'Checksum should change'
+
+    # Build the arc and record it in the manifest
+    multi_caliBrate = multi_caliBrate_fixture(fitstbl)
+    multi_caliBrate.reuse_masters = True
+    multi_caliBrate.run_step('arc')
+    arc_file = multi_caliBrate.master_files('arc')[0]
+    assert multi_caliBrate.manifest.checksum(arc_file) == multi_caliBrate.step_checksum('arc'), \
+            'Bad manifest'
+
+    # Unchanged inputs: reuse
+    multi_caliBrate = multi_caliBrate_fixture(fitstbl)
+    multi_caliBrate.reuse_masters = True
+    assert multi_caliBrate._reuse_master(arc_file), 'Should reuse the arc'
+
+    # Changed parameters: rebuild
+    multi_caliBrate.par['arcframe']['process']['sigclip'] = 4.
+    multi_caliBrate._checksums = {}
+    assert not multi_caliBrate._reuse_master(arc_file), 'Should rebuild the arc'
+    multi_caliBrate.run_step('arc')
+    assert multi_caliBrate.manifest.checksum(arc_file) == multi_caliBrate.step_checksum('arc'), \
+            'Manifest not updated'
+
+    # Cleanup
+    shutil.rmtree(multi_caliBrate.master_dir)
@@ -0,0 +1,30 @@
+"""
+Module to test the construction of datacubes.
+"""
+import numpy as np
+
+from pypeit.core import datacube
+
+
+def test_histogram_cube():
+    rng = np.random.default_rng(1)
+    npix = 100000
+    pix_coord = rng.uniform(-2, 12, (npix, 3))
+    # Pixels on the bin edges, including the upper edge of the cube
+    pix_coord[:10] = np.round(pix_coord[:10]) - 0.5
+    pix_coord[10] = [9.5, 9.5, 9.5]
+    pix_coord[11,0] = np.nan
+    bins = (np.arange(11)-0.5, np.arange(11)-0.5, np.linspace(-0.5, 9.5, 21))
+    sci = rng.normal(size=npix)
+    wghts = rng.uniform(size=npix)
+
+    flux, norm, count = datacube.histogram_cube(pix_coord, bins, [sci*wghts, wghts, None])
+    assert flux.shape == (10, 10, 20), 'Bad shape'
+    assert np.array_equal(flux, np.histogramdd(pix_coord, bins=bins, weights=sci*wghts)[0]), 'Bad flux cube'
+    assert np.array_equal(norm, np.histogramdd(pix_coord, bins=bins, weights=wghts)[0]), 'Bad weight cube'
+    assert np.array_equal(count, np.histogramdd(pix_coord, bins=bins)[0]), 'Bad count cube'
+
+    # List of coordinate arrays, and single precision
+    _flux, = datacube.histogram_cube(list(pix_coord.T), bins, [sci*wghts], dtype=np.float32)
+    assert _flux.dtype == np.float32, 'Bad type'
+    assert np.allclose(_flux, flux, rtol=1e-6, atol=1e-5), 'Bad single precision cube'
@@ -19,6 +19,7 @@ from pypeit import slittrace
 from pypeit.spectrographs.util import load_spectrograph
 from pypeit.images import pypeitimage
 from pypeit import bspline
+from pypeit import wavetilts
 
 def data_path(filename):
     data_dir = os.path.join(os.path.dirname(__file__), 'files')
@@ -121,3 +122,86 @@ def test_flatimages():
 #    # Use the trace image
 #    flatImages = flatField.run()
 #    assert np.isclose(np.median(flatImages.pixelflat), 1.0)
+
+
+def test_fit2illumflat_cache():
+    nspec, nspat = 1000, 100
+    # Spatial profile fit
+    x = np.linspace(0., 1., 500)
+    spat_bspline = bspline.bspline(x, bkspace=0.1)
+    spat_bspline.fit(x, 1. + 0.1*x, np.ones_like(x))
+    flatImages = flatfield.FlatImages(illumflat_raw=np.ones((nspec, nspat)),
+                                      illumflat_spat_bsplines=np.asarray([spat_bspline]*2),
+                                      spat_id=np.asarray([25, 75]), PYP_SPEC='dummy')
+    slits = slittrace.SlitTraceSet(left_init=np.tile([10., 60.], (nspec,1)),
+                                   right_init=np.tile([40., 90.], (nspec,1)),
+                                   pypeline='MultiSlit', nspat=nspat, PYP_SPEC='dummy')
+
+    illumflat = flatImages.fit2illumflat(slits, flexure_shift=0.501)
+    assert np.all(illumflat[:,:10] == 1.) and np.all(illumflat[:,12:38] > 1.), \
+        'Bad illumination image'
+    assert flatImages.fit2illumflat(slits, flexure_shift=0.499) is illumflat, \
+        'Should use the cached image'
+    assert not illumflat.flags.writeable, 'Cached image should be read-only'
+    _illumflat = flatImages.fit2illumflat(slits, flexure_shift=1.)
+    assert _illumflat is not illumflat, 'Different flexure should not use the cache'
+
+    # Cached image is identical to a new one
+    flatImages._illumflat_cache.clear()
+    assert np.array_equal(flatImages.fit2illumflat(slits, flexure_shift=0.5), illumflat), \
+        'Cached image is different'
+
+    # Changing the slits invalidates the cache
+    slits.mask[1] = 1
+    assert not np.array_equal(flatImages.fit2illumflat(slits, flexure_shift=0.5), illumflat), \
+        'Masked slit should not be corrected'
+
+    # Least recently used images are removed
+    for flexure in np.arange(10.):
+        flatImages.fit2illumflat(slits, flexure_shift=flexure)
+    assert len(flatImages._illumflat_cache) == flatImages.illumflat_cache_size, 'Bad cache size'
+
+
+
+def test_fit_threads():
+    # Synthetic flat with three slits
+    nspec, nspat, nslit = 300, 200, 3
+    spectrograph = load_spectrograph('shane_kast_blue')
+    detector = spectrograph.get_detector_par(fits.open(data_path('b1.fits.gz')), 1)
+    left = np.tile(10. + 60.*np.arange(nslit), (nspec,1)) + np.linspace(0,3,nspec)[:,None]
+    right = left + 48.
+    spec = np.arange(nspec)[:,None]
+    spat = np.arange(nspat)[None,:]
+    flat = np.full((nspec,nspat), 5.)
+    for i in range(nslit):
+        onslit = (spat > left[:,i,None]) & (spat < right[:,i,None])
+        flat += onslit * 2000. * (1 + 0.5*np.sin(spec/60. + i)) \
+                    * (1 - 0.2*((spat - left[:,i,None])/48. - 0.5)**2)
+    flat *= np.random.default_rng(1).normal(1., 0.01, flat.shape)
+    # Tilts are just the normalized spectral coordinate
+    coeffs = np.zeros((2,2,nslit))
+    coeffs[0,0] = coeffs[1,0] = 0.5
+
+    models = []
+    for n_threads in [1, 3]:
+        slits = slittrace.SlitTraceSet(left_init=left, right_init=right, pypeline='MultiSlit',
+                                       nspat=nspat, PYP_SPEC='shane_kast_blue')
+        waveTilts = wavetilts.WaveTilts(coeffs, nslit, slits.spat_id, np.ones(nslit, dtype=int),
+                                        np.ones(nslit, dtype=int), 'legendre2d',
+                                        PYP_SPEC='shane_kast_blue')
+        par = spectrograph.default_pypeit_par()['calibrations']['flatfield']
+        par['n_threads'] = n_threads
+        flatField = flatfield.FlatField(pypeitimage.PypeItImage(flat, detector=detector),
+                                        spectrograph, par, slits, waveTilts, None)
+        flatField.fit()
+        models += [flatField]
+
+    assert np.all(models[0].slits.mask == 0), 'All slits should be fit'
+    assert np.array_equal(models[0].mspixelflat, models[1].mspixelflat), \
+            'Pixel flat depends on the number of threads'
+    assert np.array_equal(models[0].msillumflat, models[1].msillumflat), \
+            'Illumination flat depends on the number of threads'
+    assert np.array_equal(models[0].flat_model, models[1].flat_model), \
+            'Flat model depends on the number of threads'
+    assert np.array_equal(models[0].slits.left_tweak, models[1].slits.left_tweak), \
+            'Tweaked edges depend on the number of threads'
@@ -8,8 +8,9 @@ import pytest
 import glob
 import numpy as np
 
+from pypeit.core import procimg
 from pypeit.images.rawimage import RawImage
-from pypeit.tests.tstutils import dev_suite_required
+from pypeit.tests.tstutils import dev_suite_required, data_path
 from pypeit.par import pypeitpar
 from pypeit.spectrographs.util import load_spectrograph
 
@@ -183,3 +184,49 @@ def test_load_isis():
         pytest.fail('WHT ISIS test data section failed.')
 '''
 
+
+
+def test_lazy_load():
+    spec = load_spectrograph('shane_kast_blue')
+    rawImage = RawImage(data_path('b1.fits.gz'), spec, 1)
+    # Raw data are kept in the type of the file until the image is used
+    assert rawImage.rawimage.dtype == np.uint16, 'Raw data type changed'
+    assert rawImage._image is None, 'Image should not yet be constructed'
+    assert rawImage.image.dtype == float, 'Image should be promoted to double precision'
+    assert np.array_equal(rawImage.image, rawImage.rawimage), 'Bad image'
+
+    # Section images are cached for all frames read with the same setup
+    _rawImage = RawImage(data_path('b1.fits.gz'), spec, 1)
+    assert _rawImage.rawdatasec_img is rawImage.rawdatasec_img, 'Section images not cached'
+    assert not rawImage.oscansec_img.flags.writeable, 'Cached images should be read-only'
+    assert np.array_equal(np.unique(rawImage.rawdatasec_img), [0,1,2]), 'Bad amplifiers'
+
+
+def test_section_cache():
+    spec = load_spectrograph('shane_kast_blue')
+    rawImage = RawImage(data_path('b1.fits.gz'), spec, 1)
+
+    # The trimming and orientation maps are cached with the section images
+    rows, cols, datasec_img = spec.get_trim_orient_maps(rawImage.detector,
+                                                        rawImage.rawdatasec_img)
+    assert spec.get_trim_orient_maps(rawImage.detector, rawImage.rawdatasec_img)[2] \
+                is datasec_img, 'Maps not cached'
+    assert datasec_img.shape == spec.bpm(data_path('b1.fits.gz'), 1).shape, 'Bad shape'
+
+    # ... and yield the same processed image as trimming the full image
+    rawImage.trim()
+    rawImage.orient()
+    assert rawImage.datasec_img is datasec_img, 'Did not use cached maps'
+    image = spec.orient_image(rawImage.detector,
+                              procimg.trim_frame(rawImage.rawimage, rawImage.rawdatasec_img < 1))
+    assert np.array_equal(rawImage.image, image), 'Bad trimmed and oriented image'
+
+    # The cache is shared by all spectrograph objects and drops the
+    # least-recently-used setup when full
+    _spec = load_spectrograph('shane_kast_blue')
+    assert _spec.get_raw_section_images(rawImage.detector, rawImage.rawimage.shape, '1,1')[0] \
+                is rawImage.rawdatasec_img, 'Cache not shared'
+    for i in range(spec.raw_section_cache_size):
+        spec.get_raw_section_images(rawImage.detector, (100+i, 100), '1,1')
+    assert _spec.get_raw_section_images(rawImage.detector, rawImage.rawimage.shape, '1,1')[0] \
+                is not rawImage.rawdatasec_img, 'Setup should have been dropped from the cache'
@@ -2,6 +2,10 @@
 Module to run tests on armasters
 """
 import os
+import sys
+import socket
+import subprocess
+
 import numpy as np
 import pytest
 
@@ -35,3 +39,36 @@ def test_masterframe_methods():
 
     _master_key2, _master_dir2 = masterframe.grab_key_mdir(filename, from_filename=True)
     assert _master_key2 == master_key
+
+
+def test_masterframe_lock():
+    filename = os.path.join(data_root(), 'MasterLockTest_A_1_01.fits')
+    with masterframe.MasterFrameLock(filename) as lock:
+        assert os.path.isfile(filename+'.lock'), 'Lock file not created'
+        # The lock cannot be acquired by anyone else
+        with pytest.raises(Exception):
+            with masterframe.MasterFrameLock(filename, poll=0.01, timeout=0.05):
+                pass
+        assert os.path.isfile(filename+'.lock'), 'Lock file removed by the wrong process'
+    assert not os.path.isfile(filename+'.lock'), 'Lock file not removed'
+
+
+def test_masterframe_stale_lock():
+    filename = os.path.join(data_root(), 'MasterLockTest_A_1_01.fits')
+    # Lock left by a process that no longer exists
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    with open(filename+'.lock', 'w') as f:
+        f.write('{0} {1}'.format(socket.gethostname(), proc.pid))
+    with masterframe.MasterFrameLock(filename, poll=0.01, timeout=1.):
+        with open(filename+'.lock') as f:
+            assert f.read() == masterframe.MasterFrameLock.owner(), 'Stale lock not taken over'
+    assert not os.path.isfile(filename+'.lock'), 'Lock file not removed'
+
+    # Lock held by a process on another host cannot be taken over
+    with open(filename+'.lock', 'w') as f:
+        f.write('not-{0} {1}'.format(socket.gethostname(), proc.pid))
+    with pytest.raises(Exception):
+        with masterframe.MasterFrameLock(filename, poll=0.01, timeout=0.05):
+            pass
+    os.remove(filename+'.lock')
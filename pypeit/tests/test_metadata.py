@@ -9,6 +9,8 @@ import pytest
 
 import numpy as np
 
+from astropy.table import Table
+
 from pypeit.par.util import parse_pypeit_file
 from pypeit.pypeitsetup import PypeItSetup
 from pypeit.tests.tstutils import dev_suite_required, data_path
@@ -163,3 +165,76 @@ def test_lris_blue_pypeit_overwrite():
     assert fitstbl['target'][0] != fitstbl_usr['target'][0], \
             'Fits header value and input pypeit file value expected to be different.'
 
+
+
+def test_meta_cache():
+    files = sorted(glob.glob(data_path('b*.fits.gz')))
+    spectrograph = load_spectrograph('shane_kast_blue')
+    par = spectrograph.default_pypeit_par()
+    pmd = PypeItMetaData(spectrograph, par, files=files, strict=False)
+
+    # Build the table using threads and the cache
+    cache_file = data_path('test_meta_cache.json')
+    if os.path.isfile(cache_file):
+        os.remove(cache_file)
+    par['rdx']['header_threads'] = 2
+    par['rdx']['meta_cache'] = cache_file
+    _pmd = PypeItMetaData(spectrograph, par, files=files, strict=False)
+    assert os.path.isfile(cache_file), 'Cache not written'
+    for key in spectrograph.meta.keys():
+        assert np.array_equal(pmd[key], _pmd[key]), 'Metadata changed'
+
+    # Rebuild without reading the headers
+    _get_headarr = spectrograph.get_headarr
+    def no_read(ifile, strict=True):
+        raise AssertionError('Header read for {0}'.format(ifile))
+    spectrograph.get_headarr = no_read
+    _pmd = PypeItMetaData(spectrograph, par, files=files, strict=False)
+    for key in spectrograph.meta.keys():
+        assert np.array_equal(pmd[key], _pmd[key]), 'Cached metadata changed'
+
+    # Modified files are read again
+    stat = os.stat(files[0])
+    os.utime(files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    with pytest.raises(AssertionError):
+        PypeItMetaData(spectrograph, par, files=files, strict=False)
+    spectrograph.get_headarr = _get_headarr
+    _pmd = PypeItMetaData(spectrograph, par, files=files, strict=False)
+    for key in spectrograph.meta.keys():
+        assert np.array_equal(pmd[key], _pmd[key]), 'Metadata changed'
+
+    os.utime(files[0], ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.remove(cache_file)
+
+
+def test_meta_cache_usrdata(tmp_path):
+    files = sorted(glob.glob(data_path('b*.fits.gz')))
+    spectrograph = load_spectrograph('shane_kast_blue')
+    par = spectrograph.default_pypeit_par()
+
+    # Fill the cache
+    cache_file = str(tmp_path / 'test_meta_cache_usrdata.json')
+    par['rdx']['meta_cache'] = cache_file
+    pmd = PypeItMetaData(spectrograph, par, files=files, strict=False)
+    assert os.path.isfile(cache_file), 'Cache not written'
+
+    # User-provided metadata must not be read from or written to the cache
+    usrdata = Table({'filename': [os.path.basename(f) for f in files],
+                     'target': ['test']*len(files)})
+    _get_headarr = spectrograph.get_headarr
+    nread = []
+    def count_read(ifile, strict=True):
+        nread.append(ifile)
+        return _get_headarr(ifile, strict=strict)
+    spectrograph.get_headarr = count_read
+    mtime = os.stat(cache_file).st_mtime_ns
+    _pmd = PypeItMetaData(spectrograph, par, files=files, usrdata=usrdata, strict=False)
+    assert len(nread) == len(files), 'Headers should be read when usrdata are provided'
+    assert np.all(_pmd['target'] == 'test'), 'User-provided metadata ignored'
+    assert os.stat(cache_file).st_mtime_ns == mtime, 'Cache should not be written'
+
+    # Different read settings do not use the cached metadata
+    del nread[:]
+    PypeItMetaData(spectrograph, par, files=files, strict=True)
+    assert len(nread) == len(files), 'Cache used with a different strict setting'
+    spectrograph.get_headarr = _get_headarr
@@ -29,3 +29,38 @@ def test_replace_columns():
                           np.repeat(np.arange(4),10).reshape(4,10).T), \
                 'Interpolation failed.'
 
+
+
+def test_lacosmic():
+    rng = np.random.default_rng(99)
+    img = rng.normal(scale=10., size=(300,100)) + 1000.
+    # Add cosmic rays, including two near the band boundaries
+    rows = np.array([10, 63, 64, 150, 250, 127, 128])
+    cols = np.array([20, 50, 51, 70, 10, 30, 31])
+    img[rows,cols] += 5000.
+    var = np.full_like(img, 1100.)
+
+    crmask = procimg.lacosmic(img, 65000., 60000., varframe=var, grow=0)
+    assert np.all(crmask[rows,cols]), 'Did not find all the cosmic rays'
+
+    # Processing the image in bands of rows, serially or concurrently,
+    # should yield the same mask
+    for tile_rows, n_threads in [(64, 1), (64, 3), (100, 2)]:
+        assert np.array_equal(crmask,
+                              procimg.lacosmic(img, 65000., 60000., varframe=var, grow=0,
+                                               tile_rows=tile_rows, n_threads=n_threads)), \
+                'Tiling changed the result'
+
+    # Only a single iteration is performed
+    assert np.array_equal(crmask, procimg.lacosmic(img, 65000., 60000., varframe=var, grow=0,
+                                                   maxiter=3)), 'Iterations changed the result'
+
+
+def test_grow_masked():
+    img = np.zeros((11,11), dtype=float)
+    img[5,5] = 1.
+    grown = procimg.grow_masked(img, 1.5, 1.)
+    assert grown.dtype == img.dtype, 'Changed type'
+    y, x = np.mgrid[:11,:11]
+    assert np.array_equal(grown > 0, (x-5)**2 + (y-5)**2 <= 1.5**2), 'Bad footprint'
+    assert np.array_equal(procimg.grow_masked(img, 0, 1.), img), 'Should not grow'
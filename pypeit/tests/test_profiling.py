@@ -0,0 +1,81 @@
+"""
+Module to test the profiling of the reduction steps.
+"""
+import os
+import csv
+import json
+from concurrent import futures
+
+import numpy as np
+
+from pypeit import profiling
+from pypeit.tests.tstutils import data_path
+
+
+def test_disabled():
+    profiler = profiling.Profiler()
+    with profiler.step('test'):
+        pass
+    assert len(profiler.records) == 0, 'Should not record when disabled'
+
+
+def test_step():
+    profiler = profiling.Profiler()
+    profiler.enable()
+    with profiler.step('outer', frame='b1.fits.gz', det=np.int64(1)):
+        with profiler.step('inner', slit=np.int64(175)):
+            np.ones(100000).sum()
+
+    # Records are in the order the steps finished
+    records = profiler.pop_records()
+    assert [r['step'] for r in records] == ['inner', 'outer'], 'Bad order'
+    inner, outer = records
+    assert inner['frame'] == 'b1.fits.gz' and inner['det'] == 1 and inner['slit'] == 175, \
+            'Context not inherited'
+    assert outer['slit'] is None, 'Slit should not propagate outward'
+    assert outer['wall_time'] >= inner['wall_time'], 'Outer step should take longer'
+    assert outer['pid'] == os.getpid(), 'Bad process ID'
+    assert len(profiler.records) == 0, 'Records should have been removed'
+
+
+def test_thread_context():
+    profiler = profiling.Profiler()
+    profiler.enable()
+
+    def work(slit, context):
+        with profiler.step('slit', slit=slit, context=context):
+            pass
+
+    with profiler.step('outer', frame='b1.fits.gz', det=2):
+        context = profiler.context()
+        with futures.ThreadPoolExecutor(max_workers=2) as executor:
+            list(executor.map(lambda s: work(s, context), [10, 20]))
+
+    slits = [r for r in profiler.records if r['step'] == 'slit']
+    assert sorted([r['slit'] for r in slits]) == [10, 20], 'Bad slits'
+    assert all([r['frame'] == 'b1.fits.gz' and r['det'] == 2 for r in slits]), \
+            'Thread did not inherit the context'
+
+
+def test_write():
+    profiler = profiling.Profiler()
+    profiler.enable()
+    with profiler.step('outer', frame='b1.fits.gz', det=1):
+        with profiler.step('inner', slit=5):
+            pass
+
+    ofile = data_path('tmp_profile.json')
+    profiler.write(ofile)
+    with open(ofile) as f:
+        records = json.load(f)
+    assert [r['step'] for r in records] == ['inner', 'outer'], 'Bad JSON report'
+    assert set(records[0].keys()) == set(profiling.Profiler.columns), 'Bad columns'
+    os.remove(ofile)
+
+    ofile = data_path('tmp_profile.csv')
+    profiler.write(ofile)
+    with open(ofile, newline='') as f:
+        records = list(csv.DictReader(f))
+    assert [r['step'] for r in records] == ['inner', 'outer'], 'Bad CSV report'
+    assert records[0]['slit'] == '5', 'Bad CSV slit'
+    os.remove(ofile)
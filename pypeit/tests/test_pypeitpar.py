@@ -62,6 +62,11 @@ def test_manualextraction():
 def test_redux():
     pypeitpar.ReduxPar()
 
+def test_redux_n_workers():
+    assert pypeitpar.ReduxPar()['n_workers'] == 1, 'Default should be a serial reduction'
+    with pytest.raises(ValueError):
+        pypeitpar.ReduxPar(n_workers=0)
+
 def test_wavelengthsolution():
     pypeitpar.WavelengthSolutionPar()
 
@@ -145,6 +145,17 @@ def test_run_pypeit():
     pargs = run_pypeit.parse_args([pyp_file, '-o', '-r', configdir])
     run_pypeit.main(pargs)
 
+    # Nothing has changed, so the science frame should not be reduced
+    spec2d_file = os.path.join(configdir, 'Science',
+                               'spec2d_b27-J1217p3905_KASTb_2015May20T045733.560.fits')
+    assert os.path.isfile(os.path.join(configdir, 'Science',
+                          'provenance_b27-J1217p3905_KASTb_2015May20T045733.560.json')), \
+            'Provenance not written'
+    mtime = os.path.getmtime(spec2d_file)
+    pargs = run_pypeit.parse_args([pyp_file, '-o', '-u', '-r', configdir])
+    run_pypeit.main(pargs)
+    assert os.path.getmtime(spec2d_file) == mtime, 'Unchanged frame should not be reduced'
+
     # Clean-up
     shutil.rmtree(outdir)
     shutil.rmtree(testrawdir)
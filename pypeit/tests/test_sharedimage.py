@@ -0,0 +1,49 @@
+"""
+Module to test sharing images with worker processes
+"""
+from concurrent import futures
+
+import pytest
+
+import numpy as np
+
+from pypeit.images import pypeitimage, sharedimage
+
+shared_memory_required = pytest.mark.skipif(sharedimage.shared_memory is None,
+                                            reason='python 3.8 or later required')
+
+
+def _sum_row(handle, row):
+    with handle.attach() as shared:
+        return shared.sciImg.image[row].sum() + shared['tilts'][row].sum(), shared.sciImg.PYP_SPEC
+
+
+@shared_memory_required
+def test_store():
+    img = pypeitimage.PypeItImage(image=np.arange(20.).reshape(4,5), ivar=np.ones((4,5)),
+                                  PYP_SPEC='shane_kast_blue')
+    tilts = np.full((4,5), 0.5)
+    with sharedimage.SharedImageStore(img, tilts=tilts, waveimg=None) as store:
+        assert list(store.handle.arrays.keys()) == ['image:image', 'image:ivar', 'tilts'], \
+            'Wrong shared arrays'
+        assert store.nbytes == 3*img.image.nbytes, 'Wrong size'
+
+        # Attach in this process
+        with store.handle.attach() as shared:
+            assert np.array_equal(shared.sciImg.image, img.image), 'Bad image'
+            assert shared.sciImg.rn2img is None, 'Should not be shared'
+            assert np.array_equal(shared['tilts'], tilts), 'Bad tilts'
+            assert not shared['tilts'].flags.writeable, 'Should be read-only'
+
+        # Attach in worker processes
+        with futures.ProcessPoolExecutor(max_workers=2) as executor:
+            result = list(executor.map(_sum_row, [store.handle]*4, range(4)))
+        assert [r[0] for r in result] == [np.sum(img.image[i]) + 2.5 for i in range(4)], \
+            'Bad result from workers'
+        assert all([r[1] == 'shane_kast_blue' for r in result]), 'Bad image items'
+
+        name = store.handle.arrays['tilts'].name
+
+    # Blocks are released
+    with pytest.raises(FileNotFoundError):
+        sharedimage.shared_memory.SharedMemory(name=name)
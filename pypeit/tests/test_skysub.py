@@ -6,6 +6,10 @@ import numpy as np
 
 from pypeit.core import skysub
 from pypeit.slittrace import SlitTraceSet
+from pypeit.images import pypeitimage
+from pypeit.spectrographs.util import load_spectrograph
+from pypeit.images.detector_container import DetectorContainer
+from pypeit import reduce, specobj, specobjs
 
 
 def test_userregions():
@@ -49,4 +53,129 @@ def test_generatemask():
     skymask = skysub.generate_mask("IFU", regs, slits, slits.left_init, slits.right_init)
     assert(np.array_equal(skymask, tstmsk))
 
-test_userregions()
\ No newline at end of file
+
+def fake_reduce():
+    """
+    Construct a MultiSlitReduce object with two slits, each with one
+    object, and a sky spectrum that only depends on the (tilted)
+    spectral position.  The instantiation, which requires the
+    calibrations, is bypassed.
+    """
+    nspec, nspat = 200, 100
+    rng = np.random.default_rng(1234)
+    piximg = np.arange(nspec, dtype=float)[:,None] + 0.05*np.arange(nspat, dtype=float)[None,:]
+    sky = 100. + 50.*np.exp(-0.5*((piximg-100.)/3.)**2)
+    spat = np.arange(nspat, dtype=float)[None,:]
+    obj_spat = [20., 75.]
+    obj = 200.*np.sum([np.exp(-0.5*((spat-x)/2.)**2) for x in obj_spat], axis=0)
+    image = sky + obj + rng.normal(scale=1., size=(nspec,nspat))
+    sciImg = pypeitimage.PypeItImage(image=image, ivar=np.ones_like(image),
+                                     rn2img=np.ones_like(image))
+    sciImg.fullmask = np.zeros(image.shape, dtype=int)
+    sciImg.detector = DetectorContainer(0, 0, False, False, 0.43, 65535., -1e10, 0.76, 1,
+                                        np.atleast_1d(1.), np.atleast_1d(1.), 1, '1,1')
+
+    red = reduce.MultiSlitReduce.__new__(reduce.MultiSlitReduce)
+    red.sciImg = sciImg
+    red.par = load_spectrograph('shane_kast_blue').default_pypeit_par()
+    red.std_redux = False
+    red.ir_redux = False
+    red.steps = []
+    red.slits = SlitTraceSet(left_init=np.tile([2., 52.], (nspec,1)),
+                             right_init=np.tile([47., 97.], (nspec,1)), binspec=1, binspat=1,
+                             pypeline='MultiSlit', nspat=nspat, PYP_SPEC='dummy')
+    red.slits_left, red.slits_right, _ = red.slits.select_edges()
+    red.slitmask = red.slits.slit_img()
+    red.slitpix = red.slits.slit_pixels()
+    red.reduce_bpm = np.zeros(red.slits.nslits, dtype=bool)
+    red.tilts = piximg/(nspec-1)
+    red.waveimg = 4000. + piximg
+
+    sobjs = specobjs.SpecObjs()
+    for i, (slit_spat, x) in enumerate(zip(red.slits.spat_id, obj_spat)):
+        sobj = specobj.SpecObj('MultiSlit', 1, SLITID=slit_spat)
+        sobj.TRACE_SPAT = np.full(nspec, x)
+        sobj.SPAT_PIXPOS = x
+        sobj.maskwidth = 10.
+        sobj.FWHM = 4.7
+        sobj.OBJID = i+1
+        sobjs.add_sobj(sobj)
+    return red, sky, sobjs
+
+
+def test_global_skysub_threads():
+    red, sky, _ = fake_reduce()
+    # Mask the objects
+    skymask = np.ones(sky.shape, dtype=bool)
+    skymask[:,15:26] = False
+    skymask[:,70:81] = False
+
+    global_sky = red.global_skysub(skymask=skymask, update_crmask=False).copy()
+    gpm = red.slitmask > -1
+    assert np.median(np.absolute(global_sky[gpm] - sky[gpm])) < 1., 'Bad sky fit'
+
+    red.par['reduce']['skysub']['n_threads'] = 2
+    assert np.array_equal(red.global_skysub(skymask=skymask, update_crmask=False), global_sky), \
+        'Threaded fit should be identical'
+
+
+def test_local_skysub_extract_threads():
+    red, sky, sobjs = fake_reduce()
+    global_sky = red.global_skysub(update_crmask=False).copy()
+
+    red.local_skysub_extract(global_sky, sobjs)
+    skymodel = red.skymodel.copy()
+    objmodel = red.objmodel.copy()
+    _sobjs = red.sobjs
+
+    red.par['reduce']['skysub']['n_threads'] = 2
+    _skymodel, _objmodel, _ivarmodel, _outmask, __sobjs = red.local_skysub_extract(global_sky, sobjs)
+    assert _skymodel is red.skymodel and __sobjs is red.sobjs, 'Bad return value'
+    assert np.array_equal(_skymodel, skymodel), 'Threaded sky model should be identical'
+    assert np.array_equal(_objmodel, objmodel), 'Threaded object model should be identical'
+    for sobj, _sobj in zip(__sobjs, _sobjs):
+        assert np.array_equal(sobj.OPT_COUNTS, _sobj.OPT_COUNTS), \
+            'Threaded extraction should be identical'
+
+
+def test_ech_local_skysub_extract_threads():
+    # Four vertical orders with one object each; the last order has a low
+    # S/N, such that the FWHM of its object is set by the other orders.
+    red, sky, _ = fake_reduce()
+    nspec, nspat = sky.shape
+    norders = 4
+    left = np.tile(np.arange(norders)*25. + 1., (nspec,1))
+    right = left + 22.
+    slitmask = np.full(sky.shape, -1, dtype=int)
+    for iord in range(norders):
+        slitmask[:,int(left[0,iord])+1:int(right[0,iord])] = iord
+    spat = np.arange(nspat, dtype=float)[None,:]
+    obj_spat = left[0] + 11.
+    rng = np.random.default_rng(5)
+    image = sky + np.sum([a*np.exp(-0.5*((spat-x)/2.)**2) for a, x in zip([200., 150., 100., 5.], obj_spat)],
+                         axis=0) + rng.normal(scale=1., size=sky.shape)
+    ivar = np.ones_like(image)
+    global_sky = np.copy(sky)
+
+    sobjs = specobjs.SpecObjs()
+    for iord, (x, snr) in enumerate(zip(obj_spat, [10., 8., 6., 1.])):
+        sobj = specobj.SpecObj('Echelle', 1, ECH_ORDER=50-iord, ECH_ORDERINDX=iord)
+        sobj.ECH_OBJID = 1
+        sobj.OBJID = 1
+        sobj.TRACE_SPAT = np.full(nspec, x)
+        sobj.SPAT_PIXPOS = x
+        sobj.maskwidth = 8.
+        sobj.FWHM = 4.7
+        sobj.ech_snr = snr
+        sobjs.add_sobj(sobj)
+
+    models = [skysub.ech_local_skysub_extract(image, ivar, np.zeros(image.shape, dtype=int), red.tilts,
+                                              red.waveimg, global_sky, np.ones_like(image), left, right,
+                                              slitmask, sobjs, 50-np.arange(norders),
+                                              box_rad_order=np.full(norders, 5.), n_threads=n_threads)
+              for n_threads in [1, 3]]
+    for model, _model in zip(models[0][:4], models[1][:4]):
+        assert np.array_equal(model, _model), 'Threaded models should be identical'
+    for sobj, _sobj in zip(models[0][4], models[1][4]):
+        assert np.array_equal(sobj.OPT_COUNTS, _sobj.OPT_COUNTS), 'Threaded extraction should be identical'
+        assert sobj.FWHM == _sobj.FWHM, 'Threaded FWHM should be identical'
@@ -6,7 +6,7 @@ import pytest
 
 import numpy as np
 
-from pypeit.slittrace import SlitTraceSet, SlitTraceBitMask
+from pypeit.slittrace import SlitTraceSet, SlitTraceBitMask, slitid_img_pixels
 from pypeit import masterframe
 
 master_key = 'dummy'
@@ -118,3 +118,51 @@ def test_io_single():
     os.remove(tst_file)
 
 
+
+
+def test_slit_pixels():
+    nspec, nspat = 200, 150
+    y = np.linspace(0, 1, nspec)[:,None]
+    left = np.array([-3., 10., 40., 60.5, 100.])[None,:] + 5*y**2
+    right = np.array([8., 38., 62., 98.5, 160.])[None,:] + 5*y**2
+    specmin = np.array([-1., 20.5, -1., -1., -1.])
+    specmax = np.array([nspec, nspec, 150., nspec, nspec], dtype=float)
+    slits = SlitTraceSet(left, right, 'MultiSlit', nspat=nspat, specmin=specmin,
+                         specmax=specmax, PYP_SPEC='dummy')
+    slits.mask[3] = 1
+
+    spat = np.arange(nspat)
+    spec = np.arange(nspec)
+    for pad, slitidx, flexure in [(0, None, None), (3, None, 1.5), ((2, -1.5), [2, 1], None)]:
+        # Brute-force construction of the slit image; later slits
+        # take precedence
+        _left, _right, _ = slits.select_edges(flexure=flexure)
+        _pad = pad if isinstance(pad, tuple) else (pad, pad)
+        _slitidx = np.where(slits.mask == 0)[0] if slitidx is None else slitidx
+        slitid_img = np.full((nspec, nspat), -1, dtype=int)
+        for i in _slitidx:
+            indx = (spat[None,:] > _left[:,i,None] - _pad[0]) \
+                        & (spat[None,:] < _right[:,i,None] + _pad[1]) \
+                        & (spec > specmin[i])[:,None] & (spec < specmax[i])[:,None]
+            slitid_img[indx] = slits.spat_id[i]
+        assert np.array_equal(slits.slit_img(pad=pad, slitidx=slitidx, flexure=flexure),
+                              slitid_img), 'Bad slit image'
+
+        pixels = slits.slit_pixels(pad=pad, slitidx=slitidx, flexure=flexure)
+        assert list(pixels.keys()) == list(slits.spat_id[_slitidx]), 'Bad slits'
+        for spat_id, indx in pixels.items():
+            assert np.array_equal(indx, np.flatnonzero(slitid_img == spat_id)), 'Bad pixels'
+        assert slits.slit_pixels(pad=pad, slitidx=slitidx, flexure=flexure) is pixels, \
+            'Pixels should be cached'
+
+        _pixels = slitid_img_pixels(slitid_img)
+        assert list(_pixels.keys()) == sorted(pixels.keys()), 'Bad slits'
+        for spat_id, indx in _pixels.items():
+            assert np.array_equal(indx, pixels[spat_id]), 'Bad pixels'
+
+    # Changing the edges invalidates the cache
+    pixels = slits.slit_pixels()
+    slits.init_tweaked()
+    slits.left_tweak += 2.
+    assert slits.slit_pixels() is not pixels, 'Cache not updated'
+    assert slits.slit_pixels(initial=True) is not pixels, 'Key should include initial'
@@ -0,0 +1,178 @@
+"""
+Module to test the telluric model evaluation.
+"""
+import numpy as np
+
+from astropy.io import fits
+
+from pypeit.core import telluric
+from pypeit.core.wavecal import wvutils
+
+
+def synthetic_tell_dict():
+    # Telluric grid with random absorption lines on a log-linear
+    # wavelength grid
+    rng = np.random.default_rng(1)
+    nspec = 3000
+    wave_grid = np.power(10., 4.0 + 1e-5*np.arange(nspec))
+    tell_grid = 1 - 0.5*rng.random((3,2,4,1,nspec))**8
+    dwave, dloglam, resln_guess, pix_per_sigma = wvutils.get_sampling(wave_grid)
+    return dict(wave_grid=wave_grid, dloglam=dloglam, resln_guess=resln_guess,
+                pix_per_sigma=pix_per_sigma, tell_pad_pix=int(np.ceil(10.0 * pix_per_sigma)),
+                pressure_grid=np.array([0.5, 0.7, 0.9]), temp_grid=np.array([250., 270.]),
+                h2o_grid=np.array([10., 30., 50., 70.]), airmass_grid=np.array([1.0]),
+                tell_grid=tell_grid)
+
+
+def synthetic_theta_tell(tell_dict, npop):
+    rng = np.random.default_rng(2)
+    return np.array([rng.uniform(0.5, 0.9, npop), rng.uniform(250., 270., npop),
+                     rng.uniform(10., 70., npop), np.ones(npop),
+                     rng.uniform(0.2, 1.5, npop)*tell_dict['resln_guess'],
+                     rng.uniform(-5., 5., npop), rng.uniform(0.9, 1.1, npop)])
+
+
+def poly_model(theta, obj_dict):
+    model = np.polyval(theta, obj_dict['x'])
+    return model, model > 0
+
+
+def test_eval_telluric_batch():
+    tell_dict = synthetic_tell_dict()
+    npop = 50
+    theta_tell = synthetic_theta_tell(tell_dict, npop)
+    for ind_lower, ind_upper in [(None, None), (500, 2000), (2800, 2999)]:
+        # With and without the shift and stretch
+        for ntheta in [5, 7]:
+            tell_model = telluric.eval_telluric_batch(theta_tell[:ntheta], tell_dict,
+                                                      ind_lower=ind_lower, ind_upper=ind_upper)
+            _tell_model = np.array([telluric.eval_telluric(theta_tell[:ntheta,i], tell_dict,
+                                                           ind_lower=ind_lower, ind_upper=ind_upper)
+                                    for i in range(npop)])
+            assert tell_model.shape == _tell_model.shape, 'Bad shape'
+            assert np.allclose(tell_model, _tell_model, rtol=0, atol=1e-12), \
+                    'Batch evaluation does not match'
+
+
+def test_tellfit_chi2_batch():
+    tell_dict = synthetic_tell_dict()
+    ind_lower, ind_upper = 500, 2000
+    npop = 50
+    x = np.linspace(-1, 1, ind_upper - ind_lower + 1)
+    rng = np.random.default_rng(3)
+    theta = np.vstack([rng.uniform(-0.5, 0.5, npop), rng.uniform(0.5, 1.5, npop),
+                       synthetic_theta_tell(tell_dict, npop)])
+    # Invalid object model
+    theta[1,0] = -5.
+    flux = telluric.eval_telluric(theta[2:,1], tell_dict, ind_lower=ind_lower, ind_upper=ind_upper) \
+                * np.polyval(theta[:2,1], x) + rng.normal(scale=0.01, size=x.size)
+    thismask = np.ones(x.size, dtype=bool)
+    thismask[::7] = False
+    arg_dict = dict(ivar=np.full(x.size, 1e4), tell_dict=tell_dict, ind_lower=ind_lower,
+                    ind_upper=ind_upper, obj_model_func=poly_model, obj_dict=dict(x=x))
+    loss = telluric.tellfit_chi2(theta, flux, thismask, arg_dict)
+    _loss = np.array([telluric.tellfit_chi2(theta[:,i], flux, thismask, arg_dict)
+                      for i in range(npop)])
+    assert loss.shape == (npop,), 'Bad shape'
+    assert np.isinf(loss[0]) and np.isinf(_loss[0]), 'Invalid model should have infinite loss'
+    assert np.allclose(loss[1:], _loss[1:], rtol=1e-10, atol=0), 'Batch loss function does not match'
+
+
+def write_synthetic_grid(tell_dict, ofile):
+    # Wavelengths are in nm
+    hdr = fits.Header(dict(PRES0=0.5, DPRES=0.2, NPRES=3, TEMP0=250., DTEMP=20., NTEMP=2,
+                           HUM0=10., DHUM=20., NHUM=4, AM0=1., DAM=0., NAM=1))
+    fits.HDUList([fits.PrimaryHDU(tell_dict['tell_grid'], header=hdr),
+                  fits.ImageHDU(tell_dict['wave_grid']/10.)]).writeto(ofile, overwrite=True)
+
+
+def test_read_telluric_grid(tmp_path):
+    tell_dict = synthetic_tell_dict()
+    ofile = str(tmp_path / 'tmp_telgrid.fits')
+    write_synthetic_grid(tell_dict, ofile)
+
+    full_dict = telluric.read_telluric_grid(ofile)
+    assert np.array_equal(full_dict['tell_grid'], tell_dict['tell_grid']), 'Bad grid'
+    assert np.allclose(full_dict['h2o_grid'], tell_dict['h2o_grid']), 'Bad humidity grid'
+
+    wave_min, wave_max = tell_dict['wave_grid'][[1000, 2000]]
+    trim_dict = telluric.read_telluric_grid(ofile, wave_min=wave_min, wave_max=wave_max, pad=10)
+    assert np.array_equal(trim_dict['tell_grid'], tell_dict['tell_grid'][...,990:2010]), 'Bad trimmed grid'
+    assert np.array_equal(trim_dict['wave_grid'], full_dict['wave_grid'][990:2010]), \
+            'Bad trimmed wavelengths'
+    assert not trim_dict['tell_grid'].flags.writeable, 'Grid should be read-only'
+
+    # The second read should come from the cache
+    _trim_dict = telluric.read_telluric_grid(ofile, wave_min=wave_min, wave_max=wave_max, pad=10)
+    assert _trim_dict['tell_grid'] is trim_dict['tell_grid'], 'Grid should have been cached'
+
+    # Padding for the convolution
+    pad_dict = telluric.read_telluric_grid(ofile, wave_min=wave_min, wave_max=wave_max, pad=None)
+    assert pad_dict['wave_grid'].size == 1000 + 2*(pad_dict['tell_pad_pix']+1), 'Bad padding'
+
+
+def test_telluric_workers(tmp_path):
+    tell_dict = synthetic_tell_dict()
+    ofile = str(tmp_path / 'tmp_telgrid.fits')
+    write_synthetic_grid(tell_dict, ofile)
+
+    # Two orders with a polynomial continuum
+    rng = np.random.default_rng(4)
+    wave = np.stack([np.linspace(10400., 10600., 200), np.linspace(10700., 10900., 200)], axis=1)
+    flux = np.stack([np.interp(wave[:,i], tell_dict['wave_grid'], tell_dict['tell_grid'][1,1,1,0])
+                     * (1 + 0.1*i) for i in range(2)], axis=1) + rng.normal(scale=0.01, size=wave.shape)
+    ivar = np.full(wave.shape, 1e4)
+    mask = np.ones(wave.shape, dtype=bool)
+    obj_params = dict(z_obj=0., mask_lyman_a=False, polyorder_vec=np.array([1, 1]), func='legendre',
+                      model='exp', delta_coeff_bounds=(-20., 20.), minmax_coeff_bounds=(-5., 5.),
+                      debug=False)
+
+    tell_fits = []
+    for n_workers in [1, 2]:
+        tell_fits += [telluric.Telluric(wave, flux, ivar, mask, ofile, obj_params,
+                                        telluric.init_poly_model, telluric.eval_poly_model,
+                                        maxiter=1, popsize=5, tol=1e-2, n_workers=n_workers)]
+        tell_fits[-1].run()
+
+    for iord in range(2):
+        assert np.array_equal(tell_fits[0].result_list[iord].x, tell_fits[1].result_list[iord].x), \
+                'Parallel fit does not match'
+    assert np.array_equal(tell_fits[0].out_table['TELLURIC'], tell_fits[1].out_table['TELLURIC']), \
+            'Parallel telluric model does not match'
+
+    # The model of the best fit is convolved to the fitted resolution,
+    # not the quantized resolution of the cached models
+    tell_fit = tell_fits[0]
+    for iord in range(2):
+        tellmodel = telluric.eval_telluric(tell_fit.theta_tell_list[iord], tell_fit.tell_dict,
+                                           ind_lower=tell_fit.ind_lower[iord], ind_upper=tell_fit.ind_upper[iord])
+        assert np.array_equal(tell_fit.tellmodel_list[iord], tellmodel), 'Best-fit model should not be cached'
+
+
+def test_telluric_model_cache():
+    tell_dict = synthetic_tell_dict()
+    ind_lower, ind_upper = 500, 2000
+    npop = 50
+    theta_tell = synthetic_theta_tell(tell_dict, npop)
+    cache = telluric.TelluricModelCache(resln_quantum=1e-2)
+    tell_model = telluric.eval_telluric_batch(theta_tell, tell_dict, ind_lower=ind_lower, ind_upper=ind_upper,
+                                              cache=cache)
+    assert cache.hits + cache.misses == npop, 'Bad number of models'
+    # The models are convolved to the quantized resolution
+    _theta_tell = theta_tell.copy()
+    _theta_tell[4] = cache.quantize(theta_tell[4])[1]
+    assert np.allclose(np.abs(_theta_tell[4]/theta_tell[4] - 1), 0, atol=5e-3), 'Bad quantization'
+    _tell_model = telluric.eval_telluric_batch(_theta_tell, tell_dict, ind_lower=ind_lower, ind_upper=ind_upper)
+    assert np.allclose(tell_model, _tell_model, rtol=0, atol=1e-12), 'Cached models do not match'
+
+    # Repeat with slightly different resolutions
+    theta_tell[4] *= 1.0001
+    misses = cache.misses
+    telluric.eval_telluric(theta_tell[:,0], tell_dict, ind_lower=ind_lower, ind_upper=ind_upper, cache=cache)
+    assert cache.misses == misses, 'Model should have been cached'
+    assert cache.hit_rate > 0, 'Bad hit rate'
+
+    # Limit the size of the cache
+    cache = telluric.TelluricModelCache(maxmem=10*(ind_upper - ind_lower + 1)*8/1024**2, resln_quantum=0)
+    telluric.eval_telluric_batch(theta_tell, tell_dict, ind_lower=ind_lower, ind_upper=ind_upper, cache=cache)
+    assert cache.nbytes <= cache.maxmem*1024**2 and len(cache) > 0, 'Cache too large'
@@ -6,6 +6,7 @@ import io
 import os
 import shutil
 import inspect
+import json
 
 import pytest
 
@@ -117,3 +118,50 @@ def test_wavecalib():
 
     # Finish
     os.remove(out_file)
+
+
+def test_build_waveimg():
+    nspec, nspat = 500, 100
+    slits = slittrace.SlitTraceSet(left_init=np.tile([2., 35., 70.], (nspec,1)),
+                                   right_init=np.tile([30., 65., 98.], (nspec,1)),
+                                   pypeline='MultiSlit', nspat=nspat, PYP_SPEC='dummy')
+    tilts = np.tile(np.linspace(0, 1, nspec), (nspat,1)).T \
+                + 0.01*np.linspace(0, 1, nspat)[None,:]
+    # Solutions with different orders
+    fits = [fitting.PypeItFit(fitc=np.array([5000., 1000., 10.]), func='legendre',
+                              minx=0., maxx=1.),
+            fitting.PypeItFit(fitc=np.array([6000., 900., -5., 1.]), func='legendre',
+                              minx=0.1, maxx=0.9),
+            fitting.PypeItFit(fitc=np.array([7000., 800.]), func='legendre', minx=0., maxx=1.)]
+    waveCalib = wavecalib.WaveCalib(wv_fits=np.asarray([wv_fitting.WaveFit(spat_id, pypeitfit=f)
+                                                        for spat_id, f in zip(slits.spat_id, fits)]),
+                                    nslits=slits.nslits, spat_ids=slits.spat_id,
+                                    strpar=json.dumps({'echelle': False}))
+    spec_flexure = np.array([0.5, -1., 2.])
+
+    # Evaluate each slit separately
+    slitmask = slits.slit_img()
+    waveimg = np.zeros_like(tilts)
+    for i, f in enumerate(fits):
+        indx = slitmask == slits.spat_id[i]
+        waveimg[indx] = f.eval(tilts[indx] + spec_flexure[i]/(nspec-1))
+
+    _waveimg = waveCalib.build_waveimg(tilts, slits, spec_flexure=spec_flexure)
+    assert np.array_equal(_waveimg, waveimg), 'Bad wavelength image'
+    _waveimg = waveCalib.build_waveimg(tilts, slits, spec_flexure=spec_flexure, dtype=np.float32)
+    assert _waveimg.dtype == np.float32, 'Bad type'
+    assert np.array_equal(_waveimg, waveimg.astype(np.float32)), 'Bad float32 wavelength image'
+
+    # Masked slits are not evaluated
+    slits.mask[1] = slits.bitmask.turn_on(slits.mask[1], 'BADWVCALIB')
+    waveimg[slitmask == slits.spat_id[1]] = 0.
+    assert np.array_equal(waveCalib.build_waveimg(tilts, slits, spec_flexure=spec_flexure),
+                          waveimg), 'Bad wavelength image with a masked slit'
+
+    # Mixed functions are evaluated separately
+    waveCalib.wv_fits[2].pypeitfit = fitting.PypeItFit(fitc=np.array([7000., 800.]),
+                                                       func='polynomial')
+    waveimg[slitmask == slits.spat_id[2]] = 7000. + 800.*tilts[slitmask == slits.spat_id[2]] \
+                                                + 1600./(nspec-1)
+    assert np.allclose(waveCalib.build_waveimg(tilts, slits, spec_flexure=spec_flexure),
+                       waveimg), 'Bad wavelength image with mixed functions'
@@ -180,13 +180,20 @@ class WaveCalib(datamodel.DataContainer):
         if not np.array_equal(self.spat_ids, slits.spat_id):
             msgs.error("Your wvcalib solutions are out of sync with your slits.  Remove Masters and start from scratch")
 
-    def build_waveimg(self, tilts, slits, spat_flexure=None, spec_flexure=None):
+    def build_waveimg(self, tilts, slits, spat_flexure=None, spec_flexure=None, dtype=None):
         """
         Main algorithm to build the wavelength image
 
         Only applied to good slits, which means any non-flagged or flagged
          in the exclude_for_reducing list
 
+        The on-slit pixels of all slits are gathered (see
+        :func:`pypeit.slittrace.SlitTraceSet.slit_pixels`) and the
+        wavelength solutions are evaluated in a single pass: the echelle
+        2D solution is evaluated with the order number of each pixel,
+        and the 1D solutions of all slits are stacked and evaluated with
+        :func:`pypeit.core.fitting.evaluate_fits`.
+
         Args:
             tilts (`numpy.ndarray`_):
                 Image holding tilts
@@ -200,6 +207,11 @@ class WaveCalib(datamodel.DataContainer):
                 array should be the same as the number of slits. The
                 value of each element is the spectral shift in pixels
                 to be applied to each slit.
+            dtype (`numpy.dtype`_, optional):
+                Data type of the output image; e.g., use
+                ``np.float32`` to halve its memory footprint.  The
+                solutions are always evaluated in double precision.  If
+                None, the image has the same type as ``tilts``.
 
         Returns:
             `numpy.ndarray`_: The wavelength image.
@@ -219,34 +231,55 @@ class WaveCalib(datamodel.DataContainer):
         #ok_slits = slits.mask == 0
         bpm = slits.mask.astype(bool)
         bpm &= np.logical_not(slits.bitmask.flagged(slits.mask, flag=slits.bitmask.exclude_for_reducing))
-        ok_slits = np.logical_not(bpm)
+        ok_slits = np.where(np.logical_not(bpm))[0]
         #
-        image = np.zeros_like(tilts)
-        slitmask = slits.slit_img(flexure=spat_flexure, exclude_flag=slits.bitmask.exclude_for_reducing)
+        image = np.zeros(tilts.shape, dtype=tilts.dtype if dtype is None else dtype)
+        if ok_slits.size == 0:
+            return image
+
+        # Gather the on-slit pixels of all the good slits
+        pixels = slits.slit_pixels(flexure=spat_flexure,
+                                   exclude_flag=slits.bitmask.exclude_for_reducing)
+        indx = [pixels[slits.spat_id[islit]] for islit in ok_slits]
+        npix = np.array([i.size for i in indx])
+        if np.any(npix == 0):
+            msgs.error("Something failed in wavelengths or masking..")
+        indx = np.concatenate(indx)
+        # Index in ok_slits of the slit with each pixel
+        slit_index = np.repeat(np.arange(ok_slits.size), npix)
+        x = tilts.ravel()[indx] + spec_flex[ok_slits][slit_index]
 
-        # If this is echelle print out a status message and do some error checking
         if self.par['echelle']:
             msgs.info('Evaluating 2-d wavelength solution for echelle....')
             # TODO UPDATE THIS!!
             #if len(wv_calib['fit2d']['orders']) != np.sum(ok_slits):
             #    msgs.error('wv_calib and ok_slits do not line up. Something is very wrong!')
-
-        # Unpack some 2-d fit parameters if this is echelle
-        for islit in np.where(ok_slits)[0]:
-            slit_spat = slits.spat_id[islit]
-            thismask = (slitmask == slit_spat)
-            if not np.any(thismask):
-                msgs.error("Something failed in wavelengths or masking..")
-            if self.par['echelle']:
-                # # TODO: Put this in `SlitTraceSet`?
-                # evaluate solution --
-                image[thismask] = self.wv_fit2d.eval(
-                    tilts[thismask] + spec_flex[islit], x2=np.full_like(tilts[thismask], slits.ech_order[islit]))
-                image[thismask] /= slits.ech_order[islit]
-            else:
-                iwv_fits = self.wv_fits[islit]
-                image[thismask] = iwv_fits.pypeitfit.eval(tilts[thismask] + spec_flex[islit])
-        # Return
+            order = slits.ech_order[ok_slits][slit_index]
+            image.reshape(-1)[indx] = self.wv_fit2d.eval(x, x2=order.astype(float)) / order
+            return image
+
+        fits = [self.wv_fits[islit].pypeitfit for islit in ok_slits]
+        func = fits[0].func
+        if all([f.func == func and f.fitc.ndim == 1 for f in fits]) \
+                and func in ['polynomial', 'legendre', 'chebyshev'] \
+                and (func == 'polynomial'
+                     or not any([f.minx is None or f.maxx is None for f in fits])):
+            # Stack the coefficients and evaluate all slits at once
+            fitc = np.zeros((len(fits), max([f.fitc.size for f in fits])), dtype=float)
+            for i, f in enumerate(fits):
+                fitc[i,:f.fitc.size] = f.fitc
+            minx = None if func == 'polynomial' else np.array([f.minx for f in fits])
+            maxx = None if func == 'polynomial' else np.array([f.maxx for f in fits])
+            image.reshape(-1)[indx] = fitting.evaluate_fits(fitc, func, x, slit_index,
+                                                            minx=minx, maxx=maxx)
+            return image
+
+        # Evaluate each slit separately; the pixels of each slit are
+        # contiguous in indx
+        end = np.cumsum(npix)
+        for i, f in enumerate(fits):
+            s = slice(end[i]-npix[i], end[i])
+            image.reshape(-1)[indx[s]] = f.eval(x[s])
         return image
 
     def print_diagnostics(self):
@@ -14,7 +14,7 @@ from matplotlib import pyplot as plt
 
 from astropy import stats, visualization
 
-from pypeit import msgs, datamodel
+from pypeit import msgs, datamodel, slittrace
 from pypeit.display import display
 from pypeit.core import arc
 from pypeit.core import tracewave
@@ -107,17 +107,15 @@ class WaveTilts(datamodel.DataContainer):
         """
         _flexure = 0. if flexure is None else flexure
 
-        final_tilts = np.zeros_like(slitmask).astype(float)
-        gdslit_spat = np.unique(slitmask[slitmask >= 0]).astype(int)
-        # Loop
-        for slit_spat in gdslit_spat:
+        final_tilts = np.zeros(slitmask.shape, dtype=float)
+        _final_tilts = final_tilts.reshape(-1)
+        # Loop; only the on-slit pixels are evaluated
+        for slit_spat, indx in slittrace.slitid_img_pixels(slitmask).items():
             slit_idx = self.spatid_to_zero(slit_spat)
             # Calculate
             coeff_out = self.coeffs[:self.spec_order[slit_idx]+1,:self.spat_order[slit_idx]+1,slit_idx]
-            _tilts = tracewave.fit2tilts(final_tilts.shape, coeff_out, self.func2d, spat_shift=-1*_flexure)
-            # Fill
-            thismask_science = slitmask == slit_spat
-            final_tilts[thismask_science] = _tilts[thismask_science]
+            _final_tilts[indx] = tracewave.fit2tilts(final_tilts.shape, coeff_out, self.func2d,
+                                                     spat_shift=-1*_flexure, pixels=indx)
         # Return
         return final_tilts
 